@@ -0,0 +1,123 @@
+"""
+Benchmark Dataset Generator
+
+Vectorized, chunked generator for large raw market CSVs (1M-100M rows) with
+controlled data-quality problems:
+- duplicate_rate: fraction of rows that are exact copies of another row
+- key_duplicate_rate: fraction of rows that reuse an earlier market/product/date
+  key with a different price/quantity (aggregated by the transform)
+- null_rate: per-column probability of a missing name, price or quantity
+
+Keys are drawn from a market x product x day grid sized so every non-duplicate
+row gets a fresh key. Output is split across ``files`` CSVs with the raw
+column names used by the provider drops, so the extraction manifest and
+process pool are exercised too. Same parameters + seed => same files.
+"""
+
+import math
+import os
+from datetime import date
+
+import numpy as np
+import pandas as pd
+
+from scripts.generate_market_data import MARKETS, PRODUCTS
+
+RAW_COLUMNS = ['Market Name', 'Product Name', 'Price', 'Quantity', 'Date Recorded']
+CHUNK_ROWS = 1_000_000
+
+
+def market_names(count):
+    """``count`` market names, extending the base list with numbered branches"""
+    if count <= len(MARKETS):
+        return MARKETS[:count]
+    return [f"{MARKETS[i % len(MARKETS)]} {i // len(MARKETS) + 1}" for i in range(count)]
+
+
+def _generate_chunk(rng, n, key_offset, keys_per_day, n_markets, products, start_date,
+                    duplicate_rate, key_duplicate_rate, null_rate):
+    """One chunk of raw rows; returns (frame, number of fresh keys used)"""
+    n_exact = int(round(n * duplicate_rate))
+    n_base = n - n_exact
+    n_key_dup = int(round(n_base * key_duplicate_rate))
+    n_fresh = n_base - n_key_dup
+
+    fresh = key_offset + np.arange(n_fresh, dtype=np.int64)
+    reused = rng.integers(0, max(key_offset + n_fresh, 1), size=n_key_dup, dtype=np.int64)
+    keys = np.concatenate([fresh, reused])
+
+    day, rest = np.divmod(keys, keys_per_day)
+    market_idx, product_idx = np.divmod(rest, len(products))
+
+    names = list(products)
+    low = np.array([products[p][0] for p in names], dtype=np.float64)[product_idx]
+    high = np.array([products[p][1] for p in names], dtype=np.float64)[product_idx]
+    price = np.round(low + rng.random(n_base) * (high - low), 2)
+    quantity = pd.array(rng.integers(20, 501, size=n_base), dtype='Int64')
+
+    base = pd.DataFrame({
+        'Market Name': pd.Categorical.from_codes(market_idx, market_names(n_markets)),
+        'Product Name': pd.Categorical.from_codes(product_idx, names),
+        'Price': price,
+        'Quantity': quantity,
+        'Date Recorded': pd.Timestamp(start_date) + pd.to_timedelta(day, unit='D'),
+    })
+
+    if null_rate > 0:
+        for col in RAW_COLUMNS[:4]:
+            mask = rng.random(n_base) < null_rate
+            base.loc[mask, col] = np.nan
+
+    if n_exact:
+        copies = base.iloc[rng.integers(0, n_base, size=n_exact)]
+        base = pd.concat([base, copies], ignore_index=True)
+
+    return base.iloc[rng.permutation(len(base))], n_fresh
+
+
+def generate_dataset(out_dir, rows=1_000_000, files=None, markets=100, duplicate_rate=0.02,
+                     key_duplicate_rate=0.05, null_rate=0.01, start_date=date(2020, 1, 1),
+                     seed=42, chunk_rows=CHUNK_ROWS):
+    """
+    Write ``rows`` raw market rows to ``files`` CSVs under ``out_dir``
+
+    Returns:
+        dict: dataset description (paths, bytes and the parameters used)
+    """
+    files = files or max(1, math.ceil(rows / chunk_rows))
+    os.makedirs(out_dir, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    keys_per_day = markets * len(PRODUCTS)
+
+    paths = []
+    key_offset = 0
+    per_file = math.ceil(rows / files)
+    for file_no in range(files):
+        path = os.path.join(out_dir, f"market_data_{file_no:04d}.csv")
+        remaining = min(per_file, rows - file_no * per_file)
+        header = True
+        with open(path, 'w', newline='', encoding='utf-8') as f:
+            while remaining > 0:
+                n = min(chunk_rows, remaining)
+                chunk, used = _generate_chunk(
+                    rng, n, key_offset, keys_per_day, markets, PRODUCTS, start_date,
+                    duplicate_rate, key_duplicate_rate, null_rate,
+                )
+                chunk.to_csv(f, index=False, header=header, date_format='%Y-%m-%d')
+                header = False
+                key_offset += used
+                remaining -= n
+        paths.append(path)
+
+    return {
+        'paths': paths,
+        'bytes': sum(os.path.getsize(p) for p in paths),
+        'rows': rows,
+        'files': files,
+        'markets': markets,
+        'days': math.ceil(key_offset / keys_per_day),
+        'duplicate_rate': duplicate_rate,
+        'key_duplicate_rate': key_duplicate_rate,
+        'null_rate': null_rate,
+        'seed': seed,
+    }
@@ -0,0 +1,307 @@
+"""
+Benchmark Harness
+
+Runs extract -> transform -> load on a generated dataset and records, per phase:
+- wall time and rows/sec
+- peak RSS of the process during the phase (sampled from /proc) and the process high-water mark
+- optional cProfile hotspots (top functions by cumulative time)
+- optional tracemalloc allocation hotspots and traced peak
+
+Extraction and transformation are streamed (files are read in the process
+pool and fed to the chunked transformer), so their times are split by
+measuring how long the transformer waited on the extraction generator.
+
+Each run is appended as one JSON line to a history file. `find_regressions`
+compares a run with the median of earlier runs on the same dataset shape.
+"""
+
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import resource
+import statistics
+import subprocess
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+import pandas as pd
+from sqlalchemy import create_engine, inspect, text
+
+from benchmarks.datagen import generate_dataset
+from etl.extract import extract_changed_files
+from etl.load import SCHEMA_VERSION_TABLE, load_to_database, reset_schema_cache
+from etl.manifest import FileManifest
+from etl.partitions import reset_partition_cache
+from etl.transform_engine import transform_chunks
+
+BENCH_TABLE = 'market_data_bench'
+DATASET_FILE = 'dataset.json'
+# Dataset fields that must match for two runs to be comparable
+SHAPE_KEYS = ('rows', 'files', 'markets', 'duplicate_rate', 'key_duplicate_rate', 'null_rate')
+
+MB = 1024 * 1024
+
+
+def current_rss():
+    """Resident set size of this process in bytes"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError):
+        return max_rss()
+
+
+def max_rss():
+    """Process high-water RSS in bytes (ru_maxrss is KB on Linux, bytes on macOS)"""
+    value = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return value if platform.system() == 'Darwin' else value * 1024
+
+
+class RssSampler:
+    """Background thread tracking the peak RSS between start() and stop()"""
+
+    def __init__(self, interval=0.05):
+        self.interval = interval
+        self.peak = 0
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        while not self._stop.is_set():
+            self.peak = max(self.peak, current_rss())
+            self._stop.wait(self.interval)
+
+    def start(self):
+        self.peak = current_rss()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, current_rss())
+        return self.peak
+
+
+class PhaseRecorder:
+    """Collects per-phase measurements into ``self.phases``"""
+
+    def __init__(self, cprofile=False, tracemalloc_top=0, top=15):
+        self.cprofile = cprofile
+        self.tracemalloc_top = tracemalloc_top
+        self.top = top
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        """Measure the enclosed block; set ``stats['rows']`` inside it to get rows/sec"""
+        stats = {}
+        profiler = cProfile.Profile() if self.cprofile else None
+        if self.tracemalloc_top:
+            tracemalloc.start()
+        sampler = RssSampler().start()
+        rss_before = current_rss()
+        start = time.perf_counter()
+        if profiler:
+            profiler.enable()
+        try:
+            yield stats
+        finally:
+            if profiler:
+                profiler.disable()
+            wall = time.perf_counter() - start
+            peak = sampler.stop()
+            stats.update({
+                'wall_s': round(wall, 4),
+                'peak_rss_mb': round(peak / MB, 1),
+                'rss_growth_mb': round((peak - rss_before) / MB, 1),
+                'max_rss_mb': round(max_rss() / MB, 1),
+            })
+            if stats.get('rows') is not None:
+                stats['rows_per_sec'] = round(stats['rows'] / wall, 1) if wall > 0 else None
+            if profiler:
+                stats['cprofile_top'] = _profile_hotspots(profiler, self.top)
+            if self.tracemalloc_top:
+                snapshot = tracemalloc.take_snapshot()
+                stats['tracemalloc_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / MB, 1)
+                tracemalloc.stop()
+                stats['tracemalloc_top'] = [
+                    {'site': str(s.traceback), 'size_mb': round(s.size / MB, 2), 'count': s.count}
+                    for s in snapshot.statistics('lineno')[:self.tracemalloc_top]
+                ]
+            self.phases[name] = stats
+
+
+def _profile_hotspots(profiler, top):
+    """Top functions by cumulative time as plain dicts"""
+    stats = pstats.Stats(profiler, stream=io.StringIO())
+    rows = []
+    for (filename, line, func), (cc, nc, tt, ct, _) in stats.stats.items():
+        rows.append({'function': f"{os.path.basename(filename)}:{line}({func})",
+                     'calls': nc, 'tottime_s': round(tt, 4), 'cumtime_s': round(ct, 4)})
+    return sorted(rows, key=lambda r: r['cumtime_s'], reverse=True)[:top]
+
+
+def prepare_dataset(data_dir, **params):
+    """Generate the dataset unless ``data_dir`` already holds one with the same parameters
+
+    Returns:
+        tuple: (dataset description, True if it was generated by this call)
+    """
+    description_path = os.path.join(data_dir, DATASET_FILE)
+    if os.path.exists(description_path):
+        with open(description_path) as f:
+            existing = json.load(f)
+        if all(existing.get(k) == v for k, v in params.items()) and all(os.path.exists(p) for p in existing['paths']):
+            return existing, False
+    description = generate_dataset(data_dir, **params)
+    with open(description_path, 'w') as f:
+        json.dump(description, f, indent=2)
+    return description, True
+
+
+def _timed(iterable, timer):
+    """Yield from ``iterable``, adding the time spent producing items to ``timer['s']``"""
+    iterator = iter(iterable)
+    while True:
+        start = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            timer['s'] += time.perf_counter() - start
+            return
+        timer['s'] += time.perf_counter() - start
+        yield item
+
+
+def _reset_table(engine, table_name):
+    """Drop the benchmark table and its schema-version row so each load starts cold"""
+    with engine.begin() as conn:
+        suffix = ' CASCADE' if engine.dialect.name.lower() == 'postgresql' else ''
+        conn.execute(text(f"DROP TABLE IF EXISTS {table_name}{suffix}"))
+        if inspect(conn).has_table(SCHEMA_VERSION_TABLE):
+            conn.execute(text(f"DELETE FROM {SCHEMA_VERSION_TABLE} WHERE table_name = :t"), {'t': table_name})
+    reset_schema_cache()
+    reset_partition_cache()
+
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(data_dir, targets, work_dir, dataset_params=None, workers=None,
+                  cprofile=False, tracemalloc_top=0, load_batch_size=50_000):
+    """
+    Run one benchmark and return its record
+
+    Args:
+        data_dir: Where the generated CSVs live (reused when parameters match)
+        targets: {name: SQLAlchemy URL} to load into, e.g. {'sqlite': 'sqlite:///...'}
+        work_dir: Scratch directory for the extraction manifest
+    """
+    recorder = PhaseRecorder(cprofile=cprofile, tracemalloc_top=tracemalloc_top)
+
+    with recorder.phase('generate') as stats:
+        dataset, generated = prepare_dataset(data_dir, **(dataset_params or {}))
+        stats['reused'] = not generated
+        if generated:
+            stats['rows'] = dataset['rows']
+
+    os.makedirs(work_dir, exist_ok=True)
+    manifest = FileManifest(os.path.join(work_dir, 'bench_manifest.json'))
+    manifest.reset()
+    extract_timer = {'s': 0.0}
+    with recorder.phase('extract_transform') as stats:
+        chunks = _timed((df for _, df in extract_changed_files(manifest, csv_dirs=[data_dir], max_workers=workers)),
+                        extract_timer)
+        transformed, metrics = transform_chunks(chunks)
+        stats['rows'] = metrics['input_records']
+    combined = recorder.phases['extract_transform']
+    recorder.phases['extract'] = {
+        'wall_s': round(extract_timer['s'], 4),
+        'rows': metrics['input_records'],
+        'rows_per_sec': round(metrics['input_records'] / extract_timer['s'], 1) if extract_timer['s'] else None,
+    }
+    transform_s = combined['wall_s'] - extract_timer['s']
+    recorder.phases['transform'] = {
+        'wall_s': round(transform_s, 4),
+        'rows': metrics['input_records'],
+        'rows_per_sec': round(metrics['input_records'] / transform_s, 1) if transform_s > 0 else None,
+    }
+
+    for name, url in targets.items():
+        engine = create_engine(url)
+        try:
+            _reset_table(engine, BENCH_TABLE)
+            with recorder.phase(f'load_{name}') as stats:
+                stats['rows'] = load_to_database(transformed, engine, BENCH_TABLE, batch_size=load_batch_size)
+            _reset_table(engine, BENCH_TABLE)
+        finally:
+            engine.dispose()
+
+    return {
+        'run_at': datetime.now(timezone.utc).isoformat(),
+        'git_commit': _git_commit(),
+        'host': {
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'pandas': pd.__version__,
+            'cpu_count': os.cpu_count(),
+        },
+        'dataset': {k: v for k, v in dataset.items() if k != 'paths'},
+        'output_records': len(transformed),
+        'transform_metrics': {k: v for k, v in metrics.items() if isinstance(v, (int, float))},
+        'phases': recorder.phases,
+    }
+
+
+def load_history(path):
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def append_history(path, record):
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(record, default=str) + '\n')
+
+
+def find_regressions(record, history, threshold=0.2, window=5):
+    """Phases whose rows/sec fell more than ``threshold`` below the recent median
+
+    Only earlier runs with the same dataset shape are compared.
+    """
+    shape = {k: record['dataset'].get(k) for k in SHAPE_KEYS}
+    previous = [r for r in history if {k: r['dataset'].get(k) for k in SHAPE_KEYS} == shape][-window:]
+
+    regressions = []
+    for phase, stats in record['phases'].items():
+        current = stats.get('rows_per_sec')
+        baseline = [r['phases'][phase]['rows_per_sec'] for r in previous
+                    if r['phases'].get(phase, {}).get('rows_per_sec')]
+        if not current or not baseline:
+            continue
+        median = statistics.median(baseline)
+        if current < median * (1 - threshold):
+            regressions.append({
+                'phase': phase,
+                'rows_per_sec': current,
+                'baseline_rows_per_sec': median,
+                'change': round(current / median - 1, 3),
+            })
+    return regressions
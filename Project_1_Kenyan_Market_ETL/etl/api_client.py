@@ -0,0 +1,250 @@
+"""
+Market Feed API Client
+
+Asyncio client for paginated market price feeds:
+- One pooled aiohttp session per extraction (keep-alive, capped connections)
+- Token-bucket rate limit shared by every request
+- Retries with jittered exponential backoff on timeouts, 429 and 5xx (honours Retry-After)
+- ETag / Last-Modified caching: unchanged pages come back as 304 and are served from disk
+- Each page is turned into a typed DataFrame chunk as soon as it arrives
+
+Responses may be a bare JSON list, or an object with records under ``data``
+(or ``results``) and an optional ``total_pages`` (top level or under ``meta``).
+When the page count is known the remaining pages are fetched concurrently;
+otherwise pages are walked until a short, empty or repeated page comes back
+(a server that ignores the paging parameters returns the same page every time).
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import random
+import time
+from urllib.parse import urlencode
+
+import aiohttp
+import pandas as pd
+
+# Dtypes pinned on every page so chunks concatenate without object/float drift
+MARKET_FEED_DTYPES = {
+    'price': 'float64',
+    'quantity': 'float64',
+    'date_recorded': 'datetime64[ns]',
+}
+
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class ApiExtractionError(Exception):
+    """Raised when a page cannot be fetched after all retries"""
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` requests per second with bursts up to ``capacity``"""
+
+    def __init__(self, rate, capacity=None):
+        self.rate = float(rate)
+        self.capacity = float(capacity or max(1.0, self.rate))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class ResponseCache:
+    """On-disk cache of validators (ETag / Last-Modified) and records per request URL"""
+
+    def __init__(self, directory):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, url):
+        return os.path.join(self.directory, hashlib.sha256(url.encode()).hexdigest() + '.json')
+
+    def get(self, url):
+        path = self._path(url)
+        if not os.path.exists(path):
+            return None
+        with open(path) as f:
+            return json.load(f)
+
+    def put(self, url, etag, last_modified, payload):
+        path = self._path(url)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'etag': etag, 'last_modified': last_modified, 'payload': payload}, f)
+        os.replace(tmp_path, path)
+
+
+def records_to_frame(records, dtypes=None):
+    """Build a typed DataFrame chunk from a page of JSON records"""
+    df = pd.DataFrame.from_records(records)
+    for col, dtype in (MARKET_FEED_DTYPES if dtypes is None else dtypes).items():
+        if col not in df.columns:
+            continue
+        if str(dtype).startswith('datetime64'):
+            df[col] = pd.to_datetime(df[col], errors='coerce')
+        elif dtype in ('float64', 'float32'):
+            df[col] = pd.to_numeric(df[col], errors='coerce').astype(dtype)
+        else:
+            df[col] = df[col].astype(dtype)
+    return df
+
+
+def _page_records(payload):
+    """Split a response body into (records, total_pages or None)"""
+    if isinstance(payload, list):
+        return payload, None
+    records = payload.get('data', payload.get('results', []))
+    total_pages = payload.get('total_pages') or (payload.get('meta') or {}).get('total_pages')
+    return records, total_pages
+
+
+class MarketFeedClient:
+    """Concurrent, rate-limited, cached client for a paginated market feed"""
+
+    def __init__(self, endpoint, rate_limit=10.0, burst=None, max_connections=20, timeout=30,
+                 max_retries=4, backoff_base=0.5, backoff_max=10.0, cache_dir=None,
+                 page_param='page', page_size_param='page_size', page_size=100, dtypes=None):
+        self.endpoint = endpoint
+        self.rate_limit = rate_limit
+        self.burst = burst
+        self.max_connections = max_connections
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.cache = ResponseCache(cache_dir) if cache_dir else None
+        self.page_param = page_param
+        self.page_size_param = page_size_param
+        self.page_size = page_size
+        self.dtypes = dtypes
+        self.stats = {'requests': 0, 'retries': 0, 'not_modified': 0, 'pages': 0, 'records': 0}
+
+    async def iter_chunks(self, param_sets):
+        """Async generator of typed DataFrame chunks, one per page, in completion order"""
+        connector = aiohttp.TCPConnector(limit=self.max_connections)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        self._bucket = TokenBucket(self.rate_limit, self.burst)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            queue = asyncio.Queue()
+            tasks = [asyncio.create_task(self._fetch_all_pages(session, params or {}, queue))
+                     for params in param_sets]
+            pending = len(tasks)
+            try:
+                while pending:
+                    item = await queue.get()
+                    if item is None:
+                        pending -= 1
+                    elif isinstance(item, Exception):
+                        raise item
+                    else:
+                        yield item
+            finally:
+                for task in tasks:
+                    task.cancel()
+                await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def _fetch_all_pages(self, session, params, queue):
+        """Fetch every page for one parameter set, pushing chunks to ``queue``"""
+        try:
+            paginate = self.page_size is not None
+
+            async def fetch(page, previous=None):
+                page_params = dict(params)
+                if paginate:
+                    page_params.update({self.page_param: page, self.page_size_param: self.page_size})
+                records, total_pages = _page_records(await self._get(session, page_params))
+                if previous is not None and records == previous:
+                    return [], total_pages
+                if records:
+                    chunk = records_to_frame(records, self.dtypes)
+                    self.stats['pages'] += 1
+                    self.stats['records'] += len(chunk)
+                    await queue.put(chunk)
+                return records, total_pages
+
+            records, total_pages = await fetch(1)
+            if not paginate:
+                return
+            if total_pages:
+                await asyncio.gather(*(fetch(page) for page in range(2, int(total_pages) + 1)))
+            else:
+                page = 1
+                while len(records) >= self.page_size:
+                    page += 1
+                    records, _ = await fetch(page, previous=records)
+        except Exception as e:
+            await queue.put(e)
+        finally:
+            await queue.put(None)
+
+    async def _get(self, session, params):
+        """GET one page with rate limiting, conditional headers and retries"""
+        url = f"{self.endpoint}?{urlencode(sorted(params.items()))}" if params else self.endpoint
+        cached = self.cache.get(url) if self.cache else None
+        headers = {}
+        if cached:
+            if cached.get('etag'):
+                headers['If-None-Match'] = cached['etag']
+            if cached.get('last_modified'):
+                headers['If-Modified-Since'] = cached['last_modified']
+
+        for attempt in range(self.max_retries + 1):
+            await self._bucket.acquire()
+            self.stats['requests'] += 1
+            retry_after = None
+            try:
+                async with session.get(url, headers=headers) as response:
+                    if response.status == 304:
+                        if not cached:
+                            raise ApiExtractionError(f"{url}: HTTP 304 with no cached response")
+                        self.stats['not_modified'] += 1
+                        return cached['payload']
+                    if response.status not in RETRY_STATUSES:
+                        response.raise_for_status()
+                        payload = await response.json(content_type=None)
+                        if self.cache and (response.headers.get('ETag') or response.headers.get('Last-Modified')):
+                            self.cache.put(url, response.headers.get('ETag'),
+                                           response.headers.get('Last-Modified'), payload)
+                        return payload
+                    retry_after = response.headers.get('Retry-After')
+                    error = f"HTTP {response.status}"
+            except aiohttp.ClientResponseError as e:
+                raise ApiExtractionError(f"{url}: HTTP {e.status}") from e
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                error = repr(e)
+
+            if attempt == self.max_retries:
+                raise ApiExtractionError(f"{url}: {error} after {attempt + 1} attempts")
+            self.stats['retries'] += 1
+            delay = random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+            if retry_after and retry_after.isdigit():
+                delay = max(delay, float(retry_after))
+            await asyncio.sleep(delay)
+
+
+def fetch_api_frames(endpoint, param_sets=None, **client_options):
+    """
+    Fetch every page for each parameter set concurrently
+
+    Returns:
+        tuple: (list of typed DataFrame chunks, client stats dict)
+    """
+    client = MarketFeedClient(endpoint, **client_options)
+
+    async def collect():
+        return [chunk async for chunk in client.iter_chunks(param_sets or [{}])]
+
+    return asyncio.run(collect()), client.stats
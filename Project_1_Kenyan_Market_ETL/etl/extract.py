@@ -13,10 +13,18 @@ Business Context:
 - Key commodities: maize, tomatoes, beans, onions tracked across regions
 """
 
+import hashlib
+import io
 import pandas as pd
 import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 
+from etl.manifest import STATUS_FAILED, STATUS_LOADED
+
+# Searched in order: 'data/raw' for provider drops, 'data/' for sample files
+CSV_DIRS = ["data/raw", "data"]
+
 def extract_from_csv(file_path):
     """Extract data from CSV file"""
     try:
@@ -30,20 +38,42 @@ def extract_from_csv(file_path):
         print(f"Error reading CSV: {str(e)}")
         return pd.DataFrame()
 
-def extract_from_api(endpoint, params=None):
-    """Extract data from API endpoint"""
-    import requests
-    
+def extract_from_api(endpoint, params=None, page_size=None, **client_options):
+    """
+    Extract data from API endpoint, optionally following pagination
+
+    A single request is made unless ``page_size`` is given, in which case
+    pages are fetched concurrently through the async market-feed client
+    (rate limited, retried, ETag-cached); see etl.api_client for options.
+    """
+    from etl.api_client import ApiExtractionError, fetch_api_frames
+
     try:
-        response = requests.get(endpoint, params=params)
-        response.raise_for_status()
-        data = response.json()
-        df = pd.DataFrame(data)
-        print(f"Successfully extracted {len(df)} records from API")
-        return df
-    except requests.RequestException as e:
+        chunks, stats = fetch_api_frames(endpoint, [params or {}], page_size=page_size, **client_options)
+    except ApiExtractionError as e:
         print(f"Error fetching from API: {str(e)}")
         return pd.DataFrame()
+    df = pd.concat(chunks, ignore_index=True) if chunks else pd.DataFrame()
+    print(f"Successfully extracted {len(df)} records from API ({stats['requests']} requests)")
+    return df
+
+def extract_markets_from_api(endpoint, markets, market_param='market', **client_options):
+    """
+    Pull prices for many markets at once
+
+    Returns a list of typed DataFrame chunks (one per page) ready for
+    transform_data_in_chunks.
+    """
+    from etl.api_client import ApiExtractionError, fetch_api_frames
+
+    try:
+        chunks, stats = fetch_api_frames(endpoint, [{market_param: m} for m in markets], **client_options)
+    except ApiExtractionError as e:
+        print(f"Error fetching from API: {str(e)}")
+        return []
+    print(f"Successfully extracted {stats['records']} records for {len(markets)} markets "
+          f"({stats['requests']} requests, {stats['not_modified']} not modified)")
+    return chunks
 
 def extract_from_database(connection, query):
     """Extract data from database using SQL query"""
@@ -65,13 +95,10 @@ def extract_data():
     all_data = []
     
     # Extract from CSV files in 'data/raw' and from any CSVs in 'data/' (including sample files)
-    csv_dirs = ["data/raw", "data"]
-    for csv_dir in csv_dirs:
-        if os.path.exists(csv_dir):
-            for file in Path(csv_dir).glob("*.csv"):
-                df = extract_from_csv(str(file))
-                if not df.empty:
-                    all_data.append(df)
+    for file in discover_csv_files():
+        df = extract_from_csv(file)
+        if not df.empty:
+            all_data.append(df)
     
     # Combine all extracted data
     if all_data:
@@ -81,3 +108,137 @@ def extract_data():
     else:
         print("No data extracted from sources")
         return pd.DataFrame()
+
+
+def discover_csv_files(csv_dirs=CSV_DIRS):
+    """List the CSV files in ``csv_dirs`` (sorted within each directory)"""
+    files = []
+    for csv_dir in csv_dirs:
+        if os.path.exists(csv_dir):
+            files.extend(sorted(str(f) for f in Path(csv_dir).glob("*.csv")))
+    return files
+
+
+def _read_source_file(file_path, known_hash=None):
+    """Hash and parse one CSV (runs in a worker process)
+
+    The file is read once; the bytes feed both the hash and the parser. If the
+    hash equals ``known_hash`` the parse is skipped.
+
+    Returns:
+        tuple: (file_path, DataFrame or None, hash, (size, mtime), error message or None)
+    """
+    try:
+        stat = os.stat(file_path)
+        with open(file_path, 'rb') as f:
+            content = f.read()
+        content_hash = hashlib.sha256(content).hexdigest()
+        if content_hash == known_hash:
+            return file_path, None, content_hash, (stat.st_size, stat.st_mtime), None
+        df = pd.read_csv(io.BytesIO(content))
+        return file_path, df, content_hash, (stat.st_size, stat.st_mtime), None
+    except Exception as e:
+        return file_path, None, None, None, str(e)
+
+
+def _read_files(jobs, max_workers=None):
+    """Run _read_source_file over ``jobs``, in a process pool when there are several"""
+    workers = max_workers or min(len(jobs), os.cpu_count() or 1)
+    if workers <= 1:
+        yield from (_read_source_file(*job) for job in jobs)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(_read_source_file, *job) for job in jobs]
+            yield from (future.result() for future in as_completed(futures))
+
+
+def dates_in(df):
+    """Distinct ISO dates in a raw frame's 'Date Recorded' column (None without one)"""
+    for column in df.columns:
+        if str(column).strip().lower().replace(' ', '_').replace('-', '_') == 'date_recorded':
+            values = pd.to_datetime(df[column], errors='coerce').dropna()
+            return {d.isoformat() for d in values.dt.date.unique()}
+    return None
+
+
+def extract_changed_files(manifest, csv_dirs=CSV_DIRS, max_workers=None):
+    """
+    Yield (file_path, DataFrame) for every new or changed CSV as soon as it is read
+
+    Files the manifest marks as loaded with the same size and mtime are skipped
+    without being opened. The rest are read concurrently in a process pool;
+    a file whose mtime moved but whose content hash did not is skipped too.
+    Entries are recorded as 'extracted' and the manifest is saved when the
+    generator finishes; call ``manifest.mark_loaded`` after a successful load.
+    """
+    files = discover_csv_files(csv_dirs)
+    pending = [f for f in files if not manifest.is_unchanged(f)]
+    print(f"Found {len(files)} source files: {len(files) - len(pending)} unchanged, {len(pending)} to read")
+    if not pending:
+        return
+
+    jobs = [(f, manifest.loaded_hash(f)) for f in pending]
+    try:
+        yield from _record_results(manifest, _read_files(jobs, max_workers))
+    finally:
+        manifest.save()
+
+
+def extract_affected_files(manifest, csv_dirs=CSV_DIRS, max_workers=None):
+    """
+    Yield new or changed CSVs, then every loaded CSV sharing a date with them
+
+    Rows with the same (market, product, date) key are aggregated over every
+    frame the transformer sees, and the load replaces the stored row for the
+    key. A key touched by a changed file is therefore rebuilt from all files
+    that hold it; otherwise the partial total would overwrite the full one.
+    Files holding a key share its date, so loaded files are matched on the
+    dates the manifest recorded for the changed files, before and after the
+    change. Files with unknown dates are always reread. A shared file that
+    cannot be read fails the run rather than loading partial totals.
+    """
+    previous = {f: manifest.get(f) for f in discover_csv_files(csv_dirs)}
+    dates, changed = set(), []
+    for file_path, df in extract_changed_files(manifest, csv_dirs, max_workers):
+        changed.append(file_path)
+        # Dates the file holds now, and those it held when it was last loaded
+        entries = [manifest.get(file_path)]
+        before = previous.get(file_path)
+        if before and before['status'] == STATUS_LOADED:
+            entries.append(before)
+        for entry in entries:
+            if dates is not None:
+                dates = None if entry.get('dates') is None else dates.union(entry['dates'])
+        yield file_path, df
+    if not changed:
+        return
+
+    shared = [f for f in previous if f not in changed and manifest.shares_dates(f, dates)]
+    if shared:
+        print(f"Rereading {len(shared)} loaded files that share dates with the changed ones")
+    for file_path, df, _, _, error in _read_files([(f, None) for f in shared], max_workers):
+        if error is not None:
+            raise RuntimeError(f"Could not reread {file_path}, which shares dates with a changed file: {error}")
+        manifest.remember_dates(file_path, dates_in(df))
+        if not df.empty:
+            yield file_path, df
+
+
+def _record_results(manifest, results):
+    """Update the manifest for each read result and pass non-empty frames through"""
+    for file_path, df, content_hash, stat, error in results:
+        if error is not None:
+            print(f"Error reading CSV {file_path}: {error}")
+            manifest.record(file_path, None, 0, status=STATUS_FAILED)
+            continue
+        if df is None:
+            # Touched but identical to what was loaded last time
+            entry = manifest.get(file_path)
+            manifest.record(file_path, content_hash, entry['rows'], status=STATUS_LOADED, stat=stat,
+                            dates=entry.get('dates'))
+            print(f"Skipping {file_path}: content unchanged since last load")
+            continue
+        manifest.record(file_path, content_hash, len(df), stat=stat, dates=dates_in(df))
+        print(f"Successfully extracted {len(df)} records from {file_path}")
+        if not df.empty:
+            yield file_path, df
@@ -10,51 +10,131 @@ The target table schema:
               date_recorded DATE, source_file TEXT, created_at TIMESTAMPTZ)
 
 The loader attempts to coerce incoming dataframe columns to the correct types and
-supports batched loading for large datasets.
+supports batched loading for large datasets. On PostgreSQL the default path streams
+the prepared frame through COPY FROM STDIN into a session TEMP table on the same
+connection/transaction as the final INSERT ... ON CONFLICT merge.
 """
 
 import csv
 from datetime import datetime, timezone
 import logging
+import time
 import pandas as pd
 from sqlalchemy import Table, Column, Integer, String, MetaData, Numeric, Date, Text, DateTime
 from sqlalchemy import inspect, text
 
+from etl.partitions import (
+    DEFAULT_PARTITION_DDL, PARTITIONED_TABLE_DDL, ensure_partitions, is_partitioned, partition_bounds,
+)
+
 # Setup logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
 
-def create_table_if_not_exists(engine, table_name='market_data'):
+# Bump when the market_data DDL (columns, unique key, indexes, partitioning) changes
+SCHEMA_VERSION = 4
+SCHEMA_VERSION_TABLE = 'etl_schema_version'
+
+# Process-level caches keyed by (database URL, table name)
+_schema_cache = {}
+_index_cache = set()
+
+
+def reset_schema_cache():
+    """Forget cached DDL checks (e.g. after dropping tables in tests)."""
+    _schema_cache.clear()
+    _index_cache.clear()
+
+
+def _schema_key(engine, table_name):
+    return (str(engine.url), table_name)
+
+
+def create_table_if_not_exists(engine, table_name='market_data', defer_indexes=False):
     """Create the canonical `market_data` table if it does not exist.
 
-    Matches the DDL in `sql/create_tables.sql`.
+    Matches the DDL in `sql/create_tables.sql`; on PostgreSQL the table is
+    range-partitioned by month on date_recorded, with a DEFAULT partition for
+    months that have no partition yet (see etl.partitions). The applied schema version is
+    recorded in `etl_schema_version` and cached per process, so once a table
+    is at SCHEMA_VERSION later calls cost one lookup per process and none after.
+    The version row is only trusted while the table exists (and, on PostgreSQL,
+    is partitioned); an unpartitioned table is left unrecorded, so the warning
+    repeats until it is migrated.
+    With ``defer_indexes=True`` only the unique key needed for upserts is
+    created; call `ensure_secondary_indexes` after the bulk load.
     """
+    key = _schema_key(engine, table_name)
+    if _schema_cache.get(key) == SCHEMA_VERSION:
+        return
+
+    with engine.begin() as conn:
+        conn.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {SCHEMA_VERSION_TABLE} ("
+            f"table_name VARCHAR(255) PRIMARY KEY, version INTEGER NOT NULL, applied_at TIMESTAMP NOT NULL)"
+        ))
+        applied = conn.execute(
+            text(f"SELECT version FROM {SCHEMA_VERSION_TABLE} WHERE table_name = :table_name"),
+            {'table_name': table_name},
+        ).scalar()
+        exists = inspect(conn).has_table(table_name)
+    postgres = engine.dialect.name.lower() == 'postgresql'
+    if applied == SCHEMA_VERSION and exists and (not postgres or is_partitioned(engine, table_name)):
+        _schema_cache[key] = SCHEMA_VERSION
+        return
+
     metadata = MetaData()
-    inspector = inspect(engine)
-
-    if not inspector.has_table(table_name):
-        market_table = Table(
-            table_name,
-            metadata,
-            Column('id', Integer, primary_key=True, autoincrement=True),
-            Column('market_name', Text, nullable=False),
-            Column('product_name', Text, nullable=False),
-            Column('price', Numeric(10, 2), nullable=False),
-            Column('quantity', Integer, nullable=False),
-            Column('date_recorded', Date, nullable=False),
-            Column('source_file', Text, nullable=True),
-            Column('created_at', DateTime, nullable=False),
-        )
-        metadata.create_all(engine)
+    current = True
+
+    if not exists:
+        if postgres:
+            with engine.begin() as conn:
+                conn.execute(text(PARTITIONED_TABLE_DDL.format(table=table_name)))
+        else:
+            market_table = Table(
+                table_name,
+                metadata,
+                Column('id', Integer, primary_key=True, autoincrement=True),
+                Column('market_name', Text, nullable=False),
+                Column('product_name', Text, nullable=False),
+                Column('price', Numeric(10, 2), nullable=False),
+                Column('quantity', Integer, nullable=False),
+                Column('date_recorded', Date, nullable=False),
+                Column('source_file', Text, nullable=True),
+                Column('created_at', DateTime, nullable=False),
+            )
+            metadata.create_all(engine)
         logger.info(f"Created table: {table_name}")
+    elif postgres and not is_partitioned(engine, table_name):
+        logger.warning(f"{table_name} is not partitioned; run sql/partition_market_data.sql to migrate it")
+        current = False
+    if postgres and current:
+        with engine.begin() as conn:
+            conn.execute(text(DEFAULT_PARTITION_DDL.format(table=table_name)))
 
-    # Always ensure constraints and indexes exist (idempotent)
-    _ensure_indexes_and_constraints(engine, table_name)
+    if defer_indexes:
+        _ensure_unique_key(engine, table_name)
+    else:
+        _ensure_indexes_and_constraints(engine, table_name)
 
+    if not current:
+        return
+    with engine.begin() as conn:
+        conn.execute(text(f"DELETE FROM {SCHEMA_VERSION_TABLE} WHERE table_name = :table_name"),
+                     {'table_name': table_name})
+        conn.execute(
+            text(f"INSERT INTO {SCHEMA_VERSION_TABLE} (table_name, version, applied_at) "
+                 f"VALUES (:table_name, :version, :applied_at)"),
+            {'table_name': table_name, 'version': SCHEMA_VERSION,
+             'applied_at': datetime.now(timezone.utc).replace(tzinfo=None)},
+        )
+    _schema_cache[key] = SCHEMA_VERSION
+    logger.info(f"Schema for {table_name} at version {SCHEMA_VERSION}")
 
-def _ensure_indexes_and_constraints(engine, table_name='market_data'):
-    """Ensure that required unique constraint and indexes exist on the table."""
+
+def _ensure_unique_key(engine, table_name='market_data'):
+    """Ensure the (market_name, product_name, date_recorded) unique key exists."""
     dialect = engine.dialect.name.lower()
     try:
         with engine.begin() as conn:
@@ -77,18 +157,48 @@ def _ensure_indexes_and_constraints(engine, table_name='market_data'):
                 conn.execute(text(
                     f"CREATE UNIQUE INDEX IF NOT EXISTS idx_market_unique ON {table_name} (market_name, product_name, date_recorded)"
                 ))
-            # Create additional indexes
-            conn.execute(text(
-                f"CREATE INDEX IF NOT EXISTS idx_market_market ON {table_name} (market_name)"
-            ))
-            conn.execute(text(
-                f"CREATE INDEX IF NOT EXISTS idx_market_product ON {table_name} (product_name)"
-            ))
-            conn.execute(text(
-                f"CREATE INDEX IF NOT EXISTS idx_market_date ON {table_name} (date_recorded)"
-            ))
     except Exception as e:
-        logger.debug(f"Could not ensure constraints/indexes on {table_name}: {e}")
+        logger.debug(f"Could not ensure unique key on {table_name}: {e}")
+
+
+def ensure_secondary_indexes(engine, table_name='market_data', concurrently=True):
+    """Create the market/product/date and created_at lookup indexes once per process.
+
+    On PostgreSQL the indexes are built with CREATE INDEX CONCURRENTLY (outside
+    a transaction) so readers and the next load are not blocked.
+    """
+    key = _schema_key(engine, table_name)
+    if key in _index_cache:
+        return
+    dialect = engine.dialect.name.lower()
+    # CONCURRENTLY is not supported on partitioned parents; their indexes
+    # cascade to each (new, empty) partition as it is created
+    concurrent = concurrently and dialect == 'postgresql' and not is_partitioned(engine, table_name)
+    statements = [
+        f"CREATE INDEX {'CONCURRENTLY ' if concurrent else ''}IF NOT EXISTS {name} ON {table_name} ({column})"
+        for name, column in [('idx_market_market', 'market_name'),
+                             ('idx_market_product', 'product_name'),
+                             ('idx_market_date', 'date_recorded'),
+                             ('idx_market_created_at', 'created_at')]
+    ]
+    try:
+        if concurrent:
+            with engine.connect().execution_options(isolation_level='AUTOCOMMIT') as conn:
+                for statement in statements:
+                    conn.execute(text(statement))
+        else:
+            with engine.begin() as conn:
+                for statement in statements:
+                    conn.execute(text(statement))
+        _index_cache.add(key)
+    except Exception as e:
+        logger.debug(f"Could not ensure indexes on {table_name}: {e}")
+
+
+def _ensure_indexes_and_constraints(engine, table_name='market_data'):
+    """Ensure that required unique constraint and indexes exist on the table."""
+    _ensure_unique_key(engine, table_name)
+    ensure_secondary_indexes(engine, table_name, concurrently=False)
 
 
 def _prepare_dataframe(df: pd.DataFrame) -> pd.DataFrame:
@@ -146,53 +256,48 @@ def _prepare_dataframe(df: pd.DataFrame) -> pd.DataFrame:
     return df
 
 
-def load_to_database(df: pd.DataFrame, engine, table_name='market_data', batch_size=1000):
+def load_to_database(df: pd.DataFrame, engine, table_name='market_data', batch_size=1000, method='copy'):
     """Load dataframe to database with batched inserts.
 
     If running on PostgreSQL, performs an idempotent upsert using the unique
-    constraint (market_name, product_name, date_recorded).
+    constraint (market_name, product_name, date_recorded). ``method='copy'``
+    (default) stages rows with COPY FROM STDIN; ``method='insert'`` stages
+    them with ``DataFrame.to_sql``. Secondary indexes are created after the
+    rows are in, not before.
     """
+    if method not in ('copy', 'insert'):
+        raise ValueError(f"Unsupported load method: {method}")
+
     if df.empty:
         logger.warning("No data to load")
         return 0
 
-    create_table_if_not_exists(engine, table_name)
+    create_table_if_not_exists(engine, table_name, defer_indexes=True)
 
     df = _prepare_dataframe(df)
     total = 0
 
     dialect = engine.dialect.name.lower()
 
-    if dialect == 'postgresql':
+    if dialect == 'postgresql' and method == 'copy':
+        stats = copy_upsert(df, engine, table_name, batch_size=max(batch_size, COPY_BATCH_SIZE), prepared=True)
+        total = stats['rows']
+
+    elif dialect == 'postgresql':
         # Use a temporary table + single INSERT ... ON CONFLICT for upsert (Postgres)
         temp_table = f"tmp_{table_name}"
-        try:
-            with engine.begin() as conn:
-                # Write into a temporary table in batches
-                for i in range(0, len(df), batch_size):
-                    batch = df.iloc[i:i+batch_size]
-                    batch.to_sql(temp_table, con=engine, if_exists='append', index=False)
-                    total += len(batch)
-
-                # Insert from temp table into target with ON CONFLICT
-                ts_fn = 'now()' if dialect == 'postgresql' else 'CURRENT_TIMESTAMP'
-                insert_sql = f"""
-INSERT INTO {table_name} (market_name, product_name, price, quantity, date_recorded, source_file, created_at)
-SELECT market_name, product_name, price, quantity, date_recorded, source_file, {ts_fn} FROM {temp_table}
-ON CONFLICT (market_name, product_name, date_recorded)
-DO UPDATE SET
-  price = EXCLUDED.price,
-  quantity = EXCLUDED.quantity,
-  source_file = EXCLUDED.source_file,
-  created_at = {ts_fn};
-"""
-                conn.execute(text(insert_sql))
-                # Drop temp table
-                conn.execute(text(f"DROP TABLE IF EXISTS {temp_table}"))
-                logger.info(f"Upserted {total} rows into {table_name} (via temp table)")
-        finally:
-            pass
-        return total
+        with engine.begin() as conn:
+            # Write into the staging table in batches on the same transaction
+            for i in range(0, len(df), batch_size):
+                batch = df.iloc[i : i + batch_size]
+                batch.to_sql(temp_table, con=conn, if_exists='append', index=False)
+                total += len(batch)
+
+            for target, where in _merge_targets(engine, table_name, df):
+                conn.execute(text(_merge_sql(target, temp_table, where)))
+            # Drop temp table
+            conn.execute(text(f"DROP TABLE IF EXISTS {temp_table}"))
+            logger.info(f"Upserted {total} rows into {table_name} (via temp table)")
 
     else:
         # Fallback generic path: use pandas.to_sql append in batches
@@ -201,18 +306,186 @@ DO UPDATE SET
             batch.to_sql(table_name, con=engine, if_exists='append', index=False)
             total += len(batch)
             logger.info(f"Appended {total} rows to {table_name}")
-        return total
 
+    # Lookup indexes are built after the first bulk load (no-op once they exist)
+    ensure_secondary_indexes(engine, table_name)
+    return total
+
+
+# Columns staged for the merge; created_at is stamped by the merge itself
+COPY_COLUMNS = ['market_name', 'product_name', 'price', 'quantity', 'date_recorded', 'source_file']
+COPY_BATCH_SIZE = 50_000
+UNIQUE_KEY = ['market_name', 'product_name', 'date_recorded']
+
+
+def _merge_targets(engine, table_name, df):
+    """(target table, staging filter) pairs for the merge.
 
-def load_to_csv(df: pd.DataFrame, output_path: str):
+    Partitioned tables are merged one month at a time straight into the
+    partition, after making sure every partition the frame needs exists (a
+    month whose partition was detached goes through the parent instead).
+    Rows without a date_recorded would be skipped by every month filter (and
+    break NOT NULL on a plain table), so they are rejected up front.
+    """
+    missing_dates = int(df['date_recorded'].isna().sum())
+    if missing_dates:
+        raise ValueError(f"{missing_dates} rows have no date_recorded; {table_name} requires one")
+    if not is_partitioned(engine, table_name):
+        return [(table_name, None)]
+    targets = ensure_partitions(engine, table_name, df['date_recorded'])
+    return [(target, partition_bounds(month)) for month, target in targets]
+
+
+def _merge_sql(table_name, staging_table, where=None):
+    """INSERT ... ON CONFLICT statement moving staged rows into the target table."""
+    return f"""
+INSERT INTO {table_name} (market_name, product_name, price, quantity, date_recorded, source_file, created_at)
+SELECT market_name, product_name, price, quantity, date_recorded, source_file, now() FROM {staging_table}
+{f"WHERE {where}" if where else ""}
+ON CONFLICT (market_name, product_name, date_recorded)
+DO UPDATE SET
+  price = EXCLUDED.price,
+  quantity = EXCLUDED.quantity,
+  source_file = EXCLUDED.source_file,
+  created_at = now();
+"""
+
+
+class _CsvCopyReader:
+    """Read-only file object rendering a DataFrame as CSV one batch at a time.
+
+    Lets COPY FROM STDIN stream the frame without materializing the whole CSV.
+    """
+
+    def __init__(self, df, columns, batch_size=COPY_BATCH_SIZE):
+        self._batches = (df.iloc[i : i + batch_size] for i in range(0, len(df), batch_size))
+        self._columns = columns
+        self._buffer = b''
+        self._pos = 0
+        self.bytes_sent = 0
+
+    def _fill(self):
+        batch = next(self._batches, None)
+        if batch is None:
+            return False
+        self._buffer = batch.to_csv(header=False, index=False, columns=self._columns).encode('utf-8')
+        self._pos = 0
+        return True
+
+    def read(self, size=-1):
+        chunks = []
+        while size < 0 or size > 0:
+            if self._pos >= len(self._buffer) and not self._fill():
+                break
+            end = len(self._buffer) if size < 0 else min(len(self._buffer), self._pos + size)
+            chunks.append(self._buffer[self._pos : end])
+            if size > 0:
+                size -= end - self._pos
+            self._pos = end
+        data = b''.join(chunks)
+        self.bytes_sent += len(data)
+        return data
+
+
+def copy_upsert(df: pd.DataFrame, engine, table_name='market_data', batch_size=COPY_BATCH_SIZE, prepared=False):
+    """Upsert ``df`` into PostgreSQL via COPY into a TEMP table and one ON CONFLICT merge.
+
+    Staging and merge run on one connection inside one transaction; the TEMP
+    table is dropped on commit. Partitioned targets get one merge per month,
+    straight into the partition. Returns a stats dict with the rows staged
+    and merged and per-phase timings in seconds. Rows without a
+    date_recorded raise ValueError before anything is written.
+    """
+    timings = {}
+    start = time.perf_counter()
+    if not prepared:
+        df = _prepare_dataframe(df)
+    timings['prepare_s'] = time.perf_counter() - start
+
+    staging = f"tmp_{table_name}_copy"
+    reader = _CsvCopyReader(df, COPY_COLUMNS, batch_size)
+    # COPY stages every row or fails, so rows with no target are rejected before it
+    targets = _merge_targets(engine, table_name, df) if not df.empty else []
+    stats = {'rows': 0, 'rows_merged': 0, 'partitions': 0, 'bytes_copied': 0, 'timings': timings}
+    if not targets:
+        logger.warning(f"No rows to COPY into {table_name}")
+        return stats
+
+    with engine.begin() as conn:
+        phase = time.perf_counter()
+        conn.execute(
+            text(f"""
+CREATE TEMP TABLE {staging} (
+    market_name TEXT,
+    product_name TEXT,
+    price NUMERIC(10,2),
+    quantity INTEGER,
+    date_recorded DATE,
+    source_file TEXT
+) ON COMMIT DROP
+""")
+        )
+        timings['create_staging_s'] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        cursor = conn.connection.cursor()
+        try:
+            cursor.copy_expert(
+                f"COPY {staging} ({', '.join(COPY_COLUMNS)}) FROM STDIN WITH (FORMAT csv)",
+                reader,
+                size=1 << 20,
+            )
+        finally:
+            cursor.close()
+        timings['copy_s'] = time.perf_counter() - phase
+
+        phase = time.perf_counter()
+        rows_merged = 0
+        for target, where in targets:
+            rows_merged += conn.execute(text(_merge_sql(target, staging, where))).rowcount
+        timings['merge_s'] = time.perf_counter() - phase
+
+    timings['total_s'] = time.perf_counter() - start
+    stats.update(
+        rows=len(df),
+        rows_merged=rows_merged,
+        partitions=sum(1 for _, where in targets if where),
+        bytes_copied=reader.bytes_sent,
+    )
+    logger.info(
+        f"COPY upsert of {len(df)} rows into {table_name}: "
+        + ", ".join(f"{phase}={seconds:.3f}" for phase, seconds in timings.items())
+    )
+    return stats
+
+
+def load_to_csv(df: pd.DataFrame, output_path: str, append: bool = False):
+    """Write ``df`` to ``output_path``.
+
+    With ``append`` the rows are merged into an existing file: a row replaces
+    any earlier row with the same (market_name, product_name, date_recorded),
+    so retried or re-aggregated loads do not duplicate keys.
+    """
     # Ensure parent directory exists
+    import io
     import os
     parent = os.path.dirname(output_path)
     if parent and not os.path.exists(parent):
         os.makedirs(parent, exist_ok=True)
 
-    df.to_csv(output_path, index=False)
-    logger.info(f"Wrote {len(df)} rows to {output_path}")
+    if append and os.path.exists(output_path) and os.path.getsize(output_path) > 0:
+        existing = pd.read_csv(output_path)
+        # Keep the existing file's column order, and compare keys as they are written
+        added = pd.read_csv(io.StringIO(df.reindex(columns=existing.columns).to_csv(index=False)))
+        combined = pd.concat([existing, added], ignore_index=True)
+        key = [c for c in UNIQUE_KEY if c in combined.columns]
+        if key:
+            combined = combined.drop_duplicates(subset=key, keep='last')
+        combined.to_csv(output_path, index=False)
+        logger.info(f"Merged {len(df)} rows into {output_path} ({len(combined)} rows)")
+    else:
+        df.to_csv(output_path, index=False)
+        logger.info(f"Wrote {len(df)} rows to {output_path}")
     return len(df)
 
 
@@ -228,8 +501,13 @@ def generate_load_report(rows_loaded, table_name, load_type='database'):
     return report
 
 
-def load_data(transformed_data: pd.DataFrame, connection, table_name='market_data', output_csv=None):
-    """Main entry point for loading data. `connection` is a SQLAlchemy engine."""
+def load_data(transformed_data: pd.DataFrame, connection, table_name='market_data', output_csv=None,
+              append_csv=False):
+    """Main entry point for loading data. `connection` is a SQLAlchemy engine.
+
+    With ``append_csv`` the rows are merged into the CSV backup by key rather
+    than replacing it, for incremental runs that only load affected files.
+    """
     if transformed_data is None or transformed_data.empty:
         logger.warning("No data to load")
         return
@@ -244,7 +522,7 @@ def load_data(transformed_data: pd.DataFrame, connection, table_name='market_dat
 
     if output_csv:
         try:
-            csv_rows = load_to_csv(transformed_data, output_csv)
+            csv_rows = load_to_csv(transformed_data, output_csv, append=append_csv)
             generate_load_report(csv_rows, output_csv, 'csv')
         except Exception as e:
             logger.error(f"Failed to write CSV backup: {e}")
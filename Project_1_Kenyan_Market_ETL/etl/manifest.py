@@ -0,0 +1,109 @@
+"""
+Extraction Manifest
+
+Persistent record of every source file the pipeline has seen, so re-runs only
+read files that are new or whose content changed.
+
+Each entry is keyed by path and stores:
+- size, mtime: cheap change detection (no read needed when both match)
+- hash: SHA-256 of the file content, used when size/mtime moved but the bytes may not have
+- rows: records extracted from the file
+- dates: distinct date_recorded values (ISO strings), used to find the files
+  that share (market, product, date) keys with a changed one; None if unknown
+- status: 'extracted' after a successful read, 'loaded' once the load phase committed,
+  'failed' if the read raised
+"""
+
+import json
+import os
+from datetime import datetime, timezone
+
+STATUS_EXTRACTED = 'extracted'
+STATUS_LOADED = 'loaded'
+STATUS_FAILED = 'failed'
+
+DEFAULT_MANIFEST_PATH = os.getenv('EXTRACT_MANIFEST_PATH', 'output/extract_manifest.json')
+
+
+class FileManifest:
+    """JSON-backed manifest of extracted source files"""
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH):
+        self.path = path
+        self.entries = {}
+        if os.path.exists(path):
+            with open(path) as f:
+                self.entries = json.load(f).get('files', {})
+
+    @staticmethod
+    def _key(file_path):
+        return os.path.abspath(file_path)
+
+    def get(self, file_path):
+        return self.entries.get(self._key(file_path))
+
+    def is_unchanged(self, file_path):
+        """True if the file was loaded before and its size and mtime still match"""
+        entry = self.get(file_path)
+        if not entry or entry['status'] != STATUS_LOADED:
+            return False
+        stat = os.stat(file_path)
+        return entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime
+
+    def loaded_hash(self, file_path):
+        """Content hash recorded at the last successful load, if any"""
+        entry = self.get(file_path)
+        if entry and entry['status'] == STATUS_LOADED:
+            return entry['hash']
+        return None
+
+    def shares_dates(self, file_path, dates):
+        """True if a loaded file may hold rows for ``dates`` (None: any date)"""
+        entry = self.get(file_path)
+        if not entry or entry['status'] != STATUS_LOADED:
+            return False
+        if dates is None or entry.get('dates') is None:
+            return True
+        return not dates.isdisjoint(entry['dates'])
+
+    def record(self, file_path, content_hash, rows, status=STATUS_EXTRACTED, stat=None, dates=None):
+        """Store an entry; pass the (size, mtime) seen when the file was read as ``stat``"""
+        size, mtime = stat or (os.stat(file_path).st_size, os.stat(file_path).st_mtime)
+        self.entries[self._key(file_path)] = {
+            'size': size,
+            'mtime': mtime,
+            'hash': content_hash,
+            'rows': rows,
+            'dates': sorted(dates) if dates is not None else None,
+            'status': status,
+            'updated_at': datetime.now(timezone.utc).isoformat(),
+        }
+
+    def remember_dates(self, file_path, dates):
+        """Fill in the dates of an entry recorded without them"""
+        entry = self.get(file_path)
+        if entry is not None and entry.get('dates') is None and dates is not None:
+            entry['dates'] = sorted(dates)
+
+    def mark_loaded(self, file_paths=None):
+        """Flag extracted files (all of them by default) as loaded"""
+        keys = self.entries if file_paths is None else [self._key(p) for p in file_paths]
+        for key in keys:
+            entry = self.entries.get(key)
+            if entry and entry['status'] == STATUS_EXTRACTED:
+                entry['status'] = STATUS_LOADED
+                entry['updated_at'] = datetime.now(timezone.utc).isoformat()
+
+    def reset(self):
+        """Forget every entry so the next extraction rereads all files"""
+        self.entries = {}
+
+    def save(self):
+        """Write the manifest atomically (temp file + rename)"""
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'files': self.entries}, f, indent=2, sort_keys=True)
+        os.replace(tmp_path, self.path)
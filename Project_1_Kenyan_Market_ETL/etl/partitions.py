@@ -0,0 +1,225 @@
+"""
+Monthly Range Partitioning for market_data (PostgreSQL)
+
+On PostgreSQL `market_data` is declared PARTITION BY RANGE (date_recorded)
+with one partition per calendar month, named ``{table}_yYYYYmMM``:
+- The loader creates missing partitions before each load, checking the
+  catalog each time so months detached or dropped elsewhere are recreated
+- A DEFAULT partition takes rows inserted outside the loader for months that
+  have no partition yet; they move to the month's partition when it is created
+- Upserts are merged straight into the target partition (no tuple routing
+  through the parent, and only that partition's unique index is probed)
+- Old months can be detached (kept as standalone tables) or dropped for retention
+- Queries filtering on date_recorded only scan matching partitions (pruning)
+
+SQLite and other backends keep the plain table.
+"""
+
+import logging
+import re
+from datetime import date
+
+import pandas as pd
+from sqlalchemy import text
+
+logger = logging.getLogger(__name__)
+
+PARTITIONED_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS {table} (
+    id BIGSERIAL,
+    market_name TEXT NOT NULL,
+    product_name TEXT NOT NULL,
+    price NUMERIC(10,2) NOT NULL CHECK (price >= 0),
+    quantity INTEGER NOT NULL CHECK (quantity >= 0),
+    date_recorded DATE NOT NULL,
+    source_file TEXT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, date_recorded),
+    CONSTRAINT {table}_unique_market_product_date UNIQUE (market_name, product_name, date_recorded)
+) PARTITION BY RANGE (date_recorded)
+"""
+
+DEFAULT_PARTITION_DDL = "CREATE TABLE IF NOT EXISTS {table}_default PARTITION OF {table} DEFAULT"
+
+_PARTITION_SUFFIX = re.compile(r'_y(\d{4})m(\d{2})$')
+
+# Process-level cache keyed by database URL
+_partitioned_cache = {}
+
+
+def reset_partition_cache():
+    """Forget cached partition lookups (e.g. after dropping tables in tests)."""
+    _partitioned_cache.clear()
+
+
+def month_start(d):
+    return date(d.year, d.month, 1)
+
+
+def add_months(month, n):
+    """First day of the month ``n`` months after ``month`` (negative n goes back)"""
+    index = month.year * 12 + month.month - 1 + n
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(table_name, month):
+    return f"{table_name}_y{month.year:04d}m{month.month:02d}"
+
+
+def default_partition_name(table_name):
+    return f"{table_name}_default"
+
+
+def partition_month(table_name, partition):
+    """Month start encoded in a partition name, or None if it is not one of ours"""
+    if not partition.startswith(f"{table_name}_"):
+        return None
+    match = _PARTITION_SUFFIX.search(partition)
+    if not match:
+        return None
+    return date(int(match.group(1)), int(match.group(2)), 1)
+
+
+def months_in(dates):
+    """Sorted distinct month starts covered by ``dates``"""
+    values = pd.to_datetime(pd.Series(dates), errors='coerce').dropna()
+    return sorted({date(v.year, v.month, 1) for v in values.dt.to_period('M').unique()})
+
+
+def partition_ddl(table_name, month):
+    return (
+        f"CREATE TABLE IF NOT EXISTS {partition_name(table_name, month)} PARTITION OF {table_name} "
+        f"FOR VALUES FROM ('{month.isoformat()}') TO ('{add_months(month, 1).isoformat()}')"
+    )
+
+
+def partition_bounds(month):
+    """SQL predicate selecting one month of date_recorded"""
+    return f"date_recorded >= '{month.isoformat()}' AND date_recorded < '{add_months(month, 1).isoformat()}'"
+
+
+def date_range_predicate(start=None, end=None):
+    """WHERE clause and params restricting date_recorded to [start, end).
+
+    Bounds are plain comparisons on the partition key, so PostgreSQL prunes
+    every partition outside the range. Returns ('', {}) when unbounded.
+    """
+    clauses, params = [], {}
+    if start is not None:
+        clauses.append("date_recorded >= :start_date")
+        params['start_date'] = pd.Timestamp(start).date()
+    if end is not None:
+        clauses.append("date_recorded < :end_date")
+        params['end_date'] = pd.Timestamp(end).date()
+    return (f"WHERE {' AND '.join(clauses)}" if clauses else ''), params
+
+
+def is_partitioned(engine, table_name='market_data'):
+    """True if ``table_name`` is a partitioned table (PostgreSQL only)"""
+    if engine.dialect.name.lower() != 'postgresql':
+        return False
+    key = (str(engine.url), table_name)
+    if key not in _partitioned_cache:
+        with engine.connect() as conn:
+            _partitioned_cache[key] = bool(conn.execute(text("""
+                SELECT EXISTS (
+                    SELECT 1 FROM pg_partitioned_table pt
+                    JOIN pg_class c ON c.oid = pt.partrelid
+                    WHERE c.relname = :table_name
+                )
+            """), {'table_name': table_name}).scalar())
+    return _partitioned_cache[key]
+
+
+def ensure_partitions(engine, table_name, dates):
+    """Create any missing monthly partitions for ``dates``; returns (month, merge target) pairs.
+
+    Attached partitions are read from the catalog on every call (one query)
+    rather than cached, so a month that retention detached or dropped in
+    another process is recreated instead of being merged into a detached or
+    missing table. A detached table still holding a month's partition name is
+    left alone (it is an archive); that month is merged through the parent
+    table and lands in the DEFAULT partition. Partitions are created in their
+    own committed transaction.
+    """
+    months = months_in(dates)
+    if not months:
+        return []
+    attached = set(list_partitions(engine, table_name))
+    missing = [m for m in months if partition_name(table_name, m) not in attached]
+    detached = set()
+    if missing:
+        with engine.begin() as conn:
+            detached = {r[0] for r in conn.execute(
+                text("SELECT relname FROM pg_class WHERE relname = ANY(:names)"),
+                {'names': [partition_name(table_name, m) for m in missing]},
+            )}
+            created = [m for m in missing if partition_name(table_name, m) not in detached]
+            for month in created:
+                if default_partition_name(table_name) in attached:
+                    _partition_from_default(conn, table_name, month)
+                else:
+                    conn.execute(text(partition_ddl(table_name, month)))
+        if created:
+            logger.info(f"Created {len(created)} partitions of {table_name}")
+        if detached:
+            logger.warning(f"{', '.join(sorted(detached))} detached from {table_name}; merging through the parent")
+    return [
+        (month, table_name if partition_name(table_name, month) in detached else partition_name(table_name, month))
+        for month in months
+    ]
+
+
+def _partition_from_default(conn, table_name, month):
+    """Create a month's partition, moving in the rows the DEFAULT partition holds for it.
+
+    PostgreSQL refuses a new range while the DEFAULT partition has rows in it.
+    """
+    default = default_partition_name(table_name)
+    bounds = partition_bounds(month)
+    held = f"tmp_{partition_name(table_name, month)}"
+    conn.execute(text(f"CREATE TEMP TABLE {held} ON COMMIT DROP AS SELECT * FROM {default} WHERE {bounds}"))
+    conn.execute(text(f"DELETE FROM {default} WHERE {bounds}"))
+    conn.execute(text(partition_ddl(table_name, month)))
+    conn.execute(text(f"INSERT INTO {table_name} SELECT * FROM {held}"))
+
+
+def list_partitions(engine, table_name='market_data'):
+    """Names of the partitions currently attached to ``table_name``"""
+    with engine.connect() as conn:
+        rows = conn.execute(text("""
+            SELECT c.relname FROM pg_inherits i
+            JOIN pg_class c ON c.oid = i.inhrelid
+            JOIN pg_class p ON p.oid = i.inhparent
+            WHERE p.relname = :table_name
+            ORDER BY c.relname
+        """), {'table_name': table_name}).fetchall()
+    return [r[0] for r in rows]
+
+
+def expired_partitions(table_name, partitions, keep_months, today=None):
+    """Partitions entirely older than the newest ``keep_months`` months (current month included)"""
+    cutoff = add_months(month_start(today or date.today()), -(keep_months - 1))
+    expired = []
+    for partition in partitions:
+        month = partition_month(table_name, partition)
+        if month is not None and month < cutoff:
+            expired.append(partition)
+    return expired
+
+
+def apply_retention(engine, table_name='market_data', keep_months=24, drop=False, today=None):
+    """Detach (or drop) partitions older than ``keep_months``; returns the affected names.
+
+    Detached partitions stay in the database as ordinary tables that can be
+    archived or re-attached; ``drop=True`` removes them.
+    """
+    expired = expired_partitions(table_name, list_partitions(engine, table_name), keep_months, today)
+    with engine.begin() as conn:
+        for partition in expired:
+            conn.execute(text(f"ALTER TABLE {table_name} DETACH PARTITION {partition}"))
+            if drop:
+                conn.execute(text(f"DROP TABLE {partition}"))
+    if expired:
+        logger.info(f"{'Dropped' if drop else 'Detached'} {len(expired)} partitions of {table_name}")
+    return expired
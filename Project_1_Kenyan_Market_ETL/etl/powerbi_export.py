@@ -0,0 +1,197 @@
+"""
+Incremental Power BI Export
+
+Writes `market_data` as month-partitioned Parquet for Power BI:
+
+    <output_dir>/date_month=2024-01/market_data.parquet
+    <output_dir>/_watermark.json    highest created_at exported so far
+    <output_dir>/_manifest.json     one entry per month file (rows, bytes, date range)
+
+Each run finds the months holding rows with created_at past the watermark and
+rewrites only those month files, streaming each month from a server-side
+cursor in batches. The created_at lookups use the idx_market_created_at index
+rather than scanning the table. Rewriting whole months keeps the export free of
+duplicates when the loader upserts an existing market/product/date, and makes
+re-runs idempotent, so the watermark is read back with a small overlap to catch
+rows committed late. Month filters are on date_recorded, so PostgreSQL prunes to
+a single partition per month.
+
+Months that were exported before but no longer hold rows (for example after
+their partition was dropped) have no new created_at values, so they are found
+separately. There is one single-row probe per exported month, and their files
+are removed.
+
+Market, product and source columns are dictionary-encoded; files are zstd compressed.
+"""
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from sqlalchemy import text
+
+from etl.partitions import add_months, date_range_predicate, month_start
+
+WATERMARK_FILE = '_watermark.json'
+MANIFEST_FILE = '_manifest.json'
+EXPORT_COLUMNS = ['market_name', 'product_name', 'price', 'quantity', 'date_recorded', 'source_file', 'created_at']
+
+EXPORT_SCHEMA = pa.schema([
+    ('market_name', pa.dictionary(pa.int32(), pa.string())),
+    ('product_name', pa.dictionary(pa.int32(), pa.string())),
+    ('price', pa.float64()),
+    ('quantity', pa.int32()),
+    ('date_recorded', pa.date32()),
+    ('source_file', pa.dictionary(pa.int32(), pa.string())),
+    ('created_at', pa.timestamp('us', tz='UTC')),
+])
+
+
+def _read_json(path, default):
+    if not os.path.exists(path):
+        return default
+    with open(path) as f:
+        return json.load(f)
+
+
+def _write_json(path, payload):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(payload, f, indent=2, sort_keys=True, default=str)
+    os.replace(tmp_path, path)
+
+
+def read_watermark(output_dir):
+    """Last exported created_at (UTC Timestamp), or None before the first export"""
+    value = _read_json(os.path.join(output_dir, WATERMARK_FILE), {}).get('created_at')
+    return pd.Timestamp(value) if value else None
+
+
+def _to_utc(value):
+    ts = pd.Timestamp(value)
+    return ts.tz_localize('UTC') if ts.tzinfo is None else ts.tz_convert('UTC')
+
+
+def _to_arrow(batch):
+    """Cast one cursor batch to the export schema"""
+    df = pd.DataFrame(batch, columns=EXPORT_COLUMNS)
+    df['price'] = pd.to_numeric(df['price'], errors='coerce').astype('float64')
+    df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce').astype('int32')
+    df['date_recorded'] = pd.to_datetime(df['date_recorded']).dt.date
+    df['created_at'] = pd.to_datetime(df['created_at'], utc=True, format='mixed')
+    return pa.Table.from_pandas(df, schema=EXPORT_SCHEMA, preserve_index=False)
+
+
+def changed_months(engine, table_name='market_data', since=None):
+    """Months with rows created after ``since`` (all months when None), plus the max created_at"""
+    where = "WHERE created_at > :since" if since is not None else ""
+    params = {'since': since.tz_convert('UTC').to_pydatetime()} if since is not None else {}
+    with engine.connect() as conn:
+        dates = conn.execute(text(f"SELECT DISTINCT date_recorded FROM {table_name} {where}"), params).fetchall()
+        max_created = conn.execute(text(f"SELECT MAX(created_at) FROM {table_name} {where}"), params).scalar()
+    months = sorted({month_start(pd.Timestamp(d[0]).date()) for d in dates if d[0] is not None})
+    return months, (_to_utc(max_created) if max_created is not None else None)
+
+
+def emptied_months(engine, months, table_name='market_data'):
+    """The given months that no longer hold any rows (e.g. their partition was dropped)"""
+    emptied = []
+    with engine.connect() as conn:
+        for month in months:
+            where, params = date_range_predicate(month, add_months(month, 1))
+            if conn.execute(text(f"SELECT 1 FROM {table_name} {where} LIMIT 1"), params).first() is None:
+                emptied.append(month)
+    return emptied
+
+
+def _remove_month(output_dir, month, table_name='market_data'):
+    path = os.path.join(output_dir, f"date_month={month.strftime('%Y-%m')}", f"{table_name}.parquet")
+    if os.path.exists(path):
+        os.remove(path)
+
+
+def export_month(engine, output_dir, month, table_name='market_data', batch_size=50_000):
+    """Stream one month from a server-side cursor into its Parquet file; returns a manifest entry"""
+    where, params = date_range_predicate(month, add_months(month, 1))
+    query = text(f"SELECT {', '.join(EXPORT_COLUMNS)} FROM {table_name} {where} "
+                 f"ORDER BY date_recorded, market_name, product_name")
+
+    month_dir = os.path.join(output_dir, f"date_month={month.strftime('%Y-%m')}")
+    os.makedirs(month_dir, exist_ok=True)
+    path = os.path.join(month_dir, f"{table_name}.parquet")
+    tmp_path = f"{path}.tmp"
+
+    rows = 0
+    writer = pq.ParquetWriter(tmp_path, EXPORT_SCHEMA, compression='zstd',
+                              use_dictionary=['market_name', 'product_name', 'source_file'])
+    try:
+        with engine.connect().execution_options(stream_results=True, max_row_buffer=batch_size) as conn:
+            result = conn.execute(query, params)
+            for batch in result.partitions(batch_size):
+                writer.write_table(_to_arrow(batch))
+                rows += len(batch)
+    finally:
+        writer.close()
+
+    if rows == 0:
+        # Rows deleted since the month was listed: nothing to export
+        os.remove(tmp_path)
+        _remove_month(output_dir, month, table_name)
+        return None
+    os.replace(tmp_path, path)
+    return {
+        'path': os.path.relpath(path, output_dir),
+        'rows': rows,
+        'bytes': os.path.getsize(path),
+        'min_date': month.isoformat(),
+        'max_date': (add_months(month, 1) - timedelta(days=1)).isoformat(),
+        'exported_at': datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def export_incremental(engine, output_dir, table_name='market_data', batch_size=50_000,
+                       overlap=timedelta(minutes=5), full=False):
+    """
+    Rewrite the Parquet files for every month that changed since the watermark
+
+    Returns:
+        dict: months exported and removed, rows written and the new watermark
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    watermark = None if full else read_watermark(output_dir)
+    since = watermark - overlap if watermark is not None else None
+
+    months, max_created = changed_months(engine, table_name, since)
+    manifest = _read_json(os.path.join(output_dir, MANIFEST_FILE), {'table': table_name, 'files': {}})
+
+    exported = [datetime.strptime(key, '%Y-%m').date() for key in manifest['files']]
+    removed = emptied_months(engine, [m for m in exported if m not in months], table_name)
+    for month in removed:
+        _remove_month(output_dir, month, table_name)
+        manifest['files'].pop(month.strftime('%Y-%m'), None)
+        print(f"Removed export of {month.strftime('%Y-%m')} (no rows left)")
+
+    rows = 0
+    for month in months:
+        entry = export_month(engine, output_dir, month, table_name, batch_size)
+        key = month.strftime('%Y-%m')
+        if entry is None:
+            manifest['files'].pop(key, None)
+            continue
+        manifest['files'][key] = entry
+        rows += entry['rows']
+        print(f"Exported {entry['rows']} rows for {key} ({entry['bytes']} bytes)")
+
+    new_watermark = max(filter(None, [watermark, max_created]), default=None)
+    manifest['watermark'] = new_watermark.isoformat() if new_watermark is not None else None
+    manifest['generated_at'] = datetime.now(timezone.utc).isoformat()
+    manifest['total_rows'] = sum(f['rows'] for f in manifest['files'].values())
+    _write_json(os.path.join(output_dir, MANIFEST_FILE), manifest)
+    if new_watermark is not None:
+        _write_json(os.path.join(output_dir, WATERMARK_FILE), {'created_at': new_watermark.isoformat()})
+
+    return {'months': [m.strftime('%Y-%m') for m in months], 'removed': [m.strftime('%Y-%m') for m in removed],
+            'rows': rows, 'watermark': new_watermark}
@@ -113,31 +113,34 @@ def validate_data_quality(df):
 def transform_data(raw_data):
     """
     Main transformation function that orchestrates all transformation steps
+
+    Applies standardize_columns -> clean_data -> derived columns -> quality
+    metrics through the fused engine in `etl.transform_engine`, which keeps
+    the same rules but makes far fewer passes over the data.
     """
+    from etl.transform_engine import plan_transform
+
     print("Starting data transformation process...")
     
     if raw_data.empty:
         print("Warning: Input data is empty")
         return raw_data
     
-    # Step 0: Standardize columns and formats FIRST (before dedup check)
-    transformed_df = standardize_columns(raw_data.copy())
-    
-    # Step 1: Clean data (including deduplication)
-    transformed_df = clean_data(transformed_df)
-    
-    # Step 2: Add derived columns for analysis
-    if 'market_name' in transformed_df.columns and 'product_name' in transformed_df.columns:
-        transformed_df['market_product'] = (
-            transformed_df['market_name'].astype(str) + '_' + 
-            transformed_df['product_name'].astype(str)
-        )
-    
-    if 'price' in transformed_df.columns and 'quantity' in transformed_df.columns:
-        transformed_df['total_value'] = transformed_df['price'] * transformed_df['quantity']
-    
-    # Step 3: Validate data quality
-    quality_metrics = validate_data_quality(transformed_df)
+    transformed_df, quality_metrics = plan_transform(raw_data)
     
     print(f"Transformation completed. Output records: {len(transformed_df)}")
     return transformed_df
+
+
+def transform_data_in_chunks(chunks):
+    """
+    Transform an iterable of raw chunks, aggregating duplicates across chunks
+
+    Use this when the extracted data does not fit in memory as one frame.
+    """
+    from etl.transform_engine import transform_chunks
+
+    print("Starting chunked data transformation process...")
+    transformed_df, quality_metrics = transform_chunks(chunks)
+    print(f"Transformation completed. Output records: {len(transformed_df)}")
+    return transformed_df
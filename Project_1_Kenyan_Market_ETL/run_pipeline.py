@@ -9,6 +9,8 @@ This script orchestrates the complete ETL pipeline for Kenyan market data:
 
 Usage:
     python run_pipeline.py
+    python run_pipeline.py --full-refresh   # ignore the extraction manifest and reread every file
+    python run_pipeline.py --truncate       # clean load: empty market_data, then reread every file
     
 Environment Variables:
     DB_HOST: Database host (default: localhost)
@@ -22,8 +24,9 @@ import sys
 import logging
 import argparse
 from datetime import datetime
-from etl.extract import extract_data
-from etl.transform import transform_data
+from etl.extract import extract_affected_files
+from etl.manifest import FileManifest
+from etl.transform import transform_data_in_chunks
 from etl.load import load_data
 from config.db_config import get_db_connection
 from sqlalchemy import text
@@ -91,20 +94,36 @@ def main(args):
         logger.info("="*60)
         logger.info("EXTRACTION PHASE")
         logger.info("="*60)
-        raw_data = extract_data()
-        
-        if raw_data.empty:
-            logger.error("Extraction failed - no data extracted")
-            sys.exit(1)
-        
-        logger.info(f"Extraction completed: {len(raw_data)} records")
-        
-        # Step 2: Transform
+        manifest = FileManifest()
+        # A clean load empties the table, so every file has to be reread, not just changed ones
+        full_refresh = getattr(args, 'full_refresh', False) or getattr(args, 'truncate', False)
+        if full_refresh:
+            manifest.reset()
+
+        # New or changed files, plus the loaded files sharing their dates (their keys'
+        # totals are rebuilt from every file); frames stream straight into the transformer
+        extracted_files = []
+        extracted_records = 0
+
+        def raw_chunks():
+            nonlocal extracted_records
+            for file_path, df in extract_affected_files(manifest):
+                extracted_files.append(file_path)
+                extracted_records += len(df)
+                yield df
+
+        # Step 2: Transform (consumes the extraction stream)
         logger.info("\n" + "="*60)
         logger.info("TRANSFORMATION PHASE")
         logger.info("="*60)
-        transformed_data = transform_data(raw_data)
-        
+        transformed_data = transform_data_in_chunks(raw_chunks())
+
+        if not extracted_files:
+            logger.info("No new or changed source files - nothing to load")
+            return
+
+        logger.info(f"Extraction completed: {extracted_records} records from {len(extracted_files)} files")
+
         if transformed_data.empty:
             logger.error("Transformation failed - no data transformed")
             sys.exit(1)
@@ -129,8 +148,11 @@ def main(args):
                 transformed_data,
                 conn,
                 table_name='market_data',
-                output_csv='output/market_data_loaded.csv'
+                output_csv='output/market_data_loaded.csv',
+                append_csv=not full_refresh
             )
+            manifest.mark_loaded(extracted_files)
+            manifest.save()
             logger.info("Data loading completed successfully")
         except Exception as e:
             logger.warning(f"Database loading failed: {str(e)}")
@@ -139,7 +161,8 @@ def main(args):
                 transformed_data,
                 None,
                 table_name='market_data',
-                output_csv='output/market_data_loaded.csv'
+                output_csv='output/market_data_loaded.csv',
+                append_csv=not full_refresh
             )
         
         # Pipeline completion
@@ -164,6 +187,8 @@ def main(args):
 if __name__ == "__main__":
     parser = argparse.ArgumentParser(description='Run the Kenyan Market ETL pipeline')
     parser.add_argument('--truncate', '--force', action='store_true', dest='truncate',
-                        help='Truncate the target table before loading (clean load)')
+                        help='Truncate the target table and reread every source file (clean load)')
+    parser.add_argument('--full-refresh', action='store_true', dest='full_refresh',
+                        help='Ignore the extraction manifest and reread every source file')
     parsed = parser.parse_args()
     main(parsed)
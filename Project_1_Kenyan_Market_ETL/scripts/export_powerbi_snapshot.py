@@ -1,7 +1,19 @@
 """
 Export a CSV snapshot suitable for Power BI from the configured database.
 Writes `dashboards/powerbi_sample_export.csv` with a flattened view of `market_data`.
+
+Usage:
+    python scripts/export_powerbi_snapshot.py                 # full table
+    python scripts/export_powerbi_snapshot.py --months 3      # current month and the 2 before
+    python scripts/export_powerbi_snapshot.py --start 2024-01-01 --end 2024-07-01
+    python scripts/export_powerbi_snapshot.py --incremental   # Parquet, only months with new rows
+
+Date bounds filter on date_recorded, the partition key, so only the matching
+monthly partitions are scanned. Incremental mode writes month-partitioned
+Parquet plus `_manifest.json` to `dashboards/powerbi_parquet/` (see etl.powerbi_export).
 """
+import argparse
+from datetime import date
 from pathlib import Path
 from dotenv import load_dotenv
 import pandas as pd
@@ -10,19 +22,48 @@ import pandas as pd
 load_dotenv()
 
 from config.db_config import get_db_connection
+from etl.partitions import add_months, date_range_predicate, month_start
 
 PROJECT_ROOT = Path(__file__).resolve().parents[1]
 OUT_PATH = PROJECT_ROOT / 'dashboards' / 'powerbi_sample_export.csv'
+PARQUET_DIR = PROJECT_ROOT / 'dashboards' / 'powerbi_parquet'
+
+
+def main(args):
+    if args.incremental:
+        from etl.powerbi_export import export_incremental
 
-# Use the configured database engine
-engine = get_db_connection()
+        result = export_incremental(get_db_connection(), str(args.output_dir), full=args.full)
+        print(f"Exported {result['rows']} rows across {len(result['months'])} months to {args.output_dir} "
+              f"(watermark {result['watermark']})")
+        return
 
-query = '''
+    start, end = args.start, args.end
+    if args.months:
+        start = add_months(month_start(date.today()), -(args.months - 1))
+
+    where, params = date_range_predicate(start, end)
+    query = f'''
 SELECT market_name, product_name, price, quantity, date_recorded, source_file, created_at
 FROM market_data
+{where}
 '''
 
-df = pd.read_sql(query, engine)
-OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
-df.to_csv(OUT_PATH, index=False)
-print(f"Wrote {len(df)} rows to {OUT_PATH}")
+    # Use the configured database engine
+    engine = get_db_connection()
+    df = pd.read_sql(query, engine, params=params)
+    OUT_PATH.parent.mkdir(parents=True, exist_ok=True)
+    df.to_csv(OUT_PATH, index=False)
+    print(f"Wrote {len(df)} rows to {OUT_PATH}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Export market_data for Power BI')
+    parser.add_argument('--start', help='First date_recorded to include (YYYY-MM-DD)')
+    parser.add_argument('--end', help='Export rows before this date (YYYY-MM-DD)')
+    parser.add_argument('--months', type=int, help='Export only the most recent N months')
+    parser.add_argument('--incremental', action='store_true',
+                        help='Write month-partitioned Parquet for months changed since the last export')
+    parser.add_argument('--full', action='store_true', help='With --incremental, ignore the watermark')
+    parser.add_argument('--output-dir', default=PARQUET_DIR, help='Parquet output directory')
+    main(parser.parse_args())
@@ -0,0 +1,37 @@
+"""
+Partition maintenance for market_data (PostgreSQL).
+
+Usage:
+    python scripts/manage_partitions.py --list
+    python scripts/manage_partitions.py --keep-months 24          # detach older months
+    python scripts/manage_partitions.py --keep-months 24 --drop   # drop them instead
+"""
+import argparse
+from dotenv import load_dotenv
+
+# Load .env first before importing config
+load_dotenv()
+
+from config.db_config import get_db_connection
+from etl.partitions import apply_retention, list_partitions
+
+
+def main(args):
+    engine = get_db_connection()
+    if args.list:
+        for partition in list_partitions(engine, args.table):
+            print(partition)
+        return
+
+    affected = apply_retention(engine, args.table, keep_months=args.keep_months, drop=args.drop)
+    action = 'Dropped' if args.drop else 'Detached'
+    print(f"{action} {len(affected)} partitions: {', '.join(affected) or '-'}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='List or expire market_data partitions')
+    parser.add_argument('--table', default='market_data')
+    parser.add_argument('--list', action='store_true', help='List attached partitions')
+    parser.add_argument('--keep-months', type=int, default=24, help='Months to keep, current month included')
+    parser.add_argument('--drop', action='store_true', help='Drop expired partitions instead of detaching them')
+    main(parser.parse_args())
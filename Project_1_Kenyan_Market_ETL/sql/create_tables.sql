@@ -2,28 +2,43 @@
 
 -- Primary table to store market product prices per date. The schema matches
 -- the CSV fields: Market Name, Product Name, Price, Quantity, Date Recorded
--- Designed for PostgreSQL with a uniqueness constraint to support idempotent loads
+-- Designed for PostgreSQL with a uniqueness constraint to support idempotent loads.
+-- Range-partitioned by month on date_recorded; the loader (etl/partitions.py)
+-- creates partitions named market_data_yYYYYmMM as data arrives. Partitioned
+-- tables need the partition key in every unique key, hence PRIMARY KEY (id, date_recorded).
 
 CREATE TABLE IF NOT EXISTS market_data (
-    id BIGSERIAL PRIMARY KEY,
+    id BIGSERIAL,
     market_name TEXT NOT NULL,
     product_name TEXT NOT NULL,
     price NUMERIC(10,2) NOT NULL CHECK (price >= 0),
     quantity INTEGER NOT NULL CHECK (quantity >= 0),
     date_recorded DATE NOT NULL,
     source_file TEXT,
-    created_at TIMESTAMP WITH TIME ZONE DEFAULT now()
-);
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, date_recorded),
+    -- Unique constraint to avoid duplicate rows for same market/product/date
+    CONSTRAINT market_data_unique_market_product_date UNIQUE (market_name, product_name, date_recorded)
+) PARTITION BY RANGE (date_recorded);
 
--- Unique constraint to avoid duplicate rows for same market/product/date
-ALTER TABLE market_data
-    ADD CONSTRAINT market_data_unique_market_product_date
-    UNIQUE (market_name, product_name, date_recorded);
+-- Catches rows for months that have no partition yet (e.g. inserts made outside
+-- the loader); ensure_partitions moves them out when it creates the month.
+CREATE TABLE IF NOT EXISTS market_data_default PARTITION OF market_data DEFAULT;
 
--- Indexes to speed up common queries
-CREATE INDEX IF NOT EXISTS idx_market_data_market ON market_data (market_name);
-CREATE INDEX IF NOT EXISTS idx_market_data_product ON market_data (product_name);
-CREATE INDEX IF NOT EXISTS idx_market_data_date ON market_data (date_recorded);
+-- Indexes to speed up common queries (cascade to every partition)
+CREATE INDEX IF NOT EXISTS idx_market_market ON market_data (market_name);
+CREATE INDEX IF NOT EXISTS idx_market_product ON market_data (product_name);
+CREATE INDEX IF NOT EXISTS idx_market_date ON market_data (date_recorded);
+-- Incremental Power BI export: rows created since the last run
+CREATE INDEX IF NOT EXISTS idx_market_created_at ON market_data (created_at);
+
+-- Schema versions applied by the loader (etl/load.py SCHEMA_VERSION); lets the
+-- loader skip DDL checks once a table is current
+CREATE TABLE IF NOT EXISTS etl_schema_version (
+    table_name VARCHAR(255) PRIMARY KEY,
+    version INTEGER NOT NULL,
+    applied_at TIMESTAMP NOT NULL
+);
 
 -- Summary table for quick aggregates (optional, populated by ETL)
 CREATE TABLE IF NOT EXISTS market_summary (
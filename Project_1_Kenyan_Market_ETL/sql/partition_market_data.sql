@@ -0,0 +1,57 @@
+-- Migrate an existing (unpartitioned) market_data table to monthly range partitions.
+-- Run once, in a maintenance window:  psql -f sql/partition_market_data.sql
+
+BEGIN;
+
+ALTER TABLE market_data RENAME TO market_data_unpartitioned;
+ALTER TABLE market_data_unpartitioned
+    RENAME CONSTRAINT market_data_unique_market_product_date TO market_data_unpartitioned_unique;
+ALTER INDEX IF EXISTS idx_market_market RENAME TO idx_market_unpartitioned_market;
+ALTER INDEX IF EXISTS idx_market_product RENAME TO idx_market_unpartitioned_product;
+ALTER INDEX IF EXISTS idx_market_date RENAME TO idx_market_unpartitioned_date;
+ALTER INDEX IF EXISTS idx_market_created_at RENAME TO idx_market_unpartitioned_created_at;
+
+CREATE TABLE market_data (
+    id BIGSERIAL,
+    market_name TEXT NOT NULL,
+    product_name TEXT NOT NULL,
+    price NUMERIC(10,2) NOT NULL CHECK (price >= 0),
+    quantity INTEGER NOT NULL CHECK (quantity >= 0),
+    date_recorded DATE NOT NULL,
+    source_file TEXT,
+    created_at TIMESTAMP WITH TIME ZONE NOT NULL DEFAULT now(),
+    PRIMARY KEY (id, date_recorded),
+    CONSTRAINT market_data_unique_market_product_date UNIQUE (market_name, product_name, date_recorded)
+) PARTITION BY RANGE (date_recorded);
+
+CREATE INDEX idx_market_market ON market_data (market_name);
+CREATE INDEX idx_market_product ON market_data (product_name);
+CREATE INDEX idx_market_date ON market_data (date_recorded);
+CREATE INDEX idx_market_created_at ON market_data (created_at);
+
+-- One partition per month present in the old table
+DO $$
+DECLARE
+    m DATE;
+BEGIN
+    FOR m IN SELECT DISTINCT date_trunc('month', date_recorded)::date FROM market_data_unpartitioned LOOP
+        EXECUTE format(
+            'CREATE TABLE %I PARTITION OF market_data FOR VALUES FROM (%L) TO (%L)',
+            'market_data_y' || to_char(m, 'YYYY') || 'm' || to_char(m, 'MM'),
+            m, (m + interval '1 month')::date
+        );
+    END LOOP;
+END $$;
+
+-- Rows for months without a partition land here (see sql/create_tables.sql)
+CREATE TABLE market_data_default PARTITION OF market_data DEFAULT;
+
+INSERT INTO market_data (id, market_name, product_name, price, quantity, date_recorded, source_file, created_at)
+SELECT id, market_name, product_name, price, quantity, date_recorded, source_file, coalesce(created_at, now())
+FROM market_data_unpartitioned;
+
+SELECT setval(pg_get_serial_sequence('market_data', 'id'), coalesce((SELECT max(id) FROM market_data), 1));
+
+DROP TABLE market_data_unpartitioned;
+
+COMMIT;
@@ -0,0 +1,205 @@
+"""
+Unit tests for the async market feed client, run against a local stub HTTP server.
+
+Tests cover:
+- Concurrent pagination into typed chunks
+- Retry on transient errors
+- ETag caching (304 served from cache)
+- Token-bucket rate limiting
+- Servers that ignore paging parameters or answer 304 unprompted
+- extract_from_api / extract_markets_from_api wrappers
+"""
+
+import sys
+import os
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import pandas as pd
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pytest.importorskip('aiohttp')
+
+from etl.api_client import ApiExtractionError, fetch_api_frames
+from etl.extract import extract_from_api, extract_markets_from_api
+
+PAGES = 3
+PAGE_SIZE = 2
+UNPAGED_ROWS = 150
+
+
+class StubFeedHandler(BaseHTTPRequestHandler):
+    """Paginated market feed; behaviour is driven by server attributes"""
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server
+        query = {k: v[0] for k, v in parse_qs(urlparse(self.path).query).items()}
+        server.requests.append((query, dict(self.headers)))
+
+        if server.fail_first and len(server.requests) <= server.fail_first:
+            self.send_response(503)
+            self.send_header('Retry-After', '0')
+            self.end_headers()
+            return
+        if urlparse(self.path).path == '/missing':
+            self.send_response(404)
+            self.end_headers()
+            return
+
+        if server.not_modified:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        market = query.get('market', 'Nairobi')
+        if server.unpaged:
+            # Ignores page / page_size and always returns the full list
+            records = [{'market_name': market, 'product_name': f'Product {i}', 'price': 50,
+                        'date_recorded': '2024-01-15'} for i in range(UNPAGED_ROWS)]
+            body = json.dumps(records).encode()
+            self.send_response(200)
+            self.send_header('Content-Type', 'application/json')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+            return
+
+        page = int(query.get('page', 1))
+        etag = f'"{market}-{page}"'
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        records = [{'market_name': market, 'product_name': f'Product {page}-{i}', 'price': str(50 + i),
+                    'quantity': 10 * i, 'date_recorded': '2024-01-15'} for i in range(PAGE_SIZE)]
+        body = json.dumps({'data': records, 'meta': {'total_pages': PAGES}}).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('ETag', etag)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+@pytest.fixture
+def feed():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), StubFeedHandler)
+    server.requests = []
+    server.fail_first = 0
+    server.unpaged = False
+    server.not_modified = False
+    thread = threading.Thread(target=server.serve_forever, kwargs={'poll_interval': 0.05}, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+def url(server, path='/prices'):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+def test_fetches_all_pages_as_typed_chunks(feed):
+    chunks, stats = fetch_api_frames(url(feed), page_size=PAGE_SIZE, rate_limit=100)
+
+    df = pd.concat(chunks, ignore_index=True)
+    assert len(chunks) == PAGES
+    assert len(df) == PAGES * PAGE_SIZE
+    assert df['price'].dtype == 'float64'
+    assert pd.api.types.is_datetime64_any_dtype(df['date_recorded'])
+    assert sorted(int(q['page']) for q, _ in feed.requests) == [1, 2, 3]
+    assert stats['pages'] == PAGES
+
+
+def test_retries_transient_errors(feed):
+    feed.fail_first = 2
+
+    chunks, stats = fetch_api_frames(url(feed), page_size=PAGE_SIZE, rate_limit=100, backoff_base=0.01)
+
+    assert len(chunks) == PAGES
+    assert stats['retries'] == 2
+
+
+def test_gives_up_after_max_retries(feed):
+    feed.fail_first = 100
+
+    with pytest.raises(ApiExtractionError):
+        fetch_api_frames(url(feed), page_size=PAGE_SIZE, rate_limit=100, max_retries=1, backoff_base=0.01)
+
+
+def test_etag_cache_serves_not_modified_pages(feed, tmp_path):
+    options = dict(page_size=PAGE_SIZE, rate_limit=100, cache_dir=str(tmp_path))
+    first, _ = fetch_api_frames(url(feed), **options)
+
+    second, stats = fetch_api_frames(url(feed), **options)
+
+    assert stats['not_modified'] == PAGES
+    assert any(h.get('If-None-Match') for _, h in feed.requests[PAGES:])
+    pd.testing.assert_frame_equal(
+        pd.concat(second).sort_values('product_name').reset_index(drop=True),
+        pd.concat(first).sort_values('product_name').reset_index(drop=True),
+    )
+
+
+def test_token_bucket_limits_request_rate(feed):
+    start = time.monotonic()
+    fetch_api_frames(url(feed), page_size=PAGE_SIZE, rate_limit=10, burst=1)
+
+    # Three requests at 10/s with no burst need at least two refill intervals
+    assert time.monotonic() - start >= 0.18
+
+
+def test_extract_from_api_returns_dataframe(feed):
+    df = extract_from_api(url(feed), page_size=PAGE_SIZE, rate_limit=100)
+    assert len(df) == PAGES * PAGE_SIZE
+
+
+def test_extract_from_api_error_returns_empty(feed):
+    df = extract_from_api(url(feed, '/missing'), max_retries=0)
+    assert df.empty
+
+
+def test_extract_markets_from_api(feed):
+    chunks = extract_markets_from_api(url(feed), ['Nairobi', 'Mombasa', 'Kisumu'],
+                                      page_size=PAGE_SIZE, rate_limit=100)
+
+    df = pd.concat(chunks, ignore_index=True)
+    assert set(df['market_name']) == {'Nairobi', 'Mombasa', 'Kisumu'}
+    assert len(df) == 3 * PAGES * PAGE_SIZE
+
+
+def test_extract_from_api_defaults_to_single_request(feed):
+    feed.unpaged = True
+
+    df = extract_from_api(url(feed), rate_limit=100)
+
+    assert len(df) == UNPAGED_ROWS
+    assert len(feed.requests) == 1
+    assert 'page' not in feed.requests[0][0]
+
+
+def test_stops_when_server_ignores_paging(feed):
+    feed.unpaged = True
+
+    chunks, stats = fetch_api_frames(url(feed), page_size=100, rate_limit=100)
+
+    # Page 2 repeats page 1, so it is dropped and the walk ends
+    assert stats['requests'] == 2
+    assert sum(len(chunk) for chunk in chunks) == UNPAGED_ROWS
+
+
+def test_not_modified_without_cache_is_an_error(feed):
+    feed.not_modified = True
+
+    with pytest.raises(ApiExtractionError, match='304'):
+        fetch_api_frames(url(feed), page_size=PAGE_SIZE, rate_limit=100)
@@ -0,0 +1,116 @@
+"""
+Unit tests for the benchmark dataset generator and harness.
+
+Tests cover:
+- Controlled duplicate / null rates and determinism of generated data
+- End-to-end benchmark record against SQLite
+- Regression detection over the JSON history
+"""
+
+import sys
+import os
+
+import pandas as pd
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from benchmarks.datagen import generate_dataset
+from benchmarks.harness import append_history, find_regressions, load_history, run_benchmark
+
+KEYS = ['Market Name', 'Product Name', 'Date Recorded']
+
+
+def read_all(info):
+    return pd.concat([pd.read_csv(p) for p in info['paths']], ignore_index=True)
+
+
+class TestDatasetGenerator:
+
+    def test_rates_are_controlled(self, tmp_path):
+        info = generate_dataset(str(tmp_path), rows=20_000, files=2, markets=20, duplicate_rate=0.1,
+                                key_duplicate_rate=0.0, null_rate=0.05, chunk_rows=5_000)
+        df = read_all(info)
+
+        assert len(df) == 20_000
+        assert len(info['paths']) == 2
+        assert df.duplicated().mean() == pytest.approx(0.1, abs=0.005)
+        assert df['Price'].isna().mean() == pytest.approx(0.05, abs=0.01)
+        assert df['Date Recorded'].isna().sum() == 0
+
+    def test_key_duplicates_span_files(self, tmp_path):
+        info = generate_dataset(str(tmp_path), rows=10_000, files=2, markets=5, duplicate_rate=0.0,
+                                key_duplicate_rate=0.2, null_rate=0.0)
+        first, second = (pd.read_csv(p) for p in info['paths'])
+
+        assert pd.concat([first, second]).duplicated(KEYS).mean() == pytest.approx(0.2, abs=0.01)
+        assert second.merge(first[KEYS].drop_duplicates(), on=KEYS).shape[0] > 0
+
+    def test_same_seed_same_data(self, tmp_path):
+        a = generate_dataset(str(tmp_path / 'a'), rows=2_000, seed=7)
+        b = generate_dataset(str(tmp_path / 'b'), rows=2_000, seed=7)
+
+        pd.testing.assert_frame_equal(read_all(a), read_all(b))
+
+
+class TestHarness:
+
+    def test_benchmark_record_against_sqlite(self, tmp_path):
+        record = run_benchmark(
+            str(tmp_path / 'data'),
+            {'sqlite': f"sqlite:///{tmp_path / 'bench.db'}"},
+            work_dir=str(tmp_path / 'work'),
+            dataset_params={'rows': 5_000, 'markets': 10},
+            workers=1,
+            cprofile=True,
+            tracemalloc_top=3,
+        )
+
+        phases = record['phases']
+        assert set(phases) == {'generate', 'extract_transform', 'extract', 'transform', 'load_sqlite'}
+        assert phases['extract_transform']['rows'] == 5_000
+        assert phases['load_sqlite']['rows'] == record['output_records']
+        assert phases['load_sqlite']['rows_per_sec'] > 0
+        assert phases['load_sqlite']['peak_rss_mb'] > 0
+        assert len(phases['extract_transform']['tracemalloc_top']) == 3
+        assert phases['extract_transform']['cprofile_top'][0]['cumtime_s'] > 0
+
+    def test_dataset_is_reused(self, tmp_path):
+        args = dict(targets={}, work_dir=str(tmp_path / 'work'), dataset_params={'rows': 1_000})
+        run_benchmark(str(tmp_path / 'data'), **args)
+
+        record = run_benchmark(str(tmp_path / 'data'), **args)
+
+        assert record['phases']['generate']['reused'] is True
+        assert 'rows_per_sec' not in record['phases']['generate']
+
+
+class TestRegressions:
+
+    @staticmethod
+    def record(rate, rows=1_000):
+        return {'dataset': {'rows': rows, 'files': 1, 'markets': 10, 'duplicate_rate': 0.02,
+                            'key_duplicate_rate': 0.05, 'null_rate': 0.01},
+                'phases': {'transform': {'rows_per_sec': rate}}}
+
+    def test_history_round_trip(self, tmp_path):
+        path = str(tmp_path / 'results' / 'history.jsonl')
+        append_history(path, self.record(100.0))
+        append_history(path, self.record(110.0))
+
+        assert [r['phases']['transform']['rows_per_sec'] for r in load_history(path)] == [100.0, 110.0]
+
+    def test_slowdown_is_flagged(self):
+        history = [self.record(r) for r in (100.0, 105.0, 95.0)]
+
+        regressions = find_regressions(self.record(70.0), history, threshold=0.2)
+
+        assert [r['phase'] for r in regressions] == ['transform']
+        assert regressions[0]['baseline_rows_per_sec'] == 100.0
+
+    def test_within_threshold_or_other_shape_is_not_flagged(self):
+        history = [self.record(100.0)]
+
+        assert find_regressions(self.record(90.0), history, threshold=0.2) == []
+        assert find_regressions(self.record(10.0, rows=5_000), history) == []
@@ -2,9 +2,13 @@
 Unit tests for extract module
 """
 
+import os
+import shutil
+import tempfile
 import unittest
 import pandas as pd
-from etl.extract import extract_from_csv, extract_data
+from etl.extract import extract_from_csv, extract_data, extract_changed_files, extract_affected_files
+from etl.manifest import FileManifest
 
 class TestExtract(unittest.TestCase):
     """Test cases for data extraction"""
@@ -24,5 +28,113 @@ class TestExtract(unittest.TestCase):
         result = extract_from_csv('dummy.csv')
         self.assertIsInstance(result, pd.DataFrame)
 
+
+class TestIncrementalExtract(unittest.TestCase):
+    """Test manifest-driven extraction of new/changed files"""
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.raw_dir = os.path.join(self.tmp, 'raw')
+        os.makedirs(self.raw_dir)
+        self.manifest_path = os.path.join(self.tmp, 'manifest.json')
+        for name, price in [('day1.csv', 50.0), ('day2.csv', 60.0)]:
+            self._write(name, price)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def _write(self, name, price, quantity=100, date='2024-01-15'):
+        path = os.path.join(self.raw_dir, name)
+        pd.DataFrame({'Market Name': ['Nairobi'], 'Product Name': ['Maize'],
+                      'Price': [price], 'Quantity': [quantity],
+                      'Date Recorded': [date]}).to_csv(path, index=False)
+        return path
+
+    def _run(self, max_workers=1, load=True, extract=extract_changed_files):
+        manifest = FileManifest(self.manifest_path)
+        extracted = dict(extract(manifest, csv_dirs=[self.raw_dir], max_workers=max_workers))
+        if load:
+            manifest.mark_loaded(list(extracted))
+            manifest.save()
+        return extracted
+
+    def test_loaded_files_are_skipped_on_rerun(self):
+        first = self._run()
+        second = self._run()
+
+        self.assertEqual(len(first), 2)
+        self.assertEqual(second, {})
+        entry = FileManifest(self.manifest_path).get(os.path.join(self.raw_dir, 'day1.csv'))
+        self.assertEqual(entry['rows'], 1)
+        self.assertEqual(entry['status'], 'loaded')
+
+    def test_only_new_file_is_read(self):
+        self._run()
+        new_file = self._write('day3.csv', 70.0)
+
+        extracted = self._run()
+
+        self.assertEqual(list(extracted), [new_file])
+
+    def test_changed_content_is_reread_and_touched_file_is_not(self):
+        self._run()
+        touched = os.path.join(self.raw_dir, 'day1.csv')
+        os.utime(touched, (0, 0))
+        changed = self._write('day2.csv', 65.0)
+
+        extracted = self._run()
+
+        self.assertEqual(list(extracted), [changed])
+        self.assertEqual(extracted[changed]['Price'].iloc[0], 65.0)
+
+    def test_files_not_loaded_are_reread(self):
+        self._run(load=False)
+        self.assertEqual(len(self._run()), 2)
+
+    def test_dates_are_recorded(self):
+        self._run()
+        entry = FileManifest(self.manifest_path).get(os.path.join(self.raw_dir, 'day1.csv'))
+        self.assertEqual(entry['dates'], ['2024-01-15'])
+
+    def test_files_sharing_a_date_are_reread(self):
+        """A changed key is rebuilt from every file that holds it"""
+        from etl.transform import transform_data_in_chunks
+
+        self._run()
+        changed = self._write('day2.csv', 60.0, quantity=40)
+        other_day = self._write('day3.csv', 70.0, date='2024-02-01')
+        self._run()
+        self._write('day2.csv', 60.0, quantity=30)
+
+        extracted = self._run(extract=extract_affected_files)
+
+        self.assertEqual(sorted(extracted), sorted([changed, os.path.join(self.raw_dir, 'day1.csv')]))
+        self.assertNotIn(other_day, extracted)
+        totals = transform_data_in_chunks(iter(extracted.values()))
+        self.assertEqual(totals['quantity'].tolist(), [130])
+
+    def test_new_date_rereads_nothing_else(self):
+        self._run()
+        new_file = self._write('day3.csv', 70.0, date='2024-02-01')
+
+        self.assertEqual(list(self._run(extract=extract_affected_files)), [new_file])
+
+    def test_entries_without_dates_are_reread(self):
+        self._run()
+        manifest = FileManifest(self.manifest_path)
+        for entry in manifest.entries.values():
+            del entry['dates']
+        manifest.save()
+        self._write('day3.csv', 70.0, date='2024-02-01')
+
+        self.assertEqual(len(self._run(extract=extract_affected_files)), 3)
+        self.assertEqual(list(self._run(extract=extract_affected_files)), [])
+        self.assertTrue(all(e['dates'] for e in FileManifest(self.manifest_path).entries.values()))
+
+    def test_process_pool_reads_all_files(self):
+        extracted = self._run(max_workers=2)
+        self.assertEqual(sorted(os.path.basename(p) for p in extracted), ['day1.csv', 'day2.csv'])
+
+
 if __name__ == '__main__':
     unittest.main()
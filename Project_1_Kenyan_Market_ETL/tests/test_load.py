@@ -3,9 +3,11 @@ Unit tests for data loading logic.
 
 Tests cover:
 - DataFrame preparation (dedup, type coercion)
-- Truncate functionality
+- Truncate functionality (implies a full refresh) and the appended CSV backup
 - Batch processing configuration
 - Error handling for edge cases
+- Cached schema bootstrap and deferred index creation
+- COPY-based bulk upsert (mocked, plus a live run when TEST_POSTGRES_URL is set)
 """
 
 import sys
@@ -18,11 +20,17 @@ import pytest
 # Add project root to path
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
+import etl.load as load_module
 from etl.load import (
-    load_to_database,
-    create_table_if_not_exists,
+    COPY_COLUMNS,
+    _CsvCopyReader,
+    _ensure_indexes_and_constraints,
     _prepare_dataframe,
-    _ensure_indexes_and_constraints
+    copy_upsert,
+    create_table_if_not_exists,
+    load_to_csv,
+    load_to_database,
+    reset_schema_cache,
 )
 from run_pipeline import truncate_table
 
@@ -119,6 +127,49 @@ class TestTruncateTable:
         # Should have used context manager
         mock_engine.begin.assert_called()
 
+    @patch('run_pipeline.extract_affected_files', return_value=[])
+    @patch('run_pipeline.FileManifest')
+    def test_truncate_implies_full_refresh(self, mock_manifest, mock_extract):
+        """A clean load rereads every file, so unchanged history is not lost"""
+        import argparse
+        from run_pipeline import main
+
+        main(argparse.Namespace(truncate=True, full_refresh=False))
+
+        mock_manifest.return_value.reset.assert_called_once()
+
+
+class TestCsvBackup:
+    """Test the CSV backup written alongside the database load"""
+
+    def test_append_keeps_earlier_rows(self, tmp_path):
+        """Incremental runs extend the backup; the existing column order is kept"""
+        path = str(tmp_path / 'loaded.csv')
+        load_to_csv(pd.DataFrame({'a': [1], 'b': [2]}), path)
+        load_to_csv(pd.DataFrame({'b': [4], 'a': [3]}), path, append=True)
+
+        assert pd.read_csv(path).to_dict('list') == {'a': [1, 3], 'b': [2, 4]}
+
+    def test_append_replaces_rows_with_the_same_key(self, tmp_path):
+        """A retried or re-aggregated load does not duplicate a key"""
+        path = str(tmp_path / 'loaded.csv')
+        row = {'market_name': 'Nairobi', 'product_name': 'Maize', 'date_recorded': '2024-01-15'}
+        load_to_csv(pd.DataFrame([dict(row, quantity=100)]), path)
+        load_to_csv(pd.DataFrame([dict(row, quantity=130), dict(row, product_name='Rice', quantity=5)]), path,
+                    append=True)
+        load_to_csv(pd.DataFrame([dict(row, quantity=130)]), path, append=True)
+
+        backup = pd.read_csv(path)
+        assert sorted(zip(backup['product_name'], backup['quantity'])) == [('Maize', 130), ('Rice', 5)]
+
+    def test_overwrite_by_default(self, tmp_path):
+        """Without append the backup holds only the latest rows"""
+        path = str(tmp_path / 'loaded.csv')
+        load_to_csv(pd.DataFrame({'a': [1]}), path)
+        load_to_csv(pd.DataFrame({'a': [2]}), path)
+
+        assert pd.read_csv(path)['a'].tolist() == [2]
+
 
 class TestIdempotentUpsertContract:
     """Test idempotent upsert behavior contracts"""
@@ -307,5 +358,197 @@ class TestTempTableStrategy:
         create_table_if_not_exists(mock_engine, 'market_data')
 
 
+class TestSchemaBootstrap:
+    """Schema-version registry and process-level DDL cache (SQLite)"""
+
+    @pytest.fixture
+    def engine(self, tmp_path):
+        from sqlalchemy import create_engine, event
+
+        engine = create_engine(f"sqlite:///{tmp_path / 'market.db'}")
+        engine.statements = []
+        event.listen(engine, 'before_cursor_execute',
+                     lambda conn, cursor, statement, *args: engine.statements.append(statement))
+        reset_schema_cache()
+        yield engine
+        reset_schema_cache()
+        engine.dispose()
+
+    def test_ddl_runs_once_per_process(self, engine):
+        create_table_if_not_exists(engine, 'market_data')
+        assert engine.statements
+
+        engine.statements.clear()
+        create_table_if_not_exists(engine, 'market_data')
+
+        assert engine.statements == []
+
+    def test_new_process_only_checks_version(self, engine):
+        create_table_if_not_exists(engine, 'market_data')
+        reset_schema_cache()
+        engine.statements.clear()
+
+        create_table_if_not_exists(engine, 'market_data')
+
+        # Version table, version row, and a check that market_data still exists
+        assert len(engine.statements) == 3
+        assert 'SELECT version FROM etl_schema_version' in engine.statements[1]
+
+    def test_dropped_table_is_recreated_despite_version_row(self, engine):
+        from sqlalchemy import inspect, text
+
+        create_table_if_not_exists(engine, 'market_data')
+        with engine.begin() as conn:
+            conn.execute(text("DROP TABLE market_data"))
+        reset_schema_cache()
+
+        create_table_if_not_exists(engine, 'market_data')
+
+        assert inspect(engine).has_table('market_data')
+
+    def test_version_bump_reapplies_ddl(self, engine, monkeypatch):
+        create_table_if_not_exists(engine, 'market_data')
+        reset_schema_cache()
+        monkeypatch.setattr(load_module, 'SCHEMA_VERSION', load_module.SCHEMA_VERSION + 1)
+
+        create_table_if_not_exists(engine, 'market_data')
+
+        from sqlalchemy import text
+        with engine.connect() as conn:
+            version = conn.execute(text("SELECT version FROM etl_schema_version")).scalar()
+        assert version == load_module.SCHEMA_VERSION
+
+    def test_indexes_built_after_load(self, engine):
+        from sqlalchemy import inspect
+
+        df = pd.DataFrame({
+            'market_name': ['Nairobi'], 'product_name': ['Maize'], 'price': [50.0],
+            'quantity': [100], 'date_recorded': ['2024-01-15'],
+        })
+        load_to_database(df, engine, 'market_data')
+
+        index_names = {ix['name'] for ix in inspect(engine).get_indexes('market_data')}
+        assert {'idx_market_unique', 'idx_market_market', 'idx_market_product', 'idx_market_date'} <= index_names
+
+        engine.statements.clear()
+        load_to_database(df.assign(date_recorded='2024-01-16'), engine, 'market_data')
+        assert not any('CREATE' in statement for statement in engine.statements)
+
+
+class TestCopyUpsert:
+    """COPY FROM STDIN staging + single ON CONFLICT merge"""
+
+    @pytest.fixture
+    def prepared_df(self):
+        return _prepare_dataframe(
+            pd.DataFrame(
+                {
+                    'market_name': ['Nairobi', 'Mombasa', 'Kisumu'],
+                    'product_name': ['Maize', 'Rice', 'Beans'],
+                    'price': [50.5, 120.0, 80.0],
+                    'quantity': [100, 200, 50],
+                    'date_recorded': ['2024-01-15', '2024-01-15', '2024-01-16'],
+                    'source_file': ['a.csv', None, 'a.csv'],
+                }
+            )
+        )
+
+    def test_reader_streams_csv_across_batches(self, prepared_df):
+        reader = _CsvCopyReader(prepared_df, COPY_COLUMNS, batch_size=1)
+
+        pieces = []
+        while True:
+            piece = reader.read(7)
+            if not piece:
+                break
+            assert len(piece) <= 7
+            pieces.append(piece)
+
+        lines = b''.join(pieces).decode().splitlines()
+        assert lines[0] == 'Nairobi,Maize,50.5,100,2024-01-15,a.csv'
+        assert lines[1] == 'Mombasa,Rice,120.0,200,2024-01-15,'
+        assert len(lines) == 3
+        assert reader.bytes_sent == len(b''.join(pieces))
+
+    def test_copy_upsert_uses_one_transaction(self, prepared_df):
+        engine = MagicMock()
+        conn = engine.begin.return_value.__enter__.return_value
+        cursor = conn.connection.cursor.return_value
+        conn.execute.return_value.rowcount = 3
+        copied = []
+        cursor.copy_expert.side_effect = lambda sql, f, size: copied.append((sql, f.read()))
+
+        stats = copy_upsert(prepared_df, engine, 'market_data', prepared=True)
+
+        engine.begin.assert_called_once()
+        statements = [str(c.args[0]) for c in conn.execute.call_args_list]
+        assert 'CREATE TEMP TABLE' in statements[0] and 'ON COMMIT DROP' in statements[0]
+        assert 'ON CONFLICT (market_name, product_name, date_recorded)' in statements[1]
+        assert copied[0][0].startswith('COPY tmp_market_data_copy')
+        assert copied[0][1].count(b'\n') == 3
+        assert stats['rows'] == 3
+        assert stats['rows_merged'] == 3
+        assert set(stats['timings']) == {'prepare_s', 'create_staging_s', 'copy_s', 'merge_s', 'total_s'}
+
+    def test_empty_frame_skips_the_transaction(self, prepared_df):
+        engine = MagicMock()
+
+        stats = copy_upsert(prepared_df.iloc[0:0], engine, 'market_data', prepared=True)
+
+        engine.begin.assert_not_called()
+        assert (stats['rows'], stats['rows_merged'], stats['partitions']) == (0, 0, 0)
+
+    def test_rows_without_a_date_are_rejected(self, prepared_df):
+        engine = MagicMock()
+        prepared_df.loc[1, 'date_recorded'] = None
+
+        with pytest.raises(ValueError, match='1 rows have no date_recorded'):
+            copy_upsert(prepared_df, engine, 'market_data', prepared=True)
+        engine.begin.assert_not_called()
+
+    def test_unknown_load_method_rejected(self, prepared_df):
+        with pytest.raises(ValueError):
+            load_to_database(prepared_df, MagicMock(), method='bulk')
+
+
+@pytest.mark.skipif(not os.getenv('TEST_POSTGRES_URL'), reason='TEST_POSTGRES_URL not set')
+class TestCopyUpsertPostgres:
+    """Live COPY upsert against a local Postgres"""
+
+    def test_copy_upsert_is_idempotent(self):
+        from sqlalchemy import create_engine, inspect, text
+
+        engine = create_engine(os.environ['TEST_POSTGRES_URL'])
+        table = 'market_data_copy_test'
+        df = pd.DataFrame(
+            {
+                'market_name': ['Nairobi', 'Mombasa'],
+                'product_name': ['Maize', 'Rice'],
+                'price': [50.0, 120.0],
+                'quantity': [100, 200],
+                'date_recorded': ['2024-01-15', '2024-01-15'],
+            }
+        )
+        try:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {table} CASCADE"))
+                if inspect(conn).has_table('etl_schema_version'):
+                    conn.execute(text("DELETE FROM etl_schema_version WHERE table_name = :t"), {'t': table})
+            reset_schema_cache()
+            assert load_to_database(df, engine, table) == 2
+
+            df.loc[0, 'price'] = 55.0
+            assert load_to_database(df, engine, table) == 2
+
+            with engine.connect() as conn:
+                rows = conn.execute(text(f"SELECT market_name, price FROM {table} ORDER BY market_name")).fetchall()
+            assert [(r[0], float(r[1])) for r in rows] == [('Mombasa', 120.0), ('Nairobi', 55.0)]
+        finally:
+            with engine.begin() as conn:
+                conn.execute(text(f"DROP TABLE IF EXISTS {table} CASCADE"))
+            reset_schema_cache()
+            engine.dispose()
+
+
 if __name__ == '__main__':
     pytest.main([__file__, '-v'])
@@ -0,0 +1,138 @@
+"""
+Unit tests for the incremental Power BI Parquet export (SQLite-backed).
+
+Tests cover:
+- First export writes one Parquet file per month plus manifest and watermark
+- Re-runs without new rows touch nothing
+- New rows rewrite only their month, without duplicates
+- Dictionary-encoded name columns
+- Months left without rows are removed; created_at is indexed
+"""
+
+import sys
+import os
+import json
+from datetime import timedelta
+
+import pandas as pd
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+from sqlalchemy import create_engine, inspect, text
+
+from etl.load import load_to_database, reset_schema_cache
+from etl.powerbi_export import MANIFEST_FILE, export_incremental, read_watermark
+
+NO_OVERLAP = timedelta(0)
+
+
+def market_rows(dates, market='Nairobi'):
+    return pd.DataFrame({
+        'market_name': [market] * len(dates),
+        'product_name': [f'Product {i}' for i in range(len(dates))],
+        'price': [50.0 + i for i in range(len(dates))],
+        'quantity': [10 * (i + 1) for i in range(len(dates))],
+        'date_recorded': dates,
+    })
+
+
+@pytest.fixture
+def engine(tmp_path):
+    reset_schema_cache()
+    engine = create_engine(f"sqlite:///{tmp_path / 'market.db'}")
+    load_to_database(market_rows(['2024-01-05', '2024-01-20', '2024-02-03', '2024-03-09']), engine)
+    yield engine
+    reset_schema_cache()
+    engine.dispose()
+
+
+def read_manifest(out):
+    with open(out / MANIFEST_FILE) as f:
+        return json.load(f)
+
+
+def test_first_export_writes_month_files(engine, tmp_path):
+    out = tmp_path / 'powerbi'
+
+    result = export_incremental(engine, str(out), overlap=NO_OVERLAP)
+
+    assert result['months'] == ['2024-01', '2024-02', '2024-03']
+    manifest = read_manifest(out)
+    assert manifest['files']['2024-01']['rows'] == 2
+    assert manifest['total_rows'] == 4
+    assert os.path.exists(out / 'date_month=2024-02' / 'market_data.parquet')
+    assert read_watermark(str(out)) is not None
+
+
+def test_rerun_without_new_rows_touches_nothing(engine, tmp_path):
+    out = tmp_path / 'powerbi'
+    export_incremental(engine, str(out), overlap=NO_OVERLAP)
+    before = read_manifest(out)['files']
+
+    result = export_incremental(engine, str(out), overlap=NO_OVERLAP)
+
+    assert result['months'] == []
+    assert read_manifest(out)['files'] == before
+
+
+def test_new_rows_rewrite_only_their_month(engine, tmp_path):
+    out = tmp_path / 'powerbi'
+    export_incremental(engine, str(out), overlap=NO_OVERLAP)
+    january = read_manifest(out)['files']['2024-01']
+
+    load_to_database(market_rows(['2024-03-10', '2024-03-11'], market='Kisumu'), engine)
+    result = export_incremental(engine, str(out), overlap=NO_OVERLAP)
+
+    assert result['months'] == ['2024-03']
+    manifest = read_manifest(out)
+    assert manifest['files']['2024-01'] == january
+    assert manifest['files']['2024-03']['rows'] == 3
+    exported = pd.read_parquet(out)
+    assert len(exported) == 6
+    assert not exported.duplicated(['market_name', 'product_name', 'date_recorded']).any()
+
+
+def test_name_columns_are_dictionary_encoded(engine, tmp_path):
+    out = tmp_path / 'powerbi'
+    export_incremental(engine, str(out), overlap=NO_OVERLAP)
+
+    schema = pq.read_schema(out / 'date_month=2024-01' / 'market_data.parquet')
+
+    assert str(schema.field('market_name').type).startswith('dictionary')
+    assert str(schema.field('product_name').type).startswith('dictionary')
+    assert str(schema.field('date_recorded').type) == 'date32[day]'
+
+
+def test_full_export_ignores_watermark(engine, tmp_path):
+    out = tmp_path / 'powerbi'
+    export_incremental(engine, str(out), overlap=NO_OVERLAP)
+
+    result = export_incremental(engine, str(out), overlap=NO_OVERLAP, full=True)
+
+    assert result['months'] == ['2024-01', '2024-02', '2024-03']
+
+
+def test_emptied_month_is_removed(engine, tmp_path):
+    out = tmp_path / 'powerbi'
+    export_incremental(engine, str(out), overlap=NO_OVERLAP)
+
+    # As if the February partition had been dropped
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM market_data WHERE date_recorded >= '2024-02-01' "
+                          "AND date_recorded < '2024-03-01'"))
+    result = export_incremental(engine, str(out), overlap=NO_OVERLAP)
+
+    assert result['months'] == []
+    assert result['removed'] == ['2024-02']
+    assert sorted(read_manifest(out)['files']) == ['2024-01', '2024-03']
+    assert not os.path.exists(out / 'date_month=2024-02' / 'market_data.parquet')
+
+
+def test_created_at_is_indexed(engine):
+    indexes = {index['name']: index['column_names'] for index in inspect(engine).get_indexes('market_data')}
+
+    assert indexes['idx_market_created_at'] == ['created_at']
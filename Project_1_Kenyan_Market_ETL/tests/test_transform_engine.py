@@ -0,0 +1,208 @@
+"""
+Unit tests for the planned transform engine.
+
+Tests cover:
+- Equivalence with the step-by-step standardize -> clean -> derive path
+- Incremental quality metrics
+- Chunked transform with cross-chunk dedup-aggregation
+- Median/mode fills computed over the whole stream
+"""
+
+import sys
+import os
+import pandas as pd
+import numpy as np
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from etl.transform import clean_data, standardize_columns
+from etl.transform_engine import ChunkedMarketTransformer, plan_transform, transform_chunks
+
+SAMPLE_CSV = os.path.join(os.path.dirname(__file__), '..', 'data', 'sample_market_data.csv')
+KEYS = ['market_name', 'product_name', 'date_recorded']
+
+
+def stepwise_transform(raw):
+    """Reference: the original multi-pass transform path"""
+    df = clean_data(standardize_columns(raw.copy()))
+    df['market_product'] = df['market_name'].astype(str) + '_' + df['product_name'].astype(str)
+    df['total_value'] = df['price'] * df['quantity']
+    return df
+
+
+def assert_same_rows(actual, expected):
+    """Compare two transformed frames ignoring row order and categorical dtypes"""
+    cols = [c for c in expected.columns]
+    left = actual[cols].astype({c: object for c in cols if isinstance(actual[c].dtype, pd.CategoricalDtype)})
+    left = left.sort_values(KEYS).reset_index(drop=True)
+    right = expected[cols].sort_values(KEYS).reset_index(drop=True)
+    pd.testing.assert_frame_equal(left, right, check_dtype=False, check_exact=False, rtol=1e-9)
+
+
+@pytest.fixture
+def messy_data():
+    """Raw data with exact duplicates, key duplicates and missing values"""
+    return pd.DataFrame({
+        'Market Name': ['Nairobi', 'Nairobi', 'Nairobi', 'Mombasa', 'Mombasa', None, 'Kisumu', 'Kisumu'],
+        'Product Name': ['Maize', 'Maize', 'Maize', 'Rice', 'Rice', 'Beans', 'Beans', 'Tea'],
+        'Price': [50.0, 60.0, 50.0, 120.0, np.nan, 80.0, 70.0, 300.0],
+        'Quantity': [100, 150, 100, 200, 250, 50, np.nan, 10],
+        'Date Recorded': ['2024-01-15', '2024-01-15', '2024-01-15', '2024-01-15',
+                          '2024-01-15', '2024-01-16', '2024-01-16', '2024-01-17'],
+    })
+
+
+class TestPlanTransform:
+    """Batch path of the planned engine"""
+
+    def test_matches_stepwise_path(self, messy_data):
+        planned, _ = plan_transform(messy_data)
+        assert_same_rows(planned, stepwise_transform(messy_data))
+
+    def test_matches_stepwise_path_on_sample_file(self):
+        raw = pd.read_csv(SAMPLE_CSV)
+        planned, _ = plan_transform(raw)
+        assert_same_rows(planned, stepwise_transform(raw))
+
+    def test_does_not_modify_input(self, messy_data):
+        before = messy_data.copy()
+        plan_transform(messy_data)
+        pd.testing.assert_frame_equal(messy_data, before)
+
+    def test_names_are_categorical(self, messy_data):
+        planned, _ = plan_transform(messy_data)
+        assert isinstance(planned['market_name'].dtype, pd.CategoricalDtype)
+        assert isinstance(planned['market_product'].dtype, pd.CategoricalDtype)
+        assert 'Nairobi_Maize' in set(planned['market_product'])
+
+    def test_quality_metrics(self, messy_data):
+        planned, metrics = plan_transform(messy_data)
+
+        assert metrics['input_records'] == 8
+        assert metrics['exact_duplicates_removed'] == 1
+        assert metrics['missing_values_filled'] == 3
+        assert metrics['total_records'] == len(planned)
+        assert metrics['total_columns'] == len(planned.columns)
+        assert metrics['missing_values'] == 0
+        assert metrics['duplicate_records'] == 0
+        assert metrics['memory_usage_mb'] > 0
+
+    def test_no_key_duplicates_keeps_rows(self):
+        raw = pd.DataFrame({
+            'market_name': ['Nairobi', 'Mombasa'],
+            'product_name': ['Maize', 'Rice'],
+            'price': [50.0, 120.0],
+            'quantity': [100, 200],
+            'date_recorded': ['2024-01-15', '2024-01-15'],
+            'grade': ['A', 'B'],
+        })
+        planned, metrics = plan_transform(raw)
+
+        assert len(planned) == 2
+        assert 'grade' in planned.columns
+        assert metrics['key_duplicates_aggregated'] == 0
+
+
+class TestChunkedTransform:
+    """Chunked path with cross-chunk dedup-aggregation"""
+
+    def test_chunked_matches_batch_when_duplicates_span_chunks(self, messy_data):
+        chunks = [messy_data.iloc[i:i + 3] for i in range(0, len(messy_data), 3)]
+
+        chunked, _ = transform_chunks(chunks)
+
+        assert_same_rows(chunked, stepwise_transform(messy_data))
+
+    def test_chunked_matches_batch_on_sample_file(self):
+        raw = pd.read_csv(SAMPLE_CSV)
+        chunked, metrics = transform_chunks(pd.read_csv(SAMPLE_CSV, chunksize=64))
+
+        assert metrics['chunks'] == 8
+        assert_same_rows(chunked, stepwise_transform(raw))
+
+    def test_missing_date_kept_without_key_duplicates(self):
+        raw = pd.DataFrame({
+            'Market Name': ['Nairobi', 'Mombasa', 'Kisumu'],
+            'Product Name': ['Maize', 'Rice', 'Beans'],
+            'Price': [50.0, 120.0, 80.0],
+            'Quantity': [100, 200, 50],
+            'Date Recorded': ['2024-01-15', None, '2024-01-16'],
+        })
+
+        chunked, _ = transform_chunks([raw.iloc[:2], raw.iloc[2:]])
+        batch, _ = plan_transform(raw)
+
+        assert len(chunked) == len(batch) == len(stepwise_transform(raw)) == 3
+        assert chunked['date_recorded'].isna().sum() == 1
+
+    def test_missing_date_dropped_with_key_duplicates(self):
+        raw = pd.DataFrame({
+            'Market Name': ['Nairobi', 'Nairobi', 'Kisumu'],
+            'Product Name': ['Maize', 'Maize', 'Beans'],
+            'Price': [50.0, 60.0, 80.0],
+            'Quantity': [100, 150, 50],
+            'Date Recorded': ['2024-01-15', '2024-01-15', None],
+        })
+
+        chunked, _ = transform_chunks([raw.iloc[:2], raw.iloc[2:]])
+
+        assert_same_rows(chunked, stepwise_transform(raw))
+        assert len(chunked) == len(plan_transform(raw)[0]) == 1
+
+    def test_exact_duplicates_across_chunks_counted_once(self):
+        row = {'market_name': 'Nairobi', 'product_name': 'Maize', 'price': 50.0,
+               'quantity': 100, 'date_recorded': '2024-01-15'}
+        transformer = ChunkedMarketTransformer()
+        transformer.add_chunk(pd.DataFrame([row]))
+        transformer.add_chunk(pd.DataFrame([row, dict(row, price=70.0)]))
+
+        result, metrics = transformer.finalize()
+
+        assert metrics['exact_duplicates_removed'] == 1
+        assert len(result) == 1
+        assert result.iloc[0]['price'] == pytest.approx(60.0)
+        assert result.iloc[0]['quantity'] == 200
+
+    def test_row_hashes_kept_in_logarithmic_runs(self):
+        rows = pd.DataFrame({'market_name': 'Nairobi', 'product_name': [f'P{i}' for i in range(640)],
+                             'price': 50.0, 'quantity': 100, 'date_recorded': '2024-01-15'})
+        transformer = ChunkedMarketTransformer()
+        for start in range(0, len(rows), 10):
+            transformer.add_chunk(rows.iloc[start:start + 10])
+        # Rows of the first chunk repeated after 64 chunks are still found
+        transformer.add_chunk(rows.iloc[:10])
+
+        _, metrics = transformer.finalize()
+
+        seen = transformer._seen_hashes
+        assert len(seen) == 640
+        assert len(seen.runs) <= 7
+        assert all((run[1:] >= run[:-1]).all() for run in seen.runs)
+        assert metrics['exact_duplicates_removed'] == 10
+
+    def test_source_file_keeps_first_occurrence(self):
+        chunks = [
+            pd.DataFrame({'market_name': ['Nairobi'], 'product_name': ['Maize'], 'price': [50.0],
+                          'quantity': [100], 'date_recorded': ['2024-01-15'], 'source_file': ['day1.csv']}),
+            pd.DataFrame({'market_name': ['Nairobi'], 'product_name': ['Maize'], 'price': [60.0],
+                          'quantity': [10], 'date_recorded': ['2024-01-15'], 'source_file': ['day2.csv']}),
+        ]
+        result, _ = transform_chunks(chunks)
+
+        assert result.iloc[0]['source_file'] == 'day1.csv'
+
+    def test_missing_required_column_rejected(self):
+        transformer = ChunkedMarketTransformer()
+        with pytest.raises(ValueError):
+            transformer.add_chunk(pd.DataFrame({'market_name': ['Nairobi']}))
+
+    def test_empty_stream(self):
+        result, metrics = transform_chunks([])
+        assert result.empty
+        assert metrics['input_records'] == 0
+
+
+if __name__ == '__main__':
+    pytest.main([__file__, '-v'])
@@ -0,0 +1,292 @@
+"""
+Intermediate Artifact Store
+
+Keeps the data passed between DAG tasks out of XCom:
+- Tasks write their output as Parquet (Arrow record batches) under
+  <root>/<run_id>/<name>.parquet
+- XCom carries only a small manifest: path, schema, row count, byte size and
+  SHA-256 checksum of the file
+- Readers verify the checksum before using an artifact
+- Old runs are garbage-collected by age, keeping the most recent ones
+
+The root can be a local directory or any URI pyarrow.fs understands
+(s3://bucket/prefix, gs://..., file:///...), so workers on different hosts can
+share artifacts through object storage.
+"""
+
+import hashlib
+import logging
+import os
+import re
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.fs as pafs
+import pyarrow.parquet as pq
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ARTIFACT_ROOT = os.environ.get(
+    'MPESA_ARTIFACT_ROOT',
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'data', 'artifacts'),
+)
+MANIFEST_VERSION = 1
+READ_BLOCK_SIZE = 1024 * 1024
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+class ArtifactChecksumError(ValueError):
+    """Raised when an artifact on storage does not match its manifest"""
+
+
+class _HashingStream:
+    """File-like wrapper that hashes and counts bytes on their way to storage"""
+
+    def __init__(self, raw):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.closed = False
+
+    def write(self, data):
+        self.sha256.update(data)
+        self.size += len(data)
+        return self.raw.write(data)
+
+    def tell(self):
+        return self.size
+
+    def flush(self):
+        pass
+
+    def close(self):
+        if not self.closed:
+            self.raw.close()
+            self.closed = True
+
+
+def safe_run_id(run_id):
+    """Airflow run ids contain ':' and '+'; keep them usable as a path segment"""
+    return re.sub(r'[^A-Za-z0-9_.-]', '_', str(run_id))
+
+
+def _to_table(frame, schema=None):
+    if isinstance(frame, pa.RecordBatch):
+        frame = pa.Table.from_batches([frame])
+    if isinstance(frame, pa.Table):
+        return frame if schema is None else frame.cast(schema)
+    if isinstance(frame, list):
+        frame = pd.DataFrame(frame)
+    return pa.Table.from_pandas(frame, schema=schema, preserve_index=False)
+
+
+class ArtifactWriter:
+    """Writes one artifact batch by batch; the file appears only on close()"""
+
+    def __init__(self, store, run_id, name, schema=None):
+        run_dir = store.run_dir(run_id)
+        store.fs.create_dir(run_dir, recursive=True)
+        self.store = store
+        self.run_id = run_id
+        self.name = name
+        self.schema = schema
+        self.path = f"{run_dir}/{name}.parquet"
+        self.tmp_path = f"{self.path}.tmp"
+        self.rows = 0
+        self._writer = None
+        self._stream = _HashingStream(store.fs.open_output_stream(self.tmp_path))
+
+    def write(self, batch):
+        table = _to_table(batch, self.schema)
+        if self._writer is None:
+            self.schema = table.schema.remove_metadata()
+            self._writer = pq.ParquetWriter(self._stream, self.schema, compression=self.store.compression)
+        self._writer.write_table(table.cast(self.schema))
+        self.rows += table.num_rows
+
+    def abort(self):
+        """Discard the partially written artifact"""
+        self._stream.close()
+        self.store.fs.delete_file(self.tmp_path)
+
+    def close(self):
+        """Finish the file, move it into place and return its manifest"""
+        try:
+            if self._writer is None:
+                # Nothing to write: keep an empty artifact so downstream tasks see zero rows
+                self.schema = self.schema or pa.schema([])
+                self._writer = pq.ParquetWriter(self._stream, self.schema, compression=self.store.compression)
+            self._writer.close()
+        finally:
+            self._stream.close()
+        self.store.fs.move(self.tmp_path, self.path)
+
+        stream = self._stream
+        manifest = {
+            'version': MANIFEST_VERSION,
+            'uri': self.store._uri(self.path),
+            'path': self.path,
+            'run_id': str(self.run_id),
+            'name': self.name,
+            'rows': self.rows,
+            'bytes': stream.size,
+            'sha256': stream.sha256.hexdigest(),
+            'schema': [{'name': f.name, 'type': str(f.type)} for f in self.schema],
+            'created_at': datetime.now(timezone.utc).isoformat(),
+        }
+        logger.info(f"Wrote artifact {self.name} for {self.run_id}: {self.rows} rows, {stream.size} bytes")
+        return manifest
+
+
+class ArtifactStore:
+    """Write, read and expire per-run Parquet artifacts"""
+
+    def __init__(self, root=None, filesystem=None, compression='zstd'):
+        """
+        Initialize store
+
+        Args:
+            root: Local directory or URI (default: MPESA_ARTIFACT_ROOT or data/artifacts)
+            filesystem: Explicit pyarrow filesystem; ``root`` is then a path on it
+            compression: Parquet codec for written artifacts
+        """
+        root = root or DEFAULT_ARTIFACT_ROOT
+        if filesystem is None:
+            if '://' not in root:
+                root = os.path.abspath(root)
+            filesystem, root = pafs.FileSystem.from_uri(root)
+        self.fs = filesystem
+        self.root = root.rstrip('/')
+        self.compression = compression
+
+    def run_dir(self, run_id):
+        return f"{self.root}/{safe_run_id(run_id)}"
+
+    def write(self, run_id, name, data, schema=None):
+        """
+        Write ``data`` as artifact ``name`` of ``run_id``
+
+        Args:
+            data: DataFrame, Arrow table/batch, list of dicts, or an iterable
+                  of those written batch by batch
+            schema: Optional Arrow schema (default: inferred from the first batch)
+
+        Returns:
+            dict: Manifest to pass through XCom
+        """
+        if isinstance(data, (pd.DataFrame, pa.Table, pa.RecordBatch)) or (
+                isinstance(data, list) and (not data or isinstance(data[0], dict))):
+            batches = [data]
+        else:
+            batches = data
+
+        writer = self.open_writer(run_id, name, schema)
+        try:
+            for batch in batches:
+                writer.write(batch)
+        except BaseException:
+            writer.abort()
+            raise
+        return writer.close()
+
+    def open_writer(self, run_id, name, schema=None):
+        """Incremental writer for artifact ``name``; ``close()`` returns its manifest"""
+        return ArtifactWriter(self, run_id, name, schema)
+
+    def _uri(self, path):
+        if isinstance(self.fs, pafs.LocalFileSystem):
+            return path
+        return f"{self.fs.type_name}://{path}"
+
+    def checksum(self, manifest):
+        """SHA-256 of the artifact as currently stored"""
+        digest = hashlib.sha256()
+        with self.fs.open_input_stream(manifest['path']) as f:
+            while True:
+                block = f.read(READ_BLOCK_SIZE)
+                if not block:
+                    break
+                digest.update(block)
+        return digest.hexdigest()
+
+    def verify(self, manifest):
+        """Raise ArtifactChecksumError unless the stored file matches the manifest"""
+        actual = self.checksum(manifest)
+        if actual != manifest['sha256']:
+            raise ArtifactChecksumError(
+                f"Artifact {manifest['path']} checksum {actual} does not match manifest {manifest['sha256']}"
+            )
+
+    def read_table(self, manifest, columns=None, verify=True):
+        """Load the artifact as an Arrow table"""
+        if verify:
+            self.verify(manifest)
+        table = pq.read_table(manifest['path'], filesystem=self.fs, columns=columns)
+        if table.num_rows != manifest['rows']:
+            raise ArtifactChecksumError(
+                f"Artifact {manifest['path']} has {table.num_rows} rows, manifest says {manifest['rows']}"
+            )
+        return table
+
+    def read(self, manifest, columns=None, verify=True):
+        """Load the artifact as a DataFrame"""
+        return self.read_table(manifest, columns=columns, verify=verify).to_pandas()
+
+    def iter_batches(self, manifest, batch_size=65_536, columns=None, verify=True):
+        """Yield the artifact as DataFrames of at most ``batch_size`` rows"""
+        if verify:
+            self.verify(manifest)
+        with self.fs.open_input_file(manifest['path']) as f:
+            parquet = pq.ParquetFile(f)
+            for batch in parquet.iter_batches(batch_size=batch_size, columns=columns):
+                yield batch.to_pandas()
+
+    def list_runs(self):
+        """{run directory name: last modified (UTC)} for every run in the store"""
+        try:
+            infos = self.fs.get_file_info(pafs.FileSelector(self.root, recursive=True))
+        except FileNotFoundError:
+            return {}
+        prefix = self.root + '/'
+        runs = {}
+        for info in infos:
+            relative = info.path[len(prefix):] if info.path.startswith(prefix) else info.path
+            run = relative.split('/', 1)[0]
+            if info.type != pafs.FileType.File:
+                # Directory mtimes change when files are added; age comes from the files
+                runs.setdefault(run, EPOCH)
+                continue
+            mtime = info.mtime or EPOCH
+            if mtime.tzinfo is None:
+                mtime = mtime.replace(tzinfo=timezone.utc)
+            runs[run] = max(runs.get(run, EPOCH), mtime)
+        return runs
+
+    def delete_run(self, run_id):
+        self.fs.delete_dir(self.run_dir(run_id))
+
+    def gc(self, older_than=timedelta(days=3), keep_last=5, exclude=(), now=None):
+        """
+        Delete runs last written before ``now - older_than``
+
+        The ``keep_last`` most recent runs and any in ``exclude`` are always kept.
+
+        Returns:
+            list: Run directory names that were removed
+        """
+        now = now or datetime.now(timezone.utc)
+        cutoff = now - older_than
+        protected = {safe_run_id(r) for r in exclude}
+        runs = sorted(self.list_runs().items(), key=lambda item: item[1], reverse=True)
+        protected.update(run for run, _ in runs[:keep_last])
+
+        removed = []
+        for run, modified in runs:
+            if run in protected or modified >= cutoff:
+                continue
+            self.fs.delete_dir(f"{self.root}/{run}")
+            removed.append(run)
+        if removed:
+            logger.info(f"Removed {len(removed)} expired artifact runs")
+        return removed
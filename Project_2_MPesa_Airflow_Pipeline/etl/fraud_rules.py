@@ -0,0 +1,426 @@
+"""
+Fraud Rule Engine
+
+Declarative, vectorized fraud scoring for transaction batches. Rules are plain
+dicts (or JSON) of three kinds:
+- threshold: compare a column with a value, e.g. amount > 50000
+- velocity: per-sender count and/or amount sum inside a trailing time window,
+  e.g. more than 10 transactions per sender per hour
+- baseline_ratio: amount above ``ratio`` x the sender's (or global) running mean
+
+All rules run as NumPy operations over one (sender, timestamp) sort of the
+batch: rolling windows are two searchsorted calls against a combined
+sender/time key plus a cumulative sum, so there are no per-row Python loops.
+
+Per-sender state persists between runs in a small directory of Parquet files:
+- recent: the last window of (sender, timestamp, amount) events, so velocity
+  windows span run boundaries; idle senders fall out with the window
+- baseline: running count and amount sum per sender, plus global totals
+Only new rows need scoring. Re-scoring the same run id (an Airflow retry)
+starts from the state saved before that run, so retries do not double count.
+"""
+
+import json
+import logging
+import operator
+import os
+import shutil
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+RISK_LEVELS = ['low', 'medium', 'high']
+
+# Mirrors the DAG's amount tiers and the views in sql/fraud_rules.sql
+DEFAULT_RULES = [
+    {'name': 'high_value', 'type': 'threshold', 'column': 'amount', 'op': '>', 'value': 50000, 'risk': 'high'},
+    {'name': 'elevated_value', 'type': 'threshold', 'column': 'amount', 'op': '>', 'value': 10000,
+     'risk': 'medium'},
+    {'name': 'failed_status', 'type': 'threshold', 'column': 'status', 'op': '==', 'value': 'failed'},
+    {'name': 'sender_velocity', 'type': 'velocity', 'window': '1h', 'max_count': 10, 'max_amount': 100000,
+     'risk': 'high'},
+    {'name': 'large_vs_baseline', 'type': 'baseline_ratio', 'ratio': 5, 'scope': 'global',
+     'when': {'status': 'success'}, 'risk': 'medium'},
+]
+
+OPERATORS = {
+    '>': operator.gt,
+    '>=': operator.ge,
+    '<': operator.lt,
+    '<=': operator.le,
+    '==': operator.eq,
+    '!=': operator.ne,
+    'in': lambda values, options: np.isin(values, list(options)),
+    'not in': lambda values, options: ~np.isin(values, list(options)),
+}
+
+
+class Rule:
+    """Base rule: subclasses return a boolean hit mask in batch order"""
+
+    def __init__(self, name, risk=None, when=None):
+        if risk is not None and risk not in RISK_LEVELS:
+            raise ValueError(f"Rule {name}: unknown risk level {risk!r}")
+        self.name = name
+        self.risk = risk
+        self.when = when or {}
+
+    def applies(self, batch):
+        """Mask of rows the rule is evaluated on (from the ``when`` filter)"""
+        mask = np.ones(batch.n, dtype=bool)
+        for column, expected in self.when.items():
+            values = batch.column(column)
+            if isinstance(expected, (list, tuple, set)):
+                mask &= np.isin(values, list(expected))
+            else:
+                mask &= values == expected
+        return mask
+
+    def evaluate(self, batch):
+        raise NotImplementedError
+
+
+class ThresholdRule(Rule):
+    """``column <op> value``"""
+
+    def __init__(self, name, column, op, value, risk=None, when=None):
+        super().__init__(name, risk, when)
+        if op not in OPERATORS:
+            raise ValueError(f"Rule {name}: unknown operator {op!r}")
+        self.column = column
+        self.op = op
+        self.value = value
+
+    def evaluate(self, batch):
+        values = batch.column(self.column)
+        return np.asarray(OPERATORS[self.op](values, self.value), dtype=bool) & self.applies(batch)
+
+
+class VelocityRule(Rule):
+    """More than ``max_count`` transactions or ``max_amount`` total per sender in ``window``"""
+
+    def __init__(self, name, window, max_count=None, max_amount=None, risk=None, when=None):
+        super().__init__(name, risk, when)
+        if max_count is None and max_amount is None:
+            raise ValueError(f"Rule {name}: velocity rules need max_count or max_amount")
+        self.window = pd.Timedelta(window)
+        self.max_count = max_count
+        self.max_amount = max_amount
+
+    def evaluate(self, batch):
+        count, amount = batch.window_totals(int(self.window.total_seconds()))
+        hit = np.zeros(batch.n, dtype=bool)
+        if self.max_count is not None:
+            hit |= count > self.max_count
+        if self.max_amount is not None:
+            hit |= amount > self.max_amount
+        return hit & batch.has_time & self.applies(batch)
+
+
+class BaselineRatioRule(Rule):
+    """Amount above ``ratio`` x baseline mean
+
+    scope='sender' uses the sender's mean over earlier transactions once it has
+    ``min_history`` of them and the global mean before that; scope='global'
+    always uses the global mean.
+    """
+
+    def __init__(self, name, ratio, scope='sender', min_history=5, risk=None, when=None):
+        super().__init__(name, risk, when)
+        if scope not in ('sender', 'global'):
+            raise ValueError(f"Rule {name}: scope must be 'sender' or 'global'")
+        self.ratio = ratio
+        self.scope = scope
+        self.min_history = min_history
+
+    def evaluate(self, batch):
+        baseline = np.full(batch.n, batch.global_mean)
+        if self.scope == 'sender':
+            prior_count, prior_sum = batch.sender_history()
+            known = prior_count >= self.min_history
+            baseline[known] = prior_sum[known] / prior_count[known]
+        return (batch.amount > self.ratio * baseline) & self.applies(batch)
+
+
+RULE_TYPES = {
+    'threshold': ThresholdRule,
+    'velocity': VelocityRule,
+    'baseline_ratio': BaselineRatioRule,
+}
+
+
+def build_rule(spec):
+    """Rule instance from a declarative dict"""
+    spec = dict(spec)
+    rule_type = spec.pop('type', None)
+    if rule_type not in RULE_TYPES:
+        raise ValueError(f"Unknown rule type {rule_type!r}")
+    return RULE_TYPES[rule_type](**spec)
+
+
+def load_rules(path):
+    """Rule specs from a JSON file holding a list of rule dicts"""
+    with open(path) as f:
+        return [build_rule(spec) for spec in json.load(f)]
+
+
+class FraudState:
+    """Per-sender rolling state carried between scoring runs"""
+
+    def __init__(self, recent=None, baseline=None, global_count=0, global_sum=0.0, run_id=None):
+        self.recent = recent if recent is not None else pd.DataFrame(
+            {'sender': pd.Series(dtype=object), 'ts': pd.Series(dtype='int64'), 'amount': pd.Series(dtype=float)})
+        self.baseline = baseline if baseline is not None else pd.DataFrame(
+            {'count': pd.Series(dtype='int64'), 'total': pd.Series(dtype=float)}, index=pd.Index([], name='sender'))
+        self.global_count = global_count
+        self.global_sum = global_sum
+        self.run_id = run_id
+
+    @classmethod
+    def read(cls, directory):
+        meta_path = os.path.join(directory, 'meta.json')
+        if not os.path.exists(meta_path):
+            return cls()
+        with open(meta_path) as f:
+            meta = json.load(f)
+        recent = pd.read_parquet(os.path.join(directory, 'recent.parquet'))
+        baseline = pd.read_parquet(os.path.join(directory, 'baseline.parquet')).set_index('sender')
+        return cls(recent, baseline, meta['global_count'], meta['global_sum'], meta.get('run_id'))
+
+    @classmethod
+    def load(cls, state_dir, run_id=None):
+        """Latest state, or the one saved before ``run_id`` when that run is being re-scored"""
+        state = cls.read(os.path.join(state_dir, 'current'))
+        if run_id is not None and state.run_id == str(run_id):
+            logger.info(f"Re-scoring run {run_id}: starting from the previous fraud state")
+            state = cls.read(os.path.join(state_dir, 'previous'))
+        return state
+
+    def save(self, state_dir):
+        """Write as the new current state, keeping the prior one for retries"""
+        current = os.path.join(state_dir, 'current')
+        previous = os.path.join(state_dir, 'previous')
+        tmp = os.path.join(state_dir, 'current.tmp')
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        self.recent.to_parquet(os.path.join(tmp, 'recent.parquet'), index=False)
+        self.baseline.reset_index().to_parquet(os.path.join(tmp, 'baseline.parquet'), index=False)
+        with open(os.path.join(tmp, 'meta.json'), 'w') as f:
+            json.dump({
+                'global_count': int(self.global_count),
+                'global_sum': float(self.global_sum),
+                'run_id': self.run_id,
+                'senders': len(self.baseline),
+                'recent_events': len(self.recent),
+                'saved_at': datetime.now(timezone.utc).isoformat(),
+            }, f, indent=2)
+
+        previous_run = FraudState.read(current).run_id if os.path.exists(current) else None
+        if os.path.exists(current) and previous_run != self.run_id:
+            shutil.rmtree(previous, ignore_errors=True)
+            os.replace(current, previous)
+        else:
+            shutil.rmtree(current, ignore_errors=True)
+        os.replace(tmp, current)
+
+
+class _Batch:
+    """Sorted arrays for one batch plus the history it is scored against"""
+
+    def __init__(self, df, state, sender_col, time_col, amount_col):
+        self.df = df
+        self.n = len(df)
+        self.amount = pd.to_numeric(df[amount_col], errors='coerce').to_numpy(dtype=float, na_value=np.nan)
+        senders = df[sender_col].astype(str).to_numpy(dtype=object)
+        ts = pd.to_datetime(df[time_col], errors='coerce')
+        if getattr(ts.dt, 'tz', None) is not None:
+            ts = ts.dt.tz_convert('UTC').dt.tz_localize(None)
+        self.has_time = ts.notna().to_numpy()
+        self.ts = np.where(self.has_time, ts.to_numpy(dtype='datetime64[s]').astype('int64'), 0)
+        self.senders = senders
+        self.state = state
+        self._columns = {}
+        self._windows = {}
+        self._history = None
+
+        batch_sum = np.nansum(self.amount)
+        batch_count = int(np.count_nonzero(~np.isnan(self.amount)))
+        total_count = state.global_count + batch_count
+        self.global_mean = (state.global_sum + batch_sum) / total_count if total_count else np.nan
+
+        # One sort over history + batch by (sender, time); history rows only provide context
+        history = state.recent
+        all_senders = np.concatenate([history['sender'].to_numpy(dtype=object), senders])
+        self.codes, self.uniques = pd.factorize(all_senders)
+        self.codes = self.codes.astype(np.int64)
+        all_ts = np.concatenate([history['ts'].to_numpy(dtype='int64'), self.ts])
+        all_amount = np.concatenate([history['amount'].to_numpy(dtype=float), np.nan_to_num(self.amount)])
+        self.is_batch = np.concatenate([np.zeros(len(history), dtype=bool), np.ones(self.n, dtype=bool)])
+        all_has_time = np.concatenate([np.ones(len(history), dtype=bool), self.has_time])
+
+        self.order = np.lexsort((all_ts, self.codes))
+        self.sorted_codes = self.codes[self.order]
+        self.sorted_ts = all_ts[self.order]
+        self.sorted_amount = all_amount[self.order]
+        self.sorted_has_time = all_has_time[self.order]
+        # Position of each batch row within the sorted arrays
+        self.batch_positions = np.empty(len(self.order), dtype=np.int64)
+        self.batch_positions[self.order] = np.arange(len(self.order))
+        self.batch_positions = self.batch_positions[len(history):]
+
+    def column(self, name):
+        if name not in self._columns:
+            values = self.df[name]
+            if pd.api.types.is_numeric_dtype(values):
+                self._columns[name] = values.to_numpy(dtype=float, na_value=np.nan)
+            else:
+                self._columns[name] = values.to_numpy(dtype=object)
+        return self._columns[name]
+
+    def window_totals(self, window_s):
+        """Count and amount sum of the sender's transactions in (t - window, t], per batch row"""
+        if window_s not in self._windows:
+            if len(self.order) == 0:
+                self._windows[window_s] = (np.zeros(0, dtype=np.int64), np.zeros(0))
+                return self._windows[window_s]
+            # Rows without a timestamp sit below every real window
+            base = self.sorted_ts[self.sorted_has_time].min() if self.sorted_has_time.any() else 0
+            offset = np.where(self.sorted_has_time, self.sorted_ts - base + window_s + 1, 0)
+            key = (self.sorted_codes << 34) | offset
+            left = np.searchsorted(key, key - window_s, side='right')
+            positions = np.arange(len(key))
+            cumulative = np.concatenate([[0.0], np.cumsum(self.sorted_amount)])
+            count = positions + 1 - left
+            amount = cumulative[positions + 1] - cumulative[left]
+            self._windows[window_s] = (count[self.batch_positions], amount[self.batch_positions])
+        return self._windows[window_s]
+
+    def sender_history(self):
+        """Prior transaction count and amount sum per batch row (state + earlier batch rows)"""
+        if self._history is None:
+            sorted_batch = self.is_batch[self.order]
+            batch_amount = np.where(sorted_batch, self.sorted_amount, 0.0)
+            count_before = np.cumsum(sorted_batch) - sorted_batch
+            sum_before = np.cumsum(batch_amount) - batch_amount
+            group_start = np.r_[0, np.flatnonzero(np.diff(self.sorted_codes)) + 1]
+            start_of_row = np.repeat(group_start, np.diff(np.r_[group_start, len(self.sorted_codes)]))
+            in_batch_count = count_before - count_before[start_of_row]
+            in_batch_sum = sum_before - sum_before[start_of_row]
+
+            known = self.state.baseline.reindex(self.uniques)
+            state_count = known['count'].fillna(0).to_numpy(dtype=float)[self.sorted_codes]
+            state_sum = known['total'].fillna(0).to_numpy(dtype=float)[self.sorted_codes]
+            self._history = ((state_count + in_batch_count)[self.batch_positions],
+                             (state_sum + in_batch_sum)[self.batch_positions])
+        return self._history
+
+
+class FraudRuleEngine:
+    """Score transaction batches against a list of declarative rules"""
+
+    def __init__(self, rules=None, state_dir=None, sender_col='sender', time_col='timestamp',
+                 amount_col='amount'):
+        """
+        Initialize engine
+
+        Args:
+            rules: Rule instances or dict specs (default: DEFAULT_RULES)
+            state_dir: Directory for per-sender state; None keeps state in memory only
+        """
+        self.rules = [build_rule(r) if isinstance(r, dict) else r for r in (rules or DEFAULT_RULES)]
+        if len(self.rules) > 62:
+            raise ValueError("At most 62 rules fit in the hit bitmask")
+        names = [r.name for r in self.rules]
+        if len(set(names)) != len(names):
+            raise ValueError("Rule names must be unique")
+        self.state_dir = state_dir
+        self.sender_col = sender_col
+        self.time_col = time_col
+        self.amount_col = amount_col
+        self.state = FraudState()
+        self.state_window = max((int(r.window.total_seconds()) for r in self.rules if isinstance(r, VelocityRule)),
+                                default=0)
+
+    def rule_bit(self, name):
+        """Bit of rule ``name`` in the ``fraud_flags`` column"""
+        return 1 << [r.name for r in self.rules].index(name)
+
+    def score(self, df, run_id=None, update_state=True):
+        """
+        Score new transactions
+
+        Returns:
+            tuple: (DataFrame with risk_level and fraud_flags columns, report dict)
+        """
+        started = time.perf_counter()
+        if self.state_dir:
+            self.state = FraudState.load(self.state_dir, run_id)
+        batch = _Batch(df, self.state, self.sender_col, self.time_col, self.amount_col)
+        prepare_s = time.perf_counter() - started
+
+        flags = np.zeros(batch.n, dtype=np.int64)
+        risk = np.zeros(batch.n, dtype=np.int8)
+        rule_stats = {}
+        for bit, rule in enumerate(self.rules):
+            rule_started = time.perf_counter()
+            hit = rule.evaluate(batch)
+            flags[hit] |= np.int64(1) << bit
+            if rule.risk is not None:
+                np.maximum(risk, np.where(hit, RISK_LEVELS.index(rule.risk), 0).astype(np.int8), out=risk)
+            rule_stats[rule.name] = {'hits': int(hit.sum()),
+                                     'seconds': round(time.perf_counter() - rule_started, 6)}
+
+        scored = df.copy()
+        scored['risk_level'] = np.asarray(RISK_LEVELS, dtype=object)[risk]
+        scored['fraud_flags'] = flags
+
+        if update_state:
+            self._advance_state(batch, run_id)
+            if self.state_dir:
+                self.state.save(self.state_dir)
+
+        seconds = time.perf_counter() - started
+        report = {
+            'rows': batch.n,
+            'flagged': int(np.count_nonzero(flags)),
+            'risk_levels': {level: int((risk == i).sum()) for i, level in enumerate(RISK_LEVELS)},
+            'rules': rule_stats,
+            'prepare_seconds': round(prepare_s, 6),
+            'seconds': round(seconds, 6),
+            'rows_per_sec': round(batch.n / seconds, 1) if seconds > 0 else None,
+            'state_senders': len(self.state.baseline),
+            'state_recent_events': len(self.state.recent),
+        }
+        logger.info(f"Scored {batch.n} transactions in {seconds:.3f}s; flagged {report['flagged']}")
+        return scored, report
+
+    def _advance_state(self, batch, run_id):
+        """Fold the batch into the running baselines and the recent-event window"""
+        valid_amount = ~np.isnan(batch.amount)
+        new = pd.DataFrame({'sender': batch.senders[valid_amount], 'amount': batch.amount[valid_amount]})
+        totals = new.groupby('sender', sort=False)['amount'].agg(['count', 'sum'])
+        totals.columns = ['count', 'total']
+        baseline = self.state.baseline.add(totals, fill_value=0)
+        baseline['count'] = baseline['count'].astype('int64')
+        baseline.index.name = 'sender'
+
+        recent = self.state.recent
+        if self.state_window:
+            events = pd.DataFrame({'sender': batch.senders[batch.has_time], 'ts': batch.ts[batch.has_time],
+                                   'amount': np.nan_to_num(batch.amount[batch.has_time])})
+            recent = pd.concat([recent, events], ignore_index=True) if len(recent) else events
+            if len(recent):
+                # Senders idle for longer than the widest window drop out here
+                recent = recent[recent['ts'] > recent['ts'].max() - self.state_window].reset_index(drop=True)
+
+        self.state = FraudState(
+            recent=recent,
+            baseline=baseline,
+            global_count=self.state.global_count + int(valid_amount.sum()),
+            global_sum=self.state.global_sum + float(np.nansum(batch.amount)),
+            run_id=str(run_id) if run_id is not None else None,
+        )
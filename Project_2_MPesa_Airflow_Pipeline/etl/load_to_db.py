@@ -6,39 +6,92 @@ Handles loading transactions to database with:
 - Error handling
 - Transaction management
 - Status tracking
+
+Each batch is staged and merged in its own transaction:
+- PostgreSQL: COPY FROM STDIN (CSV) into a TEMP table, then one
+  INSERT ... SELECT ... ON CONFLICT (transaction_id) DO NOTHING / DO UPDATE
+- Other dialects (SQLite for tests): the staging table is filled with to_sql
+
+Reloading the same transactions is therefore idempotent and cheap: existing
+ids are counted as duplicates (or updated in 'update' mode) instead of
+failing the batch. Rows that cannot be loaded (missing NOT NULL values,
+unparseable amount/timestamp, oversized ids) are rejected before staging.
+Batches can run in parallel over the engine's connection pool.
 """
 
+import io
+import threading
+import time
+import uuid
 import pandas as pd
 import logging
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from datetime import datetime
 from sqlalchemy import create_engine, text
 
+from etl.metrics import add_db_time
+
 logger = logging.getLogger(__name__)
 
+# Loadable columns in table order; transaction_id is the conflict key
+TABLE_COLUMNS = [
+    'transaction_id', 'sender', 'receiver', 'amount', 'timestamp', 'transaction_type',
+    'status', 'provider', 'fee', 'net_amount', 'risk_level',
+]
+NOT_NULL_COLUMNS = ['transaction_id', 'sender', 'receiver', 'amount', 'timestamp']
+MAX_LENGTHS = {'transaction_id': 50, 'sender': 20, 'receiver': 20}
+CONFLICT_MODES = ('nothing', 'update')
+
+
 class DatabaseLoader:
     """Load transaction data to database"""
-    
-    def __init__(self, engine, table_name='transactions'):
-        """Initialize loader"""
+
+    def __init__(self, engine, table_name='transactions', batch_size=50_000, on_conflict='nothing',
+                 workers=1):
+        """
+        Initialize loader
+
+        Args:
+            engine: SQLAlchemy engine
+            table_name: Target table
+            batch_size: Rows per staged batch
+            on_conflict: 'nothing' keeps existing rows, 'update' overwrites changed ones
+            workers: Batches merged in parallel (PostgreSQL only; size the pool to match)
+        """
+        if on_conflict not in CONFLICT_MODES:
+            raise ValueError(f"on_conflict must be one of {CONFLICT_MODES}")
         self.engine = engine
         self.table_name = table_name
-        self.batch_size = 1000
-        self.load_stats = {
+        self.batch_size = batch_size
+        self.on_conflict = on_conflict
+        self.is_postgres = engine.dialect.name == 'postgresql'
+        self.workers = workers if self.is_postgres else 1
+        self.load_stats = self._empty_stats()
+        self._stats_lock = threading.Lock()
+
+    @staticmethod
+    def _empty_stats():
+        return {
             'total_records': 0,
             'inserted': 0,
+            'updated': 0,
+            'duplicates': 0,
+            'rejected': 0,
             'failed': 0,
             'skipped': 0,
+            'batches': 0,
             'start_time': None,
             'end_time': None
         }
-    
+
     def create_table_if_not_exists(self):
         """Create transactions table if it doesn't exist"""
         logger.info(f"Creating table {self.table_name} if not exists...")
-        
+
+        id_column = 'id SERIAL PRIMARY KEY' if self.is_postgres else 'id INTEGER PRIMARY KEY AUTOINCREMENT'
         create_table_sql = f"""
         CREATE TABLE IF NOT EXISTS {self.table_name} (
-            id SERIAL PRIMARY KEY,
+            {id_column},
             transaction_id VARCHAR(50) UNIQUE NOT NULL,
             sender VARCHAR(20) NOT NULL,
             receiver VARCHAR(20) NOT NULL,
@@ -54,7 +107,7 @@ class DatabaseLoader:
             updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
         );
         """
-        
+
         try:
             with self.engine.connect() as conn:
                 conn.execute(text(create_table_sql))
@@ -63,59 +116,174 @@ class DatabaseLoader:
         except Exception as e:
             logger.error(f"Error creating table: {str(e)}")
             raise
-    
+
+    def prepare_batch(self, df_batch):
+        """
+        Coerce types and split off rows the table would refuse
+
+        Returns:
+            tuple: (loadable rows with TABLE_COLUMNS present in the batch, rejected rows)
+        """
+        columns = [c for c in TABLE_COLUMNS if c in df_batch.columns]
+        missing = [c for c in NOT_NULL_COLUMNS if c not in columns]
+        if missing:
+            raise ValueError(f"Missing required columns: {missing}")
+
+        batch = df_batch[columns].copy()
+        batch['amount'] = pd.to_numeric(batch['amount'], errors='coerce')
+        for column in ('fee', 'net_amount'):
+            if column in batch.columns:
+                batch[column] = pd.to_numeric(batch[column], errors='coerce')
+        batch['timestamp'] = pd.to_datetime(batch['timestamp'], errors='coerce', format='mixed')
+        if getattr(batch['timestamp'].dt, 'tz', None) is not None:
+            batch['timestamp'] = batch['timestamp'].dt.tz_convert('UTC').dt.tz_localize(None)
+
+        bad = batch[NOT_NULL_COLUMNS].isnull().any(axis=1)
+        for column, limit in MAX_LENGTHS.items():
+            bad |= batch[column].astype(str).str.len() > limit
+        return batch[~bad], df_batch[bad.values]
+
+    def _merge_sql(self, stage, columns):
+        column_list = ', '.join(columns)
+        # SQLite needs a WHERE before ON CONFLICT in INSERT ... SELECT
+        select = f"SELECT {column_list} FROM {stage}" + ('' if self.is_postgres else ' WHERE true')
+        sql = f"INSERT INTO {self.table_name} ({column_list}) {select} ON CONFLICT (transaction_id) "
+        if self.on_conflict == 'nothing':
+            return sql + "DO NOTHING"
+        updates = [c for c in columns if c != 'transaction_id']
+        target = ', '.join(f"{self.table_name}.{c}" for c in updates)
+        excluded = ', '.join(f"EXCLUDED.{c}" for c in updates)
+        changed = 'IS DISTINCT FROM' if self.is_postgres else 'IS NOT'
+        sql += (f"DO UPDATE SET {', '.join(f'{c} = EXCLUDED.{c}' for c in updates)}, "
+                f"updated_at = CURRENT_TIMESTAMP WHERE ({target}) {changed} ({excluded})")
+        if self.is_postgres:
+            # xmax = 0 only for freshly inserted rows
+            sql += " RETURNING (xmax = 0) AS inserted"
+        return sql
+
+    def _stage_postgres(self, conn, stage, batch):
+        conn.execute(text(f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS SELECT {', '.join(batch.columns)} "
+                          f"FROM {self.table_name} WITH NO DATA"))
+        buffer = io.StringIO()
+        batch.to_csv(buffer, index=False, header=False, date_format='%Y-%m-%d %H:%M:%S.%f')
+        buffer.seek(0)
+        cursor = conn.connection.cursor()
+        # COPY runs on the DBAPI cursor, which SQLAlchemy's execute events never see
+        started = time.perf_counter()
+        try:
+            cursor.copy_expert(f"COPY {stage} ({', '.join(batch.columns)}) FROM STDIN WITH (FORMAT csv)",
+                               buffer, size=1 << 20)
+        finally:
+            add_db_time(time.perf_counter() - started)
+            cursor.close()
+
+    def _merge_batch(self, batch):
+        """Stage and merge one prepared batch; returns (inserted, updated)"""
+        stage = f"stage_{self.table_name}_{uuid.uuid4().hex[:12]}"
+        columns = list(batch.columns)
+        with self.engine.begin() as conn:
+            if self.is_postgres:
+                self._stage_postgres(conn, stage, batch)
+                result = conn.execute(text(self._merge_sql(stage, columns)))
+                if self.on_conflict == 'nothing':
+                    return result.rowcount, 0
+                flags = [row[0] for row in result]
+                inserted = sum(flags)
+                return inserted, len(flags) - inserted
+
+            batch.to_sql(stage, con=conn, index=False)
+            try:
+                existing = conn.execute(text(
+                    f"SELECT COUNT(*) FROM {stage} s JOIN {self.table_name} t USING (transaction_id)")).scalar()
+                changed = conn.execute(text(self._merge_sql(stage, columns))).rowcount
+            finally:
+                conn.execute(text(f"DROP TABLE {stage}"))
+            inserted = len(batch) - existing
+            return inserted, (changed - inserted if self.on_conflict == 'update' else 0)
+
     def load_batch(self, df_batch):
         """Load a batch of records to database"""
+        rows = len(df_batch)
         try:
-            records_inserted = df_batch.to_sql(
-                self.table_name,
-                con=self.engine,
-                if_exists='append',
-                index=False,
-                method='multi'
-            )
-            self.load_stats['inserted'] += len(df_batch)
-            logger.info(f"Inserted {len(df_batch)} records")
-            return len(df_batch)
+            batch, rejected = self.prepare_batch(df_batch)
+            unique = batch.drop_duplicates(subset=['transaction_id'], keep='first')
+            inserted, updated = self._merge_batch(unique) if len(unique) else (0, 0)
         except Exception as e:
             logger.error(f"Error loading batch: {str(e)}")
-            self.load_stats['failed'] += len(df_batch)
+            with self._stats_lock:
+                self.load_stats['failed'] += rows
             return 0
-    
+
+        duplicates = len(batch) - inserted - updated
+        with self._stats_lock:
+            self.load_stats['inserted'] += inserted
+            self.load_stats['updated'] += updated
+            self.load_stats['duplicates'] += duplicates
+            self.load_stats['rejected'] += len(rejected)
+        if len(rejected):
+            logger.warning(f"Rejected {len(rejected)} rows with missing or invalid required values")
+        logger.info(f"Inserted {inserted}, updated {updated}, duplicates {duplicates} of {rows} records")
+        return inserted
+
+    def _batches(self, data):
+        if isinstance(data, pd.DataFrame):
+            for i in range(0, len(data), self.batch_size):
+                yield data.iloc[i:i + self.batch_size]
+        else:
+            for chunk in data:
+                chunk = pd.DataFrame(chunk) if isinstance(chunk, list) else chunk
+                for i in range(0, len(chunk), self.batch_size):
+                    yield chunk.iloc[i:i + self.batch_size]
+
+    def _count_batch(self, batch):
+        self.load_stats['total_records'] += len(batch)
+        self.load_stats['batches'] += 1
+
     def load_data(self, df):
-        """Load dataframe to database in batches"""
+        """Load a dataframe (or an iterable of dataframes) to database in batches"""
+        self.load_stats = self._empty_stats()
         self.load_stats['start_time'] = datetime.now()
-        self.load_stats['total_records'] = len(df)
-        
-        logger.info(f"Starting load of {len(df)} records...")
-        
+        started = time.perf_counter()
+
+        logger.info(f"Starting load into {self.table_name} (on_conflict={self.on_conflict}, workers={self.workers})...")
+
         self.create_table_if_not_exists()
-        
-        total_batches = (len(df) + self.batch_size - 1) // self.batch_size
-        
-        for i in range(0, len(df), self.batch_size):
-            batch_num = (i // self.batch_size) + 1
-            df_batch = df.iloc[i:i + self.batch_size]
-            
-            logger.info(f"Loading batch {batch_num}/{total_batches}...")
-            self.load_batch(df_batch)
-        
+
+        if self.workers > 1:
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                pending = set()
+                for batch in self._batches(df):
+                    self._count_batch(batch)
+                    # Bound the batches held in memory to two per worker
+                    if len(pending) >= 2 * self.workers:
+                        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    pending.add(pool.submit(self.load_batch, batch))
+                wait(pending)
+        else:
+            for batch in self._batches(df):
+                self._count_batch(batch)
+                self.load_batch(batch)
+
         self.load_stats['end_time'] = datetime.now()
-        duration = (self.load_stats['end_time'] - self.load_stats['start_time']).total_seconds()
-        
+        duration = time.perf_counter() - started
+        self.load_stats['duration_seconds'] = round(duration, 3)
+        self.load_stats['rows_per_sec'] = round(self.load_stats['total_records'] / duration, 1) if duration else None
+
         logger.info(f"Load completed in {duration:.2f} seconds")
-        logger.info(f"Inserted: {self.load_stats['inserted']}, Failed: {self.load_stats['failed']}")
-        
+        logger.info(f"Inserted: {self.load_stats['inserted']}, Updated: {self.load_stats['updated']}, "
+                    f"Duplicates: {self.load_stats['duplicates']}, Rejected: {self.load_stats['rejected']}, "
+                    f"Failed: {self.load_stats['failed']}")
+
         return self.load_stats
-    
+
     def get_load_stats(self):
         """Return load statistics"""
         return self.load_stats
 
-def load_transactions_to_db(data, engine, table_name='transactions'):
+def load_transactions_to_db(data, engine, table_name='transactions', **loader_options):
     """Main loading function"""
     logger.info("Loading transactions to database...")
-    
+
     if isinstance(data, list):
         df = pd.DataFrame(data)
     elif isinstance(data, pd.DataFrame):
@@ -123,12 +291,12 @@ def load_transactions_to_db(data, engine, table_name='transactions'):
     else:
         logger.error("Invalid data format")
         return {}
-    
+
     if df.empty:
         logger.warning("No data to load")
         return {}
-    
-    loader = DatabaseLoader(engine, table_name)
+
+    loader = DatabaseLoader(engine, table_name, **loader_options)
     stats = loader.load_data(df)
-    
+
     return stats
@@ -0,0 +1,233 @@
+"""
+Pipeline Run Metrics
+
+Per-task instrumentation for the M-Pesa DAG:
+- TaskMetrics times a task and records rows in/out, rows/sec, peak memory
+  (process max RSS) and time spent in database calls (every SQLAlchemy engine
+  in the process reports cursor executions to the active TaskMetrics; work on
+  the raw DBAPI connection, like the loader's COPY, reports via add_db_time)
+- write_prometheus() exports a task's metrics in the Prometheus textfile
+  collector format (one file per task and partition, replaced atomically)
+- RunHistory keeps every task run in a table and flags throughput regressions
+  against the median of recent runs of the same task
+"""
+
+import logging
+import os
+import sys
+import threading
+import time
+from datetime import datetime, timezone
+
+from sqlalchemy import Column, DateTime, Float, Integer, MetaData, String, Table, event, select
+from sqlalchemy.engine import Engine
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+logger = logging.getLogger(__name__)
+
+METRIC_PREFIX = 'mpesa_etl_task'
+PROMETHEUS_METRICS = {
+    'duration_seconds': 'Wall-clock duration of the task',
+    'rows_in': 'Rows read by the task',
+    'rows_out': 'Rows written by the task',
+    'rows_per_sec': 'Rows processed per second (rows_in / duration)',
+    'peak_memory_bytes': 'Peak resident memory of the task process',
+    'db_seconds': 'Time spent in database calls',
+    'throughput_regression': '1 when rows/sec fell below the regression threshold',
+    'last_run_timestamp_seconds': 'Unix time the task finished',
+}
+
+_active = None
+_active_lock = threading.Lock()
+
+
+@event.listens_for(Engine, 'before_cursor_execute')
+def _before_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('mpesa_query_start', []).append(time.perf_counter())
+
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def _after_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get('mpesa_query_start')
+    if not started:
+        return
+    add_db_time(time.perf_counter() - started.pop())
+
+
+def add_db_time(seconds):
+    """Count ``seconds`` of database work towards the active TaskMetrics (if any)"""
+    with _active_lock:
+        if _active is not None:
+            _active.db_seconds += seconds
+
+
+def _peak_memory_bytes():
+    if resource is None:
+        return None
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class TaskMetrics:
+    """Measure one task run; use as a context manager and set rows_in / rows_out inside"""
+
+    def __init__(self, task, run_id, partition=None):
+        self.task = task
+        self.run_id = str(run_id)
+        self.partition = partition
+        self.rows_in = 0
+        self.rows_out = 0
+        self.db_seconds = 0.0
+        self.duration_seconds = None
+        self.peak_memory_bytes = None
+        self.started_at = None
+        self.finished_at = None
+        self.status = None
+        self.throughput_regression = False
+        self._started = None
+
+    def __enter__(self):
+        global _active
+        with _active_lock:
+            _active = self
+        self.started_at = datetime.now(timezone.utc)
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        global _active
+        self.duration_seconds = time.perf_counter() - self._started
+        self.finished_at = datetime.now(timezone.utc)
+        self.peak_memory_bytes = _peak_memory_bytes()
+        self.status = 'failed' if exc_type else 'success'
+        with _active_lock:
+            if _active is self:
+                _active = None
+        return False
+
+    @property
+    def rows_per_sec(self):
+        if not self.duration_seconds:
+            return None
+        return self.rows_in / self.duration_seconds
+
+    def as_dict(self):
+        return {
+            'task': self.task,
+            'run_id': self.run_id,
+            'partition': self.partition,
+            'status': self.status,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'duration_seconds': round(self.duration_seconds, 3) if self.duration_seconds is not None else None,
+            'rows_in': self.rows_in,
+            'rows_out': self.rows_out,
+            'rows_per_sec': round(self.rows_per_sec, 1) if self.rows_per_sec is not None else None,
+            'peak_memory_bytes': self.peak_memory_bytes,
+            'db_seconds': round(self.db_seconds, 3),
+            'throughput_regression': self.throughput_regression,
+        }
+
+
+def write_prometheus(metrics, directory):
+    """Write ``<task>[-p<NNN>].prom`` for the node_exporter textfile collector; returns the path"""
+    os.makedirs(directory, exist_ok=True)
+    labels = f'task="{metrics.task}"'
+    if metrics.partition is not None:
+        labels += f',partition="{metrics.partition}"'
+    values = dict(metrics.as_dict(), throughput_regression=int(metrics.throughput_regression),
+                  last_run_timestamp_seconds=metrics.finished_at.timestamp() if metrics.finished_at else None)
+
+    lines = []
+    for name, help_text in PROMETHEUS_METRICS.items():
+        if values.get(name) is None:
+            continue
+        lines.append(f"# HELP {METRIC_PREFIX}_{name} {help_text}")
+        lines.append(f"# TYPE {METRIC_PREFIX}_{name} gauge")
+        lines.append(f"{METRIC_PREFIX}_{name}{{{labels}}} {float(values[name])}")
+
+    name = metrics.task if metrics.partition is None else f"{metrics.task}-p{metrics.partition:03d}"
+    path = os.path.join(directory, f"{name}.prom")
+    # The collector may read at any time: write aside, then rename over the old file
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    os.replace(tmp_path, path)
+    return path
+
+
+class RunHistory:
+    """Task run history table with throughput regression checks"""
+
+    def __init__(self, engine, table_name='etl_task_runs'):
+        self.engine = engine
+        self.table = Table(
+            table_name, MetaData(),
+            Column('id', Integer, primary_key=True, autoincrement=True),
+            Column('run_id', String(250), nullable=False, index=True),
+            Column('task', String(100), nullable=False, index=True),
+            Column('partition', Integer),
+            Column('status', String(20)),
+            Column('started_at', DateTime),
+            Column('duration_seconds', Float),
+            Column('rows_in', Integer),
+            Column('rows_out', Integer),
+            Column('rows_per_sec', Float),
+            Column('peak_memory_bytes', Float),
+            Column('db_seconds', Float),
+            Column('throughput_regression', Integer),
+        )
+        self.table.create(engine, checkfirst=True)
+
+    def record(self, metrics):
+        row = metrics.as_dict()
+        row['started_at'] = metrics.started_at.replace(tzinfo=None) if metrics.started_at else None
+        row['throughput_regression'] = int(metrics.throughput_regression)
+        with self.engine.begin() as conn:
+            conn.execute(self.table.insert().values(**row))
+
+    def baseline_rows_per_sec(self, task, last_n=10, exclude_run=None):
+        """Median rows/sec of the last ``last_n`` successful runs of a task (None without history)"""
+        t = self.table.c
+        query = (select(t.rows_per_sec).where(t.task == task, t.status == 'success', t.rows_per_sec.isnot(None))
+                 .order_by(t.id.desc()).limit(last_n))
+        if exclude_run is not None:
+            query = query.where(t.run_id != str(exclude_run))
+        with self.engine.connect() as conn:
+            rates = sorted(row[0] for row in conn.execute(query))
+        if not rates:
+            return None, 0
+        mid = len(rates) // 2
+        median = rates[mid] if len(rates) % 2 else (rates[mid - 1] + rates[mid]) / 2
+        return median, len(rates)
+
+    def check_regression(self, metrics, threshold=0.5, min_runs=3, last_n=10):
+        """
+        Flag ``metrics`` when its rows/sec is below ``threshold`` x the recent median
+
+        Returns:
+            dict: Alert details, or None when throughput is fine or history is too short
+        """
+        if metrics.status != 'success' or not metrics.rows_in or metrics.rows_per_sec is None:
+            return None
+        median, runs = self.baseline_rows_per_sec(metrics.task, last_n, exclude_run=metrics.run_id)
+        if median is None or runs < min_runs or metrics.rows_per_sec >= threshold * median:
+            return None
+        metrics.throughput_regression = True
+        alert = {'task': metrics.task, 'partition': metrics.partition, 'run_id': metrics.run_id,
+                 'rows_per_sec': round(metrics.rows_per_sec, 1), 'baseline_rows_per_sec': round(median, 1),
+                 'ratio': round(metrics.rows_per_sec / median, 3)}
+        logger.warning(f"Throughput regression in {metrics.task}: {alert['rows_per_sec']} rows/s "
+                       f"vs median {alert['baseline_rows_per_sec']} over the last {runs} runs")
+        return alert
+
+    def run(self, run_id):
+        """All recorded task metrics of one DAG run, as dicts"""
+        with self.engine.connect() as conn:
+            rows = conn.execute(select(self.table).where(self.table.c.run_id == str(run_id))
+                                .order_by(self.table.c.id))
+            return [dict(row._mapping) for row in rows]
@@ -0,0 +1,170 @@
+"""
+Partitioned Pipeline Stages
+
+The per-partition work of the M-Pesa DAG as plain functions, so the same code
+runs under Airflow dynamic task mapping and locally:
+- validate_stage writes the rows that pass validation to their own artifact;
+  only that artifact is partitioned, so quarantined rows are never loaded.
+  Raw rows are judged as the cleaner will leave them, so only rows it cannot
+  repair are quarantined
+- clean_stage -> score_stage -> load_stage run once per partition; each
+  returns the keyword arguments of the next stage ({partition, manifest, stats})
+- summarize_partitions folds the per-partition stats for the report (fan-in)
+- run_local partitions an artifact and runs the fan-out on a thread pool,
+  mirroring the mapped DAG without a scheduler
+"""
+
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import nullcontext
+from datetime import datetime
+
+from etl.partition import partition_artifact, partition_state_dir, require_sender_partitions
+
+logger = logging.getLogger(__name__)
+
+
+def validate_stage(store, run_id, manifest, quarantine=None, chunk_size=500_000):
+    """
+    Validate an extracted artifact batch by batch
+
+    Returns:
+        tuple: (validation results, manifest of the valid rows)
+    """
+    from etl.validate import TransactionValidator
+
+    validator = TransactionValidator(quarantine=quarantine, before_cleaning=True)
+    valid_manifest = store.write(run_id, 'valid_transactions',
+                                 (validator.validate_chunk(chunk)
+                                  for chunk in store.iter_batches(manifest, batch_size=chunk_size)))
+    return validator.finish(), valid_manifest
+
+
+def clean_stage(store, run_id, partition, manifest, stats=None, chunk_size=500_000):
+    """Stream one partition through the cleaner and add net_amount"""
+    from etl.clean import StreamingTransactionCleaner
+
+    # Duplicates are tracked across batches; equal transactions share a partition
+    cleaner = StreamingTransactionCleaner(chunk_size=chunk_size)
+
+    def cleaned_batches():
+        for chunk in cleaner.clean_chunks(store.iter_batches(manifest, batch_size=chunk_size)):
+            chunk['net_amount'] = chunk['amount'] - chunk.get('fee', 0)
+            yield chunk
+
+    try:
+        cleaned_manifest = store.write(run_id, f'cleaned_transactions-p{partition:03d}', cleaned_batches())
+    finally:
+        cleaner.close()
+
+    cleaning_report = cleaner.get_cleaning_report()
+    logger.info(f"Partition {partition}: cleaned {cleaned_manifest['rows']} transactions")
+    return {'partition': partition, 'manifest': cleaned_manifest,
+            'stats': dict(stats or {}, cleaning=cleaning_report)}
+
+
+def score_stage(store, run_id, partition, manifest, stats=None, state_dir=None):
+    """Apply the fraud rules to one partition with its own per-sender state"""
+    from etl.fraud_rules import FraudRuleEngine
+
+    transactions = store.read(manifest)
+    engine = FraudRuleEngine(state_dir=state_dir)
+    transactions, report = engine.score(transactions, run_id=run_id)
+
+    fraud_indicators = {
+        'total_transactions': report['rows'],
+        'flagged_suspicious': report['flagged'],
+        'high_value_txns': report['rules']['high_value']['hits'],
+        'rapid_transactions': report['rules']['sender_velocity']['hits'],
+        'failed_transactions': report['rules']['failed_status']['hits'],
+        'risk_levels': report['risk_levels'],
+        'rules': report['rules'],
+        'rows_per_sec': report['rows_per_sec'],
+    }
+    for name, rule_stats in report['rules'].items():
+        logger.info(f"  - partition {partition} {name}: {rule_stats['hits']} hits in {rule_stats['seconds']:.3f}s")
+
+    scored_manifest = store.write(run_id, f'transactions_with_risk-p{partition:03d}', transactions)
+    return {'partition': partition, 'manifest': scored_manifest,
+            'stats': dict(stats or {}, fraud=fraud_indicators)}
+
+
+def load_stage(store, partition, manifest, stats=None, engine=None, batch_size=50_000, workers=1):
+    """Merge one scored partition into the database (skipped when ``engine`` is None)"""
+    from etl.load_to_db import DatabaseLoader
+
+    status_counts = store.read(manifest, columns=['status'])['status'].value_counts()
+    load_stats = {
+        'total_inserted': 0,
+        'successful': int(status_counts.get('success', 0)),
+        'failed': int(status_counts.get('failed', 0)),
+        'pending': int(status_counts.get('pending', 0)),
+        'timestamp': datetime.now().isoformat()
+    }
+
+    if engine is None:
+        logger.warning("No database configured; skipping database load")
+        load_stats['total_inserted'] = manifest['rows']
+    else:
+        # COPY into staging + ON CONFLICT merge: reruns only count duplicates
+        loader = DatabaseLoader(engine, batch_size=batch_size, workers=workers)
+        result = loader.load_data(store.iter_batches(manifest, batch_size=batch_size))
+        if result['failed']:
+            raise RuntimeError(f"{result['failed']} rows of partition {partition} failed to load")
+        load_stats.update({
+            'total_inserted': result['inserted'],
+            'duplicates': result['duplicates'],
+            'rejected': result['rejected'],
+            'rows_per_sec': result['rows_per_sec'],
+        })
+
+    logger.info(f"Partition {partition}: loaded {load_stats['total_inserted']} transactions")
+    return {'partition': partition, 'manifest': manifest, 'stats': dict(stats or {}, loading=load_stats)}
+
+
+def _add_counts(total, stats):
+    """Sum numeric values (recursively); rates and timestamps do not add up"""
+    for key, value in stats.items():
+        if isinstance(value, dict):
+            _add_counts(total.setdefault(key, {}), value)
+        elif isinstance(value, (int, float)) and not isinstance(value, bool) and 'per_sec' not in key:
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+def summarize_partitions(results):
+    """Fold the stats of every partition's final stage into one summary"""
+    summary = {'partitions': len(results), 'rows_per_partition': {}}
+    for result in results:
+        summary['rows_per_partition'][result['partition']] = result['manifest']['rows']
+        _add_counts(summary, result['stats'])
+    return summary
+
+
+def run_local(store, run_id, manifest, partitions=4, by='sender', state_dir=None, engine=None, workers=4,
+              chunk_size=500_000, load_batch_size=50_000):
+    """
+    Partition an extracted artifact and run clean -> score -> load per partition in parallel
+
+    Returns:
+        tuple: (final result of every partition, summary)
+    """
+    if state_dir:
+        require_sender_partitions(by)
+    mapped = partition_artifact(store, run_id, manifest, 'transactions', by=by, partitions=partitions,
+                                batch_size=chunk_size)
+
+    # SQLite allows a single writer; other databases take the partitions' loads in parallel
+    load_lock = threading.Lock() if engine is not None and engine.dialect.name == 'sqlite' else nullcontext()
+
+    def run_partition(kwargs):
+        kwargs = clean_stage(store, run_id, chunk_size=chunk_size, **kwargs)
+        state = partition_state_dir(state_dir, by, partitions, kwargs['partition']) if state_dir else None
+        kwargs = score_stage(store, run_id, state_dir=state, **kwargs)
+        with load_lock:
+            return load_stage(store, engine=engine, batch_size=load_batch_size, **kwargs)
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(run_partition, mapped))
+    return results, summarize_partitions(results)
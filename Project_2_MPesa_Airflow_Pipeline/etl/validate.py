@@ -6,163 +6,388 @@ Implements business rule validation for transaction data including:
 - Status validation
 - Fraud detection rules
 - Data quality checks
+
+All rules are evaluated in one vectorized pass that yields a per-row bitmask
+of failed rules (see RULE_BITS). Rows failing an error rule are invalid and can
+be quarantined to a side file or table; counts are exact row counts. The
+validator also works chunk by chunk (validate_chunk), so it can run inside the
+streaming cleaner. With ``before_cleaning`` it judges raw rows as the cleaner
+will leave them, so only rows the cleaner cannot repair fail.
 """
 
 import pandas as pd
 import numpy as np
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
+# Bit of each rule in the per-row ``failed_rules`` mask
+MISSING_REQUIRED = 1
+INVALID_PHONE = 2
+INVALID_STATUS = 4
+AMOUNT_OUT_OF_RANGE = 8
+INVALID_TYPE = 16
+
+RULE_BITS = {
+    'missing_required': MISSING_REQUIRED,
+    'invalid_phone': INVALID_PHONE,
+    'invalid_status': INVALID_STATUS,
+    'amount_out_of_range': AMOUNT_OUT_OF_RANGE,
+    'invalid_type': INVALID_TYPE,
+}
+# Rules that make a row invalid; the others are only reported as warnings
+ERROR_RULES = MISSING_REQUIRED | INVALID_PHONE | INVALID_STATUS
+
+
+def rule_names(mask):
+    """Names of the rules set in one ``failed_rules`` value"""
+    return [name for name, bit in RULE_BITS.items() if mask & bit]
+
+
+def repairable_view(df):
+    """``df`` with the value fixes TransactionCleaner makes, row for row
+
+    Column names are lower-cased, phone numbers stripped, missing statuses
+    filled with 'pending', and statuses and types lower-cased and stripped.
+    """
+    view = df.copy(deep=False)
+    view.columns = view.columns.str.lower().str.strip()
+    for column in ('sender', 'receiver'):
+        if column in view.columns:
+            view[column] = view[column].where(view[column].isna(), view[column].astype(str).str.strip())
+    if 'status' in view.columns:
+        view['status'] = view['status'].fillna('pending')
+    for column in ('status', 'transaction_type'):
+        if column in view.columns:
+            view[column] = view[column].str.lower().str.strip()
+    return view
+
+
+class Quarantine:
+    """Side output for rows that failed validation
+
+    Writes to a CSV or Parquet file (chosen by extension) or appends to a
+    database table when ``engine`` is given.
+    """
+
+    def __init__(self, path=None, engine=None, table_name='transactions_quarantine'):
+        if path is None and engine is None:
+            raise ValueError("Quarantine needs a path or an engine")
+        self.path = path
+        self.engine = engine
+        self.table_name = table_name
+        self.rows = 0
+        self._writer = None
+        self._schema = None
+
+    def write(self, rows):
+        """Append quarantined rows (with their ``failed_rules`` mask)"""
+        if rows.empty:
+            return
+        rows = rows.assign(
+            failed_rule_names=[';'.join(rule_names(m)) for m in rows['failed_rules']],
+            quarantined_at=datetime.now(timezone.utc).isoformat(),
+        )
+        if self.engine is not None:
+            rows.to_sql(self.table_name, con=self.engine, if_exists='append', index=False)
+        elif self.path.endswith('.parquet'):
+            self._write_parquet(rows)
+        else:
+            header = self.rows == 0 and not os.path.exists(self.path)
+            rows.to_csv(self.path, mode='a', header=header, index=False)
+        self.rows += len(rows)
+
+    def _write_parquet(self, rows):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        # Raw rows may hold mixed types; store everything but the mask as text
+        rows = rows.astype({c: 'string' for c in rows.columns if c != 'failed_rules'})
+        if self._writer is None:
+            self._schema = pa.Schema.from_pandas(rows, preserve_index=False)
+            self._writer = pq.ParquetWriter(self.path, self._schema)
+        self._writer.write_table(pa.Table.from_pandas(rows[self._schema.names], schema=self._schema,
+                                                      preserve_index=False))
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
+
+
 class TransactionValidator:
     """Validate transactions against business rules"""
-    
+
     MIN_AMOUNT = 1
     MAX_AMOUNT = 1000000
     VALID_STATUSES = ['success', 'failed', 'pending', 'reversed']
     VALID_TYPES = ['transfer', 'withdrawal', 'deposit', 'payment', 'airtime_purchase']
-    
-    def __init__(self, df):
-        """Initialize validator with dataframe"""
+    REQUIRED_FIELDS = ['transaction_id', 'sender', 'receiver', 'amount', 'status']
+
+    def __init__(self, df=None, quarantine=None, before_cleaning=False):
+        """
+        Initialize validator
+
+        Args:
+            df: DataFrame to validate with validate(); omit when using validate_chunk()
+            quarantine: Optional Quarantine receiving invalid rows
+            before_cleaning: Rows are raw; judge them through repairable_view() so
+                             rows the cleaner repairs are not quarantined
+        """
         self.df = df
+        self.quarantine = quarantine
+        self.before_cleaning = before_cleaning
+        self._view = None
+        self._masks = None
+        self._amount_stats = {'count': 0, 'sum': 0.0, 'sumsq': 0.0, 'failed': 0}
         self.validation_results = {
-            'total_records': len(df),
+            'total_records': len(df) if df is not None else 0,
             'valid_records': 0,
             'invalid_records': 0,
+            'quarantined_records': 0,
+            'rule_failures': {name: 0 for name in RULE_BITS},
             'warnings': [],
             'errors': [],
             'anomalies': []
         }
-    
+
+    def rule_masks(self, df):
+        """Evaluate every rule in one pass; returns {rule name: boolean row mask}"""
+        n = len(df)
+        present = [f for f in self.REQUIRED_FIELDS if f in df.columns]
+        missing = df[present].isnull().to_numpy().any(axis=1) if present else np.zeros(n, dtype=bool)
+        if len(present) < len(self.REQUIRED_FIELDS):
+            missing = np.ones(n, dtype=bool)
+
+        def short_phone(column):
+            if column not in df.columns:
+                return np.zeros(n, dtype=bool)
+            return (df[column].astype(str).str.len() < 10).to_numpy() & df[column].notna().to_numpy()
+
+        amount = pd.to_numeric(df['amount'], errors='coerce').to_numpy(dtype=float) \
+            if 'amount' in df.columns else np.full(n, np.nan)
+        status = df['status'] if 'status' in df.columns else pd.Series(None, index=df.index)
+        transaction_type = df['transaction_type'] if 'transaction_type' in df.columns else None
+
+        return {
+            'missing_required': missing,
+            'invalid_phone': short_phone('sender') | short_phone('receiver'),
+            'invalid_status': ~status.isin(self.VALID_STATUSES).to_numpy(),
+            'amount_out_of_range': (amount < self.MIN_AMOUNT) | (amount > self.MAX_AMOUNT),
+            'invalid_type': (~transaction_type.isin(self.VALID_TYPES)).to_numpy()
+            if transaction_type is not None else np.zeros(n, dtype=bool),
+        }
+
+    def failed_rules(self, df, masks=None):
+        """Per-row bitmask of failed rules (see RULE_BITS)"""
+        masks = masks if masks is not None else self.rule_masks(df)
+        flags = np.zeros(len(df), dtype=np.int64)
+        for name, mask in masks.items():
+            flags[mask] |= RULE_BITS[name]
+        return flags
+
+    def _rule_view(self, df):
+        return repairable_view(df) if self.before_cleaning else df
+
+    def _frame(self):
+        if self._view is None:
+            self._view = self._rule_view(self.df)
+        return self._view
+
+    def _frame_masks(self):
+        if self._masks is None:
+            self._masks = self.rule_masks(self._frame())
+        return self._masks
+
     def validate_amount_range(self):
         """Validate transaction amounts are within acceptable range"""
         logger.info("Validating amount ranges...")
-        
-        invalid_amounts = self.df[
-            (self.df['amount'] < self.MIN_AMOUNT) | 
-            (self.df['amount'] > self.MAX_AMOUNT)
-        ]
-        
-        if len(invalid_amounts) > 0:
-            msg = f"Found {len(invalid_amounts)} transactions with invalid amounts"
+
+        invalid_amounts = int(self._frame_masks()['amount_out_of_range'].sum())
+
+        if invalid_amounts > 0:
+            msg = f"Found {invalid_amounts} transactions with invalid amounts"
             self.validation_results['warnings'].append(msg)
             logger.warning(msg)
-        
-        return len(invalid_amounts) == 0
-    
+
+        return invalid_amounts == 0
+
     def validate_status_values(self):
         """Validate status values are from allowed set"""
         logger.info("Validating status values...")
-        
-        invalid_status = self.df[~self.df['status'].isin(self.VALID_STATUSES)]
-        
-        if len(invalid_status) > 0:
-            msg = f"Found {len(invalid_status)} transactions with invalid status"
+
+        invalid_status = int(self._frame_masks()['invalid_status'].sum())
+
+        if invalid_status > 0:
+            msg = f"Found {invalid_status} transactions with invalid status"
             self.validation_results['errors'].append(msg)
             logger.error(msg)
             return False
-        
+
         return True
-    
+
     def validate_transaction_types(self):
         """Validate transaction types are from allowed set"""
         logger.info("Validating transaction types...")
-        
-        if 'transaction_type' not in self.df.columns:
-            return True
-        
-        invalid_types = self.df[~self.df['transaction_type'].isin(self.VALID_TYPES)]
-        
-        if len(invalid_types) > 0:
-            msg = f"Found {len(invalid_types)} transactions with invalid type"
+
+        invalid_types = int(self._frame_masks()['invalid_type'].sum())
+
+        if invalid_types > 0:
+            msg = f"Found {invalid_types} transactions with invalid type"
             self.validation_results['warnings'].append(msg)
             logger.warning(msg)
-        
+
         return True
-    
+
     def validate_phone_numbers(self):
         """Validate phone numbers have minimum length"""
         logger.info("Validating phone numbers...")
-        
-        invalid_sender = self.df[self.df['sender'].str.len() < 10]
-        invalid_receiver = self.df[self.df['receiver'].str.len() < 10]
-        
-        invalid_count = len(invalid_sender) + len(invalid_receiver)
-        
+
+        invalid_count = int(self._frame_masks()['invalid_phone'].sum())
+
         if invalid_count > 0:
             msg = f"Found {invalid_count} transactions with invalid phone numbers"
             self.validation_results['errors'].append(msg)
             logger.error(msg)
             return False
-        
+
         return True
-    
+
     def detect_anomalies(self):
         """Detect statistical anomalies in transactions"""
         logger.info("Detecting anomalies...")
-        
+
+        self._amount_stats = {'count': 0, 'sum': 0.0, 'sumsq': 0.0, 'failed': 0}
+        self._accumulate_amount_stats(self._frame())
+        return self._report_anomalies(self._frame()) + self._report_failure_rate()
+
+    def _accumulate_amount_stats(self, df):
+        amount = pd.to_numeric(df['amount'], errors='coerce').dropna().to_numpy(dtype=float)
+        stats = self._amount_stats
+        stats['count'] += len(amount)
+        stats['sum'] += float(amount.sum())
+        stats['sumsq'] += float(np.square(amount).sum())
+        stats['failed'] += int((df['status'] == 'failed').sum())
+
+    def _amount_threshold(self):
+        """mean + 3 * sample std of all amounts seen so far"""
+        stats = self._amount_stats
+        if stats['count'] < 2:
+            return np.nan
+        mean = stats['sum'] / stats['count']
+        variance = max(stats['sumsq'] - stats['count'] * mean ** 2, 0.0) / (stats['count'] - 1)
+        return mean + 3 * np.sqrt(variance)
+
+    def _report_anomalies(self, df):
         anomaly_count = 0
-        
-        mean_amount = self.df['amount'].mean()
-        std_amount = self.df['amount'].std()
-        threshold = mean_amount + (3 * std_amount)
-        
-        high_value_txns = self.df[self.df['amount'] > threshold]
-        if len(high_value_txns) > 0:
-            anomaly_count += len(high_value_txns)
-            msg = f"Found {len(high_value_txns)} high-value anomalies (>${threshold:.2f})"
+        threshold = self._amount_threshold()
+
+        high_value_txns = int((pd.to_numeric(df['amount'], errors='coerce') > threshold).sum())
+        if high_value_txns > 0:
+            anomaly_count += high_value_txns
+            msg = f"Found {high_value_txns} high-value anomalies (>${threshold:.2f})"
             self.validation_results['anomalies'].append(msg)
             logger.info(msg)
-        
-        failed_txns = self.df[self.df['status'] == 'failed']
-        if len(failed_txns) > 0:
-            failure_rate = (len(failed_txns) / len(self.df)) * 100
+
+        return anomaly_count
+
+    def _report_failure_rate(self):
+        stats = self._amount_stats
+        total = self.validation_results['total_records']
+        if stats['failed'] > 0 and total:
+            failure_rate = (stats['failed'] / total) * 100
             if failure_rate > 10:
                 msg = f"High failure rate detected: {failure_rate:.2f}%"
                 self.validation_results['anomalies'].append(msg)
                 logger.warning(msg)
-                anomaly_count += 1
-        
-        return anomaly_count
-    
+                return 1
+        return 0
+
     def validate_completeness(self):
         """Validate data completeness"""
         logger.info("Validating data completeness...")
-        
-        required_fields = ['transaction_id', 'sender', 'receiver', 'amount', 'status']
-        missing_values = self.df[required_fields].isnull().sum().sum()
-        
+
+        missing_values = int(self._frame()[self.REQUIRED_FIELDS].isnull().sum().sum())
+
         if missing_values > 0:
             msg = f"Found {missing_values} missing values in required fields"
             self.validation_results['errors'].append(msg)
             logger.error(msg)
             return False
-        
+
         return True
-    
+
+    def _count_rows(self, df, flags):
+        """Add exact per-rule and valid/invalid row counts; quarantine invalid rows"""
+        results = self.validation_results
+        for name, bit in RULE_BITS.items():
+            results['rule_failures'][name] += int(np.count_nonzero(flags & bit))
+        invalid = (flags & ERROR_RULES) != 0
+        invalid_count = int(invalid.sum())
+        results['invalid_records'] += invalid_count
+        results['valid_records'] += len(flags) - invalid_count
+        if self.quarantine is not None and invalid_count:
+            self.quarantine.write(df[invalid].assign(failed_rules=flags[invalid]))
+            results['quarantined_records'] += invalid_count
+        return invalid
+
     def validate(self):
         """Execute complete validation pipeline"""
         logger.info("Starting validation pipeline...")
-        
+
         all_valid = True
-        
+
         all_valid &= self.validate_completeness()
         all_valid &= self.validate_phone_numbers()
         all_valid &= self.validate_status_values()
         all_valid &= self.validate_amount_range()
         all_valid &= self.validate_transaction_types()
-        
+
         self.detect_anomalies()
-        
-        self.validation_results['valid_records'] = len(self.df) - len(self.validation_results['errors'])
-        self.validation_results['invalid_records'] = len(self.validation_results['errors'])
-        self.validation_results['validation_passed'] = all_valid
-        
+
+        self.row_flags = self.failed_rules(self._frame(), self._frame_masks())
+        self._count_rows(self.df, self.row_flags)
+        self.validation_results['validation_passed'] = bool(all_valid)
+
         logger.info(f"Validation completed. Valid: {self.validation_results['valid_records']}")
-        
-        return all_valid
-    
+
+        return bool(all_valid)
+
+    def validate_chunk(self, df):
+        """
+        Validate one chunk and accumulate the results
+
+        Returns:
+            DataFrame: The chunk's valid rows (invalid rows go to the quarantine)
+        """
+        self.validation_results['total_records'] += len(df)
+        if df.empty:
+            return df
+        view = self._rule_view(df)
+        flags = self.failed_rules(view)
+        self._accumulate_amount_stats(view)
+        # High-value anomalies are judged against the amounts seen up to this chunk
+        self._report_anomalies(view)
+        # Valid and quarantined rows are passed on as they came in
+        invalid = self._count_rows(df, flags)
+        return df[~invalid] if invalid.any() else df
+
+    def finish(self):
+        """Close a chunked validation; returns the results"""
+        results = self.validation_results
+        for name, count in results['rule_failures'].items():
+            if count:
+                msg = f"Found {count} transactions failing {name}"
+                (results['errors'] if RULE_BITS[name] & ERROR_RULES else results['warnings']).append(msg)
+        self._report_failure_rate()
+        results['validation_passed'] = results['invalid_records'] == 0
+        if self.quarantine is not None:
+            self.quarantine.close()
+        logger.info(f"Validation completed. Valid: {results['valid_records']}, invalid: {results['invalid_records']}")
+        return results
+
     def get_results(self):
         """Return validation results"""
         return self.validation_results
@@ -170,7 +395,7 @@ class TransactionValidator:
 def validate_transactions(data):
     """Main validation function"""
     logger.info("Validating transaction data...")
-    
+
     if isinstance(data, pd.DataFrame):
         df = data
     elif isinstance(data, list):
@@ -178,8 +403,8 @@ def validate_transactions(data):
     else:
         logger.error("Invalid data format")
         return False
-    
+
     validator = TransactionValidator(df)
     is_valid = validator.validate()
-    
+
     return is_valid
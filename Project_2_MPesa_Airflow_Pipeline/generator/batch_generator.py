@@ -0,0 +1,329 @@
+"""
+Batched M-Pesa Transaction Generator
+
+Vectorized counterpart of TransactionGenerator for load-testing volumes
+(a realistic day is ~30M transactions). Whole columns are drawn with NumPy
+per batch instead of one dict at a time:
+- Seedable and reproducible: batch i always comes from the same random
+  stream (seed, i), whatever the batch size of other batches or the sharding
+- Shardable: shard k of n produces batches k, k+n, k+2n, ..., so n processes
+  together write exactly the rows a single process would
+- Sender/receiver popularity follows a Zipf law over a fixed subscriber
+  population, so a few numbers account for much of the traffic
+- Timestamps follow an hourly (diurnal) profile within the date range
+
+Batches can be written to Parquet, CSV, or a topic stand-in (JSON lines per
+partition, or any producer with a kafka-python style ``send``).
+"""
+
+import argparse
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+
+from generator.transaction_generator import TransactionGenerator
+
+logger = logging.getLogger(__name__)
+
+# Relative transaction volume per hour of day (00:00-23:00): quiet nights,
+# morning, lunchtime and evening peaks
+DIURNAL_PROFILE = [
+    0.6, 0.4, 0.3, 0.3, 0.4, 0.9, 2.0, 3.6, 5.2, 5.8, 5.6, 5.5,
+    6.0, 6.2, 5.6, 5.3, 5.5, 6.4, 7.0, 6.6, 5.4, 4.0, 2.4, 1.3,
+]
+# Safaricom numbers 254712000000-254719999999
+PHONE_BASE = 254712000000
+PHONE_SPACE = 8_000_000
+# Odd multiplier: spreads Zipf ranks over the number space without collisions
+PHONE_MULTIPLIER = 2_654_435_761
+HEX_DIGITS = np.frombuffer(b'0123456789ABCDEF', dtype=np.uint8)
+# '0000'...'9999' as a (10000, 4) byte table
+DECIMAL_BLOCKS = np.frombuffer(''.join(f'{i:04d}' for i in range(10000)).encode(), dtype=np.uint8).reshape(-1, 4)
+
+
+def _hex(values, width):
+    """Fixed-width upper-case hex digits (as a uint8 matrix) for non-negative ints"""
+    shifts = np.arange(width - 1, -1, -1, dtype=np.int64) * 4
+    return HEX_DIGITS[(values.astype(np.int64)[:, None] >> shifts) & 0xF]
+
+
+def _decimal(values, width):
+    """Fixed-width decimal digits (as a uint8 matrix); width is a multiple of 4"""
+    values = values.astype(np.int64)
+    blocks = [DECIMAL_BLOCKS[(values // 10 ** (4 * i)) % 10000] for i in range(width // 4 - 1, -1, -1)]
+    return np.hstack(blocks)
+
+
+def _strings(*parts):
+    """Concatenate uint8 matrices / byte prefixes column-wise into a pyarrow-backed string array
+
+    Fixed-width rows become one Arrow buffer directly, without a Python object per value.
+    """
+    import pyarrow as pa
+
+    n = next(len(p) for p in parts if isinstance(p, np.ndarray))
+    columns = [p if isinstance(p, np.ndarray) else np.broadcast_to(np.frombuffer(p, np.uint8), (n, len(p)))
+               for p in parts]
+    matrix = np.hstack(columns)
+    offsets = np.arange(0, (n + 1) * matrix.shape[1], matrix.shape[1], dtype=np.int32)
+    array = pa.StringArray.from_buffers(n, pa.py_buffer(offsets), pa.py_buffer(np.ascontiguousarray(matrix)))
+    return pd.arrays.ArrowStringArray(array)
+
+
+class BatchTransactionGenerator:
+    """Generate transactions as columnar batches"""
+
+    TRANSACTION_TYPES = TransactionGenerator.TRANSACTION_TYPES
+    STATUSES = TransactionGenerator.STATUSES
+    STATUS_WEIGHTS = [85, 10, 3, 2]
+    PROVIDERS = TransactionGenerator.PROVIDERS
+    AMOUNT_RANGES = TransactionGenerator.AMOUNT_RANGES
+
+    def __init__(self, seed=42, start_date=None, end_date=None, subscribers=1_000_000, sender_skew=1.1,
+                 receiver_skew=1.05, diurnal_profile=None, batch_size=1_000_000):
+        """
+        Initialize generator
+
+        Args:
+            seed: Base seed; same seed and parameters => same rows
+            start_date, end_date: Timestamp range (default: the 30 days before 2024-01-31)
+            subscribers: Size of the phone number population (<= 8M)
+            sender_skew, receiver_skew: Zipf exponents (0 = uniform)
+            diurnal_profile: 24 hourly weights (default: DIURNAL_PROFILE)
+            batch_size: Rows per batch; fixes which row lands in which batch
+        """
+        if not 0 < subscribers <= PHONE_SPACE:
+            raise ValueError(f"subscribers must be between 1 and {PHONE_SPACE}")
+        profile = np.asarray(diurnal_profile or DIURNAL_PROFILE, dtype=float)
+        if profile.shape != (24,) or (profile < 0).any() or profile.sum() == 0:
+            raise ValueError("diurnal_profile needs 24 non-negative weights")
+
+        self.seed = seed
+        self.end_date = end_date or datetime(2024, 1, 31)
+        self.start_date = start_date or (self.end_date - timedelta(days=30))
+        self.subscribers = subscribers
+        self.batch_size = batch_size
+        self.hour_cdf = np.cumsum(profile) / profile.sum()
+        self.sender_cdf = self._zipf_cdf(sender_skew)
+        self.receiver_cdf = self._zipf_cdf(receiver_skew)
+        self.status_cdf = np.cumsum(self.STATUS_WEIGHTS) / sum(self.STATUS_WEIGHTS)
+        self.amount_low = np.array([self.AMOUNT_RANGES[t][0] for t in self.TRANSACTION_TYPES], dtype=float)
+        self.amount_high = np.array([self.AMOUNT_RANGES[t][1] for t in self.TRANSACTION_TYPES], dtype=float)
+
+        start = np.datetime64(pd.Timestamp(self.start_date).floor('D').to_datetime64(), 's')
+        self.start = start
+        self.days = max(1, int(np.ceil((pd.Timestamp(self.end_date) - pd.Timestamp(start)).total_seconds() / 86400)))
+        # YYYYMMDD of each day in range, for transaction ids
+        dates = pd.date_range(pd.Timestamp(start), periods=self.days, freq='D')
+        self.day_digits = _decimal(np.asarray(dates.year * 10000 + dates.month * 100 + dates.day), 8)
+
+    def _zipf_cdf(self, skew):
+        weights = 1.0 / np.arange(1, self.subscribers + 1, dtype=float) ** skew
+        return np.cumsum(weights) / weights.sum()
+
+    def _phones(self, rng, cdf, n):
+        rank = np.searchsorted(cdf, rng.random(n), side='right')
+        return (rank.astype(np.int64) * PHONE_MULTIPLIER) % PHONE_SPACE + PHONE_BASE
+
+    def batch(self, index, rows=None):
+        """
+        Batch ``index`` (rows batch_size*index ...) as a DataFrame
+
+        Args:
+            rows: Rows in this batch (default batch_size; the last batch may be shorter)
+        """
+        n = self.batch_size if rows is None else rows
+        rng = np.random.default_rng([self.seed, index])
+        row_ids = index * self.batch_size + np.arange(n, dtype=np.int64)
+
+        type_idx = rng.integers(0, len(self.TRANSACTION_TYPES), n)
+        low, high = self.amount_low[type_idx], self.amount_high[type_idx]
+        amount = np.round(low + rng.random(n) * (high - low), 2)
+
+        day = rng.integers(0, self.days, n)
+        hour = np.searchsorted(self.hour_cdf, rng.random(n), side='right')
+        seconds = day * 86400 + hour * 3600 + rng.integers(0, 3600, n)
+        timestamp = self.start + seconds.astype('timedelta64[s]')
+
+        senders = self._phones(rng, self.sender_cdf, n)
+        receivers = self._phones(rng, self.receiver_cdf, n)
+        # Nobody sends to themselves: shift clashing receivers to the next number
+        same = senders == receivers
+        receivers[same] = (senders[same] - PHONE_BASE + 1) % PHONE_SPACE + PHONE_BASE
+
+        transaction_id = _strings(b'TXN', self.day_digits[day], _hex(row_ids, 10))
+        reference = _strings(b'REF', _hex(rng.integers(0, 1 << 32, n), 8))
+
+        return pd.DataFrame({
+            'transaction_id': transaction_id,
+            'sender': _strings(_decimal(senders, 12)),
+            'receiver': _strings(_decimal(receivers, 12)),
+            'amount': amount,
+            'timestamp': timestamp,
+            'transaction_type': pd.Categorical.from_codes(type_idx, self.TRANSACTION_TYPES),
+            'status': pd.Categorical.from_codes(
+                np.searchsorted(self.status_cdf, rng.random(n), side='right'), self.STATUSES),
+            'provider': pd.Categorical.from_codes(rng.integers(0, len(self.PROVIDERS), n), self.PROVIDERS),
+            'fee': np.round(rng.random(n) * 50, 2),
+            'reference': reference,
+        })
+
+    def batches(self, total_rows, shard=0, num_shards=1):
+        """Yield this shard's batches of a ``total_rows`` dataset"""
+        if not 0 <= shard < num_shards:
+            raise ValueError("shard must be in [0, num_shards)")
+        num_batches = -(-total_rows // self.batch_size)
+        for index in range(shard, num_batches, num_shards):
+            yield self.batch(index, min(self.batch_size, total_rows - index * self.batch_size))
+
+
+class ParquetSink:
+    """Write batches to one Parquet file"""
+
+    def __init__(self, path, compression='zstd'):
+        self.path = path
+        self.compression = compression
+        self._writer = None
+
+    def write(self, df):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        table = pa.Table.from_pandas(df, preserve_index=False)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.path, table.schema, compression=self.compression)
+        self._writer.write_table(table)
+
+    def close(self):
+        if self._writer is not None:
+            self._writer.close()
+
+
+class CsvSink:
+    """Write batches to one CSV file (ISO timestamps, like TransactionGenerator)"""
+
+    def __init__(self, path):
+        self.path = path
+        self._header = True
+
+    def write(self, df):
+        df.to_csv(self.path, mode='w' if self._header else 'a', header=self._header, index=False,
+                  date_format='%Y-%m-%dT%H:%M:%S')
+        self._header = False
+
+    def close(self):
+        pass
+
+
+class TopicSink:
+    """Kafka stand-in: JSON events partitioned by sender
+
+    With ``producer`` (e.g. kafka-python KafkaProducer with a JSON value
+    serializer) events are sent to ``topic`` keyed by sender. Otherwise they are
+    appended to <directory>/<topic>/partition-<n>.jsonl, one event per line.
+    """
+
+    def __init__(self, topic='mpesa-transactions', directory=None, partitions=6, producer=None):
+        if producer is None and directory is None:
+            raise ValueError("TopicSink needs a directory or a producer")
+        self.topic = topic
+        self.partitions = partitions
+        self.producer = producer
+        self.directory = os.path.join(directory, topic) if directory else None
+        self.sent = 0
+        if self.directory:
+            os.makedirs(self.directory, exist_ok=True)
+
+    def write(self, df):
+        events = df.assign(timestamp=df['timestamp'].dt.strftime('%Y-%m-%dT%H:%M:%S'))
+        if self.producer is not None:
+            for record in events.to_dict('records'):
+                self.producer.send(self.topic, key=record['sender'].encode(), value=record)
+        else:
+            partition = pd.util.hash_array(events['sender'].to_numpy(dtype=object)) % np.uint64(self.partitions)
+            for p in np.unique(partition):
+                lines = events[partition == p].to_json(orient='records', lines=True)
+                with open(os.path.join(self.directory, f'partition-{int(p)}.jsonl'), 'a') as f:
+                    f.write(lines if lines.endswith('\n') else lines + '\n')
+        self.sent += len(df)
+
+    def close(self):
+        if self.producer is not None:
+            self.producer.flush()
+
+
+def open_sink(output, fmt, shard=0, topic='mpesa-transactions', partitions=6):
+    """Sink for one shard: part-<shard>.parquet/.csv, or the shared topic directory"""
+    if fmt == 'topic':
+        return TopicSink(topic, directory=output, partitions=partitions)
+    os.makedirs(output, exist_ok=True)
+    path = os.path.join(output, f'part-{shard:05d}.{fmt}')
+    if fmt == 'parquet':
+        return ParquetSink(path)
+    if fmt == 'csv':
+        return CsvSink(path)
+    raise ValueError(f"Unknown format {fmt!r}")
+
+
+def write_shard(total_rows, output, fmt='parquet', shard=0, num_shards=1, generator_options=None):
+    """Generate and write one shard; returns the number of rows written"""
+    generator = BatchTransactionGenerator(**(generator_options or {}))
+    sink = open_sink(output, fmt, shard)
+    rows = 0
+    try:
+        for df in generator.batches(total_rows, shard, num_shards):
+            sink.write(df)
+            rows += len(df)
+    finally:
+        sink.close()
+    logger.info(f"Shard {shard}/{num_shards}: wrote {rows} rows")
+    return rows
+
+
+def generate_dataset(total_rows, output, fmt='parquet', num_shards=1, workers=1, generator_options=None):
+    """Write ``total_rows`` transactions as ``num_shards`` files using ``workers`` processes"""
+    if fmt == 'topic' and workers > 1:
+        raise ValueError("The topic stand-in appends to shared files; use workers=1")
+    args = [(total_rows, output, fmt, shard, num_shards, generator_options) for shard in range(num_shards)]
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            return sum(pool.map(write_shard, *zip(*args)))
+    return sum(write_shard(*a) for a in args)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Generate large synthetic M-Pesa transaction datasets')
+    parser.add_argument('--rows', type=int, default=1_000_000)
+    parser.add_argument('--output', default='data/generated')
+    parser.add_argument('--format', choices=['parquet', 'csv', 'topic'], default='parquet')
+    parser.add_argument('--shards', type=int, default=1)
+    parser.add_argument('--workers', type=int, default=1)
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--batch-size', type=int, default=1_000_000)
+    parser.add_argument('--subscribers', type=int, default=1_000_000)
+    parser.add_argument('--sender-skew', type=float, default=1.1)
+    parser.add_argument('--receiver-skew', type=float, default=1.05)
+    parser.add_argument('--start-date', type=lambda s: datetime.fromisoformat(s))
+    parser.add_argument('--end-date', type=lambda s: datetime.fromisoformat(s))
+    args = parser.parse_args(argv)
+
+    options = {
+        'seed': args.seed, 'batch_size': args.batch_size, 'subscribers': args.subscribers,
+        'sender_skew': args.sender_skew, 'receiver_skew': args.receiver_skew,
+        'start_date': args.start_date, 'end_date': args.end_date,
+    }
+    started = datetime.now()
+    rows = generate_dataset(args.rows, args.output, args.format, args.shards, args.workers, options)
+    seconds = (datetime.now() - started).total_seconds()
+    print(f"\n✓ Generated {rows} transactions in {seconds:.1f}s ({rows / max(seconds, 1e-9):,.0f} rows/s)")
+    print(json.dumps({'output': args.output, 'format': args.format, 'shards': args.shards}, indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    main()
@@ -5,12 +5,15 @@ Orchestrates the M-Pesa transaction ETL pipeline with Airflow.
 Handles data extraction, validation, cleaning, and loading.
 """
 
+from contextlib import contextmanager
 from datetime import datetime, timedelta
 from airflow import DAG
 from airflow.operators.python import PythonOperator
 from airflow.operators.bash import BashOperator
 from airflow.models import TaskGroup
+from airflow.utils.trigger_rule import TriggerRule
 import logging
+import os
 
 logger = logging.getLogger(__name__)
 
@@ -34,167 +37,330 @@ dag = DAG(
     schedule_interval='0 */6 * * *',  # Every 6 hours
     start_date=datetime(2024, 1, 1),
     catchup=False,
+    max_active_runs=1,  # Watermarks and rollups advance run after run
     tags=['mpesa', 'etl', 'transactions'],
 )
 
 # ===== Python Callables =====
 
+# Task outputs live in the artifact store; XCom only carries their manifests
+ARTIFACT_RETENTION = timedelta(days=int(os.environ.get('MPESA_ARTIFACT_RETENTION_DAYS', 3)))
+CLEAN_CHUNK_SIZE = int(os.environ.get('MPESA_CLEAN_CHUNK_SIZE', 500_000))
+LOAD_BATCH_SIZE = int(os.environ.get('MPESA_LOAD_BATCH_SIZE', 50_000))
+LOAD_WORKERS = int(os.environ.get('MPESA_LOAD_WORKERS', 1))
+# Rolling per-sender fraud state (recent events and running baselines); set it empty to
+# score every run on its own, without state carried over from earlier runs
+FRAUD_STATE_DIR = os.environ.get(
+    'MPESA_FRAUD_STATE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'fraud_state')) or None
+
+
+QUARANTINE_DIR = os.environ.get(
+    'MPESA_QUARANTINE_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'quarantine'))
+# Incremental extraction: a source table in the M-Pesa database or a landing directory of files
+SOURCE_TABLE = os.environ.get('MPESA_SOURCE_TABLE')
+LANDING_DIR = os.environ.get('MPESA_LANDING_DIR')
+LANDING_FORMAT = os.environ.get('MPESA_LANDING_FORMAT', 'parquet')
+# Watermarks and run history live in the M-Pesa database when configured, otherwise here
+WATERMARK_DB_URL = os.environ.get(
+    'MPESA_WATERMARK_DB_URL',
+    'sqlite:///' + os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'watermarks.db'))
+# Clean -> score -> load fan out over this many partitions by sender hash
+# ('provider' needs MPESA_FRAUD_STATE_DIR set empty: it splits senders across partitions)
+PARTITION_COUNT = int(os.environ.get('MPESA_PARTITIONS', 4))
+PARTITION_BY = os.environ.get('MPESA_PARTITION_BY', 'sender')
+# Backfills are split into sub-ranges extracted in parallel
+BACKFILL_STEP = timedelta(hours=int(os.environ.get('MPESA_BACKFILL_STEP_HOURS', 1)))
+EXTRACT_WORKERS = int(os.environ.get('MPESA_EXTRACT_WORKERS', 4))
+# Per-task metrics: Prometheus textfiles here, plus the etl_task_runs history table
+METRICS_DIR = os.environ.get(
+    'MPESA_METRICS_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'metrics'))
+# Alert when a task's rows/sec falls below this fraction of its recent median
+THROUGHPUT_REGRESSION_RATIO = float(os.environ.get('MPESA_THROUGHPUT_REGRESSION_RATIO', 0.5))
+
+
+def get_artifact_store():
+    """Artifact store shared by all tasks (root from MPESA_ARTIFACT_ROOT)"""
+    from etl.artifacts import ArtifactStore
+    return ArtifactStore()
+
+
+def get_state_engine():
+    """The M-Pesa database, or a local SQLite file (MPESA_WATERMARK_DB_URL) for pipeline state"""
+    from sqlalchemy import create_engine
+    
+    engine = get_mpesa_engine()
+    if engine is None:
+        if WATERMARK_DB_URL.startswith('sqlite:///'):
+            os.makedirs(os.path.dirname(WATERMARK_DB_URL[len('sqlite:///'):]), exist_ok=True)
+        engine = create_engine(WATERMARK_DB_URL)
+    return engine
+
+def get_watermark_store():
+    """Watermark table in the pipeline state database"""
+    from etl.extract import WatermarkStore
+    return WatermarkStore(get_state_engine())
+
+def get_run_history():
+    """Per-task run history in the pipeline state database"""
+    from etl.metrics import RunHistory
+    return RunHistory(get_state_engine())
+
+@contextmanager
+def task_metrics(task, context, partition=None):
+    """Time a task body; exports Prometheus metrics and records run history when it ends"""
+    from airflow.exceptions import AirflowSkipException
+    from etl.metrics import TaskMetrics, write_prometheus
+    
+    metrics = TaskMetrics(task, context['run_id'], partition)
+    try:
+        with metrics:
+            yield metrics
+    except AirflowSkipException:
+        metrics.status = 'skipped'
+        raise
+    finally:
+        # Metrics must never fail the task they measure
+        try:
+            history = get_run_history()
+            alert = history.check_regression(metrics, threshold=THROUGHPUT_REGRESSION_RATIO)
+            history.record(metrics)
+            history.engine.dispose()
+            write_prometheus(metrics, METRICS_DIR)
+            if alert:
+                context['task_instance'].xcom_push(key='throughput_alert', value=alert)
+            logger.info(f"Task metrics: {metrics.as_dict()}")
+        except Exception as e:
+            logger.warning(f"Could not record metrics of {task}: {e}")
+
+def get_transaction_source():
+    """Configured incremental source (MPESA_SOURCE_TABLE or MPESA_LANDING_DIR), or None"""
+    from etl.extract import LandingDirectorySource, TableSource
+    
+    if SOURCE_TABLE:
+        engine = get_mpesa_engine()
+        if engine is None:
+            raise ValueError("MPESA_SOURCE_TABLE needs MPESA_DB_URL or MPESA_DB_* settings")
+        return TableSource(engine, SOURCE_TABLE)
+    if LANDING_DIR:
+        return LandingDirectorySource(LANDING_DIR, file_format=LANDING_FORMAT)
+    return None
+
 def extract_transactions(**context):
     """Extract transaction data from source systems"""
+    from airflow.exceptions import AirflowSkipException
+    from etl.extract import IncrementalExtractor
     from generator.transaction_generator import TransactionGenerator
     
     logger.info("Starting transaction extraction...")
     
-    generator = TransactionGenerator()
-    transactions = generator.generate_transactions(count=5000)
-    
-    # Push to XCom for downstream tasks
-    context['task_instance'].xcom_push(key='transaction_count', value=len(transactions))
-    context['task_instance'].xcom_push(key='transactions', value=transactions)
-    
-    logger.info(f"Extracted {len(transactions)} transactions")
-    return len(transactions)
+    ti = context['task_instance']
+    source = get_transaction_source()
+    store = get_artifact_store()
+    
+    with task_metrics('extract_transactions', context) as metrics:
+        if source is None:
+            logger.warning("No MPESA_SOURCE_TABLE / MPESA_LANDING_DIR configured; generating sample transactions")
+            generator = TransactionGenerator()
+            manifest = store.write(context['run_id'], 'transactions', generator.generate_transactions(count=5000))
+        else:
+            # Only rows of this data interval that are past the source's watermark
+            extractor = IncrementalExtractor(source, get_watermark_store(), chunk_size=CLEAN_CHUNK_SIZE)
+            chunks = extractor.extract(context['data_interval_start'], context['data_interval_end'],
+                                       backfill_step=BACKFILL_STEP, workers=EXTRACT_WORKERS)
+            first = next(chunks, None)
+            if first is None:
+                raise AirflowSkipException(f"No new transactions in {source.name} for this interval")
+            
+            def all_chunks():
+                yield first
+                yield from chunks
+            
+            manifest = store.write(context['run_id'], 'transactions', all_chunks())
+            # The watermark is committed by generate_report once these rows are loaded
+            ti.xcom_push(key='extract_stats', value=extractor.stats)
+        metrics.rows_in = metrics.rows_out = manifest['rows']
+    
+    # Push only the manifest to XCom for downstream tasks
+    ti.xcom_push(key='transaction_count', value=manifest['rows'])
+    ti.xcom_push(key='transactions_manifest', value=manifest)
+    
+    logger.info(f"Extracted {manifest['rows']} transactions")
+    return manifest['rows']
 
 def validate_raw_data(**context):
     """Validate raw extracted data"""
+    from etl.artifacts import safe_run_id
+    from etl.pipeline import validate_stage
+    from etl.validate import Quarantine
+    
     logger.info("Validating raw data...")
     
     ti = context['task_instance']
-    transactions = ti.xcom_pull(task_ids='extract_transactions', key='transactions')
+    manifest = ti.xcom_pull(task_ids='extract_transactions', key='transactions_manifest')
     
-    if not transactions:
+    if not manifest or not manifest['rows']:
         raise ValueError("No transactions extracted")
     
-    # Data validation checks
-    validation_results = {
-        'total_records': len(transactions),
-        'required_fields': ['transaction_id', 'sender', 'receiver', 'amount'],
-        'valid_records': 0,
-        'invalid_records': 0
-    }
-    
-    for txn in transactions:
-        has_required = all(field in txn for field in validation_results['required_fields'])
-        if has_required and txn.get('amount', 0) > 0:
-            validation_results['valid_records'] += 1
-        else:
-            validation_results['invalid_records'] += 1
+    # One vectorized pass per batch; failing rows are kept aside for inspection and
+    # only the valid rows go on to partitioning
+    os.makedirs(QUARANTINE_DIR, exist_ok=True)
+    quarantine = Quarantine(os.path.join(QUARANTINE_DIR, f"{safe_run_id(context['run_id'])}.parquet"))
+    with task_metrics('validate_raw_data', context) as metrics:
+        validation_results, valid_manifest = validate_stage(get_artifact_store(), context['run_id'], manifest,
+                                                            quarantine=quarantine, chunk_size=CLEAN_CHUNK_SIZE)
+        metrics.rows_in = validation_results['total_records']
+        metrics.rows_out = validation_results['valid_records']
     
     validation_rate = (validation_results['valid_records'] / validation_results['total_records']) * 100
     logger.info(f"Validation rate: {validation_rate:.2f}%")
+    logger.info(f"Rule failures: {validation_results['rule_failures']}")
     
     if validation_rate < 95:
         raise ValueError(f"Data validation failed. Valid rate: {validation_rate:.2f}%")
     
     ti.xcom_push(key='validation_results', value=validation_results)
+    ti.xcom_push(key='valid_manifest', value=valid_manifest)
     return validation_results
 
-def clean_data(**context):
-    """Clean and standardize transaction data"""
-    logger.info("Cleaning transaction data...")
+def partition_transactions(**context):
+    """Split the validated transactions into partitions; returns one op_kwargs dict per partition"""
+    from etl.partition import partition_artifact, require_sender_partitions
     
+    # detect_fraud keeps per-sender state when configured, so fail here rather than after cleaning
+    if FRAUD_STATE_DIR:
+        require_sender_partitions(PARTITION_BY)
     ti = context['task_instance']
-    transactions = ti.xcom_pull(task_ids='extract_transactions', key='transactions')
-    
-    cleaned_transactions = []
-    for txn in transactions:
-        cleaned_txn = {
-            'transaction_id': str(txn.get('transaction_id', '')).strip(),
-            'sender': str(txn.get('sender', '')).strip(),
-            'receiver': str(txn.get('receiver', '')).strip(),
-            'amount': float(txn.get('amount', 0)),
-            'timestamp': txn.get('timestamp', datetime.now().isoformat()),
-            'transaction_type': str(txn.get('transaction_type', 'unknown')).lower(),
-            'status': str(txn.get('status', 'pending')).lower(),
-            'provider': str(txn.get('provider', 'unknown')).strip(),
-            'fee': float(txn.get('fee', 0)),
-            'net_amount': float(txn.get('amount', 0)) - float(txn.get('fee', 0)),
-        }
-        cleaned_transactions.append(cleaned_txn)
-    
-    logger.info(f"Cleaned {len(cleaned_transactions)} transactions")
-    ti.xcom_push(key='cleaned_transactions', value=cleaned_transactions)
-    return len(cleaned_transactions)
-
-def detect_fraud(**context):
-    """Apply fraud detection rules"""
-    logger.info("Running fraud detection...")
-    
-    ti = context['task_instance']
-    transactions = ti.xcom_pull(task_ids='clean_data', key='cleaned_transactions')
-    
-    fraud_indicators = {
-        'total_transactions': len(transactions),
-        'flagged_suspicious': 0,
-        'high_value_txns': 0,
-        'rapid_transactions': 0,
-    }
-    
-    # Rule 1: Flag high-value transactions
-    for txn in transactions:
-        if txn['amount'] > 50000:
-            fraud_indicators['high_value_txns'] += 1
-            txn['risk_level'] = 'high'
-        elif txn['amount'] > 10000:
-            fraud_indicators['rapid_transactions'] += 1
-            txn['risk_level'] = 'medium'
-        else:
-            txn['risk_level'] = 'low'
-    
-    # Rule 2: Flag failed transactions
-    for txn in transactions:
-        if txn['status'] == 'failed':
-            fraud_indicators['flagged_suspicious'] += 1
+    manifest = ti.xcom_pull(task_ids='validation_group.validate_raw_data', key='valid_manifest')
     
-    fraud_rate = (fraud_indicators['flagged_suspicious'] / fraud_indicators['total_transactions']) * 100
+    partitions = partition_artifact(get_artifact_store(), context['run_id'], manifest, 'transactions',
+                                    by=PARTITION_BY, partitions=PARTITION_COUNT, batch_size=CLEAN_CHUNK_SIZE)
+    logger.info(f"Fanning out over {len(partitions)} partitions by {PARTITION_BY}")
+    return partitions
+
+def clean_data(partition, manifest, stats=None, **context):
+    """Clean and standardize one partition of transaction data"""
+    from etl.pipeline import clean_stage
+    
+    logger.info(f"Cleaning transaction data of partition {partition}...")
+    
+    # Stream the artifact through the cleaner batch by batch; duplicates are tracked across batches
+    with task_metrics('clean_data', context, partition) as metrics:
+        result = clean_stage(get_artifact_store(), context['run_id'], partition, manifest, stats,
+                             chunk_size=CLEAN_CHUNK_SIZE)
+        metrics.rows_in, metrics.rows_out = manifest['rows'], result['manifest']['rows']
+    return result
+
+def detect_fraud(partition, manifest, stats=None, **context):
+    """Apply fraud detection rules to one partition"""
+    from etl.partition import partition_state_dir
+    from etl.pipeline import score_stage
+    
+    logger.info(f"Running fraud detection on partition {partition}...")
+    
+    # Per-sender velocity windows and baselines carry over from earlier runs of the same partition
+    state_dir = partition_state_dir(FRAUD_STATE_DIR, PARTITION_BY, PARTITION_COUNT, partition) \
+        if FRAUD_STATE_DIR else None
+    with task_metrics('detect_fraud', context, partition) as metrics:
+        result = score_stage(get_artifact_store(), context['run_id'], partition, manifest, stats,
+                             state_dir=state_dir)
+        metrics.rows_in, metrics.rows_out = manifest['rows'], result['manifest']['rows']
+    
+    fraud = result['stats']['fraud']
+    fraud_rate = (fraud['flagged_suspicious'] / max(fraud['total_transactions'], 1)) * 100
     logger.info(f"Fraud detection complete. Flagged: {fraud_rate:.2f}%")
-    
-    ti.xcom_push(key='fraud_results', value=fraud_indicators)
-    ti.xcom_push(key='transactions_with_risk', value=transactions)
-    return fraud_indicators
+    return result
 
-def load_to_database(**context):
-    """Load cleaned and validated data to database"""
-    logger.info("Loading data to database...")
-    
-    ti = context['task_instance']
-    transactions = ti.xcom_pull(task_ids='detect_fraud', key='transactions_with_risk')
-    
-    # Simulated database insertion
-    load_stats = {
-        'total_inserted': len(transactions),
-        'successful': len([t for t in transactions if t['status'] == 'success']),
-        'failed': len([t for t in transactions if t['status'] == 'failed']),
-        'pending': len([t for t in transactions if t['status'] == 'pending']),
-        'timestamp': datetime.now().isoformat()
-    }
-    
-    logger.info(f"Loaded {load_stats['total_inserted']} transactions to database")
+def get_mpesa_engine():
+    """Engine for the M-Pesa database (MPESA_DB_URL or MPESA_DB_* settings); None when not configured"""
+    from sqlalchemy import create_engine
+    
+    url = os.environ.get('MPESA_DB_URL')
+    if not url and os.environ.get('MPESA_DB_NAME'):
+        url = (f"postgresql+psycopg2://{os.environ.get('MPESA_DB_USER', 'postgres')}:"
+               f"{os.environ.get('MPESA_DB_PASSWORD', '')}@{os.environ.get('MPESA_DB_HOST', 'localhost')}:"
+               f"{os.environ.get('MPESA_DB_PORT', '5432')}/{os.environ['MPESA_DB_NAME']}")
+    return create_engine(url, pool_size=max(LOAD_WORKERS, 5)) if url else None
+
+def load_to_database(partition, manifest, stats=None, **context):
+    """Load one cleaned and validated partition to database"""
+    from etl.pipeline import load_stage
+    
+    logger.info(f"Loading partition {partition} to database...")
+    
+    engine = get_mpesa_engine()
+    if engine is None:
+        logger.warning("MPESA_DB_URL / MPESA_DB_NAME not set; skipping database load")
+    try:
+        with task_metrics('load_to_database', context, partition) as metrics:
+            result = load_stage(get_artifact_store(), partition, manifest, stats, engine=engine,
+                                batch_size=LOAD_BATCH_SIZE, workers=LOAD_WORKERS)
+            metrics.rows_in, metrics.rows_out = manifest['rows'], result['stats']['loading']['total_inserted']
+    finally:
+        if engine is not None:
+            engine.dispose()
+    
+    load_stats = result['stats']['loading']
     logger.info(f"  - Successful: {load_stats['successful']}")
     logger.info(f"  - Failed: {load_stats['failed']}")
     logger.info(f"  - Pending: {load_stats['pending']}")
-    
-    ti.xcom_push(key='load_stats', value=load_stats)
-    return load_stats
+    return result
+
+def update_fraud_rollups(**context):
+    """Fold the newly loaded transactions into the fraud rollup tables"""
+    from etl.rollups import FraudRollups
+    
+    engine = get_mpesa_engine()
+    if engine is None:
+        logger.warning("MPESA_DB_URL / MPESA_DB_NAME not set; skipping fraud rollups")
+        return None
+    try:
+        rollups = FraudRollups(engine)
+        rollups.create_tables()
+        result = rollups.refresh()
+        rapid = rollups.rapid_senders_between(context['data_interval_start'], context['data_interval_end'])
+        result['rapid_senders'] = int(rapid['sender'].nunique())
+    finally:
+        engine.dispose()
+    
+    logger.info(f"Fraud rollups: {result}")
+    context['task_instance'].xcom_push(key='rollup_stats', value=result)
+    return result
 
-def generate_report(**context):
-    """Generate ETL execution report"""
+def generate_report(partitions, **context):
+    """Generate ETL execution report from the results of every partition"""
+    from etl.pipeline import summarize_partitions
+    
     logger.info("Generating ETL report...")
     
     ti = context['task_instance']
     extraction_count = ti.xcom_pull(task_ids='extract_transactions', key='transaction_count')
-    validation_results = ti.xcom_pull(task_ids='validate_raw_data', key='validation_results')
-    fraud_results = ti.xcom_pull(task_ids='detect_fraud', key='fraud_results')
-    load_stats = ti.xcom_pull(task_ids='load_to_database', key='load_stats')
+    validation_results = ti.xcom_pull(task_ids='validation_group.validate_raw_data', key='validation_results')
+    summary = summarize_partitions(list(partitions))
+    task_runs = get_run_history().run(context['run_id'])
+    for run in task_runs:
+        run['label'] = run['task'] if run['partition'] is None else f"{run['task']}[p{run['partition']}]"
+    
+    # Every partition is loaded: the extracted rows are durable, move the watermark past them
+    extract_stats = ti.xcom_pull(task_ids='extract_transactions', key='extract_stats')
+    watermark_advanced = get_watermark_store().commit(extract_stats) if extract_stats else False
     
     report = {
         'dag_execution_date': context['execution_date'].isoformat(),
         'extraction': {
             'total_transactions': extraction_count,
+            'watermark_advanced': watermark_advanced,
         },
         'validation': validation_results,
-        'fraud_detection': fraud_results,
-        'loading': load_stats,
+        'partitions': {'count': summary['partitions'], 'rows': summary['rows_per_partition'],
+                       'key': PARTITION_BY},
+        'cleaning': summary.get('cleaning', {}),
+        'fraud_detection': summary.get('fraud', {}),
+        'loading': summary.get('loading', {}),
+        'fraud_rollups': ti.xcom_pull(task_ids='update_fraud_rollups', key='rollup_stats'),
+        'task_metrics': [{k: run[k] for k in ('task', 'partition', 'duration_seconds', 'rows_in', 'rows_out',
+                                              'rows_per_sec', 'peak_memory_bytes', 'db_seconds')}
+                         for run in task_runs],
+        'throughput_regressions': [run['label'] for run in task_runs if run['throughput_regression']],
         'pipeline_status': 'SUCCESS',
         'completed_at': datetime.now().isoformat()
     }
@@ -204,12 +370,24 @@ def generate_report(**context):
     logger.info("="*60)
     logger.info(f"Extracted: {extraction_count} transactions")
     logger.info(f"Valid: {validation_results['valid_records']}")
-    logger.info(f"Loaded: {load_stats['total_inserted']}")
+    logger.info(f"Partitions: {summary['partitions']} by {PARTITION_BY}")
+    logger.info(f"Loaded: {report['loading'].get('total_inserted', 0)}")
     logger.info(f"Status: {report['pipeline_status']}")
+    for run in task_runs:
+        logger.info(f"  {run['label']}: {run['duration_seconds']}s, {run['rows_in']} -> {run['rows_out']} rows, "
+                    f"{run['rows_per_sec']} rows/s, DB {run['db_seconds']}s")
+    if report['throughput_regressions']:
+        logger.warning(f"Throughput regression in: {', '.join(report['throughput_regressions'])}")
     logger.info("="*60)
     
     return report
 
+def cleanup_artifacts(**context):
+    """Garbage-collect artifacts of expired runs"""
+    removed = get_artifact_store().gc(older_than=ARTIFACT_RETENTION, exclude=[context['run_id']])
+    logger.info(f"Removed artifacts of {len(removed)} expired runs")
+    return removed
+
 # ===== DAG Tasks =====
 
 with dag:
@@ -230,34 +408,54 @@ with dag:
             provide_context=True,
         )
     
+    # Partitioning: one mapped clean -> score -> load chain per partition
+    partition_task = PythonOperator(
+        task_id='partition_transactions',
+        python_callable=partition_transactions,
+        provide_context=True,
+    )
+    
     # Transformation Phase
     with TaskGroup('transformation_group', tooltip='Data cleaning and enrichment') as transformation_group:
-        clean_task = PythonOperator(
+        clean_task = PythonOperator.partial(
             task_id='clean_data',
             python_callable=clean_data,
-            provide_context=True,
-        )
+        ).expand(op_kwargs=partition_task.output)
         
-        fraud_task = PythonOperator(
+        fraud_task = PythonOperator.partial(
             task_id='detect_fraud',
             python_callable=detect_fraud,
-            provide_context=True,
-        )
+        ).expand(op_kwargs=clean_task.output)
     
     # Loading Phase
-    load_task = PythonOperator(
+    load_task = PythonOperator.partial(
         task_id='load_to_database',
         python_callable=load_to_database,
-        provide_context=True,
         retries=1,
+    ).expand(op_kwargs=fraud_task.output)
+    
+    # Incremental fraud aggregates, once every partition is loaded
+    rollup_task = PythonOperator(
+        task_id='update_fraud_rollups',
+        python_callable=update_fraud_rollups,
+        provide_context=True,
     )
     
-    # Reporting
+    # Reporting: fan-in over the results of every partition
     report_task = PythonOperator(
         task_id='generate_report',
         python_callable=generate_report,
+        op_kwargs={'partitions': load_task.output},
+        provide_context=True,
+    )
+    
+    # Artifact cleanup runs even when an upstream task failed
+    cleanup_task = PythonOperator(
+        task_id='cleanup_artifacts',
+        python_callable=cleanup_artifacts,
         provide_context=True,
+        trigger_rule=TriggerRule.ALL_DONE,
     )
     
     # Task Dependencies
-    extract_task >> validation_group >> transformation_group >> load_task >> report_task
+    extract_task >> validation_group >> partition_task >> transformation_group >> load_task >> rollup_task >> report_task >> cleanup_task
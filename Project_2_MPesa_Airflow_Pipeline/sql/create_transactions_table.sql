@@ -1,17 +1,23 @@
 -- M-Pesa Transactions Table
+-- Matches etl/load_to_db.py; the loader merges on the transaction_id unique key
 
 CREATE TABLE IF NOT EXISTS transactions (
     id SERIAL PRIMARY KEY,
-    transaction_id UUID UNIQUE NOT NULL,
+    transaction_id VARCHAR(50) UNIQUE NOT NULL,
     sender VARCHAR(20) NOT NULL,
     receiver VARCHAR(20) NOT NULL,
     amount DECIMAL(15, 2) NOT NULL,
     timestamp TIMESTAMP NOT NULL,
     transaction_type VARCHAR(50),
     status VARCHAR(20),
-    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    provider VARCHAR(50),
+    fee DECIMAL(10, 2),
+    net_amount DECIMAL(15, 2),
+    risk_level VARCHAR(20),
+    created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
 );
 
-CREATE INDEX idx_transaction_id ON transactions(transaction_id);
-CREATE INDEX idx_timestamp ON transactions(timestamp);
-CREATE INDEX idx_status ON transactions(status);
+-- transaction_id is already indexed by its UNIQUE constraint
+CREATE INDEX IF NOT EXISTS idx_timestamp ON transactions(timestamp);
+CREATE INDEX IF NOT EXISTS idx_status ON transactions(status);
@@ -1,24 +1,56 @@
 -- Fraud Detection Rules for M-Pesa
+-- The views read incremental rollups maintained by etl/rollups.py (refreshed after
+-- each load from new rows only) instead of scanning the transactions table.
 
--- Rule 1: Flag multiple transactions within short time
-CREATE VIEW suspicious_rapid_transactions AS
-SELECT 
-    sender,
-    COUNT(*) as transaction_count,
-    MAX(amount) as max_amount,
-    SUM(amount) as total_amount
-FROM transactions
-WHERE timestamp > NOW() - INTERVAL '1 hour'
-GROUP BY sender
-HAVING COUNT(*) > 10 OR SUM(amount) > 100000;
+CREATE TABLE IF NOT EXISTS sender_hourly_rollup (
+    sender VARCHAR(20) NOT NULL,
+    hour_start TIMESTAMP NOT NULL,
+    transaction_count INTEGER NOT NULL,
+    total_amount DECIMAL(18, 2) NOT NULL,
+    max_amount DECIMAL(15, 2) NOT NULL,
+    success_count INTEGER NOT NULL,
+    success_amount DECIMAL(18, 2) NOT NULL,
+    PRIMARY KEY (sender, hour_start)
+);
+
+-- Running amount totals: scope 'global' plus one row per sender
+CREATE TABLE IF NOT EXISTS amount_baseline (
+    scope VARCHAR(20) PRIMARY KEY,
+    transaction_count BIGINT NOT NULL,
+    total_amount DECIMAL(20, 2) NOT NULL
+);
+
+-- Highest transactions.id already folded into the rollups
+CREATE TABLE IF NOT EXISTS rollup_state (
+    name VARCHAR(50) PRIMARY KEY,
+    last_id BIGINT NOT NULL,
+    updated_at TIMESTAMP NOT NULL
+);
 
--- Rule 2: Flag unusually large transactions
-CREATE VIEW suspicious_large_amounts AS
-SELECT 
-    transaction_id,
+CREATE INDEX IF NOT EXISTS idx_transactions_amount ON transactions(amount);
+
+-- Rule 1: Flag multiple transactions within one clock hour. The previous hour is
+-- included so the last hour stays covered right after the clock turns over.
+CREATE OR REPLACE VIEW suspicious_rapid_transactions AS
+SELECT
     sender,
-    receiver,
-    amount
-FROM transactions
-WHERE amount > (SELECT AVG(amount) * 5 FROM transactions)
-    AND status = 'success';
+    transaction_count,
+    max_amount,
+    total_amount,
+    hour_start
+FROM sender_hourly_rollup
+WHERE hour_start >= date_trunc('hour', NOW()) - INTERVAL '1 hour'
+    AND (transaction_count > 10 OR total_amount > 100000);
+
+-- Rule 2: Flag unusually large transactions (5x the running average amount)
+CREATE OR REPLACE VIEW suspicious_large_amounts AS
+SELECT
+    t.transaction_id,
+    t.sender,
+    t.receiver,
+    t.amount
+FROM transactions t
+CROSS JOIN amount_baseline b
+WHERE b.scope = 'global'
+    AND t.amount > 5 * b.total_amount / NULLIF(b.transaction_count, 0)
+    AND t.status = 'success';
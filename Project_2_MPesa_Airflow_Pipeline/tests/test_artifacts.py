@@ -0,0 +1,74 @@
+"""
+Tests for the intermediate artifact store used between DAG tasks
+
+Tests cover:
+- Round trip of DataFrames, dict lists and batch iterables with a small manifest
+- Checksum verification of tampered artifacts
+- Garbage collection of expired runs
+"""
+
+import json
+import os
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+from etl.artifacts import ArtifactChecksumError, ArtifactStore, safe_run_id
+
+RUN_ID = 'scheduled__2024-01-01T06:00:00+00:00'
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path / 'artifacts'))
+
+
+class TestArtifactStore:
+
+    def test_round_trip_with_manifest(self, store, sample_dataframe):
+        manifest = store.write(RUN_ID, 'transactions', sample_dataframe)
+
+        assert manifest['rows'] == len(sample_dataframe)
+        assert manifest['path'].endswith(f"{safe_run_id(RUN_ID)}/transactions.parquet")
+        assert {'name': 'amount', 'type': 'double'} in manifest['schema']
+        assert len(json.dumps(manifest)) < 2048
+        pd.testing.assert_frame_equal(store.read(manifest), sample_dataframe)
+
+    def test_dict_list_and_batches(self, store, sample_transactions):
+        from_dicts = store.write(RUN_ID, 'raw', sample_transactions)
+        frames = [pd.DataFrame(sample_transactions[i:i + 20]) for i in range(0, 50, 20)]
+        from_batches = store.write(RUN_ID, 'batched', iter(frames))
+
+        assert from_dicts['rows'] == from_batches['rows'] == 50
+        assert [len(b) for b in store.iter_batches(from_batches, batch_size=25)] == [25, 25]
+        assert store.read(from_batches, columns=['transaction_id'])['transaction_id'].tolist() == \
+            [t['transaction_id'] for t in sample_transactions]
+
+    def test_tampered_artifact_is_rejected(self, store, sample_dataframe):
+        manifest = store.write(RUN_ID, 'transactions', sample_dataframe)
+        store.write(RUN_ID, 'transactions', sample_dataframe.head(10))
+
+        with pytest.raises(ArtifactChecksumError):
+            store.read(manifest)
+
+    def test_gc_removes_only_expired_runs(self, store, sample_dataframe):
+        for run in ('run_old', 'run_older', 'run_new'):
+            store.write(run, 'transactions', sample_dataframe)
+        old = (datetime.now() - timedelta(days=10)).timestamp()
+        for run in ('run_old', 'run_older'):
+            path = store.run_dir(run) + '/transactions.parquet'
+            os.utime(path, (old, old))
+
+        removed = store.gc(older_than=timedelta(days=3), keep_last=1, exclude=['run_older'])
+
+        assert removed == ['run_old']
+        assert set(store.list_runs()) == {'run_older', 'run_new'}
+
+    def test_gc_keeps_most_recent_runs(self, store, sample_dataframe):
+        store.write('run_a', 'transactions', sample_dataframe)
+
+        later = datetime.now(timezone.utc) + timedelta(days=30)
+
+        assert store.gc(older_than=timedelta(days=1), keep_last=1, now=later) == []
+        assert store.gc(older_than=timedelta(days=1), keep_last=0, now=later) == ['run_a']
@@ -0,0 +1,116 @@
+"""
+Tests for the batched NumPy transaction generator
+
+Tests cover:
+- Same seed gives the same rows; sharding does not change the dataset
+- Column formats and value ranges matching TransactionGenerator
+- Zipf sender skew and the diurnal timestamp profile
+- Parquet, CSV and topic stand-in sinks
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl.validate import TransactionValidator
+from generator.batch_generator import BatchTransactionGenerator, TopicSink, generate_dataset
+
+
+@pytest.fixture
+def generator():
+    return BatchTransactionGenerator(seed=7, batch_size=1000, subscribers=5000)
+
+
+class TestBatchGenerator:
+
+    def test_reproducible_and_shardable(self, generator):
+        whole = pd.concat(generator.batches(3500), ignore_index=True)
+        again = pd.concat(BatchTransactionGenerator(seed=7, batch_size=1000, subscribers=5000).batches(3500),
+                          ignore_index=True)
+        shards = pd.concat([df for shard in range(3) for df in generator.batches(3500, shard, 3)])
+
+        pd.testing.assert_frame_equal(whole, again)
+        assert len(shards) == 3500
+        pd.testing.assert_frame_equal(whole.sort_values('transaction_id', ignore_index=True),
+                                      shards.sort_values('transaction_id', ignore_index=True))
+        assert not whole.equals(pd.concat(BatchTransactionGenerator(seed=8, batch_size=1000).batches(3500)))
+
+    def test_columns_match_transaction_generator(self, generator):
+        df = generator.batch(0)
+
+        assert df['transaction_id'].is_unique
+        assert df['transaction_id'].str.match(r'^TXN\d{8}[0-9A-F]{10}$').all()
+        assert df['sender'].str.match(r'^2547(1[2-9])\d{6}$').all()
+        assert (df['sender'] != df['receiver']).all()
+        low = df['transaction_type'].map(lambda t: generator.AMOUNT_RANGES[t][0]).astype(float)
+        high = df['transaction_type'].map(lambda t: generator.AMOUNT_RANGES[t][1]).astype(float)
+        assert df['amount'].between(low, high).all()
+        assert set(df['status']) <= set(generator.STATUSES)
+        assert TransactionValidator(df).validate() is True
+
+    def test_sender_skew_and_diurnal_profile(self):
+        df = BatchTransactionGenerator(seed=1, batch_size=50_000, sender_skew=1.2).batch(0)
+        uniform = BatchTransactionGenerator(seed=1, batch_size=50_000, sender_skew=0).batch(0)
+
+        top = df['sender'].value_counts()
+        assert top.iloc[0] > 0.1 * len(df)
+        assert uniform['sender'].value_counts().iloc[0] < 10
+        hours = df['timestamp'].dt.hour.value_counts()
+        assert hours[18] > 10 * hours[3]
+
+    def test_invalid_profile(self):
+        with pytest.raises(ValueError):
+            BatchTransactionGenerator(diurnal_profile=[1] * 12)
+
+
+class TestSinks:
+
+    @pytest.mark.parametrize('fmt', ['parquet', 'csv'])
+    def test_file_shards(self, tmp_path, fmt):
+        options = {'seed': 3, 'batch_size': 400}
+
+        rows = generate_dataset(2000, str(tmp_path), fmt, num_shards=2, generator_options=options)
+
+        files = sorted(tmp_path.iterdir())
+        assert rows == 2000
+        assert [f.name for f in files] == [f'part-00000.{fmt}', f'part-00001.{fmt}']
+        read = pd.read_parquet if fmt == 'parquet' else pd.read_csv
+        df = pd.concat(read(f) for f in files)
+        assert len(df) == 2000 and df['transaction_id'].is_unique
+
+    def test_topic_partitions_by_sender(self, tmp_path, generator):
+        sink = TopicSink('mpesa', directory=str(tmp_path), partitions=4)
+
+        for df in generator.batches(2500):
+            sink.write(df)
+
+        partitions = {}
+        for path in (tmp_path / 'mpesa').glob('partition-*.jsonl'):
+            events = [json.loads(line) for line in path.read_text().splitlines()]
+            partitions[path.stem] = {e['sender'] for e in events}
+        assert sink.sent == 2500
+        assert sum(len(s) for s in partitions.values()) == len(set().union(*partitions.values()))
+
+    def test_topic_producer(self, generator):
+        class RecordingProducer:
+            def __init__(self):
+                self.sent = []
+                self.flushed = False
+
+            def send(self, topic, key=None, value=None):
+                self.sent.append((topic, key, value))
+
+            def flush(self):
+                self.flushed = True
+
+        producer = RecordingProducer()
+        sink = TopicSink(producer=producer)
+        sink.write(generator.batch(0, rows=5))
+        sink.close()
+
+        assert len(producer.sent) == 5 and producer.flushed
+        topic, key, value = producer.sent[0]
+        assert key == value['sender'].encode()
+        assert isinstance(value['timestamp'], str) and np.isscalar(value['amount'])
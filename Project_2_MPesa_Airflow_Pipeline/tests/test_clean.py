@@ -0,0 +1,100 @@
+"""
+Tests for batch and streaming transaction cleaning
+
+Tests cover:
+- Streaming output and report match the in-memory cleaner
+- Duplicates are removed across chunk boundaries
+- Fingerprint and Bloom filter seen-sets
+- CSV input in chunks
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl.clean import BloomSeenSet, FingerprintSet, StreamingTransactionCleaner, TransactionCleaner
+
+
+@pytest.fixture
+def messy_dataframe(sample_dataframe):
+    rng = np.random.default_rng(7)
+    df = pd.concat([sample_dataframe, sample_dataframe.iloc[:10]], ignore_index=True)
+    df = df.sample(frac=1, random_state=3).reset_index(drop=True)
+    df.loc[rng.random(len(df)) < 0.1, 'status'] = None
+    df.loc[[2, 5], 'sender'] = None
+    df.loc[[3], 'receiver'] = '0712'
+    df.loc[[4], 'amount'] = -10
+    return df
+
+
+def chunks_of(df, size):
+    return (df.iloc[i:i + size] for i in range(0, len(df), size))
+
+
+class TestStreamingCleaner:
+
+    @pytest.mark.parametrize('seen_ids', [None, 'bloom'])
+    def test_matches_in_memory_cleaner(self, messy_dataframe, seen_ids):
+        expected = TransactionCleaner(messy_dataframe.copy()).clean()
+        seen = BloomSeenSet(capacity=1000) if seen_ids == 'bloom' else None
+        streaming = StreamingTransactionCleaner(seen_ids=seen)
+
+        cleaned = pd.concat(streaming.clean_chunks(chunks_of(messy_dataframe, 7)), ignore_index=True)
+        streaming.close()
+
+        pd.testing.assert_frame_equal(cleaned, expected.get_cleaned_data())
+        report = streaming.get_cleaning_report()
+        for key, value in expected.get_cleaning_report().items():
+            assert report[key] == value
+        assert report['chunks'] == 9
+        assert report['input_records'] == len(messy_dataframe)
+
+    def test_duplicates_across_chunks(self, sample_transactions):
+        streaming = StreamingTransactionCleaner(chunk_size=20)
+
+        cleaned = pd.concat(streaming.clean_records(sample_transactions + sample_transactions[:5]))
+
+        assert len(cleaned) == len(sample_transactions)
+        assert cleaned['transaction_id'].is_unique
+        assert streaming.get_cleaning_report()['duplicates_removed'] == 5
+
+    def test_clean_csv(self, tmp_path, sample_dataframe):
+        path = tmp_path / 'transactions.csv'
+        pd.concat([sample_dataframe, sample_dataframe]).to_csv(path, index=False)
+        streaming = StreamingTransactionCleaner(chunk_size=30)
+
+        cleaned = pd.concat(streaming.clean_csv(path))
+
+        assert len(cleaned) == len(sample_dataframe)
+        assert streaming.get_cleaning_report()['chunks'] == 4
+
+
+class TestSeenSets:
+
+    def test_fingerprint_set(self):
+        seen = FingerprintSet()
+        for start in range(0, 1000, 100):
+            assert not seen.seen([f'TXN{i}' for i in range(start, start + 100)]).any()
+
+        assert seen.seen(['TXN5', 'TXN999', 'NEW', 'NEW']).tolist() == [True, True, False, True]
+        assert len(seen) == 1001
+        assert len(seen.runs) < 10
+
+    def test_bloom_exact_fallback_never_drops_new_ids(self):
+        # A tiny filter saturates quickly, so nearly every lookup hits the fallback
+        seen = BloomSeenSet(capacity=10, error_rate=0.5)
+        try:
+            assert not seen.seen([f'TXN{i}' for i in range(500)]).any()
+            assert not seen.seen([f'NEW{i}' for i in range(500)]).any()
+            assert seen.seen(['TXN1', 'NEW1']).all()
+            assert seen.fallback_lookups > 0
+        finally:
+            seen.close()
+
+    def test_bloom_without_fallback(self):
+        seen = BloomSeenSet(capacity=1000, exact_fallback=False)
+
+        seen.seen([f'TXN{i}' for i in range(1000)])
+
+        assert seen.seen([f'TXN{i}' for i in range(1000)]).all()
+        assert seen.seen([f'NEW{i}' for i in range(1000)]).mean() < 0.05
@@ -0,0 +1,125 @@
+"""
+Tests for the vectorized fraud rule engine
+
+Tests cover:
+- Threshold rules and risk level assignment
+- Velocity windows per sender, including across runs through persisted state
+- Sender and global baseline ratio rules
+- Retried runs starting from the pre-run state
+- Rule validation and per-rule report
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from etl.fraud_rules import DEFAULT_RULES, FraudRuleEngine, FraudState, build_rule
+
+VELOCITY = [{'name': 'burst', 'type': 'velocity', 'window': '1h', 'max_count': 3, 'risk': 'high'}]
+
+
+def transactions(sender, minutes, amounts=None, status='success'):
+    amounts = amounts if amounts is not None else [100.0] * len(minutes)
+    return pd.DataFrame({
+        'transaction_id': [f'{sender}-{m}' for m in minutes],
+        'sender': sender,
+        'amount': amounts,
+        'status': status,
+        'timestamp': [(pd.Timestamp('2024-01-01') + pd.Timedelta(minutes=m)).isoformat() for m in minutes],
+    })
+
+
+def hits(engine, scored, rule):
+    return ((scored['fraud_flags'] & engine.rule_bit(rule)) > 0).tolist()
+
+
+class TestRules:
+
+    def test_default_amount_tiers(self, sample_dataframe):
+        engine = FraudRuleEngine(DEFAULT_RULES[:3])
+        df = sample_dataframe.copy()
+        df['amount'] = np.linspace(100, 90000, len(df))
+
+        scored, report = engine.score(df)
+
+        expected = np.select([df['amount'] > 50000, df['amount'] > 10000], ['high', 'medium'], 'low')
+        assert scored['risk_level'].tolist() == expected.tolist()
+        assert report['rules']['high_value']['hits'] == int((df['amount'] > 50000).sum())
+        assert report['rules']['failed_status']['hits'] == int((df['status'] == 'failed').sum())
+        assert set(report['rules']) == {r.name for r in engine.rules}
+
+    def test_velocity_window_per_sender(self):
+        engine = FraudRuleEngine(VELOCITY)
+        df = pd.concat([transactions('A', [0, 10, 20, 30, 120]), transactions('B', [0, 1, 2])])
+
+        scored, report = engine.score(df)
+
+        assert hits(engine, scored, 'burst') == [False, False, False, True, False, False, False, False]
+        assert report['risk_levels']['high'] == 1
+
+    def test_unsorted_input_keeps_row_order(self):
+        engine = FraudRuleEngine(VELOCITY)
+        df = transactions('A', [30, 0, 20, 10]).reset_index(drop=True)
+
+        scored, _ = engine.score(df)
+
+        assert scored['transaction_id'].tolist() == df['transaction_id'].tolist()
+        assert hits(engine, scored, 'burst') == [True, False, False, False]
+
+    def test_sender_baseline_uses_prior_transactions(self):
+        engine = FraudRuleEngine([{'name': 'spike', 'type': 'baseline_ratio', 'ratio': 5, 'min_history': 3}])
+        df = transactions('A', [0, 1, 2, 3, 4], amounts=[100.0, 100.0, 100.0, 600.0, 400.0])
+
+        scored, _ = engine.score(df)
+
+        assert hits(engine, scored, 'spike') == [False, False, False, True, False]
+
+    def test_when_filter(self):
+        engine = FraudRuleEngine([{'name': 'big_success', 'type': 'threshold', 'column': 'amount', 'op': '>',
+                                   'value': 50, 'when': {'status': 'success'}}])
+        df = pd.concat([transactions('A', [0]), transactions('B', [0], status='failed')])
+
+        scored, _ = engine.score(df)
+
+        assert hits(engine, scored, 'big_success') == [True, False]
+
+    def test_invalid_specs_are_rejected(self):
+        with pytest.raises(ValueError):
+            build_rule({'name': 'x', 'type': 'nope'})
+        with pytest.raises(ValueError):
+            build_rule({'name': 'x', 'type': 'velocity', 'window': '1h'})
+        with pytest.raises(ValueError):
+            FraudRuleEngine([VELOCITY[0], VELOCITY[0]])
+
+
+class TestPersistentState:
+
+    def test_velocity_spans_runs(self, tmp_path):
+        engine = FraudRuleEngine(VELOCITY, state_dir=str(tmp_path))
+        engine.score(transactions('A', [0, 10, 20]), run_id='run_1')
+
+        scored, _ = FraudRuleEngine(VELOCITY, state_dir=str(tmp_path)).score(
+            transactions('A', [30, 200]), run_id='run_2')
+
+        assert hits(engine, scored, 'burst') == [True, False]
+
+    def test_idle_senders_are_evicted(self, tmp_path):
+        engine = FraudRuleEngine(VELOCITY, state_dir=str(tmp_path))
+        engine.score(pd.concat([transactions('A', [0]), transactions('B', [300])]), run_id='run_1')
+
+        state = FraudState.load(str(tmp_path))
+
+        assert state.recent['sender'].tolist() == ['B']
+        assert set(state.baseline.index) == {'A', 'B'}
+        assert state.global_count == 2
+
+    def test_retry_does_not_double_count(self, tmp_path):
+        engine = FraudRuleEngine(VELOCITY, state_dir=str(tmp_path))
+        engine.score(transactions('A', [0, 10]), run_id='run_1')
+        batch = transactions('A', [20, 30])
+
+        first, _ = engine.score(batch, run_id='run_2')
+        retried, _ = engine.score(batch, run_id='run_2')
+
+        assert hits(engine, first, 'burst') == hits(engine, retried, 'burst') == [False, True]
+        assert FraudState.load(str(tmp_path)).global_count == 4
@@ -0,0 +1,137 @@
+"""
+Tests for the idempotent staged bulk loader
+
+Tests cover:
+- Exact inserted / duplicate / rejected counts on first load and rerun
+- ON CONFLICT DO UPDATE counting changed rows only
+- Chunked input and a failing batch not affecting others
+- COPY time counted in the active task metrics
+- PostgreSQL COPY path with parallel batches (needs TEST_POSTGRES_URL)
+"""
+
+import os
+import time
+from unittest.mock import MagicMock
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from etl.load_to_db import DatabaseLoader
+from etl.metrics import TaskMetrics
+
+POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'mpesa.db'}")
+    yield engine
+    engine.dispose()
+
+
+def row_count(engine, table='transactions'):
+    with engine.connect() as conn:
+        return conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
+
+
+class TestDatabaseLoader:
+
+    def test_rerun_is_idempotent(self, engine, sample_dataframe):
+        loader = DatabaseLoader(engine, batch_size=20)
+
+        first = dict(loader.load_data(sample_dataframe))
+        second = loader.load_data(sample_dataframe)
+
+        assert first['inserted'] == len(sample_dataframe)
+        assert first['batches'] == 3
+        assert second['inserted'] == 0
+        assert second['duplicates'] == len(sample_dataframe)
+        assert row_count(engine) == len(sample_dataframe)
+
+    def test_duplicates_and_rejects_are_counted(self, engine, sample_dataframe):
+        df = pd.concat([sample_dataframe, sample_dataframe.head(5)], ignore_index=True)
+        df.loc[10, 'amount'] = None
+        df.loc[11, 'timestamp'] = 'not a date'
+        df.loc[12, 'sender'] = '2547' * 10
+
+        stats = DatabaseLoader(engine).load_data(df)
+
+        assert stats['rejected'] == 3
+        assert stats['duplicates'] == 5
+        assert stats['inserted'] == len(sample_dataframe) - 3
+        assert stats['total_records'] == len(df)
+
+    def test_update_mode_counts_changed_rows(self, engine, sample_dataframe):
+        DatabaseLoader(engine).load_data(sample_dataframe)
+        changed = sample_dataframe.copy()
+        changed.loc[:4, 'status'] = 'reversed'
+        new = sample_dataframe.head(2).assign(transaction_id=['TXNNEW1', 'TXNNEW2'])
+
+        stats = DatabaseLoader(engine, on_conflict='update').load_data(pd.concat([changed, new]))
+
+        assert (stats['inserted'], stats['updated']) == (2, 5)
+        assert stats['duplicates'] == len(sample_dataframe) - 5
+        with engine.connect() as conn:
+            reversed_count = conn.execute(text("SELECT COUNT(*) FROM transactions WHERE status = 'reversed'")).scalar()
+        assert reversed_count >= 5
+
+    def test_chunked_input_and_failed_batch(self, engine, sample_dataframe):
+        broken = sample_dataframe.head(10).drop(columns=['sender'])
+
+        stats = DatabaseLoader(engine).load_data(iter([sample_dataframe.iloc[10:], broken]))
+
+        assert stats['inserted'] == len(sample_dataframe) - 10
+        assert stats['failed'] == 10
+        assert stats['batches'] == 2
+
+    def test_invalid_conflict_mode(self, engine):
+        with pytest.raises(ValueError):
+            DatabaseLoader(engine, on_conflict='replace')
+
+    def test_copy_time_counts_as_db_time(self, engine, sample_dataframe):
+        conn = MagicMock()
+        conn.connection.cursor.return_value.copy_expert.side_effect = lambda *args, **kwargs: time.sleep(0.05)
+        loader = DatabaseLoader(engine)
+        batch, _ = loader.prepare_batch(sample_dataframe)
+
+        with TaskMetrics('load_to_database', 'run') as metrics:
+            loader._stage_postgres(conn, 'stage_test', batch)
+
+        conn.connection.cursor.return_value.copy_expert.assert_called_once()
+        assert metrics.db_seconds >= 0.05
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL not set")
+class TestDatabaseLoaderPostgres:
+
+    TABLE = 'transactions_loader_test'
+
+    @pytest.fixture
+    def pg_engine(self):
+        engine = create_engine(POSTGRES_URL, pool_size=4)
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {self.TABLE}"))
+        yield engine
+        with engine.begin() as conn:
+            conn.execute(text(f"DROP TABLE IF EXISTS {self.TABLE}"))
+        engine.dispose()
+
+    def test_parallel_copy_merge(self, pg_engine, sample_dataframe):
+        loader = DatabaseLoader(pg_engine, self.TABLE, batch_size=10, workers=3)
+
+        first = dict(loader.load_data(sample_dataframe))
+        second = loader.load_data(sample_dataframe)
+
+        assert first['inserted'] == len(sample_dataframe)
+        assert second['duplicates'] == len(sample_dataframe)
+        assert row_count(pg_engine, self.TABLE) == len(sample_dataframe)
+
+    def test_update_returning_counts(self, pg_engine, sample_dataframe):
+        DatabaseLoader(pg_engine, self.TABLE).load_data(sample_dataframe)
+        changed = sample_dataframe.copy()
+        changed.loc[:2, 'status'] = 'reversed'
+
+        stats = DatabaseLoader(pg_engine, self.TABLE, on_conflict='update').load_data(changed)
+
+        assert (stats['inserted'], stats['updated']) == (0, 3)
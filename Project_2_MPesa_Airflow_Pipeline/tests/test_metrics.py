@@ -0,0 +1,113 @@
+"""
+Tests for the per-task run metrics
+
+Tests cover:
+- Duration, rows/sec, peak memory and database time of a task
+- Prometheus textfile export
+- Run history and throughput regression alerts
+"""
+
+import time
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from etl.metrics import RunHistory, TaskMetrics, write_prometheus
+
+RUN_ID = 'scheduled__2024-01-01T00:00:00'
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'state.db'}")
+    yield engine
+    engine.dispose()
+
+
+def finished(task, run_id, rows, seconds, partition=None):
+    metrics = TaskMetrics(task, run_id, partition)
+    metrics.rows_in = metrics.rows_out = rows
+    metrics.status = 'success'
+    metrics.duration_seconds = seconds
+    return metrics
+
+
+class TestTaskMetrics:
+
+    def test_measures_task(self, engine):
+        with TaskMetrics('load_to_database', RUN_ID, partition=2) as metrics:
+            with engine.connect() as conn:
+                conn.execute(text("WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n "
+                                  "WHERE i < 200000) SELECT SUM(i) FROM n")).scalar()
+            time.sleep(0.05)
+            metrics.rows_in, metrics.rows_out = 1000, 990
+
+        assert metrics.status == 'success'
+        assert metrics.duration_seconds >= 0.05
+        assert 0 < metrics.db_seconds < metrics.duration_seconds
+        assert metrics.rows_per_sec == pytest.approx(1000 / metrics.duration_seconds)
+        assert metrics.peak_memory_bytes > 0
+        # Queries outside a task are not counted
+        db_seconds = metrics.db_seconds
+        with engine.connect() as conn:
+            conn.execute(text("SELECT 1"))
+        assert metrics.db_seconds == db_seconds
+
+    def test_failed_task(self):
+        with pytest.raises(RuntimeError):
+            with TaskMetrics('clean_data', RUN_ID) as metrics:
+                raise RuntimeError("boom")
+
+        assert metrics.status == 'failed'
+        assert metrics.duration_seconds is not None
+
+
+class TestPrometheus:
+
+    def test_textfile(self, tmp_path):
+        with TaskMetrics('clean_data', RUN_ID, partition=3) as metrics:
+            metrics.rows_in, metrics.rows_out = 500, 480
+
+        path = write_prometheus(metrics, str(tmp_path))
+
+        assert path.endswith('clean_data-p003.prom')
+        lines = open(path).read().splitlines()
+        samples = dict(line.rsplit(' ', 1) for line in lines if not line.startswith('#'))
+        labels = '{task="clean_data",partition="3"}'
+        assert float(samples[f'mpesa_etl_task_rows_out{labels}']) == 480
+        assert float(samples[f'mpesa_etl_task_throughput_regression{labels}']) == 0
+        assert '# TYPE mpesa_etl_task_duration_seconds gauge' in lines
+        assert list(tmp_path.iterdir()) == [tmp_path / 'clean_data-p003.prom']
+
+
+class TestRunHistory:
+
+    def test_record_and_read_run(self, engine):
+        history = RunHistory(engine)
+        history.record(finished('extract_transactions', RUN_ID, 1000, 2.0))
+        history.record(finished('clean_data', RUN_ID, 250, 1.0, partition=0))
+        history.record(finished('clean_data', 'other', 250, 1.0, partition=0))
+
+        runs = history.run(RUN_ID)
+
+        assert [(r['task'], r['partition']) for r in runs] == [('extract_transactions', None), ('clean_data', 0)]
+        assert runs[0]['rows_per_sec'] == 500.0
+
+    def test_throughput_regression(self, engine):
+        history = RunHistory(engine)
+        for i, rate in enumerate([1000, 1100, 900]):
+            current = finished('detect_fraud', f'run_{i}', rate, 1.0)
+            # Too little history to judge the first runs
+            assert history.check_regression(current) is None
+            history.record(current)
+
+        steady = finished('detect_fraud', 'run_3', 800, 1.0)
+        slow = finished('detect_fraud', 'run_4', 400, 1.0)
+
+        assert history.check_regression(steady) is None
+        alert = history.check_regression(slow)
+        assert alert['baseline_rows_per_sec'] == 1000.0
+        assert alert['ratio'] == 0.4
+        assert slow.throughput_regression and not steady.throughput_regression
+        # Other tasks keep their own baseline
+        assert history.check_regression(finished('clean_data', 'run_4', 10, 1.0)) is None
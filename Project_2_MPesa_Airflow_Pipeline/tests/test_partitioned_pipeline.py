@@ -0,0 +1,217 @@
+"""
+Tests for the partitioned (fan-out / fan-in) pipeline
+
+Tests cover:
+- Stable sender-hash and provider partitioning in one streaming pass
+- Fraud state rejected for provider partitions, which split senders; without
+  fraud state they run
+- Local run of clean -> score -> load per partition matching an unpartitioned run
+- Idempotent partitioned loads and the fan-in summary
+- Quarantined rows never reaching the load, while rows the cleaner repairs do
+- DAG wiring with dynamically mapped tasks (needs Airflow)
+"""
+
+from datetime import datetime
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from etl.artifacts import ArtifactStore
+from etl.partition import partition_artifact, partition_ids
+from etl.pipeline import run_local, summarize_partitions, validate_stage
+from etl.validate import Quarantine
+from generator.batch_generator import BatchTransactionGenerator
+
+RUN_ID = 'manual__2024-01-02T00:00:00'
+BAD_ROWS = [0, 7]
+REPAIRED_ROWS = [3, 5, 9]
+
+
+def loaded_ids(engine):
+    with engine.connect() as conn:
+        return {row[0] for row in conn.execute(text("SELECT transaction_id FROM transactions"))}
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ArtifactStore(str(tmp_path / 'artifacts'))
+
+
+@pytest.fixture
+def extracted(store):
+    generator = BatchTransactionGenerator(seed=11, batch_size=1500, subscribers=300, sender_skew=1.3,
+                                          start_date=datetime(2024, 1, 1), end_date=datetime(2024, 1, 2))
+    return store.write(RUN_ID, 'transactions', generator.batches(6000))
+
+
+@pytest.fixture
+def flawed(store, sample_dataframe):
+    df = sample_dataframe.copy()
+    df.loc[BAD_ROWS[0], 'status'] = 'unknown'
+    df.loc[BAD_ROWS[1], 'sender'] = '0712'
+    df.loc[REPAIRED_ROWS[0], 'status'] = ' SUCCESS '
+    df.loc[REPAIRED_ROWS[1], 'sender'] = f" {df.loc[REPAIRED_ROWS[1], 'sender']} "
+    df.loc[REPAIRED_ROWS[2], 'amount'] = 5_000_000
+    return df, store.write(RUN_ID, 'transactions', df)
+
+
+class TestPartitioning:
+
+    @pytest.mark.parametrize('by', ['sender', 'provider'])
+    def test_keys_stay_together(self, store, extracted, by):
+        mapped = partition_artifact(store, RUN_ID, extracted, 'transactions', by=by, partitions=3, batch_size=1000)
+
+        frames = [store.read(m['manifest']) for m in mapped]
+        assert [m['partition'] for m in mapped] == sorted(m['partition'] for m in mapped)
+        assert sum(len(f) for f in frames) == extracted['rows']
+        keys = [set(f[by]) for f in frames]
+        assert sum(len(k) for k in keys) == len(set().union(*keys))
+
+    def test_provider_partitions_split_senders(self, tmp_path, store, extracted):
+        mapped = partition_artifact(store, RUN_ID, extracted, 'transactions', by='provider', partitions=3)
+
+        senders = [set(store.read(m['manifest'], columns=['sender'])['sender']) for m in mapped]
+        # Velocity and baselines per sender would be inexact, so fraud state is refused
+        assert sum(len(s) for s in senders) > len(set().union(*senders))
+        with pytest.raises(ValueError, match='sender'):
+            run_local(store, RUN_ID, extracted, partitions=3, by='provider', state_dir=str(tmp_path / 'state'))
+        _, summary = run_local(store, RUN_ID, extracted, partitions=3, by='provider')
+        assert sum(summary['rows_per_partition'].values()) == extracted['rows']
+
+    def test_padded_senders_share_a_partition(self, sample_dataframe):
+        padded = sample_dataframe.assign(sender=' ' + sample_dataframe['sender'] + '  ')
+
+        assert (partition_ids(padded, 'sender', 8) == partition_ids(sample_dataframe, 'sender', 8)).all()
+
+    def test_ids_are_stable(self, sample_dataframe):
+        first = partition_ids(sample_dataframe, 'sender', 8)
+
+        assert (first == partition_ids(sample_dataframe.iloc[::-1], 'sender', 8)[::-1]).all()
+        assert first.min() >= 0 and first.max() < 8
+        with pytest.raises(ValueError):
+            partition_ids(sample_dataframe, 'status', 8)
+
+
+class TestLocalRun:
+
+    def test_matches_single_partition(self, tmp_path, store, extracted):
+        single, single_summary = run_local(store, RUN_ID, extracted, partitions=1,
+                                           state_dir=str(tmp_path / 'state1'), workers=1)
+        results, summary = run_local(store, RUN_ID, extracted, partitions=4, state_dir=str(tmp_path / 'state4'))
+
+        assert summary['partitions'] == len(results) == 4
+        assert sum(summary['rows_per_partition'].values()) == extracted['rows']
+        # Sender partitions keep every sender's history together, so sender rules agree exactly
+        for rule in ('high_value', 'failed_status', 'sender_velocity'):
+            assert summary['fraud']['rules'][rule]['hits'] == single_summary['fraud']['rules'][rule]['hits']
+        assert summary['fraud']['rules']['sender_velocity']['hits'] > 0
+        assert summary['cleaning']['final_record_count'] == single_summary['cleaning']['final_record_count']
+        assert (tmp_path / 'state4' / 'sender-4' / 'p003').is_dir()
+
+    def test_partitioned_load_is_idempotent(self, tmp_path, store, extracted):
+        engine = create_engine(f"sqlite:///{tmp_path / 'mpesa.db'}")
+
+        _, first = run_local(store, RUN_ID, extracted, partitions=3, engine=engine)
+        _, second = run_local(store, RUN_ID, extracted, partitions=3, engine=engine)
+
+        with engine.connect() as conn:
+            loaded = conn.execute(text("SELECT COUNT(*) FROM transactions")).scalar()
+        engine.dispose()
+        assert loaded == first['loading']['total_inserted'] == first['cleaning']['final_record_count']
+        assert second['loading']['total_inserted'] == 0
+        assert second['loading']['duplicates'] == loaded
+
+    def test_quarantined_rows_are_not_loaded(self, tmp_path, store, flawed):
+        df, manifest = flawed
+        engine = create_engine(f"sqlite:///{tmp_path / 'mpesa.db'}")
+
+        results, valid = validate_stage(store, RUN_ID, manifest, Quarantine(str(tmp_path / 'q.parquet')))
+        run_local(store, RUN_ID, valid, partitions=2, engine=engine)
+
+        bad_ids = set(df['transaction_id'].iloc[BAD_ROWS])
+        assert results['quarantined_records'] == 2
+        assert valid['rows'] == len(df) - 2
+        assert loaded_ids(engine) and not loaded_ids(engine) & bad_ids
+        assert set(df['transaction_id'].iloc[REPAIRED_ROWS]) <= loaded_ids(engine)
+        engine.dispose()
+
+    def test_summary_skips_rates(self):
+        results = [{'partition': p, 'manifest': {'rows': 10},
+                    'stats': {'loading': {'total_inserted': 10, 'rows_per_sec': 5.0, 'timestamp': 'x'}}}
+                   for p in range(2)]
+
+        summary = summarize_partitions(results)
+
+        assert summary['loading'] == {'total_inserted': 20}
+        assert summary['rows_per_partition'] == {0: 10, 1: 10}
+
+
+class TestDag:
+
+    def test_mapped_fan_out(self):
+        pytest.importorskip('airflow')
+        from airflow.models.mappedoperator import MappedOperator
+
+        from mpesa_dag import dag
+
+        for task_id in ('transformation_group.clean_data', 'transformation_group.detect_fraud', 'load_to_database'):
+            assert isinstance(dag.get_task(task_id), MappedOperator)
+        assert dag.get_task('partition_transactions').downstream_task_ids >= {'transformation_group.clean_data'}
+        assert 'load_to_database' in dag.get_task('generate_report').upstream_task_ids
+
+    def test_quarantined_rows_skip_the_dag_load(self, tmp_path, monkeypatch, store, flawed):
+        pytest.importorskip('airflow')
+        import mpesa_dag
+
+        df, manifest = flawed
+        db_url = f"sqlite:///{tmp_path / 'mpesa.db'}"
+        monkeypatch.setattr(mpesa_dag, 'get_artifact_store', lambda: store)
+        monkeypatch.setattr(mpesa_dag, 'get_mpesa_engine', lambda: create_engine(db_url))
+        for name in ('QUARANTINE_DIR', 'FRAUD_STATE_DIR', 'METRICS_DIR'):
+            monkeypatch.setattr(mpesa_dag, name, str(tmp_path / name.lower()))
+
+        xcom = {('extract_transactions', 'transactions_manifest'): manifest}
+
+        class TaskInstance:
+            task_id = 'validation_group.validate_raw_data'
+
+            def xcom_push(self, key, value):
+                xcom[(self.task_id, key)] = value
+
+            def xcom_pull(self, task_ids, key):
+                return xcom.get((task_ids, key))
+
+        context = {'run_id': RUN_ID, 'task_instance': TaskInstance()}
+        mpesa_dag.validate_raw_data(**context)
+        for kwargs in mpesa_dag.partition_transactions(**context):
+            kwargs = mpesa_dag.clean_data(**kwargs, **context)
+            kwargs = mpesa_dag.detect_fraud(**kwargs, **context)
+            mpesa_dag.load_to_database(**kwargs, **context)
+
+        engine = create_engine(db_url)
+        assert xcom[('validation_group.validate_raw_data', 'validation_results')]['quarantined_records'] == 2
+        assert loaded_ids(engine) and not loaded_ids(engine) & set(df['transaction_id'].iloc[BAD_ROWS])
+        engine.dispose()
+
+    def test_provider_partitions_without_fraud_state(self, tmp_path, monkeypatch, store, extracted):
+        pytest.importorskip('airflow')
+        import mpesa_dag
+
+        monkeypatch.setattr(mpesa_dag, 'get_artifact_store', lambda: store)
+        monkeypatch.setattr(mpesa_dag, 'METRICS_DIR', str(tmp_path / 'metrics'))
+        monkeypatch.setattr(mpesa_dag, 'PARTITION_BY', 'provider')
+
+        class TaskInstance:
+            def xcom_pull(self, task_ids, key):
+                return extracted
+
+        context = {'run_id': RUN_ID, 'task_instance': TaskInstance()}
+        monkeypatch.setattr(mpesa_dag, 'FRAUD_STATE_DIR', str(tmp_path / 'state'))
+        with pytest.raises(ValueError, match='sender'):
+            mpesa_dag.partition_transactions(**context)
+
+        monkeypatch.setattr(mpesa_dag, 'FRAUD_STATE_DIR', None)
+        for kwargs in mpesa_dag.partition_transactions(**context):
+            kwargs = mpesa_dag.clean_data(**kwargs, **context)
+            mpesa_dag.detect_fraud(**kwargs, **context)
+        assert not (tmp_path / 'state').exists()
@@ -0,0 +1,148 @@
+"""
+Tests for the incremental fraud rollups
+
+Tests cover:
+- Hourly per-sender rollups and baselines matching a full recomputation
+- Refreshes folding in only new rows, and repeated refreshes not double counting
+- Rapid-sender and large-amount queries served from the rollups, per DAG data interval
+- PostgreSQL upserts (needs TEST_POSTGRES_URL)
+"""
+
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine, text
+
+from etl.load_to_db import DatabaseLoader
+from etl.rollups import FraudRollups
+from generator.batch_generator import BatchTransactionGenerator
+
+POSTGRES_URL = os.environ.get('TEST_POSTGRES_URL')
+
+
+@pytest.fixture
+def batches():
+    generator = BatchTransactionGenerator(seed=3, batch_size=2000, subscribers=150, sender_skew=1.4,
+                                          start_date=datetime(2024, 1, 1), end_date=datetime(2024, 1, 2))
+    return list(generator.batches(6000))
+
+
+@pytest.fixture
+def engine(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'mpesa.db'}")
+    yield engine
+    engine.dispose()
+
+
+def hourly_table(engine):
+    df = pd.read_sql("SELECT * FROM sender_hourly_rollup", engine)
+    df['hour_start'] = pd.to_datetime(df['hour_start'])
+    return df.sort_values(['sender', 'hour_start'], ignore_index=True)
+
+
+class TestFraudRollups:
+
+    def test_incremental_matches_rebuild(self, engine, batches):
+        rollups = FraudRollups(engine)
+        DatabaseLoader(engine).load_data(batches[0])
+        rollups.create_tables()
+
+        first = rollups.refresh()
+        # The second load repeats some rows: only the newly inserted ones are aggregated
+        DatabaseLoader(engine).load_data(pd.concat(batches[1:] + [batches[0].head(50)]))
+        second = rollups.refresh()
+        third = rollups.refresh()
+        incremental = hourly_table(engine)
+        rollups.rebuild()
+
+        assert (first['rows'], second['rows'], third['rows']) == (2000, 4000, 0)
+        pd.testing.assert_frame_equal(incremental, hourly_table(engine))
+
+    def test_rollups_match_transactions(self, engine, batches):
+        df = pd.concat(batches, ignore_index=True)
+        DatabaseLoader(engine).load_data(df)
+        rollups = FraudRollups(engine)
+        rollups.create_tables()
+        rollups.refresh()
+
+        expected = (df.assign(hour_start=df['timestamp'].dt.floor('h'))
+                    .groupby(['sender', 'hour_start'])['amount'].agg(['count', 'sum', 'max']).reset_index())
+        hourly = hourly_table(engine).merge(expected, on=['sender', 'hour_start'])
+        assert len(hourly) == len(expected)
+        assert (hourly['transaction_count'] == hourly['count']).all()
+        assert (hourly['total_amount'] - hourly['sum']).abs().max() < 0.01
+        assert (hourly['max_amount'] == hourly['max']).all()
+        assert rollups.average_amount() == pytest.approx(df['amount'].mean())
+        sender = df['sender'].iloc[0]
+        assert rollups.average_amount(sender) == pytest.approx(df.loc[df['sender'] == sender, 'amount'].mean())
+
+    def test_fraud_queries(self, engine, batches):
+        df = pd.concat(batches, ignore_index=True)
+        DatabaseLoader(engine).load_data(df)
+        rollups = FraudRollups(engine)
+        rollups.create_tables()
+        rollups.refresh()
+        as_of = datetime(2024, 1, 1, 18, 30)
+
+        rapid = rollups.rapid_senders(as_of=as_of)
+        large = rollups.large_amounts(ratio=5)
+
+        hour = df[df['timestamp'].dt.floor('h') == pd.Timestamp('2024-01-01 18:00')].groupby('sender')['amount']
+        expected = (hour.count() > 10) | (hour.sum() > 100_000)
+        assert sorted(rapid['sender']) == sorted(expected[expected].index)
+        threshold = 5 * df['amount'].mean()
+        assert sorted(large['transaction_id']) == sorted(
+            df.loc[(df['amount'] > threshold) & (df['status'] == 'success'), 'transaction_id'])
+        assert large['amount'].is_monotonic_decreasing
+
+    def test_rapid_senders_of_a_data_interval(self, engine, batches):
+        burst = batches[0].head(20).assign(
+            transaction_id=[f'BURST{i}' for i in range(20)], sender='254700000001', amount=100.0,
+            timestamp=pd.date_range('2024-01-03 05:00', periods=20, freq='2min'))
+        DatabaseLoader(engine).load_data(burst)
+        rollups = FraudRollups(engine)
+        rollups.create_tables()
+        rollups.refresh()
+
+        # The exclusive interval end's own hour belongs to the next run
+        assert rollups.rapid_senders(as_of=datetime(2024, 1, 3, 6)).empty
+        rapid = rollups.rapid_senders_between(datetime(2024, 1, 3, 0), datetime(2024, 1, 3, 6))
+        later = rollups.rapid_senders_between(datetime(2024, 1, 3, 6), datetime(2024, 1, 3, 12))
+
+        assert list(rapid['sender']) == ['254700000001']
+        assert later.empty
+
+    def test_empty_table(self, engine):
+        DatabaseLoader(engine).create_table_if_not_exists()
+        rollups = FraudRollups(engine)
+        rollups.create_tables()
+
+        assert rollups.refresh()['rows'] == 0
+        assert rollups.average_amount() is None
+        assert rollups.large_amounts().empty
+
+
+@pytest.mark.skipif(not POSTGRES_URL, reason="TEST_POSTGRES_URL not set")
+class TestFraudRollupsPostgres:
+
+    def test_refresh_and_queries(self, batches):
+        engine = create_engine(POSTGRES_URL)
+        table = 'transactions_rollup_test'
+        with engine.begin() as conn:
+            for name in ('sender_hourly_rollup', 'amount_baseline', 'rollup_state', table):
+                conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+        try:
+            DatabaseLoader(engine, table).load_data(batches[0])
+            rollups = FraudRollups(engine, table)
+            rollups.create_tables()
+            assert rollups.refresh()['rows'] == 2000
+            DatabaseLoader(engine, table).load_data(batches[1])
+            assert rollups.refresh()['rows'] == 2000
+            assert rollups.average_amount() == pytest.approx(pd.concat(batches[:2])['amount'].mean())
+        finally:
+            with engine.begin() as conn:
+                for name in ('sender_hourly_rollup', 'amount_baseline', 'rollup_state', table):
+                    conn.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            engine.dispose()
@@ -0,0 +1,154 @@
+"""
+Tests for the single-pass transaction validator
+
+Tests cover:
+- Per-row failed-rule bitmask and exact valid/invalid counts
+- Chunked validation matching whole-frame validation
+- Quarantine to CSV, Parquet and a database table
+- Validation inside the streaming cleaner
+"""
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+from etl.clean import StreamingTransactionCleaner
+from etl.validate import (AMOUNT_OUT_OF_RANGE, INVALID_PHONE, INVALID_STATUS, INVALID_TYPE, MISSING_REQUIRED,
+                          Quarantine, TransactionValidator, rule_names)
+
+
+@pytest.fixture
+def flawed_dataframe(sample_dataframe):
+    df = sample_dataframe.copy()
+    df.loc[0, 'status'] = 'unknown'
+    df.loc[1, 'sender'] = '0712'
+    df.loc[1, 'receiver'] = '0713'
+    df.loc[2, 'amount'] = 5_000_000
+    df.loc[3, 'transaction_type'] = 'lottery'
+    df.loc[4, 'receiver'] = None
+    df.loc[5, 'status'] = 'unknown'
+    df.loc[5, 'amount'] = 0
+    return df
+
+
+class TestRowVerdicts:
+
+    def test_bitmask_per_row(self, flawed_dataframe):
+        validator = TransactionValidator()
+
+        flags = validator.failed_rules(flawed_dataframe)
+
+        assert flags[:7].tolist() == [INVALID_STATUS, INVALID_PHONE, AMOUNT_OUT_OF_RANGE, INVALID_TYPE,
+                                      MISSING_REQUIRED, INVALID_STATUS | AMOUNT_OUT_OF_RANGE, 0]
+        assert rule_names(flags[5]) == ['invalid_status', 'amount_out_of_range']
+
+    def test_exact_row_counts(self, flawed_dataframe):
+        validator = TransactionValidator(flawed_dataframe)
+
+        assert validator.validate() is False
+
+        results = validator.get_results()
+        # Rows 2 and 3 only fail warning-level rules
+        assert results['invalid_records'] == 4
+        assert results['valid_records'] == len(flawed_dataframe) - 4
+        assert results['rule_failures']['invalid_phone'] == 1
+        assert results['rule_failures']['invalid_type'] == 1
+        assert validator.row_flags[3] == INVALID_TYPE
+
+    def test_clean_data_passes(self, sample_dataframe):
+        validator = TransactionValidator(sample_dataframe)
+
+        assert validator.validate() is True
+        assert validator.get_results()['valid_records'] == len(sample_dataframe)
+
+
+class TestChunkedValidation:
+
+    def test_chunks_match_whole_frame(self, flawed_dataframe):
+        whole = TransactionValidator(flawed_dataframe)
+        whole.validate()
+        chunked = TransactionValidator()
+
+        valid = pd.concat([chunked.validate_chunk(flawed_dataframe.iloc[i:i + 8])
+                           for i in range(0, len(flawed_dataframe), 8)])
+        results = chunked.finish()
+
+        for key in ('total_records', 'valid_records', 'invalid_records', 'rule_failures'):
+            assert results[key] == whole.get_results()[key]
+        assert len(valid) == results['valid_records']
+        assert results['validation_passed'] is False
+
+    def test_amount_range_is_a_warning_in_both_paths(self, flawed_dataframe):
+        whole = TransactionValidator(flawed_dataframe)
+        whole.validate()
+        chunked = TransactionValidator()
+
+        for i in range(0, len(flawed_dataframe), 4):
+            chunked.validate_chunk(flawed_dataframe.iloc[i:i + 4])
+        results = chunked.finish()
+
+        assert results['invalid_records'] == whole.get_results()['invalid_records'] == 4
+        assert results['valid_records'] == whole.get_results()['valid_records'] == len(flawed_dataframe) - 4
+        assert any('amount_out_of_range' in msg for msg in results['warnings'])
+        assert not any('amount_out_of_range' in msg for msg in results['errors'])
+        assert any('invalid amounts' in msg for msg in whole.get_results()['warnings'])
+
+    def test_before_cleaning_fails_only_unrepairable_rows(self, sample_dataframe):
+        raw = sample_dataframe.copy()
+        raw['status'] = raw['status'].astype(object)
+        raw.loc[0, 'status'] = ' SUCCESS '
+        raw.loc[1, 'sender'] = '  ' + raw.loc[1, 'sender'] + ' '
+        raw.loc[2, 'status'] = None
+        raw.loc[3, 'transaction_type'] = 'Payment'
+        raw.loc[4, 'sender'] = ' 0712 '
+        whole = TransactionValidator(raw, before_cleaning=True)
+        whole.validate()
+        chunked = TransactionValidator(before_cleaning=True)
+
+        valid = pd.concat([chunked.validate_chunk(raw.iloc[i:i + 3]) for i in range(0, len(raw), 3)])
+        results = chunked.finish()
+
+        assert results['invalid_records'] == whole.get_results()['invalid_records'] == 1
+        assert results['rule_failures'] == whole.get_results()['rule_failures']
+        assert results['rule_failures']['invalid_phone'] == 1
+        # Valid rows are passed on unrepaired; the cleaner fixes them later
+        assert valid['status'].iloc[0] == ' SUCCESS '
+        assert TransactionValidator(raw).validate() is False
+
+    @pytest.mark.parametrize('suffix', ['csv', 'parquet'])
+    def test_quarantine_file(self, tmp_path, flawed_dataframe, suffix):
+        path = str(tmp_path / f'quarantine.{suffix}')
+        validator = TransactionValidator(quarantine=Quarantine(path))
+
+        for i in range(0, len(flawed_dataframe), 3):
+            validator.validate_chunk(flawed_dataframe.iloc[i:i + 3])
+        validator.finish()
+
+        quarantined = pd.read_csv(path) if suffix == 'csv' else pd.read_parquet(path)
+        assert sorted(quarantined['transaction_id']) == sorted(flawed_dataframe['transaction_id'].iloc[[0, 1, 4, 5]])
+        assert set(quarantined['failed_rule_names']) >= {'invalid_status', 'missing_required'}
+        assert validator.get_results()['quarantined_records'] == 4
+
+    def test_quarantine_table(self, tmp_path, flawed_dataframe):
+        engine = create_engine(f"sqlite:///{tmp_path / 'q.db'}")
+        validator = TransactionValidator(flawed_dataframe, quarantine=Quarantine(engine=engine))
+
+        validator.validate()
+
+        stored = pd.read_sql('SELECT failed_rules FROM transactions_quarantine', engine)
+        assert np.bitwise_or.reduce(stored['failed_rules']) & INVALID_STATUS
+
+    def test_inside_streaming_cleaner(self, flawed_dataframe):
+        validator = TransactionValidator()
+        cleaner = StreamingTransactionCleaner(chunk_size=10, validator=validator)
+
+        cleaned = pd.concat(cleaner.clean_chunks(
+            flawed_dataframe.iloc[i:i + 10] for i in range(0, len(flawed_dataframe), 10)))
+
+        report = cleaner.get_cleaning_report()
+        # The cleaner already drops short phones, missing parties and zero amounts
+        assert report['validation_rejected'] == 1
+        assert len(cleaned) == report['final_record_count']
+        assert set(cleaned['status']) <= set(TransactionValidator.VALID_STATUSES)
+        assert validator.get_results()['total_records'] == report['final_record_count'] + 1
@@ -2,53 +2,158 @@
 Kafka Consumer Runner
 
 Consumes transaction events from Kafka and processes them in real-time.
+
+By default events are polled in batches (--max-records) whose partitions are
+processed in parallel (--workers) with offsets committed after each batch;
+--per-message uses the one-event-at-a-time loop. --fake-events N fills an
+in-process broker with N events first and consumes those instead of Kafka.
+
+--window-by provider transaction_type ... maintains per-minute (--window-size)
+event-time aggregates for each field, checkpointed in --state-db, and writes
+fired windows to its window_aggregates table or to --aggregates-topic.
+
+--fraud scores every event (sender velocity, amount vs baseline, high value)
+and publishes alerts to --alerts-topic, reporting event-to-alert latency.
 """
 
 from streaming.kafka_consumer import TransactionConsumer
+import argparse
 import logging
 import signal
-import sys
 import json
+import os
+import threading
+import time
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-consumer = None
+stop_event = threading.Event()
 
 def signal_handler(sig, frame):
     """Handle Ctrl+C gracefully"""
     logger.info("Shutting down consumer...")
-    if consumer:
-        consumer.close()
-    sys.exit(0)
+    stop_event.set()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Consume M-Pesa transaction events")
+    parser.add_argument('--bootstrap-servers', default='localhost:9092')
+    parser.add_argument('--topic', default='transactions')
+    parser.add_argument('--group-id', default='transaction-consumer-group')
+    parser.add_argument('--max-records', type=int, default=5000, help="Most events per poll")
+    parser.add_argument('--workers', type=int, default=4, help="Partitions processed in parallel")
+    parser.add_argument('--executor', default='thread', choices=['thread', 'process'])
+    parser.add_argument('--max-messages', type=int, help="Stop after this many events")
+    parser.add_argument('--per-message', action='store_true', help="Process events one at a time")
+    parser.add_argument('--fake-events', type=int, help="Consume this many generated events from an in-process broker")
+    parser.add_argument('--fake-format', default='binary', choices=['json', 'binary'])
+    parser.add_argument('--window-by', nargs='+', help="Event fields to aggregate per window, e.g. provider sender")
+    parser.add_argument('--window-size', type=int, default=60, help="Window length in seconds")
+    parser.add_argument('--window-slide', type=int, help="Seconds between window starts (default: tumbling)")
+    parser.add_argument('--allowed-lateness', type=int, default=60, help="Seconds late events still update a window")
+    parser.add_argument('--state-db', default='data/stream_state.db', help="SQLite file for window checkpoints")
+    parser.add_argument('--aggregates-topic', help="Send window results to this topic instead of the state DB")
+    parser.add_argument('--fraud', action='store_true', help="Score events and publish fraud alerts")
+    parser.add_argument('--alerts-topic', default='fraud-alerts')
+    parser.add_argument('--velocity-window', type=int, default=300, help="Seconds of per-sender velocity")
+    parser.add_argument('--max-count', type=int, default=10, help="Transactions per sender and velocity window")
+    return parser.parse_args()
+
+def fake_consumer(args):
+    """In-process broker filled with generated events, and a consumer of it"""
+    from streaming.fake_kafka import FakeBroker, FakeConsumer, FakeProducer
+    from streaming.kafka_producer import TransactionProducer
+    from streaming.load_generator import LoadGenerator
+    from streaming.serialization import get_serializer
+
+    broker = FakeBroker(partitions=4)
+    serializer = get_serializer(args.fake_format)
+    client = FakeProducer(broker, value_serializer=serializer, key_serializer=lambda k: k.encode('utf-8'))
+    producer = TransactionProducer(topic=args.topic, producer=client, serializer=serializer)
+    LoadGenerator(producer, rate=0).run(count=args.fake_events)
+    producer.close()
+    return FakeConsumer(args.topic, broker, group_id=args.group_id)
+
+def window_options(args):
+    """Aggregators, checkpoint and sink for --window-by"""
+    from streaming.windowing import SqliteCheckpoint, SqliteSink, TopicSink, WindowedAggregator
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.state_db)), exist_ok=True)
+    aggregators = [WindowedAggregator(key, size=args.window_size, slide=args.window_slide,
+                                      allowed_lateness=args.allowed_lateness) for key in args.window_by]
+    if args.aggregates_topic:
+        from kafka import KafkaProducer
+        sink = TopicSink(KafkaProducer(bootstrap_servers=args.bootstrap_servers), args.aggregates_topic)
+    else:
+        sink = SqliteSink(args.state_db)
+    return aggregators, SqliteCheckpoint(args.state_db), sink
+
+def fraud_sink(args, consumer):
+    """Alerts topic on the in-process broker or on Kafka"""
+    from streaming.windowing import TopicSink
+
+    if args.fake_events:
+        from streaming.fake_kafka import FakeProducer
+        producer = FakeProducer(consumer.consumer.broker)
+    else:
+        from kafka import KafkaProducer
+        producer = KafkaProducer(bootstrap_servers=args.bootstrap_servers, acks='all')
+    return TopicSink(producer, args.alerts_topic, key_fields=('sender',))
 
 def main():
     """Main consumer function"""
-    global consumer
-    
+    args = parse_args()
     signal.signal(signal.SIGINT, signal_handler)
-    
-    bootstrap_servers = 'localhost:9092'
-    topic = 'transactions'
-    group_id = 'transaction-consumer-group'
-    
+
     consumer = TransactionConsumer(
-        bootstrap_servers=bootstrap_servers,
-        topic=topic,
-        group_id=group_id
+        bootstrap_servers=args.bootstrap_servers,
+        topic=args.topic,
+        group_id=args.group_id,
+        consumer=fake_consumer(args) if args.fake_events else None
     )
-    
-    logger.info(f"Starting Kafka Consumer from {bootstrap_servers}")
-    logger.info(f"Topic: {topic}")
-    logger.info(f"Consumer Group: {group_id}")
+
+    source = 'in-process broker' if args.fake_events else args.bootstrap_servers
+    logger.info(f"Starting Kafka Consumer from {source}")
+    logger.info(f"Topic: {args.topic}")
+    logger.info(f"Consumer Group: {args.group_id}")
     logger.info("Press Ctrl+C to stop\n")
-    
+
+    started = time.perf_counter()
     try:
-        consumer.consume_messages()
+        if args.per_message:
+            consumer.consume_messages(max_messages=args.max_messages or args.fake_events)
+        elif args.fraud:
+            from streaming.fraud import FraudScorer
+
+            scorer = FraudScorer(window=args.velocity_window, max_count=args.max_count)
+            sink = fraud_sink(args, consumer)
+            try:
+                consumer.consume_fraud(scorer, sink=sink, max_records=args.max_records, workers=args.workers,
+                                       max_messages=args.max_messages, stop_event=stop_event,
+                                       idle_polls=3 if args.fake_events else None)
+            finally:
+                sink.close()
+            logger.info(f"Fraud scoring: {json.dumps(scorer.get_stats(), indent=2)}")
+        elif args.window_by:
+            aggregators, checkpoint, sink = window_options(args)
+            try:
+                consumer.consume_windows(aggregators, checkpoint=checkpoint, sink=sink, max_records=args.max_records,
+                                         workers=args.workers, max_messages=args.max_messages, stop_event=stop_event,
+                                         idle_polls=3 if args.fake_events else None)
+            finally:
+                sink.close()
+                checkpoint.close()
+            logger.info(f"Windows: {json.dumps({a.name: a.get_stats() for a in aggregators}, indent=2)}")
+        else:
+            consumer.consume_batches(max_records=args.max_records, workers=args.workers, executor=args.executor,
+                                     max_messages=args.max_messages, stop_event=stop_event,
+                                     idle_polls=3 if args.fake_events else None)
     except KeyboardInterrupt:
         logger.info("Consumer stopped by user")
     finally:
         stats = consumer.get_stats()
+        elapsed = time.perf_counter() - started
+        stats['messages_per_sec'] = round(consumer.message_count / elapsed, 1) if elapsed else None
         logger.info(f"\nFinal Statistics: {json.dumps(stats, indent=2)}")
 
 if __name__ == "__main__":
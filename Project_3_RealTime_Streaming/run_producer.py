@@ -2,60 +2,83 @@
 Kafka Producer Runner
 
 Continuously produces transaction data to Kafka topics for streaming pipeline.
+
+Events are sent asynchronously at a controlled rate (--rate, 0 = unthrottled)
+and a delivery report with msgs/sec and ack latency percentiles is logged at
+the end. --fake produces to an in-process broker instead of Kafka.
 """
 
 from streaming.kafka_producer import TransactionProducer
-import time
+from streaming.load_generator import LoadGenerator
+from streaming.serialization import get_serializer
+import argparse
+import json
 import logging
 import signal
-import sys
+import threading
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-producer = None
+stop_event = threading.Event()
 
 def signal_handler(sig, frame):
     """Handle Ctrl+C gracefully"""
     logger.info("Shutting down producer...")
-    if producer:
-        producer.close()
-    sys.exit(0)
+    stop_event.set()
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Produce M-Pesa transaction events")
+    parser.add_argument('--bootstrap-servers', default='localhost:9092')
+    parser.add_argument('--topic', default='transactions')
+    parser.add_argument('--rate', type=float, default=1000, help="Events per second (0 = as fast as possible)")
+    parser.add_argument('--count', type=int, help="Stop after this many events")
+    parser.add_argument('--duration', type=float, help="Stop after this many seconds")
+    parser.add_argument('--linger-ms', type=int, default=5)
+    parser.add_argument('--batch-size', type=int, default=64 * 1024)
+    parser.add_argument('--compression', default='lz4', choices=['lz4', 'zstd', 'snappy', 'gzip', 'none'])
+    parser.add_argument('--max-in-flight', type=int, default=10000)
+    parser.add_argument('--format', default='json', choices=['json', 'binary'],
+                        help="Event encoding; consumers read both")
+    parser.add_argument('--report-interval', type=float, default=5)
+    parser.add_argument('--fake', action='store_true', help="Use an in-process broker instead of Kafka")
+    parser.add_argument('--fake-ack-delay-ms', type=float, default=1, help="Simulated broker round trip")
+    return parser.parse_args()
 
 def main():
     """Main producer function"""
-    global producer
-    
+    args = parse_args()
     signal.signal(signal.SIGINT, signal_handler)
-    
-    bootstrap_servers = 'localhost:9092'
-    topic = 'transactions'
-    interval = 1  # Seconds between messages
-    
-    producer = TransactionProducer(bootstrap_servers=bootstrap_servers, topic=topic)
-    
-    logger.info(f"Starting Kafka Producer to {bootstrap_servers} on topic '{topic}'")
+
+    serializer = get_serializer(args.format)
+    client = None
+    if args.fake:
+        from streaming.fake_kafka import FakeProducer
+        client = FakeProducer(value_serializer=serializer,
+                              key_serializer=lambda k: k.encode('utf-8'),
+                              linger_ms=args.linger_ms, ack_delay_ms=args.fake_ack_delay_ms)
+
+    producer = TransactionProducer(
+        bootstrap_servers=args.bootstrap_servers,
+        topic=args.topic,
+        linger_ms=args.linger_ms,
+        batch_size=args.batch_size,
+        compression_type=None if args.compression == 'none' else args.compression,
+        max_in_flight=args.max_in_flight,
+        producer=client,
+        serializer=serializer
+    )
+
+    target = 'in-process broker' if args.fake else args.bootstrap_servers
+    logger.info(f"Starting Kafka Producer to {target} on topic '{args.topic}' at {args.rate or 'max'} events/s")
     logger.info("Press Ctrl+C to stop\n")
-    
-    message_count = 0
-    
+
     try:
-        while True:
-            message_count += 1
-            transaction = producer.generate_transaction()
-            
-            if producer.send_transaction(transaction):
-                logger.info(f"[{message_count}] Sent: {transaction['transaction_id']} | "
-                          f"Amount: {transaction['amount']} | Status: {transaction['status']}")
-            
-            time.sleep(interval)
-    
-    except KeyboardInterrupt:
-        logger.info("Producer stopped by user")
+        generator = LoadGenerator(producer, rate=args.rate, report_interval=args.report_interval)
+        report = generator.run(count=args.count, duration=args.duration, stop_event=stop_event)
+        logger.info(f"\nDelivery report: {json.dumps(report, indent=2)}")
     finally:
-        producer.flush()
         producer.close()
-        logger.info(f"Total messages sent: {message_count}")
 
 if __name__ == "__main__":
     main()
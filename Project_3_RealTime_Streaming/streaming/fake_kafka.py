@@ -0,0 +1,331 @@
+"""
+In-Process Fake Kafka
+
+A small stand-in for a Kafka broker so the streaming code can be exercised
+and benchmarked without a broker container:
+- FakeBroker keeps partitioned, offset-addressed logs per topic in memory
+- FakeProducer mirrors the KafkaProducer calls the pipeline uses (send with
+  key/value serializers, futures with callbacks and errbacks, flush, close)
+  and acknowledges records from a background thread every ``linger_ms``,
+  like a real producer's sender thread
+- FakeConsumer mirrors the KafkaConsumer calls of the batch consumer (poll with
+  max_records, manual commits stored per group on the broker, seek, positions,
+  end offsets); a single group member is assigned every partition
+"""
+
+import logging
+import threading
+import time
+import zlib
+from collections import deque, namedtuple
+
+from kafka.structs import TopicPartition
+
+logger = logging.getLogger(__name__)
+
+RecordMetadata = namedtuple('RecordMetadata', ['topic', 'partition', 'offset', 'timestamp'])
+StoredRecord = namedtuple('StoredRecord', ['topic', 'partition', 'offset', 'timestamp', 'key', 'value'])
+
+
+class FakeFuture:
+    """Resolved by the fake producer; same callback API as kafka-python futures"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._done = False
+        self._callbacks = []
+        self._errbacks = []
+        self.value = None
+        self.exception = None
+
+    def is_done(self):
+        return self._done
+
+    def succeeded(self):
+        return self._done and self.exception is None
+
+    def failed(self):
+        return self._done and self.exception is not None
+
+    def success(self, value):
+        with self._lock:
+            self.value = value
+            self._done = True
+        for fn, args, kwargs in self._callbacks:
+            fn(*args, value, **kwargs)
+        return self
+
+    def failure(self, exception):
+        with self._lock:
+            self.exception = exception
+            self._done = True
+        for fn, args, kwargs in self._errbacks:
+            fn(*args, exception, **kwargs)
+        return self
+
+    def add_callback(self, fn, *args, **kwargs):
+        with self._lock:
+            if not self._done:
+                self._callbacks.append((fn, args, kwargs))
+                return self
+        if self.exception is None:
+            fn(*args, self.value, **kwargs)
+        return self
+
+    def add_errback(self, fn, *args, **kwargs):
+        with self._lock:
+            if not self._done:
+                self._errbacks.append((fn, args, kwargs))
+                return self
+        if self.exception is not None:
+            fn(*args, self.exception, **kwargs)
+        return self
+
+    def get(self, timeout=None):
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self._done:
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Record not acknowledged within {timeout}s")
+            time.sleep(0.0005)
+        if self.exception is not None:
+            raise self.exception
+        return self.value
+
+
+class FakeBroker:
+    """In-memory topics made of partition logs"""
+
+    def __init__(self, partitions=3):
+        self.default_partitions = partitions
+        self._topics = {}
+        self._lock = threading.Lock()
+        self._round_robin = 0
+        self._committed = {}
+
+    def create_topic(self, topic, partitions=None):
+        with self._lock:
+            return self._topic(topic, partitions)
+
+    def _topic(self, topic, partitions=None):
+        if topic not in self._topics:
+            self._topics[topic] = [[] for _ in range(partitions or self.default_partitions)]
+        return self._topics[topic]
+
+    def partitions_for(self, topic):
+        with self._lock:
+            return set(range(len(self._topic(topic))))
+
+    def append(self, topic, key, value, timestamp_ms=None, partition=None):
+        """Append one record; keyed records always land on the same partition"""
+        with self._lock:
+            logs = self._topic(topic)
+            if partition is None:
+                if key is not None:
+                    partition = zlib.crc32(key) % len(logs)
+                else:
+                    partition = self._round_robin % len(logs)
+                    self._round_robin += 1
+            log = logs[partition]
+            timestamp_ms = timestamp_ms if timestamp_ms is not None else int(time.time() * 1000)
+            record = StoredRecord(topic, partition, len(log), timestamp_ms, key, value)
+            log.append(record)
+        return RecordMetadata(topic, partition, record.offset, timestamp_ms)
+
+    def records(self, topic, partition, offset=0, max_records=None):
+        with self._lock:
+            log = self._topic(topic)[partition]
+            end = len(log) if max_records is None else min(len(log), offset + max_records)
+            return log[offset:end]
+
+    def end_offset(self, topic, partition):
+        with self._lock:
+            return len(self._topic(topic)[partition])
+
+    def count(self, topic):
+        with self._lock:
+            return sum(len(log) for log in self._topic(topic))
+
+    def commit(self, group_id, topic, partition, offset):
+        with self._lock:
+            self._committed[(group_id, topic, partition)] = offset
+
+    def committed(self, group_id, topic, partition):
+        with self._lock:
+            return self._committed.get((group_id, topic, partition))
+
+
+class FakeProducer:
+    """
+    KafkaProducer look-alike writing to a FakeBroker
+
+    Sends are queued and acknowledged in batches by a sender thread every
+    ``linger_ms``; ``ack_delay_ms`` adds a simulated broker round trip.
+    Set ``error`` to an exception instance to fail every following send.
+    """
+
+    def __init__(self, broker=None, value_serializer=None, key_serializer=None, linger_ms=5,
+                 ack_delay_ms=0, **config):
+        self.broker = broker or FakeBroker()
+        self.value_serializer = value_serializer
+        self.key_serializer = key_serializer
+        self.linger_ms = linger_ms
+        self.ack_delay_ms = ack_delay_ms
+        self.config = config
+        self.error = None
+        # Appends and pops of a deque are atomic, so the send path takes no lock
+        self._pending = deque()
+        self._closed = threading.Event()
+        self._wakeup = threading.Event()
+        self._sender = threading.Thread(target=self._run, name='fake-producer-sender', daemon=True)
+        self._sender.start()
+
+    def send(self, topic, value=None, key=None, partition=None, timestamp_ms=None):
+        if self._closed.is_set():
+            raise RuntimeError("Producer is closed")
+        if self.value_serializer is not None and value is not None:
+            value = self.value_serializer(value)
+        if self.key_serializer is not None and key is not None:
+            key = self.key_serializer(key)
+        future = FakeFuture()
+        self._pending.append((future, topic, key, value, partition, timestamp_ms))
+        return future
+
+    def _drain(self):
+        batch = []
+        while self._pending:
+            batch.append(self._pending.popleft())
+        if not batch:
+            return
+        if self.ack_delay_ms:
+            time.sleep(self.ack_delay_ms / 1000)
+        for future, topic, key, value, partition, timestamp_ms in batch:
+            if topic is None:
+                future.success(None)  # flush marker
+            elif self.error is not None:
+                future.failure(self.error)
+            else:
+                future.success(self.broker.append(topic, key, value, timestamp_ms, partition))
+
+    def _run(self):
+        while not self._closed.is_set():
+            self._wakeup.wait(self.linger_ms / 1000)
+            self._wakeup.clear()
+            self._drain()
+        self._drain()
+
+    def flush(self, timeout=None):
+        """Block until every queued record is acknowledged"""
+        if self._closed.is_set():
+            return
+        # Records are acknowledged in order: once the marker is, everything before it is
+        marker = FakeFuture()
+        self._pending.append((marker, None, None, None, None, None))
+        self._wakeup.set()
+        marker.get(timeout)
+
+    def close(self, timeout=None):
+        self._closed.set()
+        self._wakeup.set()
+        self._sender.join(timeout)
+
+
+class FakeConsumer:
+    """
+    KafkaConsumer look-alike reading from a FakeBroker
+
+    Starts at the group's committed offsets (or offset 0, like
+    auto_offset_reset='earliest'). Values are returned as stored unless a
+    ``value_deserializer`` is given. A rebalance listener passed to
+    subscribe() is told of the assignment by the next poll, as with a group.
+    """
+
+    def __init__(self, topic, broker=None, group_id='transaction-group', value_deserializer=None, **config):
+        self.broker = broker or FakeBroker()
+        self.topic = topic
+        self.group_id = group_id
+        self.value_deserializer = value_deserializer
+        self.config = config
+        self._assignment = {TopicPartition(topic, p) for p in self.broker.partitions_for(topic)}
+        self._positions = {}
+        self._next = 0
+        self.commits = []
+        self.closed = False
+        self._listener = None
+        self._assigned = True
+
+    def subscribe(self, topics=(), pattern=None, listener=None):
+        """Like a group subscription: nothing is assigned until the next poll"""
+        self.topic = list(topics)[0] if topics else self.topic
+        self._listener = listener
+        self.rebalance()
+
+    def rebalance(self):
+        """Revoke every partition and reassign it on the next poll; positions fall back to committed offsets"""
+        if self._listener is not None and self._assignment:
+            self._listener.on_partitions_revoked(self.assignment())
+        self._assignment = set()
+        self._positions.clear()
+        self._assigned = False
+
+    def assignment(self):
+        return set(self._assignment)
+
+    def position(self, tp):
+        if tp not in self._positions:
+            self._positions[tp] = self.broker.committed(self.group_id, tp.topic, tp.partition) or 0
+        return self._positions[tp]
+
+    def seek(self, tp, offset):
+        self._positions[tp] = offset
+
+    def poll(self, timeout_ms=0, max_records=None, update_offsets=True):
+        """Up to ``max_records`` records, taken from the partitions in turn"""
+        if not self._assigned:
+            self._assigned = True
+            self._assignment = {TopicPartition(self.topic, p) for p in self.broker.partitions_for(self.topic)}
+            if self._listener is not None:
+                self._listener.on_partitions_assigned(self.assignment())
+        partitions = sorted(self._assignment)
+        remaining = max_records or 500
+        batches = {}
+        for i in range(len(partitions)):
+            if remaining <= 0:
+                break
+            tp = partitions[(self._next + i) % len(partitions)]
+            stored = self.broker.records(tp.topic, tp.partition, self.position(tp), remaining)
+            if not stored:
+                continue
+            batches[tp] = [record if self.value_deserializer is None
+                           else record._replace(value=self.value_deserializer(record.value)) for record in stored]
+            remaining -= len(stored)
+            if update_offsets:
+                self._positions[tp] = stored[-1].offset + 1
+        self._next += 1
+        if not batches and timeout_ms:
+            time.sleep(min(timeout_ms, 50) / 1000)
+        return batches
+
+    def commit(self, offsets=None, timeout_ms=None):
+        if offsets is None:
+            offsets = {tp: self.position(tp) for tp in self._assignment}
+        offsets = {tp: getattr(offset, 'offset', offset) for tp, offset in offsets.items()}
+        for tp, offset in offsets.items():
+            self.broker.commit(self.group_id, tp.topic, tp.partition, offset)
+        self.commits.append(offsets)
+
+    def committed(self, tp):
+        return self.broker.committed(self.group_id, tp.topic, tp.partition)
+
+    def end_offsets(self, partitions):
+        return {tp: self.broker.end_offset(tp.topic, tp.partition) for tp in partitions}
+
+    def highwater(self, tp):
+        return self.broker.end_offset(tp.topic, tp.partition)
+
+    def close(self, autocommit=True):
+        self.closed = True
+
+    def __iter__(self):
+        while not self.closed:
+            for records in self.poll(timeout_ms=100).values():
+                yield from records
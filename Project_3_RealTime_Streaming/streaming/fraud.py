@@ -0,0 +1,304 @@
+"""
+Streaming Fraud Scoring
+
+Scores transactions as they are consumed (TransactionConsumer.consume_fraud())
+and publishes alerts seconds after the event instead of at the next batch DAG
+run. The rules follow the batch defaults of Project 2 (etl/fraud_rules.py):
+- sender_velocity: more than ``max_count`` transactions, or more than
+  ``max_amount`` in total, per sender within ``window`` seconds (high risk)
+- large_vs_baseline: a successful amount above ``ratio`` x the sender's mean
+  successful amount, or the global mean while the sender has fewer than
+  ``min_history`` transactions (medium risk)
+- high_value: amount above ``high_value`` (high risk)
+
+Per-sender state is bounded:
+- velocity counts and amounts live in a ring of ``window / bucket`` time
+  buckets per sender slot (two NumPy arrays). The ring advances with event
+  time; buckets leaving the window are zeroed for all senders at once.
+- there are at most ``max_senders`` slots. Senders idle for ``idle_ttl``
+  seconds of event time are evicted, and the least recently seen senders when
+  the table is still full.
+
+Velocity counts are exact to one bucket: an event counts the sender's events
+in its own bucket and the ``window / bucket - 1`` before it.
+
+Latency is measured from the event timestamp to scoring and to the alert
+being on the broker (p50/p99/max in get_stats()).
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from streaming.windowing import to_epoch
+
+logger = logging.getLogger(__name__)
+
+def _wall_clock():
+    """Seconds since the epoch on the producers' clock"""
+    # Producers stamp events with naive local time (datetime.now()) and to_epoch
+    # reads naive timestamps as UTC, so local wall time is read the same way
+    return time.time() + datetime.now().astimezone().utcoffset().total_seconds()
+
+def _percentiles(values):
+    values = np.asarray(values, dtype=float)
+    if not len(values):
+        return None
+    p50, p99 = np.percentile(values, [50, 99])
+    return {'p50': round(float(p50), 3), 'p99': round(float(p99), 3), 'max': round(float(values.max()), 3)}
+
+class FraudScorer:
+    """Velocity, baseline and high-value checks over the transaction stream"""
+
+    def __init__(self, window=300, bucket=10, max_count=10, max_amount=100000, ratio=5, min_history=5,
+                 high_value=50000, max_senders=50000, idle_ttl=3600, latency_samples=100000, clock=None):
+        """
+        Args:
+            window: Velocity window in seconds; a multiple of ``bucket``
+            bucket: Velocity resolution in seconds
+            max_count / max_amount: Velocity limits per sender and window (None disables one)
+            ratio: Baseline multiple that counts as large
+            min_history: Successful transactions before a sender's own mean is the baseline
+            high_value: Single-transaction limit (None disables it)
+            max_senders: Sender slots; memory is about max_senders * window / bucket * 12 bytes
+            idle_ttl: Event-time seconds after which an inactive sender is evicted
+            latency_samples: Latency measurements kept for the percentiles
+            clock: Returns the current time in epoch seconds (defaults to the producers' clock)
+        """
+        if bucket <= 0 or window % bucket:
+            raise ValueError(f"Velocity window {window} must be a multiple of the bucket {bucket}")
+        self.window = window
+        self.bucket = bucket
+        self.buckets = window // bucket
+        self.max_count = max_count
+        self.max_amount = max_amount
+        self.ratio = ratio
+        self.min_history = min_history
+        self.high_value = high_value
+        self.max_senders = max_senders
+        self.idle_ttl = idle_ttl
+        self.clock = clock or _wall_clock
+
+        self.counts = np.zeros((max_senders, self.buckets), dtype=np.int32)
+        self.amounts = np.zeros((max_senders, self.buckets), dtype=np.float64)
+        self.head = None  # newest bucket held by the rings
+        self.history_count = np.zeros(max_senders, dtype=np.int64)
+        self.history_sum = np.zeros(max_senders, dtype=np.float64)
+        self.global_count = 0
+        self.global_sum = 0.0
+        self.slots = {}
+        self.senders = np.empty(max_senders, dtype=object)
+        self.in_use = np.zeros(max_senders, dtype=bool)
+        self.last_seen = np.zeros(max_senders, dtype=np.int64)
+        self.free = list(range(max_senders - 1, -1, -1))
+
+        self.pending = []
+        self.stats = {'scored': 0, 'alerts': 0, 'evicted': 0,
+                      'rules': {'sender_velocity': 0, 'large_vs_baseline': 0, 'high_value': 0}}
+        self.score_latencies = deque(maxlen=latency_samples)
+        self.alert_latencies = deque(maxlen=latency_samples)
+        self._lock = threading.Lock()
+
+    def _evict(self, needed, now, protected):
+        """Free idle slots, then the least recently seen ones until ``needed`` are free"""
+        idle = self.in_use & (self.last_seen < now - self.idle_ttl)
+        idle[protected] = False
+        victims = np.flatnonzero(idle)
+        short = needed - len(self.free) - len(victims)
+        if short > 0:
+            candidates = self.in_use & ~idle
+            candidates[protected] = False
+            candidates = np.flatnonzero(candidates)
+            oldest = np.argpartition(self.last_seen[candidates], short - 1)[:short]
+            victims = np.concatenate([victims, candidates[oldest]])
+        for slot in victims.tolist():
+            del self.slots[self.senders[slot]]
+            self.senders[slot] = None
+            self.free.append(slot)
+        self.in_use[victims] = False
+        self.stats['evicted'] += len(victims)
+
+    def _assign(self, senders, now):
+        """Slots of the batch's unique senders, allocating (and evicting) for new ones"""
+        if len(senders) > self.max_senders:
+            raise ValueError(f"{len(senders)} senders in one batch exceed max_senders={self.max_senders}")
+        slots = np.array([self.slots.get(sender, -1) for sender in senders], dtype=np.int64)
+        new = np.flatnonzero(slots < 0)
+        if len(new):
+            if len(new) > len(self.free):
+                self._evict(len(new), now, slots[slots >= 0])
+            for i in new.tolist():
+                slot = self.free.pop()
+                self.slots[senders[i]] = slot
+                self.senders[slot] = senders[i]
+                slots[i] = slot
+            fresh = slots[new]
+            self.counts[fresh] = 0
+            self.amounts[fresh] = 0
+            self.history_count[fresh] = 0
+            self.history_sum[fresh] = 0
+            self.last_seen[fresh] = 0
+            self.in_use[fresh] = True
+        return slots
+
+    def _advance(self, head):
+        """Move the rings to ``head``, zeroing buckets that left the window"""
+        if self.head is None or head - self.head >= self.buckets:
+            self.counts[:] = 0
+            self.amounts[:] = 0
+        elif head > self.head:
+            stale = np.arange(self.head + 1, head + 1) % self.buckets
+            self.counts[:, stale] = 0
+            self.amounts[:, stale] = 0
+        self.head = head
+
+    def score(self, partition, frame):
+        """
+        Score a batch of events from one partition and queue alerts for publish()
+
+        Safe to call from several pool threads at once.
+
+        Returns:
+            list[dict]: Alerts raised by this batch
+        """
+        if frame is None or frame.empty:
+            return []
+        scored_at = self.clock()
+        micros = to_epoch(frame['timestamp'], 'us')
+        seconds = micros // 1_000_000
+        buckets = seconds // self.bucket
+        amounts = frame['amount'].to_numpy(dtype=float)
+        success = (frame['status'].astype(str) == 'success').to_numpy() if 'status' in frame \
+            else np.ones(len(frame), dtype=bool)
+        codes, senders = pd.factorize(frame['sender'].astype(str).to_numpy())
+
+        # Velocity within the batch: events of the same sender sorted by time
+        order = np.lexsort((micros, codes))
+        keys = codes[order] * (1 << 40) + buckets[order]
+        first = np.searchsorted(keys, keys - self.buckets + 1, side='left')
+        position = np.arange(len(order))
+        running = np.concatenate([[0.0], np.cumsum(amounts[order])])
+        batch_count = np.empty(len(order), dtype=np.int64)
+        batch_amount = np.empty(len(order))
+        batch_count[order] = position - first + 1
+        batch_amount[order] = running[position + 1] - running[first]
+
+        with self._lock:
+            slots = self._assign(senders.tolist(), int(seconds.max()))
+
+            # Velocity from earlier batches: a prefix sum over each sender's ring, oldest bucket first
+            state_count = np.zeros(len(frame), dtype=np.int64)
+            state_amount = np.zeros(len(frame))
+            if self.head is not None:
+                oldest = self.head - self.buckets + 1
+                columns = np.arange(oldest, self.head + 1) % self.buckets
+                count_prefix = np.zeros((len(slots), self.buckets + 1), dtype=np.int64)
+                amount_prefix = np.zeros((len(slots), self.buckets + 1))
+                np.cumsum(self.counts[slots][:, columns], axis=1, out=count_prefix[:, 1:])
+                np.cumsum(self.amounts[slots][:, columns], axis=1, out=amount_prefix[:, 1:])
+                upper = np.clip(np.minimum(buckets, self.head) - oldest + 1, 0, self.buckets)
+                lower = np.clip(buckets - self.buckets + 1 - oldest, 0, self.buckets)
+                lower = np.minimum(lower, upper)
+                state_count = count_prefix[codes, upper] - count_prefix[codes, lower]
+                state_amount = amount_prefix[codes, upper] - amount_prefix[codes, lower]
+
+            # Baselines as of the start of the batch
+            history = self.history_count[slots][codes]
+            with np.errstate(invalid='ignore', divide='ignore'):
+                sender_mean = self.history_sum[slots][codes] / history
+            global_mean = self.global_sum / self.global_count if self.global_count else np.nan
+            baseline = np.where(history >= self.min_history, sender_mean, global_mean)
+
+            # Fold the batch into the state
+            self._advance(max(self.head if self.head is not None else 0, int(buckets.max())))
+            recent = buckets > self.head - self.buckets
+            np.add.at(self.counts, (slots[codes[recent]], buckets[recent] % self.buckets), 1)
+            np.add.at(self.amounts, (slots[codes[recent]], buckets[recent] % self.buckets), amounts[recent])
+            np.add.at(self.history_count, slots[codes[success]], 1)
+            np.add.at(self.history_sum, slots[codes[success]], amounts[success])
+            self.global_count += int(success.sum())
+            self.global_sum += float(amounts[success].sum())
+            np.maximum.at(self.last_seen, slots[codes], seconds)
+            idle = self.in_use & (self.last_seen < int(seconds.max()) - self.idle_ttl)
+            if idle.any():
+                self._evict(0, int(seconds.max()), slots)
+
+        velocity_count = state_count + batch_count
+        velocity_amount = state_amount + batch_amount
+        hits = {'sender_velocity': np.zeros(len(frame), dtype=bool)}
+        if self.max_count is not None:
+            hits['sender_velocity'] |= velocity_count > self.max_count
+        if self.max_amount is not None:
+            hits['sender_velocity'] |= velocity_amount > self.max_amount
+        with np.errstate(invalid='ignore'):
+            hits['large_vs_baseline'] = success & (amounts > self.ratio * baseline)
+        hits['high_value'] = amounts > self.high_value if self.high_value is not None \
+            else np.zeros(len(frame), dtype=bool)
+
+        alerts = []
+        flagged = np.flatnonzero(hits['sender_velocity'] | hits['large_vs_baseline'] | hits['high_value'])
+        if len(flagged):
+            transaction_ids = frame['transaction_id'].to_numpy() if 'transaction_id' in frame \
+                else np.full(len(frame), None)
+            stamps = np.datetime_as_string(micros[flagged].astype('datetime64[us]'))
+            for i, stamp in zip(flagged.tolist(), stamps.tolist()):
+                rules = [name for name, hit in hits.items() if hit[i]]
+                alerts.append({
+                    'transaction_id': transaction_ids[i],
+                    'sender': senders[codes[i]],
+                    'amount': float(amounts[i]),
+                    'timestamp': stamp,
+                    'partition': partition,
+                    'rules': rules,
+                    'risk': 'medium' if rules == ['large_vs_baseline'] else 'high',
+                    'velocity_count': int(velocity_count[i]),
+                    'velocity_amount': round(float(velocity_amount[i]), 2),
+                    'baseline': None if np.isnan(baseline[i]) else round(float(baseline[i]), 2),
+                    'event_time': micros[i] / 1e6
+                })
+
+        with self._lock:
+            self.pending.extend(alerts)
+            self.stats['scored'] += len(frame)
+            for name, hit in hits.items():
+                self.stats['rules'][name] += int(hit.sum())
+            self.score_latencies.extend(((scored_at - micros / 1e6) * 1000).tolist())
+        return alerts
+
+    def publish(self, sink=None):
+        """
+        Stamp queued alerts with their latency and write them to ``sink``
+
+        Returns:
+            list[dict]: The published alerts
+        """
+        with self._lock:
+            alerts, self.pending = self.pending, []
+        if not alerts:
+            return alerts
+        alerted_at = self.clock()
+        for alert in alerts:
+            alert['latency_ms'] = round((alerted_at - alert['event_time']) * 1000, 3)
+        if sink is not None:
+            sink.write(alerts)
+        delivered = self.clock()
+        with self._lock:
+            self.alert_latencies.extend((delivered - alert['event_time']) * 1000 for alert in alerts)
+            self.stats['alerts'] += len(alerts)
+        logger.debug(f"Published {len(alerts)} fraud alerts "
+                    f"(latest latency {alerts[-1]['latency_ms']} ms)")
+        return alerts
+
+    def get_stats(self):
+        """Scored events, alerts per rule, sender table usage and latency percentiles (ms)"""
+        with self._lock:
+            return dict(self.stats, rules=dict(self.stats['rules']),
+                        senders=len(self.slots),
+                        state_bytes=self.counts.nbytes + self.amounts.nbytes,
+                        event_to_score_ms=_percentiles(self.score_latencies),
+                        event_to_alert_ms=_percentiles(self.alert_latencies))
@@ -2,31 +2,96 @@
 Kafka Consumer Module
 
 Consumes transaction events from Kafka for real-time processing and analytics.
+
+Two consume paths, both with manual offset commits (at-least-once delivery):
+- consume_messages() handles one event at a time and commits every
+  ``commit_every`` events
+- consume_batches() polls up to ``max_records`` events, decodes each
+  partition's share into a DataFrame, hands the partitions to a thread or
+  process pool and commits a partition's offsets only after its handler has
+  returned. A failed partition is rewound and redelivered by the next poll.
 """
 
 import json
 import logging
-from kafka import KafkaConsumer
-from kafka.errors import KafkaError
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from kafka import ConsumerRebalanceListener, KafkaConsumer
+from kafka.errors import CommitFailedError, KafkaError
+from kafka.structs import OffsetAndMetadata
 from datetime import datetime
 import threading
 
+from streaming.serialization import EventDeserializer
+
 logger = logging.getLogger(__name__)
 
+def _commit_offset(offset):
+    # kafka-python 2.3+ adds leader_epoch to OffsetAndMetadata
+    if 'leader_epoch' in OffsetAndMetadata._fields:
+        return OffsetAndMetadata(offset, '', -1)
+    return OffsetAndMetadata(offset, '')
+
+def summarize_batch(partition, frame):
+    """
+    Default batch handler: the vectorized counterpart of process_message
+    
+    Returns:
+        dict: Increments for TransactionConsumer.stats
+    """
+    if 'status' not in frame:
+        return {'total_messages': len(frame), 'successful': 0, 'failed': len(frame), 'total_amount': 0}
+    success = (frame['status'] == 'success').to_numpy()
+    successful = int(success.sum())
+    return {
+        'total_messages': len(frame),
+        'successful': successful,
+        'failed': len(frame) - successful,
+        'total_amount': float(frame['amount'].to_numpy()[success].sum()) if 'amount' in frame else 0
+    }
+
+def handle_partition(deserializer, handler, partition, payloads):
+    """Decode one partition's polled payloads and run the handler (runs in a pool worker)"""
+    frame = deserializer.deserialize_frame([p for p in payloads if p is not None])
+    return handler(partition, frame)
+
+class _SeekOnAssign(ConsumerRebalanceListener):
+    """Moves every newly assigned partition to its offset in ``offsets`` (kept current by the caller)"""
+    
+    def __init__(self, consumer, offsets):
+        self.consumer = consumer
+        self.offsets = offsets
+    
+    def on_partitions_revoked(self, revoked):
+        pass
+    
+    def on_partitions_assigned(self, assigned):
+        for tp in assigned:
+            if tp.partition in self.offsets:
+                self.consumer.seek(tp, self.offsets[tp.partition])
+
 class TransactionConsumer:
     """Kafka consumer for transaction events"""
     
-    def __init__(self, bootstrap_servers='localhost:9092', topic='transactions', group_id='transaction-group'):
-        """Initialize Kafka consumer"""
+    def __init__(self, bootstrap_servers='localhost:9092', topic='transactions', group_id='transaction-group',
+                 registry=None, consumer=None):
+        """
+        Initialize Kafka consumer
+        
+        Events may be JSON or schema-versioned binary (streaming.serialization);
+        ``registry`` is the SchemaRegistry holding the binary schemas.
+        ``consumer`` replaces the KafkaConsumer (e.g. streaming.fake_kafka.FakeConsumer).
+        """
         self.topic = topic
         self.group_id = group_id
-        self.consumer = KafkaConsumer(
+        self.deserializer = EventDeserializer(registry)
+        # Values stay raw bytes: batches are decoded column-wise per partition
+        self.consumer = consumer or KafkaConsumer(
             topic,
             bootstrap_servers=bootstrap_servers,
             group_id=group_id,
-            value_deserializer=lambda m: json.loads(m.decode('utf-8')),
             auto_offset_reset='earliest',
-            enable_auto_commit=True,
+            enable_auto_commit=False,
             session_timeout_ms=6000
         )
         self.message_count = 0
@@ -36,6 +101,9 @@ class TransactionConsumer:
             'failed': 0,
             'total_amount': 0
         }
+        self.batch_stats = {'batches': 0, 'failed_batches': 0, 'commits': 0}
+        self.committed_offsets = {}
+        self.partition_lag = {}
         logger.info(f"Kafka Consumer initialized for topic: {topic}, group: {group_id}")
     
     def process_message(self, message):
@@ -57,8 +125,24 @@ class TransactionConsumer:
             logger.error(f"Error processing message: {str(e)}")
             return False
     
-    def consume_messages(self, max_messages=None):
-        """Consume messages from Kafka"""
+    def process_batch(self, frame, partition=None):
+        """Process a DataFrame of events at once (same stats as process_message)"""
+        self._add_stats(summarize_batch(partition, frame))
+        return True
+    
+    def _add_stats(self, increments):
+        for key, value in (increments or {}).items():
+            if key in self.stats:
+                self.stats[key] += value
+    
+    def consume_messages(self, max_messages=None, callback=None, commit_every=100):
+        """
+        Consume messages from Kafka one by one
+        
+        Args:
+            callback: Called with every processed event
+            commit_every: Commit offsets after this many events (and on exit)
+        """
         logger.info(f"Starting to consume messages from {self.topic}...")
         
         try:
@@ -66,7 +150,10 @@ class TransactionConsumer:
                 self.message_count += 1
                 
                 # Process message
-                self.process_message(message.value)
+                event = self.deserializer(message.value)
+                self.process_message(event)
+                if callback:
+                    callback(event)
                 
                 # Log periodically
                 if self.message_count % 100 == 0:
@@ -75,33 +162,256 @@ class TransactionConsumer:
                         f"Successful: {self.stats['successful']}, "
                         f"Failed: {self.stats['failed']}"
                     )
+                if self.message_count % commit_every == 0:
+                    self._commit()
                 
                 # Stop if max messages reached
                 if max_messages and self.message_count >= max_messages:
                     logger.info(f"Reached max messages: {max_messages}")
                     break
+            
+            self._commit()
         
         except KeyboardInterrupt:
             logger.info("Consumer interrupted by user")
+            self._commit()
         except Exception as e:
             logger.error(f"Error consuming messages: {str(e)}")
         finally:
             self.close()
     
     def consume_messages_async(self, callback=None, max_messages=None):
-        """Consume messages asynchronously"""
+        """Consume messages asynchronously, calling ``callback`` with every event"""
         def consume_worker():
-            self.consume_messages(max_messages)
+            self.consume_messages(max_messages, callback=callback)
         
         thread = threading.Thread(target=consume_worker, daemon=True)
         thread.start()
         return thread
     
+    def consume_batches(self, handler=None, max_records=500, workers=4, executor='thread',
+                        poll_timeout_ms=1000, max_messages=None, stop_event=None, idle_polls=None,
+                        max_retries=3, lag_interval=10, start_offsets=None, before_commit=None):
+        """
+        Consume in polled batches, partitions processed in parallel
+        
+        Args:
+            handler: handler(partition, frame) -> stats increments or None. It must make its
+                results durable before returning; offsets are committed right after.
+                Defaults to summarize_batch. With executor='process' it must be picklable.
+            max_records: Most events per poll
+            workers: Pool size; partitions of one poll are handled concurrently
+            executor: 'thread' or 'process'
+            max_messages: Stop after this many events
+            stop_event: threading.Event that stops the loop
+            idle_polls: Stop after this many consecutive empty polls
+            max_retries: Consecutive failures of a partition before the error is raised
+                (once the other partitions of that poll are committed)
+            lag_interval: Seconds between per-partition lag refreshes
+            start_offsets: {partition: offset} already handled elsewhere (e.g. restored from a
+                checkpoint); polled records below it are skipped, only their offsets committed
+            before_commit: before_commit({TopicPartition: next offset}) runs after a poll's
+                handlers succeeded and before those offsets are committed
+        
+        Returns:
+            dict: Consumer statistics (see get_stats)
+        """
+        handler = handler or summarize_batch
+        pool = (ProcessPoolExecutor if executor == 'process' else ThreadPoolExecutor)(max_workers=workers)
+        failures = {}
+        idle = 0
+        next_lag = time.monotonic()
+        logger.info(f"Starting batch consumption from {self.topic} "
+                    f"(max_records={max_records}, workers={workers}, executor={executor})")
+        
+        try:
+            while not (stop_event is not None and stop_event.is_set()):
+                batches = self.consumer.poll(timeout_ms=poll_timeout_ms, max_records=max_records)
+                if not batches:
+                    idle += 1
+                    if idle_polls and idle >= idle_polls:
+                        logger.info(f"No new messages after {idle} polls; stopping")
+                        break
+                    continue
+                idle = 0
+                
+                payloads = {tp: [r.value for r in records if r.offset >= start_offsets.get(tp.partition, 0)]
+                            for tp, records in batches.items()} if start_offsets else \
+                    {tp: [r.value for r in records] for tp, records in batches.items()}
+                futures = {tp: pool.submit(handle_partition, self.deserializer, handler, tp.partition, values)
+                           for tp, values in payloads.items()}
+                done = {}
+                error = None
+                for tp, future in futures.items():
+                    records = batches[tp]
+                    try:
+                        increments = future.result()
+                    except Exception as e:
+                        # Rewind: the next poll redelivers this partition's records
+                        self.consumer.seek(tp, records[0].offset)
+                        self.batch_stats['failed_batches'] += 1
+                        failures[tp] = failures.get(tp, 0) + 1
+                        logger.error(f"Batch of partition {tp.partition} at offset {records[0].offset} failed "
+                                     f"({failures[tp]}/{max_retries}): {e}")
+                        if failures[tp] >= max_retries:
+                            error = e
+                        continue
+                    failures.pop(tp, None)
+                    done[tp] = records[-1].offset + 1
+                    self.message_count += len(payloads[tp])
+                    self.batch_stats['batches'] += 1
+                    self._add_stats(increments)
+                
+                if done:
+                    if before_commit:
+                        before_commit(done)
+                    self._commit(done)
+                if error is not None:
+                    raise error
+                if time.monotonic() >= next_lag:
+                    self.update_lag()
+                    logger.info(f"Processed {self.message_count} messages. Lag: "
+                                f"{ {p: lag['lag'] for p, lag in self.partition_lag.items()} }")
+                    next_lag = time.monotonic() + lag_interval
+                if max_messages and self.message_count >= max_messages:
+                    logger.info(f"Reached max messages: {max_messages}")
+                    break
+        
+        except KeyboardInterrupt:
+            logger.info("Consumer interrupted by user")
+        finally:
+            pool.shutdown(wait=True)
+            self.update_lag()
+            self.close()
+        return self.get_stats()
+    
+    def consume_windows(self, aggregators, checkpoint=None, sink=None, **options):
+        """
+        Consume in batches while maintaining event-time window aggregates
+        
+        After every poll the windows the watermark has passed are written to the
+        sink, then state and offsets are checkpointed, then offsets are committed.
+        A crash can therefore re-emit a window result (sinks upsert by window and
+        key) but never loses or double-counts events.
+        
+        Args:
+            aggregators: streaming.windowing.WindowedAggregator, or a list of them
+            checkpoint: streaming.windowing.SqliteCheckpoint; its state and offsets are restored first
+            sink: Receives fired results via sink.write(rows) (SqliteSink, TopicSink)
+            options: Passed on to consume_batches (max_records, workers, max_messages, stop_event, ...)
+        
+        Returns:
+            dict: Consumer statistics with a 'windows' entry per aggregator
+        """
+        if not isinstance(aggregators, (list, tuple)):
+            aggregators = [aggregators]
+        start_offsets = checkpoint.restore(aggregators, self.topic) if checkpoint else {}
+        # The group assigns partitions during the first poll, so seeking has to happen then
+        resume_offsets = dict(start_offsets)
+        if checkpoint is not None:
+            self.consumer.subscribe([self.topic], listener=_SeekOnAssign(self.consumer, resume_offsets))
+        if start_offsets:
+            logger.info(f"Resuming from checkpointed offsets {start_offsets}")
+        
+        def handler(partition, frame):
+            for aggregator in aggregators:
+                aggregator.add(partition, frame)
+            return summarize_batch(partition, frame)
+        
+        def assign():
+            partitions = [tp.partition for tp in self.consumer.assignment()]
+            for aggregator in aggregators:
+                aggregator.assign(partitions)
+        
+        def before_commit(offsets):
+            assign()
+            rows = [row for aggregator in aggregators for row in aggregator.fire()]
+            if rows and sink is not None:
+                sink.write(rows)
+            if checkpoint is not None:
+                saved = {tp.partition: offset for tp, offset in offsets.items()}
+                checkpoint.save(aggregators, saved, self.topic)
+                resume_offsets.update(saved)
+        
+        assign()
+        # Aggregators share state across partitions, so workers are threads
+        options['executor'] = 'thread'
+        stats = self.consume_batches(handler, start_offsets=start_offsets, before_commit=before_commit, **options)
+        stats['windows'] = {aggregator.name: aggregator.get_stats() for aggregator in aggregators}
+        return stats
+    
+    def consume_fraud(self, scorer, sink=None, **options):
+        """
+        Consume in batches, scoring every event for fraud
+        
+        Alerts raised by a poll are published to ``sink`` before its offsets are
+        committed, so an alert is never lost; after a crash it may be sent again
+        (alerts carry the transaction_id).
+        
+        Args:
+            scorer: streaming.fraud.FraudScorer
+            sink: Receives alerts via sink.write(alerts), e.g. a TopicSink on the alerts topic
+            options: Passed on to consume_batches (max_records, workers, max_messages, stop_event, ...)
+        
+        Returns:
+            dict: Consumer statistics with a 'fraud' entry (alerts per rule, latency percentiles)
+        """
+        def handler(partition, frame):
+            scorer.score(partition, frame)
+            return summarize_batch(partition, frame)
+        
+        def before_commit(offsets):
+            scorer.publish(sink)
+        
+        # The scorer's sender state is shared, so workers are threads
+        options['executor'] = 'thread'
+        stats = self.consume_batches(handler, before_commit=before_commit, **options)
+        stats['fraud'] = scorer.get_stats()
+        return stats
+    
+    def _commit(self, offsets=None):
+        """Commit next offsets ({TopicPartition: offset}), or the current positions"""
+        try:
+            if offsets is None:
+                self.consumer.commit()
+            else:
+                self.consumer.commit({tp: _commit_offset(offset) for tp, offset in offsets.items()})
+                self.committed_offsets.update(offsets)
+            self.batch_stats['commits'] += 1
+        except (CommitFailedError, KafkaError) as e:
+            # Partitions moved to another member; it resumes from the last commit
+            logger.warning(f"Offset commit failed: {e}")
+    
+    def update_lag(self):
+        """
+        Refresh per-partition lag (end offset minus committed offset)
+        
+        Returns:
+            dict: {partition: {'committed', 'end_offset', 'lag'}}
+        """
+        try:
+            assignment = sorted(self.consumer.assignment())
+            ends = self.consumer.end_offsets(assignment) if assignment else {}
+        except KafkaError as e:
+            logger.warning(f"Could not fetch end offsets: {e}")
+            return self.partition_lag
+        lag = {}
+        for tp in assignment:
+            committed = self.committed_offsets.get(tp)
+            if committed is None:
+                committed = self.consumer.position(tp)
+            lag[tp.partition] = {'committed': committed, 'end_offset': ends[tp],
+                                 'lag': max(ends[tp] - committed, 0)}
+        self.partition_lag = lag
+        return lag
+    
     def get_stats(self):
         """Get consumption statistics"""
         return {
             'messages_processed': self.message_count,
             'stats': self.stats,
+            'batches': self.batch_stats,
+            'partition_lag': self.partition_lag,
             'timestamp': datetime.now().isoformat()
         }
     
@@ -2,32 +2,88 @@
 Kafka Producer Module
 
 Produces transaction events to Kafka topics for real-time streaming processing.
+
+Two send paths:
+- send_transaction() waits for the broker acknowledgement of every event
+- send_async() returns immediately; deliveries are reported through callbacks,
+  records are batched by ``linger_ms``/``batch_size`` and at most
+  ``max_in_flight`` unacknowledged events are outstanding (further sends block)
 """
 
-import json
 import logging
-from kafka import KafkaProducer
+import threading
+import time
+from collections import deque
+from kafka import KafkaProducer, codec
 from kafka.errors import KafkaError
 from datetime import datetime
+import numpy as np
 import random
 import uuid
 
+from streaming.serialization import get_serializer
+
 logger = logging.getLogger(__name__)
 
+# Codec checks of kafka-python; lz4/zstd need the lz4 / zstandard packages
+COMPRESSION_CODECS = {
+    'lz4': codec.has_lz4,
+    'zstd': codec.has_zstd,
+    'snappy': codec.has_snappy,
+    'gzip': codec.has_gzip,
+}
+
+
+def resolve_compression(compression_type):
+    """Requested codec if its library is installed, otherwise gzip"""
+    available = COMPRESSION_CODECS.get(compression_type)
+    if compression_type is None or available is None or available():
+        return compression_type
+    logger.warning(f"{compression_type} compression is not installed; falling back to gzip")
+    return 'gzip'
+
+
 class TransactionProducer:
     """Kafka producer for transaction events"""
     
-    def __init__(self, bootstrap_servers='localhost:9092', topic='transactions'):
-        """Initialize Kafka producer"""
+    def __init__(self, bootstrap_servers='localhost:9092', topic='transactions', linger_ms=5,
+                 batch_size=64 * 1024, compression_type='lz4', max_in_flight=10000, acks='all',
+                 producer=None, latency_samples=100000, serializer='json'):
+        """
+        Initialize Kafka producer
+        
+        Args:
+            linger_ms: How long the client waits to fill a batch before sending it
+            batch_size: Maximum bytes per partition batch
+            compression_type: 'lz4', 'zstd', 'snappy', 'gzip' or None
+            max_in_flight: Unacknowledged send_async() events allowed before sends block
+            producer: Ready-made client (e.g. streaming.fake_kafka.FakeProducer) instead of KafkaProducer
+            latency_samples: Most recent acknowledgement latencies kept for percentiles
+            serializer: 'json', 'binary' (schema-versioned, see streaming.serialization) or a serializer
+        """
         self.topic = topic
-        self.producer = KafkaProducer(
+        self.serializer = get_serializer(serializer) if isinstance(serializer, str) else serializer
+        self.compression_type = resolve_compression(compression_type)
+        self.producer = producer or KafkaProducer(
             bootstrap_servers=bootstrap_servers,
-            value_serializer=lambda v: json.dumps(v).encode('utf-8'),
-            acks='all',
+            value_serializer=self.serializer,
+            key_serializer=lambda k: k.encode('utf-8'),
+            acks=acks,
             retries=3,
-            compression_type='gzip'
+            linger_ms=linger_ms,
+            batch_size=batch_size,
+            compression_type=self.compression_type
         )
-        logger.info(f"Kafka Producer initialized for topic: {topic}")
+        self.max_in_flight = max_in_flight
+        self._lock = threading.Lock()
+        self._capacity = threading.Condition(self._lock)
+        self.in_flight = 0
+        self.ack_latencies = deque(maxlen=latency_samples)
+        self.delivery_stats = {'sent': 0, 'acked': 0, 'failed': 0}
+        self._rng = np.random.default_rng()
+        logger.info(f"Kafka Producer initialized for topic: {topic} "
+                    f"(linger_ms={linger_ms}, batch_size={batch_size}, compression={self.compression_type}, "
+                    f"format={getattr(self.serializer, 'name', type(self.serializer).__name__)})")
     
     def generate_transaction(self):
         """Generate a random transaction"""
@@ -43,13 +99,41 @@ class TransactionProducer:
             'fee': round(random.uniform(0, 100), 2)
         }
     
+    def generate_transactions(self, count):
+        """Generate ``count`` random transactions at once (same fields as generate_transaction)"""
+        rng = self._rng
+        ids = rng.bytes(16 * count).hex()
+        phones = rng.integers(700000000, 800000000, size=(2, count)).tolist()
+        amounts = rng.uniform(100, 50000, count).round(2).tolist()
+        fees = rng.uniform(0, 100, count).round(2).tolist()
+        types = rng.choice(['transfer', 'withdrawal', 'deposit'], count).tolist()
+        statuses = rng.choice(['success', 'failed'], count, p=[0.9, 0.1]).tolist()
+        providers = rng.choice(['Safaricom', 'Airtel', 'Equity'], count).tolist()
+        timestamp = datetime.now().isoformat()
+        return [
+            {
+                'transaction_id': f'{ids[i:i + 8]}-{ids[i + 8:i + 12]}-{ids[i + 12:i + 16]}-'
+                                  f'{ids[i + 16:i + 20]}-{ids[i + 20:i + 32]}',
+                'sender': f'254{sender}',
+                'receiver': f'254{receiver}',
+                'amount': amount,
+                'timestamp': timestamp,
+                'transaction_type': transaction_type,
+                'status': status,
+                'provider': provider,
+                'fee': fee
+            }
+            for i, sender, receiver, amount, transaction_type, status, provider, fee in zip(
+                range(0, 32 * count, 32), phones[0], phones[1], amounts, types, statuses, providers, fees)
+        ]
+    
     def send_transaction(self, transaction=None, callback=None):
         """Send transaction to Kafka"""
         if transaction is None:
             transaction = self.generate_transaction()
         
         try:
-            future = self.producer.send(self.topic, value=transaction)
+            future = self.producer.send(self.topic, key=transaction.get('sender'), value=transaction)
             record_metadata = future.get(timeout=10)
             
             logger.info(
@@ -66,6 +150,76 @@ class TransactionProducer:
             logger.error(f"Error sending message: {str(e)}")
             return False
     
+    def send_async(self, transaction=None, callback=None, errback=None, timeout=30):
+        """
+        Send a transaction without waiting for the broker
+        
+        Blocks only while ``max_in_flight`` events are unacknowledged.
+        
+        Args:
+            callback: Called as callback(transaction, record_metadata) once acknowledged
+            errback: Called as errback(transaction, exception) if delivery fails
+            timeout: Seconds to wait for in-flight capacity
+        
+        Returns:
+            The send future, or None if the event could not be queued
+        """
+        if transaction is None:
+            transaction = self.generate_transaction()
+        
+        with self._capacity:
+            if not self._capacity.wait_for(lambda: self.in_flight < self.max_in_flight, timeout):
+                self.delivery_stats['failed'] += 1
+                logger.error(f"{self.max_in_flight} events still unacknowledged after {timeout}s; dropping send")
+                return None
+            self.delivery_stats['sent'] += 1
+            self.in_flight += 1
+        started = time.perf_counter()
+        try:
+            future = self.producer.send(self.topic, key=transaction.get('sender'), value=transaction)
+        except Exception as e:
+            self._delivered('failed')
+            logger.error(f"Error queueing message: {str(e)}")
+            if errback:
+                errback(transaction, e)
+            return None
+        
+        future.add_callback(self._on_ack, transaction, started, callback)
+        future.add_errback(self._on_error, transaction, errback)
+        return future
+    
+    def _on_ack(self, transaction, started, callback, record_metadata):
+        self.ack_latencies.append(time.perf_counter() - started)
+        self._delivered('acked')
+        if callback:
+            callback(transaction, record_metadata)
+    
+    def _on_error(self, transaction, errback, exc):
+        self._delivered('failed')
+        logger.error(f"Error delivering message {transaction.get('transaction_id')}: {exc}")
+        if errback:
+            errback(transaction, exc)
+    
+    def _delivered(self, outcome):
+        with self._capacity:
+            self.delivery_stats[outcome] += 1
+            self.in_flight -= 1
+            # Every ack frees one slot: wake one blocked sender for it
+            self._capacity.notify()
+    
+    def delivery_report(self):
+        """Delivery counts and acknowledgement latency percentiles (milliseconds) of send_async()"""
+        with self._lock:
+            report = dict(self.delivery_stats, in_flight=self.in_flight)
+        latencies = np.array(self.ack_latencies) * 1000
+        if len(latencies):
+            p50, p99 = np.percentile(latencies, [50, 99])
+            report['ack_latency_ms'] = {'p50': round(float(p50), 3), 'p99': round(float(p99), 3),
+                                        'max': round(float(latencies.max()), 3)}
+        else:
+            report['ack_latency_ms'] = None
+        return report
+    
     def send_batch(self, count=100):
         """Send batch of transactions"""
         logger.info(f"Sending batch of {count} transactions...")
@@ -94,7 +248,6 @@ class TransactionProducer:
 def main():
     """Main function for testing"""
     import sys
-    import time
     
     producer = TransactionProducer()
     
@@ -103,12 +256,10 @@ def main():
         message_count = int(sys.argv[1]) if len(sys.argv) > 1 else 10
         
         for i in range(message_count):
-            producer.send_transaction()
-            print(f"Sent message {i + 1}/{message_count}")
-            time.sleep(1)
+            producer.send_async()
         
         producer.flush()
-        print("✓ All messages sent successfully")
+        print(f"✓ Delivery report: {producer.delivery_report()}")
     
     except KeyboardInterrupt:
         print("Producer stopped by user")
@@ -0,0 +1,91 @@
+"""
+Producer Load Generator
+
+Drives TransactionProducer.send_async() at a target rate to simulate peak
+M-Pesa traffic and reports what the pipeline actually achieved:
+- msgs/sec sent and acknowledged
+- p50/p99 acknowledgement latency
+- delivery failures
+"""
+
+import logging
+import time
+
+logger = logging.getLogger(__name__)
+
+
+class LoadGenerator:
+    """Rate-controlled transaction load against a TransactionProducer"""
+
+    def __init__(self, producer, rate=10000, report_interval=5, max_burst=1000):
+        """
+        Args:
+            producer: TransactionProducer (backed by Kafka or a FakeProducer)
+            rate: Target events per second; 0 or None sends as fast as possible
+            report_interval: Seconds between progress log lines
+            max_burst: Most events sent back to back before re-checking the schedule
+        """
+        self.producer = producer
+        self.rate = rate
+        self.report_interval = report_interval
+        self.max_burst = max_burst
+
+    def run(self, count=None, duration=None, stop_event=None, flush_timeout=60):
+        """
+        Send until ``count`` events, ``duration`` seconds or ``stop_event`` is set
+
+        Returns:
+            dict: Sent/acked/failed counts, achieved rates and ack latency percentiles
+        """
+        if count is None and duration is None and stop_event is None:
+            raise ValueError("Give count, duration or stop_event so the load ends")
+
+        producer = self.producer
+        before = dict(producer.delivery_stats)
+        producer.ack_latencies.clear()
+        started = time.perf_counter()
+        next_report = started + self.report_interval
+        sent = 0
+
+        while True:
+            now = time.perf_counter()
+            elapsed = now - started
+            if (count is not None and sent >= count) or (duration is not None and elapsed >= duration) \
+                    or (stop_event is not None and stop_event.is_set()):
+                break
+            if self.rate:
+                # Sends due by now on the target schedule; sleep until the next one otherwise
+                due = int(elapsed * self.rate) + 1 - sent
+                if due <= 0:
+                    time.sleep(min((sent - elapsed * self.rate) / self.rate, 0.01))
+                    continue
+            else:
+                due = self.max_burst
+            burst = min(due, self.max_burst) if count is None else min(due, self.max_burst, count - sent)
+            for transaction in producer.generate_transactions(burst):
+                producer.send_async(transaction)
+            sent += burst
+
+            if now >= next_report:
+                logger.info(f"Sent {sent} events in {elapsed:.1f}s ({sent / elapsed:.0f}/s), "
+                            f"{producer.in_flight} in flight")
+                next_report = now + self.report_interval
+
+        send_seconds = time.perf_counter() - started
+        producer.flush(flush_timeout)
+        total_seconds = time.perf_counter() - started
+
+        delivered = producer.delivery_report()
+        acked = delivered['acked'] - before['acked']
+        report = {
+            'target_rate': self.rate or None,
+            'sent': sent,
+            'acked': acked,
+            'failed': delivered['failed'] - before['failed'],
+            'seconds': round(total_seconds, 3),
+            'send_rate': round(sent / send_seconds, 1) if send_seconds else None,
+            'msgs_per_sec': round(acked / total_seconds, 1) if total_seconds else None,
+            'ack_latency_ms': delivered['ack_latency_ms'],
+        }
+        logger.info(f"Load complete: {report}")
+        return report
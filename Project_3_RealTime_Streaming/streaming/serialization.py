@@ -0,0 +1,415 @@
+"""
+Event Serialization
+
+Pluggable value (de)serializers for the transaction topics:
+- JsonSerializer: the original UTF-8 JSON events
+- BinarySerializer: compact, schema-versioned binary events. Numbers, phone
+  numbers and timestamps are stored as fixed-width integers/doubles and
+  enumerations as one byte, so an event is about a third of its JSON size
+- SchemaRegistry: file-based registry of schemas (one JSON file per subject
+  version) shared by producers and consumers
+- EventDeserializer: reads both formats from the same topic, so consumers keep
+  working on existing JSON topics while producers switch to binary
+
+Binary wire format (same framing as the Confluent registry format):
+    byte 0      magic byte 0x00 (JSON events start with '{')
+    bytes 1-4   schema id, big-endian uint32
+    body        fixed-width fields in schema order (little-endian), then the
+                UTF-8 bytes of the string fields, each length-prefixed in the
+                fixed part (uint16, 0xFFFF = null)
+
+Timestamps are stored as microseconds since the epoch; naive ISO timestamps
+round-trip unchanged, aware ones come back as naive UTC. Phone numbers must be
+canonical (254 and nine digits) to be stored as integers; anything else, such
+as '0712...' or '+254...', is rejected rather than silently rewritten.
+"""
+
+import json
+import logging
+import os
+import re
+import struct
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MAGIC_BYTE = 0
+HEADER = struct.Struct('>BI')
+NULL_LENGTH = 0xFFFF
+EPOCH = datetime(1970, 1, 1)
+MICROSECOND = timedelta(microseconds=1)
+
+DEFAULT_REGISTRY_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'schemas')
+TRANSACTION_SUBJECT = 'transactions-value'
+
+# Field types: struct code and numpy dtype of the fixed-width part
+FIELD_TYPES = {
+    'string': ('H', '<u2'),
+    'phone': ('q', '<i8'),
+    'int': ('q', '<i8'),
+    'double': ('d', '<f8'),
+    'timestamp': ('q', '<i8'),
+    'enum': ('B', 'u1'),
+}
+
+TRANSACTION_SCHEMA = {
+    'name': 'Transaction',
+    'fields': [
+        {'name': 'transaction_id', 'type': 'string'},
+        {'name': 'sender', 'type': 'phone'},
+        {'name': 'receiver', 'type': 'phone'},
+        {'name': 'amount', 'type': 'double'},
+        {'name': 'timestamp', 'type': 'timestamp'},
+        {'name': 'transaction_type', 'type': 'enum', 'symbols': ['transfer', 'withdrawal', 'deposit']},
+        {'name': 'status', 'type': 'enum', 'symbols': ['success', 'failed', 'pending']},
+        {'name': 'provider', 'type': 'enum', 'symbols': ['Safaricom', 'Airtel', 'Equity']},
+        {'name': 'fee', 'type': 'double', 'default': 0.0},
+    ],
+}
+
+
+class SchemaRegistry:
+    """
+    Local schema registry: ``<directory>/<subject>/v<version>.json``
+
+    Ids are unique across subjects. Registering a schema that is already the
+    latest version of its subject returns the existing id.
+    """
+
+    def __init__(self, directory=DEFAULT_REGISTRY_DIR):
+        self.directory = directory
+        self._by_id = {}
+        self._load()
+
+    def _load(self):
+        self._by_id = {}
+        if not os.path.isdir(self.directory):
+            return
+        for subject in sorted(os.listdir(self.directory)):
+            subject_dir = os.path.join(self.directory, subject)
+            if not os.path.isdir(subject_dir):
+                continue
+            for name in os.listdir(subject_dir):
+                if name.endswith('.json'):
+                    with open(os.path.join(subject_dir, name)) as f:
+                        entry = json.load(f)
+                    self._by_id[entry['id']] = entry
+
+    def versions(self, subject):
+        return sorted(e['version'] for e in self._by_id.values() if e['subject'] == subject)
+
+    def latest(self, subject):
+        """Newest registered entry of a subject ({'id', 'subject', 'version', 'schema'}) or None"""
+        entries = [e for e in self._by_id.values() if e['subject'] == subject]
+        return max(entries, key=lambda e: e['version']) if entries else None
+
+    def get(self, schema_id):
+        """Registry entry by id; re-reads the directory for ids registered by other processes"""
+        if schema_id not in self._by_id:
+            self._load()
+        if schema_id not in self._by_id:
+            raise KeyError(f"Schema id {schema_id} is not registered in {self.directory}")
+        return self._by_id[schema_id]
+
+    def register(self, subject, schema):
+        """
+        Register ``schema`` as the next version of ``subject``
+
+        Returns:
+            int: Schema id
+        """
+        validate_schema(schema)
+        self._load()
+        latest = self.latest(subject)
+        if latest is not None and latest['schema'] == schema:
+            return latest['id']
+
+        os.makedirs(os.path.join(self.directory, subject), exist_ok=True)
+        while True:
+            entry = {'id': max(self._by_id, default=0) + 1, 'subject': subject,
+                     'version': latest['version'] + 1 if latest else 1, 'schema': schema}
+            path = os.path.join(self.directory, subject, f"v{entry['version']}.json")
+            try:
+                # O_EXCL: a concurrent registration of the same version makes us retry
+                with open(path, 'x') as f:
+                    json.dump(entry, f, indent=2)
+                break
+            except FileExistsError:
+                self._load()
+                latest = self.latest(subject)
+                if latest['schema'] == schema:
+                    return latest['id']
+        self._by_id[entry['id']] = entry
+        logger.info(f"Registered {subject} v{entry['version']} as schema id {entry['id']}")
+        return entry['id']
+
+
+def validate_schema(schema):
+    names = set()
+    for field in schema['fields']:
+        if field['type'] not in FIELD_TYPES:
+            raise ValueError(f"Unsupported type {field['type']!r} of field {field['name']!r}")
+        if field['type'] == 'enum' and not 0 < len(field.get('symbols', [])) <= 255:
+            raise ValueError(f"Enum field {field['name']!r} needs 1 to 255 symbols")
+        if field['name'] in names:
+            raise ValueError(f"Duplicate field {field['name']!r}")
+        names.add(field['name'])
+
+
+_CANONICAL_PHONE = re.compile(r'254[0-9]{9}')
+
+
+def _phone_to_int(value):
+    if not _CANONICAL_PHONE.fullmatch(str(value)):
+        raise ValueError(f"{value!r} is not a canonical phone number (254 and nine digits)")
+    return int(value)
+
+
+def _timestamp_to_micros(value):
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if isinstance(value, datetime):
+        if value.tzinfo is not None:
+            value = value.astimezone(timezone.utc).replace(tzinfo=None)
+        return (value - EPOCH) // MICROSECOND
+    return int(value)
+
+
+class _Codec:
+    """Compiled layout of one schema"""
+
+    def __init__(self, schema_id, schema):
+        self.schema_id = schema_id
+        self.fields = schema['fields']
+        self.header = HEADER.pack(MAGIC_BYTE, schema_id)
+        self.fixed = struct.Struct('<' + ''.join(FIELD_TYPES[f['type']][0] for f in self.fields))
+        self.dtype = np.dtype([(f['name'], FIELD_TYPES[f['type']][1]) for f in self.fields])
+        self.strings = [i for i, f in enumerate(self.fields) if f['type'] == 'string']
+        self.symbols = {f['name']: f['symbols'] for f in self.fields if f['type'] == 'enum'}
+        self.indexes = {name: {s: i for i, s in enumerate(symbols)} for name, symbols in self.symbols.items()}
+        self.names = [f['name'] for f in self.fields]
+        # Event value -> fixed-width value
+        self.encoders = []
+        for field in self.fields:
+            convert = {'phone': _phone_to_int, 'int': int, 'timestamp': _timestamp_to_micros}.get(field['type'])
+            if field['type'] == 'enum':
+                convert = self._enum_encoder(field['name'], self.indexes[field['name']])
+            self.encoders.append((field['name'], field.get('default'), field['type'], convert))
+        # Fixed-width value -> event value, for the fields that need converting
+        self.converters = []
+        for i, field in enumerate(self.fields):
+            if field['type'] == 'enum':
+                self.converters.append((i, field['symbols'].__getitem__))
+            elif field['type'] == 'timestamp':
+                self.converters.append((i, lambda micros: (EPOCH + micros * MICROSECOND).isoformat()))
+            elif field['type'] == 'phone':
+                self.converters.append((i, str))
+
+    @staticmethod
+    def _enum_encoder(name, index):
+        def encode(value):
+            try:
+                return index[value]
+            except KeyError:
+                raise ValueError(f"{value!r} is not a symbol of enum field {name!r}") from None
+        return encode
+
+    def encode(self, event):
+        values = []
+        tail = []
+        for name, default, kind, convert in self.encoders:
+            value = event.get(name, default)
+            if kind == 'string':
+                if value is None:
+                    values.append(NULL_LENGTH)
+                else:
+                    data = str(value).encode('utf-8')
+                    values.append(len(data))
+                    tail.append(data)
+                continue
+            if value is None:
+                raise ValueError(f"Field {name!r} is missing and has no default")
+            values.append(convert(value) if convert else value)
+        return b''.join([self.header, self.fixed.pack(*values)] + tail)
+
+    def decode(self, payload):
+        values = list(self.fixed.unpack_from(payload, HEADER.size))
+        position = HEADER.size + self.fixed.size
+        for i in self.strings:
+            size = values[i]
+            if size == NULL_LENGTH:
+                values[i] = None
+            else:
+                values[i], position = payload[position:position + size].decode('utf-8'), position + size
+        for i, convert in self.converters:
+            values[i] = convert(values[i])
+        return dict(zip(self.names, values))
+
+    def decode_columns(self, payloads):
+        """Decode same-schema payloads into columns; numeric fields without a Python loop"""
+        lengths = np.fromiter((len(p) for p in payloads), dtype=np.int64, count=len(payloads))
+        buffer = np.frombuffer(b''.join(payloads), dtype=np.uint8)
+        starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) + HEADER.size
+        fixed = buffer[starts[:, None] + np.arange(self.fixed.size)].view(self.dtype).ravel()
+
+        columns = {}
+        if self.strings:
+            string_fields = [self.fields[i]['name'] for i in self.strings]
+            sizes = np.stack([fixed[name].astype(np.int64) for name in string_fields], axis=1)
+            offsets = starts + self.fixed.size
+            stored = np.where(sizes == NULL_LENGTH, 0, sizes)
+            positions = offsets[:, None] + np.cumsum(stored, axis=1) - stored
+            for j, name in enumerate(string_fields):
+                size = sizes[:, j]
+                if len(size) and (size == size[0]).all() and size[0] != NULL_LENGTH:
+                    # Fixed-length values (ids): gather all bytes at once
+                    chars = buffer[positions[:, j, None] + np.arange(size[0])]
+                    columns[name] = np.char.decode(chars.view(f'S{size[0]}').ravel(), 'utf-8').astype(object)
+                else:
+                    data = buffer.tobytes()
+                    columns[name] = [None if n == NULL_LENGTH else data[p:p + n].decode('utf-8')
+                                     for p, n in zip(positions[:, j].tolist(), size.tolist())]
+
+        for field in self.fields:
+            name, kind = field['name'], field['type']
+            if kind == 'enum':
+                columns[name] = pd.Categorical.from_codes(fixed[name].astype(np.int16), categories=field['symbols'])
+            elif kind == 'timestamp':
+                columns[name] = fixed[name].astype('datetime64[us]')
+            elif kind == 'phone':
+                columns[name] = fixed[name].astype(str).astype(object)
+            elif kind != 'string':
+                columns[name] = fixed[name].copy()
+        return pd.DataFrame({f['name']: columns[f['name']] for f in self.fields})
+
+
+class JsonSerializer:
+    """UTF-8 JSON events (the original topic format)"""
+
+    name = 'json'
+
+    def serialize(self, event):
+        return json.dumps(event).encode('utf-8')
+
+    def __call__(self, event):
+        return self.serialize(event)
+
+
+class BinarySerializer:
+    """Schema-versioned binary events, registering the schema on first use"""
+
+    name = 'binary'
+
+    def __init__(self, registry=None, subject=TRANSACTION_SUBJECT, schema=TRANSACTION_SCHEMA):
+        self.registry = registry or SchemaRegistry()
+        self.subject = subject
+        schema_id = self.registry.register(subject, schema)
+        self.codec = _Codec(schema_id, schema)
+
+    @property
+    def schema_id(self):
+        return self.codec.schema_id
+
+    def serialize(self, event):
+        return self.codec.encode(event)
+
+    def __call__(self, event):
+        return self.serialize(event)
+
+
+class EventDeserializer:
+    """
+    Decode JSON or binary events, picking the format from the first byte
+
+    Binary events are decoded with the schema they were written with. Fields
+    of the subject's latest schema that the writer schema lacks are filled
+    from their defaults.
+    """
+
+    def __init__(self, registry=None, subject=TRANSACTION_SUBJECT):
+        self.registry = registry or SchemaRegistry()
+        self.subject = subject
+        self._codecs = {}
+        self._defaults = {}
+
+    def __getstate__(self):
+        # Compiled codecs hold struct.Struct objects; process pool workers rebuild them
+        return {'registry': self.registry, 'subject': self.subject, '_codecs': {}, '_defaults': {}}
+
+    def _codec(self, schema_id):
+        codec = self._codecs.get(schema_id)
+        if codec is None:
+            entry = self.registry.get(schema_id)
+            codec = self._codecs[schema_id] = _Codec(schema_id, entry['schema'])
+            self._defaults[schema_id] = self._missing_defaults(entry)
+        return codec
+
+    def _missing_defaults(self, entry):
+        latest = self.registry.latest(entry['subject'])
+        written = {f['name'] for f in entry['schema']['fields']}
+        return {f['name']: f['default'] for f in latest['schema']['fields']
+                if f['name'] not in written and 'default' in f}
+
+    @staticmethod
+    def schema_id(payload):
+        """Schema id of a binary payload, None for JSON"""
+        if payload[:1] != b'\x00':
+            return None
+        return HEADER.unpack_from(payload)[1]
+
+    def deserialize(self, payload):
+        if payload is None:
+            return None
+        schema_id = self.schema_id(payload)
+        if schema_id is None:
+            return json.loads(payload.decode('utf-8'))
+        event = self._codec(schema_id).decode(payload)
+        defaults = self._defaults[schema_id]
+        if defaults:
+            event = {**defaults, **event}
+        return event
+
+    def __call__(self, payload):
+        return self.deserialize(payload)
+
+    def deserialize_frame(self, payloads):
+        """
+        Decode raw payloads into a DataFrame in their original order
+
+        Binary payloads are decoded column-wise per schema; timestamps become
+        datetime64 and enums categoricals whichever format the events came in.
+        """
+        groups = {}
+        for position, payload in enumerate(payloads):
+            groups.setdefault(self.schema_id(payload), []).append(position)
+
+        frames = []
+        for schema_id, positions in groups.items():
+            batch = [payloads[p] for p in positions]
+            if schema_id is None:
+                frame = pd.DataFrame([json.loads(p.decode('utf-8')) for p in batch])
+                if 'timestamp' in frame:
+                    frame['timestamp'] = pd.to_datetime(frame['timestamp'], format='ISO8601')
+            else:
+                frame = self._codec(schema_id).decode_columns(batch)
+                for name, value in self._defaults[schema_id].items():
+                    frame[name] = value
+            frames.append(frame.set_axis(positions))
+
+        if not frames:
+            return pd.DataFrame()
+        if len(frames) == 1:
+            return frames[0].reset_index(drop=True)
+        return pd.concat(frames).sort_index().reset_index(drop=True)
+
+
+def get_serializer(name='json', registry=None):
+    """Value serializer by name: 'json' or 'binary'"""
+    if name == 'json':
+        return JsonSerializer()
+    if name == 'binary':
+        return BinarySerializer(registry)
+    raise ValueError(f"Unknown serializer {name!r} (expected 'json' or 'binary')")
@@ -0,0 +1,391 @@
+"""
+Windowed Stream Aggregation
+
+Event-time window aggregates over the transaction stream, computed batch by
+batch inside TransactionConsumer.consume_windows():
+- WindowedAggregator: tumbling or sliding windows keyed by one or more event
+  fields (provider, transaction_type, sender, ...), with a watermark and
+  allowed lateness
+- SqliteCheckpoint: window state, watermarks and consumed offsets saved in
+  one transaction, so a restarted consumer resumes without replaying the topic
+- SqliteSink / TopicSink: where fired window results are written
+
+Times are whole seconds since the epoch (UTC) internally. The watermark of an
+aggregator is the smallest maximum event time over the assigned partitions
+minus ``max_delay``; it advances once per poll. A window fires once the
+watermark passes its end. Events for a
+fired window still update it (and it fires again) until the watermark passes
+its end plus ``allowed_lateness``. After that the window is dropped and later
+events for it are counted as late.
+"""
+
+import json
+import logging
+import sqlite3
+import threading
+import time
+from datetime import datetime, timezone
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+AGGREGATES = ('count', 'successful', 'total_amount', 'total_fee', 'max_amount')
+
+def to_epoch(values, unit='s'):
+    """Event timestamps (ISO strings or datetime64, naive = UTC) as int64 since the epoch in ``unit``"""
+    if values.dtype.kind != 'M':
+        values = pd.to_datetime(values, utc=True, format='ISO8601').dt.tz_localize(None)
+    elif values.dt.tz is not None:
+        values = values.dt.tz_convert('UTC').dt.tz_localize(None)
+    return values.to_numpy().astype(f'datetime64[{unit}]').astype(np.int64)
+
+def _isoformat(seconds):
+    return datetime.fromtimestamp(seconds, timezone.utc).replace(tzinfo=None).isoformat()
+
+class WindowedAggregator:
+    """Count, success and amount aggregates per event-time window and key"""
+
+    def __init__(self, key='provider', size=60, slide=None, allowed_lateness=60, max_delay=5, idle_timeout=30,
+                 name=None):
+        """
+        Args:
+            key: Event field, or tuple of fields, the aggregates are grouped by
+            size: Window length in seconds
+            slide: Seconds between window starts; None (or ``size``) gives tumbling windows.
+                ``size`` must be a multiple of it.
+            allowed_lateness: Seconds past a window's end during which late events still update it
+            max_delay: Out-of-orderness tolerated before the watermark passes an event time
+            idle_timeout: Wall-clock seconds after which a partition without events stops
+                holding the watermark back
+            name: Identifies the aggregator in checkpoints and sinks
+        """
+        self.keys = (key,) if isinstance(key, str) else tuple(key)
+        self.size = int(size)
+        self.slide = int(slide or size)
+        if self.slide <= 0 or self.size % self.slide:
+            raise ValueError(f"Window size {size} must be a positive multiple of the slide {slide}")
+        self.allowed_lateness = allowed_lateness
+        self.max_delay = max_delay
+        self.idle_timeout = idle_timeout
+        kind = 'tumbling' if self.slide == self.size else f'sliding{self.slide}s'
+        self.name = name or f"{'_'.join(self.keys)}_{self.size}s_{kind}"
+
+        # {window start: {key: [count, successful, total_amount, total_fee, max_amount]}}
+        self.windows = {}
+        self.event_times = {}  # partition -> max event time seen (None: assigned, nothing yet)
+        self.last_seen = {}    # partition -> time.monotonic() of its last events
+        self.watermark = None
+        self.pending = {}      # start -> keys updated since the window last fired
+        self.dirty = {}        # start -> keys changed since the last checkpoint
+        self.purged = set()    # window starts dropped since the last checkpoint
+        self.stats = {'events': 0, 'late_records': 0, 'fired': 0}
+        self._lock = threading.Lock()
+
+    def assign(self, partitions):
+        """Partitions the watermark waits for (in addition to those that delivered events)"""
+        now = time.monotonic()
+        with self._lock:
+            for partition in partitions:
+                if partition not in self.event_times:
+                    self.event_times[partition] = None
+                    self.last_seen[partition] = now
+
+    def _partial(self, frame, times):
+        """Aggregates of one batch per (window start, key)"""
+        buckets = pd.DataFrame({key: frame[key] for key in self.keys})
+        buckets['start'] = times - times % self.slide
+        buckets['successful'] = (frame['status'].astype(str) == 'success').to_numpy(dtype=np.int64) \
+            if 'status' in frame else 0
+        buckets['amount'] = frame['amount'].to_numpy(dtype=float)
+        buckets['fee'] = frame['fee'].to_numpy(dtype=float) if 'fee' in frame else 0.0
+        groups = ['start', *self.keys]
+        partial = buckets.groupby(groups, sort=False, observed=True, dropna=False).agg(
+            count=('amount', 'size'), successful=('successful', 'sum'), total_amount=('amount', 'sum'),
+            total_fee=('fee', 'sum'), max_amount=('amount', 'max'))
+
+        # Sliding windows: each slide-sized bucket belongs to size / slide windows
+        per_bucket = self.size // self.slide
+        if per_bucket > 1:
+            partial = partial.reset_index()
+            partial = pd.concat([partial.assign(start=partial['start'] - i * self.slide) for i in range(per_bucket)])
+            partial = partial.groupby(groups, sort=False, observed=True, dropna=False).agg(
+                count=('count', 'sum'), successful=('successful', 'sum'), total_amount=('total_amount', 'sum'),
+                total_fee=('total_fee', 'sum'), max_amount=('max_amount', 'max'))
+
+        # Key strings are built per group, not per event
+        levels = [partial.index.get_level_values(key).astype(str).tolist() for key in self.keys]
+        keys = levels[0] if len(levels) == 1 else ['|'.join(parts) for parts in zip(*levels)]
+        return partial.index.get_level_values('start').to_numpy(), keys, partial
+
+    def add(self, partition, frame):
+        """
+        Fold a batch of events from one partition into the window state
+
+        Safe to call from several pool threads at once. Events are checked for
+        lateness against the watermark of the last fire(), so the result does
+        not depend on the order partitions are handled in.
+
+        Returns:
+            int: Window records dropped as too late
+        """
+        if frame is None or frame.empty:
+            return 0
+        times = to_epoch(frame['timestamp'])
+        starts, keys, partial = self._partial(frame, times)
+
+        with self._lock:
+            late = 0
+            if self.watermark is not None:
+                open_ = starts + self.size + self.allowed_lateness > self.watermark
+                if not open_.all():
+                    late = int(partial['count'].to_numpy()[~open_].sum())
+                    starts, partial = starts[open_], partial[open_]
+                    keys = [key for key, keep in zip(keys, open_) if keep]
+
+            for start, key, count, successful, total, fees, largest in zip(
+                    starts.tolist(), keys, *(partial[column].to_numpy().tolist() for column in AGGREGATES)):
+                window = self.windows.get(start)
+                if window is None:
+                    window = self.windows[start] = {}
+                values = window.get(key)
+                if values is None:
+                    window[key] = [count, successful, total, fees, largest]
+                else:
+                    values[0] += count
+                    values[1] += successful
+                    values[2] += total
+                    values[3] += fees
+                    if largest > values[4]:
+                        values[4] = largest
+                pending = self.pending.get(start)
+                if pending is None:
+                    pending = self.pending[start] = set()
+                pending.add(key)
+                dirty = self.dirty.get(start)
+                if dirty is None:
+                    dirty = self.dirty[start] = set()
+                dirty.add(key)
+
+            latest = self.event_times.get(partition)
+            self.event_times[partition] = max(latest or 0, int(times.max()))
+            self.last_seen[partition] = time.monotonic()
+            self.stats['events'] += len(frame)
+            self.stats['late_records'] += late
+        if late:
+            logger.debug(f"{self.name}: dropped {late} late window records from partition {partition}")
+        return late
+
+    def _advance_watermark(self):
+        """Smallest max event time over active partitions, minus max_delay; never moves back"""
+        now = time.monotonic()
+        active = [t for p, t in self.event_times.items() if now - self.last_seen[p] <= self.idle_timeout]
+        if not active or None in active:
+            return self.watermark
+        watermark = min(active) - self.max_delay
+        if self.watermark is None or watermark > self.watermark:
+            self.watermark = watermark
+        return self.watermark
+
+    def fire(self):
+        """
+        Advance the watermark and return the windows it passed that changed since they last fired
+
+        Windows past their allowed lateness are dropped from the state afterwards.
+
+        Returns:
+            list[dict]: One row per window and key
+        """
+        with self._lock:
+            watermark = self._advance_watermark()
+            if watermark is None:
+                return []
+            marked = _isoformat(watermark)
+            rows = []
+            for start in sorted(s for s in self.pending if s + self.size <= watermark):
+                window = self.windows[start]
+                window_start, window_end = _isoformat(start), _isoformat(start + self.size)
+                for key in sorted(self.pending.pop(start)):
+                    count, successful, total, fees, largest = window[key]
+                    rows.append({
+                        'aggregation': self.name,
+                        'window_start': window_start,
+                        'window_end': window_end,
+                        'key': key,
+                        'count': count,
+                        'successful': successful,
+                        'failed': count - successful,
+                        'total_amount': round(total, 2),
+                        'total_fee': round(fees, 2),
+                        'max_amount': largest,
+                        'watermark': marked
+                    })
+
+            for start in [s for s in self.windows if s + self.size + self.allowed_lateness <= watermark]:
+                del self.windows[start]
+                self.dirty.pop(start, None)
+                self.purged.add(start)
+            self.stats['fired'] += len(rows)
+        return rows
+
+    def snapshot(self):
+        """
+        State changed since the last snapshot, for SqliteCheckpoint.save
+
+        Returns:
+            tuple: (upserted rows, purged window starts, {partition: max event time})
+        """
+        with self._lock:
+            upserts = []
+            for start, keys in self.dirty.items():
+                window, pending = self.windows[start], self.pending.get(start, ())
+                upserts.extend((start, key, *window[key], int(key in pending)) for key in keys)
+            purged = list(self.purged)
+            self.dirty.clear()
+            self.purged.clear()
+            return upserts, purged, {p: t for p, t in self.event_times.items() if t is not None}
+
+    def restore(self, rows, event_times):
+        """Load state saved by SqliteCheckpoint"""
+        now = time.monotonic()
+        with self._lock:
+            self.windows.clear()
+            self.pending.clear()
+            for start, key, count, successful, total, fees, largest, pending in rows:
+                self.windows.setdefault(start, {})[key] = [count, successful, total, fees, largest]
+                if pending:
+                    self.pending.setdefault(start, set()).add(key)
+            self.event_times = dict(event_times)
+            self.last_seen = {partition: now for partition in self.event_times}
+            self.watermark = None
+            self._advance_watermark()
+
+    def get_stats(self):
+        """Events seen, late records, fired results and current state size"""
+        with self._lock:
+            return dict(self.stats, open_windows=len(self.windows),
+                        watermark=None if self.watermark is None else _isoformat(self.watermark))
+
+class SqliteCheckpoint:
+    """
+    Window state and consumed offsets in a local SQLite file
+
+    ``save`` writes the aggregators' changes and the offsets in one
+    transaction, so state and position never disagree after a crash.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        with self.conn:
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS window_state (
+                    aggregation TEXT, window_start INTEGER, key TEXT, count INTEGER, successful INTEGER,
+                    total_amount REAL, total_fee REAL, max_amount REAL, pending INTEGER,
+                    PRIMARY KEY (aggregation, window_start, key)) WITHOUT ROWID""")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS window_progress (
+                    aggregation TEXT, partition INTEGER, event_time INTEGER,
+                    PRIMARY KEY (aggregation, partition))""")
+            self.conn.execute("""
+                CREATE TABLE IF NOT EXISTS consumer_offsets (
+                    topic TEXT, partition INTEGER, next_offset INTEGER,
+                    PRIMARY KEY (topic, partition))""")
+
+    def save(self, aggregators, offsets=None, topic='transactions'):
+        """Persist the aggregators' changes and {partition: next offset}"""
+        with self.conn:
+            for aggregator in aggregators:
+                upserts, purged, event_times = aggregator.snapshot()
+                self.conn.executemany("INSERT OR REPLACE INTO window_state VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                                      [(aggregator.name, *row) for row in upserts])
+                self.conn.executemany("DELETE FROM window_state WHERE aggregation = ? AND window_start = ?",
+                                      [(aggregator.name, start) for start in purged])
+                self.conn.executemany("INSERT OR REPLACE INTO window_progress VALUES (?, ?, ?)",
+                                      [(aggregator.name, p, t) for p, t in event_times.items()])
+            self.conn.executemany("INSERT OR REPLACE INTO consumer_offsets VALUES (?, ?, ?)",
+                                  [(topic, p, offset) for p, offset in (offsets or {}).items()])
+
+    def restore(self, aggregators, topic='transactions'):
+        """
+        Load saved state into the aggregators
+
+        Returns:
+            dict: {partition: next offset} to resume consuming from
+        """
+        for aggregator in aggregators:
+            rows = self.conn.execute(
+                "SELECT window_start, key, count, successful, total_amount, total_fee, max_amount, pending "
+                "FROM window_state WHERE aggregation = ?", (aggregator.name,)).fetchall()
+            event_times = self.conn.execute(
+                "SELECT partition, event_time FROM window_progress WHERE aggregation = ?",
+                (aggregator.name,)).fetchall()
+            aggregator.restore(rows, event_times)
+            if rows:
+                logger.info(f"Restored {len(rows)} window aggregates for {aggregator.name}")
+        return dict(self.conn.execute(
+            "SELECT partition, next_offset FROM consumer_offsets WHERE topic = ?", (topic,)).fetchall())
+
+    def close(self):
+        self.conn.close()
+
+class SqliteSink:
+    """Upserts fired window results into a SQLite table (one row per aggregation, window and key)"""
+
+    COLUMNS = ('aggregation', 'window_start', 'window_end', 'key', 'count', 'successful', 'failed',
+               'total_amount', 'total_fee', 'max_amount', 'watermark')
+
+    def __init__(self, path, table='window_aggregates'):
+        self.table = table
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.conn:
+            self.conn.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    aggregation TEXT, window_start TEXT, window_end TEXT, key TEXT, count INTEGER,
+                    successful INTEGER, failed INTEGER, total_amount REAL, total_fee REAL, max_amount REAL,
+                    watermark TEXT, PRIMARY KEY (aggregation, window_start, key))""")
+
+    def write(self, rows):
+        placeholders = ', '.join('?' * len(self.COLUMNS))
+        with self.conn:
+            self.conn.executemany(f"INSERT OR REPLACE INTO {self.table} VALUES ({placeholders})",
+                                  [tuple(row[c] for c in self.COLUMNS) for row in rows])
+
+    def read(self, aggregation=None):
+        """Stored results as a DataFrame"""
+        query = f"SELECT * FROM {self.table}"
+        params = ()
+        if aggregation:
+            query += " WHERE aggregation = ?"
+            params = (aggregation,)
+        return pd.read_sql_query(query + " ORDER BY aggregation, window_start, key", self.conn, params=params)
+
+    def close(self):
+        self.conn.close()
+
+class TopicSink:
+    """Sends rows (window results, alerts) as JSON to a Kafka topic"""
+
+    def __init__(self, producer, topic='transaction-aggregates', key_fields=('aggregation', 'key'), timeout=30):
+        """
+        Args:
+            producer: KafkaProducer (or FakeProducer) without serializers
+            key_fields: Row fields joined with '|' into the message key
+        """
+        self.producer = producer
+        self.topic = topic
+        self.key_fields = key_fields
+        self.timeout = timeout
+
+    def write(self, rows):
+        for row in rows:
+            key = '|'.join(str(row[field]) for field in self.key_fields)
+            self.producer.send(self.topic, key=key.encode('utf-8'), value=json.dumps(row).encode('utf-8'))
+        # Rows must be on the broker before the offsets behind them are committed
+        self.producer.flush(timeout=self.timeout)
+
+    def close(self):
+        self.producer.flush(timeout=self.timeout)
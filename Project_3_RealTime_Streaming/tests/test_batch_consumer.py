@@ -0,0 +1,155 @@
+"""Tests for the batch-polling consumer and its offset handling"""
+
+import json
+import threading
+
+import pytest
+
+from streaming.fake_kafka import FakeBroker, FakeConsumer, FakeProducer
+from streaming.kafka_consumer import TransactionConsumer, summarize_batch
+from streaming.kafka_producer import TransactionProducer
+from streaming.serialization import BinarySerializer, JsonSerializer, SchemaRegistry
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return SchemaRegistry(str(tmp_path / 'schemas'))
+
+
+@pytest.fixture
+def broker(registry):
+    """Four partitions holding 1000 events, every third one JSON"""
+    broker = FakeBroker(partitions=4)
+    binary, text = BinarySerializer(registry), JsonSerializer()
+    client = FakeProducer(broker, value_serializer=lambda v: v, key_serializer=lambda k: k.encode('utf-8'))
+    producer = TransactionProducer(producer=client)
+    for i, event in enumerate(producer.generate_transactions(1000)):
+        client.send('transactions', key=event['sender'], value=(binary if i % 3 else text)(event))
+    producer.close()
+    return broker
+
+
+def make_consumer(broker, registry):
+    return TransactionConsumer(registry=registry, consumer=FakeConsumer('transactions', broker))
+
+
+def stored_events(broker):
+    return [json.loads(r.value) if r.value[:1] == b'{' else None
+            for p in broker.partitions_for('transactions') for r in broker.records('transactions', p)]
+
+
+class TestConsumeBatches:
+    """Test polled batches handled per partition in a worker pool"""
+
+    @pytest.mark.parametrize('executor', ['thread', 'process'])
+    def test_same_stats_as_per_message(self, broker, registry, executor):
+        """Batch and per-message consumption agree on every statistic"""
+        single = make_consumer(broker, registry)
+        single.consume_messages(max_messages=1000)
+
+        batched = TransactionConsumer(registry=registry, group_id='batch',
+                                      consumer=FakeConsumer('transactions', broker, group_id='batch'))
+        stats = batched.consume_batches(max_records=128, workers=2, executor=executor, idle_polls=2,
+                                        poll_timeout_ms=1)
+
+        assert stats['messages_processed'] == 1000
+        assert stats['stats']['total_messages'] == single.stats['total_messages'] == 1000
+        assert stats['stats']['successful'] == single.stats['successful']
+        assert stats['stats']['total_amount'] == pytest.approx(single.stats['total_amount'])
+        assert {p: lag['lag'] for p, lag in stats['partition_lag'].items()} == {0: 0, 1: 0, 2: 0, 3: 0}
+
+    def test_commits_follow_handler(self, broker, registry):
+        """A partition's offsets are committed only after its handler returned"""
+        consumer = make_consumer(broker, registry)
+        seen = []
+
+        def handler(partition, frame):
+            committed = broker.committed(consumer.group_id, 'transactions', partition) or 0
+            seen.append((partition, committed, len(frame)))
+            return summarize_batch(partition, frame)
+
+        consumer.consume_batches(handler=handler, max_records=100, idle_polls=1, poll_timeout_ms=1)
+
+        handled = {}
+        for partition, committed, count in seen:
+            assert committed == handled.get(partition, 0)
+            handled[partition] = handled.get(partition, 0) + count
+        assert handled == {p: broker.end_offset('transactions', p) for p in range(4)}
+        assert sum(handled.values()) == 1000
+
+    def test_failed_batch_redelivered(self, broker, registry):
+        """A failing partition is rewound and its events handled again (at-least-once)"""
+        consumer = make_consumer(broker, registry)
+        attempts = []
+
+        def flaky(partition, frame):
+            attempts.append(partition)
+            if partition == 1 and attempts.count(1) == 1:
+                raise IOError("sink unavailable")
+            return summarize_batch(partition, frame)
+
+        stats = consumer.consume_batches(handler=flaky, max_records=2000, idle_polls=1, poll_timeout_ms=1)
+
+        assert attempts.count(1) == 2
+        assert stats['batches']['failed_batches'] == 1
+        assert stats['messages_processed'] == 1000
+        assert broker.committed(consumer.group_id, 'transactions', 1) == broker.end_offset('transactions', 1)
+
+    def test_persistent_failure_raises(self, broker, registry):
+        """After max_retries the error surfaces and nothing is committed"""
+        consumer = make_consumer(broker, registry)
+
+        def broken(partition, frame):
+            raise IOError("sink unavailable")
+
+        with pytest.raises(IOError):
+            consumer.consume_batches(handler=broken, max_records=2000, max_retries=2, poll_timeout_ms=1)
+
+        assert consumer.consumer.closed
+        assert all(broker.committed(consumer.group_id, 'transactions', p) is None for p in range(4))
+        assert sum(lag['lag'] for lag in consumer.partition_lag.values()) == 1000
+
+    def test_restart_resumes_from_commits(self, broker, registry):
+        """A new consumer in the group continues after the last committed batch"""
+        first = make_consumer(broker, registry)
+        first.consume_batches(max_records=100, max_messages=300, poll_timeout_ms=1)
+        committed = sum(lag['committed'] for lag in first.partition_lag.values())
+
+        second = make_consumer(broker, registry)
+        second.consume_batches(max_records=100, idle_polls=1, poll_timeout_ms=1)
+
+        assert committed == first.message_count >= 300
+        assert first.message_count + second.message_count == 1000
+
+    def test_stop_event(self, broker, registry):
+        """A set stop event ends the loop before polling"""
+        stop = threading.Event()
+        stop.set()
+
+        stats = make_consumer(broker, registry).consume_batches(stop_event=stop)
+
+        assert stats['messages_processed'] == 0
+        assert sum(lag['lag'] for lag in stats['partition_lag'].values()) == 1000
+
+
+class TestConsumeMessages:
+    """Test the per-message path"""
+
+    def test_async_invokes_callback(self, broker, registry):
+        """consume_messages_async passes every event to the callback"""
+        consumer = make_consumer(broker, registry)
+        events = []
+
+        consumer.consume_messages_async(callback=events.append, max_messages=1000).join(timeout=30)
+
+        assert len(events) == 1000
+        assert [e for e in stored_events(broker) if e] == [e for e, raw in zip(events, stored_events(broker)) if raw]
+
+    def test_commits_positions(self, broker, registry):
+        """Per-message consumption commits periodically and on exit"""
+        consumer = make_consumer(broker, registry)
+
+        consumer.consume_messages(max_messages=250, commit_every=100)
+
+        assert consumer.batch_stats['commits'] >= 3
+        assert sum(broker.committed(consumer.group_id, 'transactions', p) or 0 for p in range(4)) >= 250
@@ -0,0 +1,179 @@
+"""Tests for in-stream fraud scoring"""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+
+from streaming.fake_kafka import FakeBroker, FakeConsumer, FakeProducer
+from streaming.fraud import FraudScorer
+from streaming.kafka_consumer import TransactionConsumer
+from streaming.windowing import TopicSink
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+EPOCH = START.replace(tzinfo=timezone.utc).timestamp()
+
+
+def frame(sample, seconds, sender='254711111111', amounts=None, **fields):
+    """Transactions from ``sender`` at START + each offset in ``seconds``"""
+    amounts = amounts or [sample['amount']] * len(seconds)
+    return pd.DataFrame([dict(sample, transaction_id=f'TXN{s}-{i}', sender=sender, amount=amount,
+                              timestamp=(START + timedelta(seconds=s)).isoformat(), **fields)
+                         for i, (s, amount) in enumerate(zip(seconds, amounts))])
+
+
+def scorer(**options):
+    options.setdefault('clock', lambda: EPOCH + 3600)
+    return FraudScorer(**options)
+
+
+class TestVelocity:
+    """Test the per-sender velocity rule"""
+
+    def test_burst_within_one_batch(self, sample_transaction):
+        """The 11th transaction of a sender inside the window raises an alert"""
+        fraud = scorer(window=60, bucket=5, max_count=10, max_amount=None)
+
+        alerts = fraud.score(0, frame(sample_transaction, range(12)))
+
+        assert [a['velocity_count'] for a in alerts] == [11, 12]
+        assert alerts[0]['rules'] == ['sender_velocity']
+        assert alerts[0]['risk'] == 'high'
+        assert alerts[0]['timestamp'] == '2024-01-01T12:00:10.000000'
+
+    def test_counts_span_batches_and_expire(self, sample_transaction):
+        """Earlier batches count while inside the window and drop out after it"""
+        fraud = scorer(window=60, bucket=5, max_count=3, max_amount=None)
+
+        assert fraud.score(0, frame(sample_transaction, [0, 10, 20])) == []
+        burst = fraud.score(1, frame(sample_transaction, [30]))
+        later = fraud.score(0, frame(sample_transaction, [75, 80]))  # 0-10s left the window
+        gap = fraud.score(0, frame(sample_transaction, [500]))
+
+        assert [a['velocity_count'] for a in burst] == [4]
+        assert later == []
+        assert gap == []
+        assert fraud.counts.sum() == 1
+
+    def test_amount_limit(self, sample_transaction):
+        """The summed amount per window is limited too"""
+        fraud = scorer(window=60, bucket=5, max_count=None, max_amount=2500)
+
+        alerts = fraud.score(0, frame(sample_transaction, [0, 5, 10]))
+
+        assert [a['velocity_amount'] for a in alerts] == [3000.0]
+
+    def test_senders_are_separate(self, sample_transaction):
+        """Each sender has its own counters"""
+        fraud = scorer(window=60, bucket=5, max_count=2, max_amount=None)
+        batch = pd.concat([frame(sample_transaction, [0, 1], sender=f'25470000000{i}') for i in range(5)])
+
+        assert fraud.score(0, batch) == []
+        assert len(fraud.score(0, frame(sample_transaction, [2], sender='254700000003'))) == 1
+
+
+class TestBaselineAndThreshold:
+    """Test amount checks"""
+
+    def test_sender_baseline(self, sample_transaction):
+        """Amounts far above the sender's own mean are flagged once there is enough history"""
+        fraud = scorer(max_count=None, max_amount=None, ratio=5, min_history=5)
+        fraud.score(0, frame(sample_transaction, range(0, 50, 10), amounts=[1000] * 5))
+
+        alerts = fraud.score(0, frame(sample_transaction, [60, 70], amounts=[4000, 6000]))
+
+        assert [(a['amount'], a['baseline'], a['risk']) for a in alerts] == [(6000.0, 1000.0, 'medium')]
+
+    def test_global_baseline_for_new_senders(self, sample_transaction):
+        """Senders without history are compared with the global mean"""
+        fraud = scorer(max_count=None, max_amount=None, ratio=5, min_history=5)
+        fraud.score(0, frame(sample_transaction, [0, 1, 2], sender='254700000001', amounts=[2000] * 3))
+
+        alerts = fraud.score(0, frame(sample_transaction, [3, 4], sender='254700000002', amounts=[11000, 9000]))
+        failed = fraud.score(0, frame(sample_transaction, [5], sender='254700000003', amounts=[20000],
+                                      status='failed'))
+
+        assert [(a['amount'], a['rules']) for a in alerts] == [(11000.0, ['large_vs_baseline'])]
+        assert failed == []
+
+    def test_high_value(self, sample_transaction):
+        """Single transactions above the limit are high risk"""
+        fraud = scorer(high_value=50000, max_count=None, max_amount=None)
+
+        alerts = fraud.score(0, frame(sample_transaction, [0], amounts=[75000]))
+
+        assert alerts[0]['rules'] == ['high_value'] and alerts[0]['risk'] == 'high'
+        assert fraud.get_stats()['rules']['high_value'] == 1
+
+
+class TestBoundedState:
+    """Test eviction from the sender table"""
+
+    def test_table_never_exceeds_max_senders(self, sample_transaction):
+        """The least recently seen senders make room for new ones"""
+        fraud = scorer(max_senders=10, window=60, bucket=5, max_count=1, max_amount=None)
+        for i in range(30):
+            fraud.score(0, frame(sample_transaction, [i], sender=f'2547000000{i:02d}'))
+        repeat = fraud.score(0, frame(sample_transaction, [31], sender='254700000029'))
+        evicted = fraud.score(0, frame(sample_transaction, [32], sender='254700000000'))
+
+        assert len(fraud.slots) == 10
+        assert fraud.get_stats()['evicted'] == 21
+        assert [a['velocity_count'] for a in repeat] == [2]
+        assert evicted == []
+        with pytest.raises(ValueError):
+            fraud.score(0, pd.concat([frame(sample_transaction, [40], sender=f'25471{i:07d}') for i in range(11)]))
+
+    def test_idle_senders_evicted(self, sample_transaction):
+        """Senders inactive for idle_ttl seconds of event time are dropped"""
+        fraud = scorer(idle_ttl=600)
+        fraud.score(0, frame(sample_transaction, [0], sender='254700000001'))
+        fraud.score(0, frame(sample_transaction, [300], sender='254700000002'))
+        fraud.score(0, frame(sample_transaction, [700], sender='254700000003'))
+
+        assert sorted(fraud.slots) == ['254700000002', '254700000003']
+        assert FraudScorer(max_senders=1000, window=300, bucket=10).get_stats()['state_bytes'] == 1000 * 30 * 12
+
+
+class TestAlertPipeline:
+    """Test publishing alerts from the consumer"""
+
+    def test_latency_measured_from_event_time(self, sample_transaction):
+        """Alerts carry the time from event to publication"""
+        fraud = scorer(high_value=500, clock=lambda: EPOCH + 2.5)
+        fraud.score(0, frame(sample_transaction, [1]))
+
+        published = fraud.publish()
+
+        assert published[0]['latency_ms'] == 1500.0
+        assert fraud.get_stats()['event_to_alert_ms'] == {'p50': 1500.0, 'p99': 1500.0, 'max': 1500.0}
+        assert fraud.get_stats()['event_to_score_ms']['p50'] == 1500.0
+        assert fraud.publish() == []
+
+    def test_consume_fraud_publishes_alerts(self, sample_transaction):
+        """A burst in the stream reaches the alerts topic before offsets are committed"""
+        broker = FakeBroker(partitions=2)
+        client = FakeProducer(broker, value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+                              key_serializer=lambda k: k.encode('utf-8'))
+        for i, row in enumerate(frame(sample_transaction, range(40)).to_dict('records')):
+            client.send('transactions', key=row['sender'] if i < 15 else f'2547{i:08d}',
+                        value=dict(row, sender=row['sender'] if i < 15 else f'2547{i:08d}'))
+        client.flush()
+        sink = TopicSink(FakeProducer(broker), 'fraud-alerts', key_fields=('sender',))
+        committed = []
+        write = sink.write
+        sink.write = lambda alerts: (write(alerts), committed.append(dict(broker._committed)))
+
+        stats = TransactionConsumer(consumer=FakeConsumer('transactions', broker)).consume_fraud(
+            scorer(window=60, bucket=5, max_count=10, max_amount=None), sink=sink, max_records=8, idle_polls=1,
+            poll_timeout_ms=1)
+
+        alerts = [json.loads(r.value) for p in range(2) for r in broker.records('fraud-alerts', p)]
+        assert [a['velocity_count'] for a in alerts] == [11, 12, 13, 14, 15]
+        assert {r.key for p in range(2) for r in broker.records('fraud-alerts', p)} == {b'254711111111'}
+        assert stats['messages_processed'] == 40
+        assert stats['fraud']['alerts'] == 5
+        assert committed and all(offsets != dict(broker._committed) for offsets in committed)
+        client.close()
+        sink.producer.close()
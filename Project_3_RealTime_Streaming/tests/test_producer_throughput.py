@@ -0,0 +1,212 @@
+"""Tests for the asynchronous producer path and the load generator"""
+
+import json
+import os
+import threading
+import time
+from unittest.mock import patch
+
+import pytest
+
+from streaming import kafka_producer
+from streaming.fake_kafka import FakeBroker, FakeProducer
+from streaming.kafka_producer import TransactionProducer, resolve_compression
+from streaming.load_generator import LoadGenerator
+
+KAFKA_BOOTSTRAP = os.environ.get('TEST_KAFKA_BOOTSTRAP_SERVERS')
+
+
+def json_client(broker=None, **kwargs):
+    return FakeProducer(broker, value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+                        key_serializer=lambda k: k.encode('utf-8'), **kwargs)
+
+
+@pytest.fixture
+def broker():
+    return FakeBroker(partitions=4)
+
+
+class TestAsyncSend:
+    """Test fire-and-forget sends with delivery callbacks"""
+
+    def test_callbacks_and_delivery_report(self, broker, sample_transaction):
+        """Acknowledged sends reach the broker and report latency"""
+        producer = TransactionProducer(producer=json_client(broker))
+        delivered = []
+
+        for transaction in [sample_transaction] + producer.generate_transactions(99):
+            assert producer.send_async(transaction, callback=lambda t, m: delivered.append((t, m))) is not None
+        producer.flush()
+        report = producer.delivery_report()
+
+        assert len(delivered) == 100
+        assert broker.count('transactions') == 100
+        assert report['sent'] == report['acked'] == 100
+        assert report['in_flight'] == 0 and report['failed'] == 0
+        assert 0 <= report['ack_latency_ms']['p50'] <= report['ack_latency_ms']['p99']
+        stored = broker.records('transactions', delivered[0][1].partition, delivered[0][1].offset, 1)[0]
+        assert json.loads(stored.value) == sample_transaction
+        producer.close()
+
+    def test_sender_key_keeps_partition(self, broker):
+        """All events of a sender land on one partition"""
+        producer = TransactionProducer(producer=json_client(broker))
+        partitions = []
+
+        for transaction in producer.generate_transactions(20):
+            transaction['sender'] = '254712345678'
+            producer.send_async(transaction, callback=lambda t, m: partitions.append(m.partition))
+        producer.flush()
+
+        assert len(partitions) == 20 and len(set(partitions)) == 1
+        producer.close()
+
+    def test_errback_on_failed_delivery(self, broker):
+        """Failed deliveries call the errback and free in-flight capacity"""
+        client = json_client(broker)
+        client.error = RuntimeError("broker unavailable")
+        producer = TransactionProducer(producer=client, max_in_flight=2)
+        failures = []
+
+        for _ in range(5):
+            producer.send_async(errback=lambda t, e: failures.append(e), timeout=5)
+        producer.flush()
+
+        assert len(failures) == 5
+        assert producer.delivery_report()['failed'] == 5
+        assert producer.in_flight == 0
+        producer.close()
+
+    def test_backpressure(self, broker):
+        """Sends block once max_in_flight events are unacknowledged"""
+        client = json_client(broker, linger_ms=60_000)
+        producer = TransactionProducer(producer=client, max_in_flight=3)
+
+        futures = [producer.send_async() for _ in range(3)]
+        started = time.perf_counter()
+        blocked = producer.send_async(timeout=0.1)
+        waited = time.perf_counter() - started
+
+        assert all(futures) and blocked is None
+        assert waited >= 0.1
+        assert producer.delivery_report()['failed'] == 1
+
+        # Acknowledging the outstanding events lets a waiting send through
+        result = []
+        sender = threading.Thread(target=lambda: result.append(producer.send_async(timeout=5)))
+        sender.start()
+        client.flush(5)
+        sender.join(5)
+        client.flush(5)
+        assert result[0] is not None
+        assert broker.count('transactions') == 4
+        producer.close()
+
+    def test_every_ack_wakes_a_blocked_sender(self, broker):
+        """Several blocked senders all get through as acks free capacity"""
+        client = json_client(broker, linger_ms=60_000)
+        producer = TransactionProducer(producer=client, max_in_flight=2)
+        futures = [producer.send_async() for _ in range(2)]
+        results = []
+        senders = [threading.Thread(target=lambda: results.append(producer.send_async(timeout=5)))
+                   for _ in range(3)]
+        for sender in senders:
+            sender.start()
+        time.sleep(0.05)
+
+        started = time.perf_counter()
+        while any(sender.is_alive() for sender in senders) and time.perf_counter() - started < 4:
+            client.flush(1)
+            for sender in senders:
+                sender.join(0.02)
+        client.flush(5)
+
+        assert all(futures) and len(results) == 3 and all(results)
+        assert time.perf_counter() - started < 2
+        assert broker.count('transactions') == 5
+        producer.close()
+
+
+class TestProducerConfig:
+    """Test client configuration"""
+
+    @patch('streaming.kafka_producer.KafkaProducer')
+    def test_batching_settings(self, mock_kafka_producer_class):
+        """linger_ms, batch_size and compression reach the Kafka client"""
+        with patch.dict(kafka_producer.COMPRESSION_CODECS, {'zstd': lambda: True}):
+            TransactionProducer(linger_ms=20, batch_size=128 * 1024, compression_type='zstd')
+
+        config = mock_kafka_producer_class.call_args.kwargs
+        assert config['linger_ms'] == 20
+        assert config['batch_size'] == 128 * 1024
+        assert config['compression_type'] == 'zstd'
+
+    def test_compression_fallback(self):
+        """A codec without its library falls back to gzip"""
+        with patch.dict(kafka_producer.COMPRESSION_CODECS, {'lz4': lambda: False}):
+            assert resolve_compression('lz4') == 'gzip'
+        with patch.dict(kafka_producer.COMPRESSION_CODECS, {'lz4': lambda: True}):
+            assert resolve_compression('lz4') == 'lz4'
+        assert resolve_compression(None) is None
+
+    def test_generate_transactions(self):
+        """Bulk-generated events have the same shape as single ones"""
+        with patch('streaming.kafka_producer.KafkaProducer'):
+            producer = TransactionProducer()
+
+        transactions = producer.generate_transactions(500)
+        single = producer.generate_transaction()
+
+        assert len(transactions) == 500
+        assert all(t.keys() == single.keys() for t in transactions)
+        assert len({t['transaction_id'] for t in transactions}) == 500
+        assert all(len(t['sender']) == 12 and t['sender'].startswith('2547') for t in transactions)
+        assert all(100 <= t['amount'] <= 50000 for t in transactions)
+        assert {t['status'] for t in transactions} == {'success', 'failed'}
+
+
+class TestLoadGenerator:
+    """Test rate-controlled load generation"""
+
+    def test_rate_control(self, broker):
+        """Sends are paced to the target rate"""
+        producer = TransactionProducer(producer=json_client(broker))
+
+        report = LoadGenerator(producer, rate=2000).run(count=1000)
+
+        assert report['sent'] == report['acked'] == 1000
+        assert broker.count('transactions') == 1000
+        assert 0.4 <= report['seconds'] < 2
+        assert report['send_rate'] <= 2200
+        assert report['ack_latency_ms']['p99'] >= report['ack_latency_ms']['p50']
+        producer.close()
+
+    def test_duration_and_stop(self, broker):
+        """Unthrottled loads stop on duration or a stop event"""
+        producer = TransactionProducer(producer=json_client(broker))
+        stop = threading.Event()
+        stop.set()
+
+        timed = LoadGenerator(producer, rate=0).run(duration=0.2)
+        stopped = LoadGenerator(producer, rate=0).run(stop_event=stop)
+
+        assert timed['sent'] > 0 and timed['acked'] == timed['sent']
+        assert stopped['sent'] == 0
+        with pytest.raises(ValueError):
+            LoadGenerator(producer).run()
+        producer.close()
+
+
+@pytest.mark.skipif(not KAFKA_BOOTSTRAP, reason="TEST_KAFKA_BOOTSTRAP_SERVERS not set")
+class TestLiveBroker:
+    """Test against a running broker (docker-compose-kafka.yml)"""
+
+    def test_load_against_broker(self):
+        """Events are acknowledged by a real broker"""
+        producer = TransactionProducer(bootstrap_servers=KAFKA_BOOTSTRAP, topic='load-test-transactions')
+        try:
+            report = LoadGenerator(producer, rate=5000).run(count=2000)
+        finally:
+            producer.close()
+
+        assert report['acked'] == 2000 and report['failed'] == 0
@@ -0,0 +1,180 @@
+"""Tests for the pluggable event serializers and the local schema registry"""
+
+import copy
+import json
+from unittest.mock import patch
+
+import pandas as pd
+import pytest
+
+from streaming.fake_kafka import FakeBroker, FakeProducer
+from streaming.kafka_consumer import TransactionConsumer
+from streaming.kafka_producer import TransactionProducer
+from streaming.serialization import (TRANSACTION_SCHEMA, TRANSACTION_SUBJECT, BinarySerializer, EventDeserializer,
+                                     JsonSerializer, SchemaRegistry, get_serializer)
+
+
+@pytest.fixture
+def registry(tmp_path):
+    return SchemaRegistry(str(tmp_path / 'schemas'))
+
+
+@pytest.fixture
+def transactions():
+    with patch('streaming.kafka_producer.KafkaProducer'):
+        return TransactionProducer().generate_transactions(200)
+
+
+def schema_v2():
+    schema = copy.deepcopy(TRANSACTION_SCHEMA)
+    schema['fields'].append({'name': 'channel', 'type': 'string', 'default': 'app'})
+    return schema
+
+
+class TestSchemaRegistry:
+    """Test the file-based schema registry"""
+
+    def test_register_and_lookup(self, registry):
+        """Schemas get versions and ids that other processes can read"""
+        first = registry.register(TRANSACTION_SUBJECT, TRANSACTION_SCHEMA)
+        again = registry.register(TRANSACTION_SUBJECT, TRANSACTION_SCHEMA)
+        second = registry.register(TRANSACTION_SUBJECT, schema_v2())
+        other = registry.register('alerts-value', {'name': 'Alert', 'fields': [{'name': 'id', 'type': 'string'}]})
+
+        reopened = SchemaRegistry(registry.directory)
+        assert first == again == 1
+        assert (second, other) == (2, 3)
+        assert reopened.versions(TRANSACTION_SUBJECT) == [1, 2]
+        assert reopened.latest(TRANSACTION_SUBJECT)['id'] == 2
+        assert reopened.get(1)['schema'] == TRANSACTION_SCHEMA
+        with pytest.raises(KeyError):
+            reopened.get(99)
+
+    def test_invalid_schema(self, registry):
+        """Unknown field types are rejected"""
+        with pytest.raises(ValueError):
+            registry.register('bad', {'name': 'Bad', 'fields': [{'name': 'x', 'type': 'decimal'}]})
+
+    def test_shipped_schema_registered(self):
+        """The repository registry already holds the transaction schema"""
+        assert SchemaRegistry().latest(TRANSACTION_SUBJECT)['schema'] == TRANSACTION_SCHEMA
+
+
+class TestBinarySerializer:
+    """Test the compact binary format"""
+
+    def test_round_trip(self, registry, transactions, sample_transaction):
+        """Events decode to the same dicts as JSON events"""
+        serializer = BinarySerializer(registry)
+        deserializer = EventDeserializer(registry)
+
+        for event in transactions + [sample_transaction]:
+            payload = serializer(event)
+            assert payload[:1] == b'\x00'
+            assert deserializer(payload) == event
+
+    def test_smaller_than_json(self, registry, transactions):
+        """Binary events are well under half the JSON size"""
+        binary = sum(len(BinarySerializer(registry)(t)) for t in transactions)
+        text = sum(len(JsonSerializer()(t)) for t in transactions)
+
+        assert binary < 0.5 * text
+
+    def test_invalid_events(self, registry, sample_transaction):
+        """Unknown enum symbols and missing required fields are errors; defaults fill the rest"""
+        serializer = BinarySerializer(registry)
+        deserializer = EventDeserializer(registry)
+
+        with pytest.raises(ValueError):
+            serializer(dict(sample_transaction, provider='Unknown'))
+        with pytest.raises(ValueError):
+            serializer({k: v for k, v in sample_transaction.items() if k != 'amount'})
+        without_fee = {k: v for k, v in sample_transaction.items() if k != 'fee'}
+        assert deserializer(serializer(without_fee))['fee'] == 0.0
+
+    @pytest.mark.parametrize('phone', ['0712345678', '+254712345678', '25471234567', '2547123456789', ''])
+    def test_non_canonical_phones_rejected(self, registry, sample_transaction, phone):
+        """Phones that would not round-trip through an integer are errors"""
+        with pytest.raises(ValueError, match='phone'):
+            BinarySerializer(registry)(dict(sample_transaction, sender=phone))
+
+    def test_aware_timestamps_become_utc(self, registry, sample_transaction):
+        """Timestamps with an offset are stored as UTC"""
+        event = dict(sample_transaction, timestamp='2024-01-01T15:00:00+03:00')
+
+        decoded = EventDeserializer(registry)(BinarySerializer(registry)(event))
+
+        assert decoded['timestamp'] == '2024-01-01T12:00:00'
+
+
+class TestEventDeserializer:
+    """Test reading JSON and binary events from one topic"""
+
+    def test_json_events_still_readable(self, registry, sample_transaction):
+        """Existing JSON topics decode unchanged"""
+        assert EventDeserializer(registry)(json.dumps(sample_transaction).encode('utf-8')) == sample_transaction
+
+    def test_old_schema_versions(self, registry, sample_transaction):
+        """Events written with v1 get the defaults of fields added in v2"""
+        v1 = BinarySerializer(registry)(sample_transaction)
+        writer_v2 = BinarySerializer(registry, schema=schema_v2())
+        v2 = writer_v2(dict(sample_transaction, channel='ussd'))
+        deserializer = EventDeserializer(SchemaRegistry(registry.directory))
+
+        assert writer_v2.schema_id == 2
+        assert deserializer(v1) == dict(sample_transaction, channel='app')
+        assert deserializer(v2) == dict(sample_transaction, channel='ussd')
+
+    def test_frame_from_mixed_batch(self, registry, transactions):
+        """A batch mixing formats decodes to one frame in order"""
+        binary, text = BinarySerializer(registry), JsonSerializer()
+        payloads = [(binary if i % 3 else text)(t) for i, t in enumerate(transactions)]
+
+        frame = EventDeserializer(registry).deserialize_frame(payloads)
+
+        expected = pd.DataFrame(transactions)
+        assert list(frame.columns) == list(expected.columns)
+        assert (frame['transaction_id'] == expected['transaction_id']).all()
+        assert (frame['sender'] == expected['sender']).all()
+        assert (frame['amount'] == expected['amount']).all()
+        assert (frame['status'].astype(str) == expected['status']).all()
+        assert (frame['timestamp'] == pd.to_datetime(expected['timestamp'])).all()
+        assert str(frame['timestamp'].dtype).startswith('datetime64')
+
+    def test_frame_with_variable_strings(self, registry, sample_transaction):
+        """Columns of different string lengths and nulls decode column-wise"""
+        serializer = BinarySerializer(registry)
+        events = [dict(sample_transaction, transaction_id=f'TXN{i}' * (i % 4)) for i in range(10)]
+        events[3]['transaction_id'] = None
+
+        frame = EventDeserializer(registry).deserialize_frame([serializer(e) for e in events])
+
+        assert frame['transaction_id'].tolist() == [e['transaction_id'] for e in events]
+        assert EventDeserializer(registry).deserialize_frame([]).empty
+
+
+class TestPipelineFormats:
+    """Test producer and consumer with either format"""
+
+    @pytest.mark.parametrize('fmt', ['json', 'binary'])
+    def test_producer_to_consumer(self, fmt, registry, transactions):
+        """Events produced in either format are decoded by the consumer"""
+        serializer = BinarySerializer(registry) if fmt == 'binary' else get_serializer('json')
+        broker = FakeBroker(partitions=1)
+        producer = TransactionProducer(producer=FakeProducer(broker, value_serializer=serializer,
+                                                             key_serializer=lambda k: k.encode('utf-8')))
+        for event in transactions[:20]:
+            producer.send_async(event)
+        producer.flush()
+
+        with patch('streaming.kafka_consumer.KafkaConsumer'):
+            consumer = TransactionConsumer(registry=registry)
+        decoded = [consumer.deserializer(r.value) for r in broker.records('transactions', 0)]
+
+        assert decoded == transactions[:20]
+        producer.close()
+
+    def test_unknown_format(self):
+        """Serializer names are checked"""
+        with pytest.raises(ValueError):
+            get_serializer('xml')
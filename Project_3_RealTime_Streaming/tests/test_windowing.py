@@ -0,0 +1,208 @@
+"""Tests for event-time window aggregation, checkpoints and sinks"""
+
+import json
+from datetime import datetime, timedelta
+
+import pandas as pd
+import pytest
+
+from streaming.fake_kafka import FakeBroker, FakeConsumer, FakeProducer
+from streaming.kafka_consumer import TransactionConsumer
+from streaming.windowing import SqliteCheckpoint, SqliteSink, TopicSink, WindowedAggregator
+
+START = datetime(2024, 1, 1, 12, 0, 0)
+PROVIDERS = ['Safaricom', 'Airtel', 'Equity']
+
+
+def events(sample, seconds, **fields):
+    """Copies of ``sample`` at START + each offset in ``seconds``"""
+    return [dict(sample, transaction_id=f'TXN{i}', sender=f'2547{i % 7:08d}', provider=PROVIDERS[i % 3],
+                 timestamp=(START + timedelta(seconds=s)).isoformat(), **fields)
+            for i, s in enumerate(seconds)]
+
+
+def frame(sample, seconds, **fields):
+    return pd.DataFrame(events(sample, seconds, **fields))
+
+
+def fill(broker, transactions):
+    client = FakeProducer(broker, value_serializer=lambda v: json.dumps(v).encode('utf-8'),
+                          key_serializer=lambda k: k.encode('utf-8'))
+    for transaction in transactions:
+        client.send('transactions', key=transaction['sender'], value=transaction)
+    client.flush()
+    client.close()
+
+
+class TestWindowedAggregator:
+    """Test window assignment, watermarks and lateness"""
+
+    def test_tumbling_windows_fire_after_watermark(self, sample_transaction):
+        """A window is emitted once the watermark passes its end"""
+        aggregator = WindowedAggregator('provider', size=60, max_delay=5)
+        aggregator.add(0, frame(sample_transaction, range(0, 60, 10)))
+
+        assert aggregator.fire() == []  # watermark 50 - 5 = 45s
+        aggregator.add(0, frame(sample_transaction, [64, 70]))
+        rows = aggregator.fire()        # watermark 65s
+
+        assert [(r['window_start'], r['key'], r['count']) for r in rows] == [
+            ('2024-01-01T12:00:00', 'Airtel', 2), ('2024-01-01T12:00:00', 'Equity', 2),
+            ('2024-01-01T12:00:00', 'Safaricom', 2)]
+        assert rows[0]['window_end'] == '2024-01-01T12:01:00'
+        assert rows[0]['total_amount'] == 2000.0
+        assert rows[0]['total_fee'] == 20.0
+        assert aggregator.fire() == []
+
+    def test_sliding_windows(self, sample_transaction):
+        """Every event counts in size / slide overlapping windows"""
+        aggregator = WindowedAggregator('transaction_type', size=300, slide=60, max_delay=0, allowed_lateness=0)
+        aggregator.add(0, frame(sample_transaction, [0, 70, 130, 250]))
+        rows = aggregator.fire()
+        aggregator.add(0, frame(sample_transaction, [900], transaction_type='deposit'))
+        rows += aggregator.fire()
+
+        counts = {r['window_start'][11:16]: r['count'] for r in rows if r['key'] == 'transfer'}
+
+        assert counts == {'11:56': 1, '11:57': 2, '11:58': 3, '11:59': 3, '12:00': 4, '12:01': 3,
+                          '12:02': 2, '12:03': 1, '12:04': 1}
+        with pytest.raises(ValueError):
+            WindowedAggregator(size=300, slide=70)
+
+    def test_composite_keys_and_failures(self, sample_transaction):
+        """Keys may combine fields; failed transactions are counted separately"""
+        aggregator = WindowedAggregator(('provider', 'status'), size=60, max_delay=0)
+        batch = frame(sample_transaction, [1, 2, 4])
+        batch.loc[1, 'status'] = 'failed'
+        aggregator.add(0, batch)
+        aggregator.add(0, frame(sample_transaction, [200]))
+
+        rows = {r['key']: r for r in aggregator.fire()}
+
+        assert set(rows) == {'Safaricom|success', 'Airtel|failed', 'Equity|success'}
+        assert (rows['Airtel|failed']['successful'], rows['Airtel|failed']['failed']) == (0, 1)
+
+    def test_late_events(self, sample_transaction):
+        """Late events update a fired window within the allowed lateness and are dropped after it"""
+        aggregator = WindowedAggregator('provider', size=60, max_delay=0, allowed_lateness=30)
+        aggregator.add(0, frame(sample_transaction, [10, 70]))
+        aggregator.fire()                                        # watermark 70: window 12:00 fires
+        aggregator.add(0, frame(sample_transaction, [20]))       # late, within lateness
+        refired = aggregator.fire()
+        aggregator.add(0, frame(sample_transaction, [100]))
+        aggregator.fire()                                        # watermark 100: window 12:00 is dropped
+        late = aggregator.add(0, frame(sample_transaction, [30]))
+
+        assert [(r['window_start'][11:], r['count']) for r in refired] == [('12:00:00', 2)]
+        assert late == 1
+        assert aggregator.get_stats()['late_records'] == 1
+        assert aggregator.get_stats()['open_windows'] == 1
+
+    def test_watermark_waits_for_assigned_partitions(self, sample_transaction):
+        """Partitions that have not delivered hold the watermark back until they go idle"""
+        aggregator = WindowedAggregator('provider', size=60, max_delay=0, idle_timeout=30)
+        aggregator.assign([0, 1])
+        aggregator.add(0, frame(sample_transaction, [10, 200]))
+
+        assert aggregator.fire() == []
+        aggregator.add(1, frame(sample_transaction, [30]))
+        assert aggregator.fire() == []  # partition 1 is only at 30s
+        aggregator.add(1, frame(sample_transaction, [90]))
+        assert [(r['key'], r['count']) for r in aggregator.fire()] == [('Safaricom', 2)]
+
+        aggregator.assign([2])
+        aggregator.add(1, frame(sample_transaction, [300]))
+        assert aggregator.fire() == []
+        assert aggregator.get_stats()['watermark'] == '2024-01-01T12:01:30'
+        aggregator.last_seen[2] -= 60  # partition 2 has been idle too long
+        assert [r['window_start'] for r in aggregator.fire()] == ['2024-01-01T12:01:00']
+        assert aggregator.get_stats()['watermark'] == '2024-01-01T12:03:20'
+
+
+class TestConsumeWindows:
+    """Test window aggregation on TransactionConsumer"""
+
+    @pytest.fixture
+    def broker(self, sample_transaction):
+        broker = FakeBroker(partitions=3)
+        fill(broker, events(sample_transaction, range(0, 1200, 2)))
+        return broker
+
+    def run(self, broker, path, group_id='windows', **options):
+        aggregators = [WindowedAggregator('provider', size=60), WindowedAggregator('sender', size=300, slide=60)]
+        sink, checkpoint = SqliteSink(path), SqliteCheckpoint(path)
+        consumer = TransactionConsumer(consumer=FakeConsumer('transactions', broker, group_id=group_id))
+        stats = consumer.consume_windows(aggregators, checkpoint=checkpoint, sink=sink, max_records=60,
+                                         workers=3, poll_timeout_ms=1, **options)
+        results = sink.read().drop(columns=['watermark'])
+        sink.close()
+        checkpoint.close()
+        return stats, results
+
+    def test_results_in_sink(self, broker, tmp_path):
+        """Fired windows land in the sink table with every event counted once"""
+        stats, results = self.run(broker, str(tmp_path / 'state.db'), idle_polls=1)
+        by_provider = results[results['aggregation'] == 'provider_60s_tumbling']
+
+        assert stats['messages_processed'] == 600
+        assert stats['windows']['provider_60s_tumbling']['late_records'] == 0
+        assert by_provider['window_start'].nunique() == 19
+        assert by_provider.groupby('window_start')['count'].sum().eq(30).all()
+        assert stats['stats']['total_messages'] == 600
+
+    def test_restart_resumes_from_checkpoint(self, broker, tmp_path):
+        """A restarted consumer continues from the checkpoint without replaying the topic"""
+        _, expected = self.run(broker, str(tmp_path / 'once.db'), group_id='once', idle_polls=1)
+
+        path = str(tmp_path / 'state.db')
+        first, _ = self.run(broker, path, max_messages=250)
+        # A new group has no Kafka offsets; the checkpoint alone decides where to resume
+        second, results = self.run(broker, path, group_id='replacement', idle_polls=1)
+
+        assert first['messages_processed'] >= 250
+        assert first['messages_processed'] + second['messages_processed'] == 600
+        pd.testing.assert_frame_equal(results, expected)
+
+    def test_restart_seeks_when_partitions_are_assigned(self, broker, tmp_path):
+        """Under a new group the checkpointed offsets are applied on assignment, also after a rebalance"""
+        path = str(tmp_path / 'state.db')
+        self.run(broker, path, max_messages=250)
+        saved = SqliteCheckpoint(path).restore([], 'transactions')
+
+        consumer = FakeConsumer('transactions', broker, group_id='replacement')
+        consumer.subscribe(['transactions'])  # like KafkaConsumer(topic): no partitions before the first poll
+        poll, fetched = consumer.poll, []
+
+        def recording_poll(*args, **kwargs):
+            if len(fetched) == 3:
+                consumer.rebalance()
+            batches = poll(*args, **kwargs)
+            fetched.append([(tp.partition, r.offset) for tp, records in batches.items() for r in records])
+            return batches
+
+        consumer.poll = recording_poll
+        checkpoint, sink = SqliteCheckpoint(path), SqliteSink(str(tmp_path / 'sink.db'))
+        stats = TransactionConsumer(consumer=consumer).consume_windows(
+            WindowedAggregator('provider', size=60), checkpoint=checkpoint, sink=sink, max_records=60,
+            poll_timeout_ms=1, idle_polls=1)
+        checkpoint.close()
+        sink.close()
+
+        offsets = [offset for batch in fetched for offset in batch]
+        assert len(offsets) == len(set(offsets)) == 600 - sum(saved.values())
+        assert {p: min(o for q, o in offsets if q == p) for p in saved} == saved
+        assert stats['messages_processed'] == len(offsets)
+
+    def test_topic_sink(self, sample_transaction):
+        """Window results can be sent to a topic, keyed by aggregation and key"""
+        broker = FakeBroker(partitions=1)
+        sink = TopicSink(FakeProducer(broker), topic='transaction-aggregates')
+        aggregator = WindowedAggregator('provider', size=60, max_delay=0)
+        aggregator.add(0, frame(sample_transaction, [5, 65]))
+
+        sink.write(aggregator.fire())
+
+        records = broker.records('transaction-aggregates', 0)
+        assert [r.key for r in records] == [b'provider_60s_tumbling|Safaricom']
+        assert json.loads(records[0].value)['count'] == 1
+        sink.producer.close()
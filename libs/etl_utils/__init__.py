@@ -1,9 +1,36 @@
 """Shared ETL utilities used across projects.
 
-This package contains small helpers for S3 upload and simple CSV incremental helpers.
+This package contains small helpers for S3 upload (a pooled, parallel, resumable
+uploader) and CSV streaming: a plain incremental chunk reader and a
+schema-pinned typed chunk reader.
 """
 
-from .s3 import upload_file_to_s3
-from .io import incremental_csv_chunks
+from .s3 import (
+    get_s3_client,
+    resumable_upload_to_s3,
+    upload_directory_to_s3,
+    upload_file_to_s3,
+)
+from .io import (
+    DATETIME,
+    MARKET_DATA_SCHEMA,
+    MPESA_TRANSACTION_SCHEMA,
+    ChunkStats,
+    concat_typed_chunks,
+    incremental_csv_chunks,
+    typed_csv_chunks,
+)
 
-__all__ = ["upload_file_to_s3", "incremental_csv_chunks"]
+__all__ = [
+    "upload_file_to_s3",
+    "upload_directory_to_s3",
+    "resumable_upload_to_s3",
+    "get_s3_client",
+    "incremental_csv_chunks",
+    "typed_csv_chunks",
+    "concat_typed_chunks",
+    "ChunkStats",
+    "DATETIME",
+    "MARKET_DATA_SCHEMA",
+    "MPESA_TRANSACTION_SCHEMA",
+]
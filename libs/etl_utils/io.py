@@ -1,8 +1,192 @@
 import pandas as pd
-from typing import Iterator
+from dataclasses import dataclass
+from typing import BinaryIO, Iterable, Iterator, List, Mapping, Optional, Tuple, Union
+
+DtypeSpec = Union[str, pd.CategoricalDtype]
+ColumnSchema = Mapping[str, DtypeSpec]
+
+# Schema value for columns that should be parsed as timestamps.
+DATETIME = "datetime"
+
+# Raw column layout of the Project 1 market price CSVs.
+MARKET_DATA_SCHEMA = {
+    "Market Name": "category",
+    "Product Name": "category",
+    "Price": "float32",
+    "Quantity": "Int32",
+    "Date Recorded": DATETIME,
+}
+
+# Raw column layout of the M-Pesa transaction CSVs (Projects 2-4).
+MPESA_TRANSACTION_SCHEMA = {
+    "transaction_id": "string",
+    "sender": "string",
+    "receiver": "string",
+    "amount": "float64",
+    "fee": "float32",
+    "timestamp": DATETIME,
+    "transaction_type": "category",
+    "status": "category",
+    "provider": "category",
+}
+
+_ARROW_TYPES = {
+    "category": "dictionary",
+    "string": "string",
+    "str": "string",
+    "float32": "float32",
+    "float64": "float64",
+    "int8": "int8",
+    "int16": "int16",
+    "int32": "int32",
+    "int64": "int64",
+    "Int8": "int8",
+    "Int16": "int16",
+    "Int32": "int32",
+    "Int64": "int64",
+    "bool": "bool",
+    "boolean": "bool",
+}
+
+
+@dataclass
+class ChunkStats:
+    """Counters for one chunk yielded by `typed_csv_chunks`."""
+
+    index: int
+    rows: int
+    bytes_read: int
+    total_bytes_read: int
+    memory_bytes: int
 
 
 def incremental_csv_chunks(path: str, chunk_size: int = 100_000) -> Iterator[pd.DataFrame]:
     """Yield CSV chunks as DataFrames for memory-friendly processing."""
     for chunk in pd.read_csv(path, chunksize=chunk_size):
         yield chunk
+
+
+def typed_csv_chunks(
+    path: str,
+    schema: ColumnSchema,
+    chunk_size: int = 100_000,
+    engine: str = "c",
+    date_format: Optional[str] = None,
+    block_size: int = 16 << 20,
+) -> Iterator[Tuple[pd.DataFrame, ChunkStats]]:
+    """Yield ``(chunk, stats)`` pairs read with dtypes pinned by ``schema``.
+
+    Only the columns named in ``schema`` are read. Values are pandas dtype
+    strings (``"category"``, ``"float32"``, ``"Int32"``, ...), a
+    ``pd.CategoricalDtype`` with fixed categories, or ``DATETIME``.
+
+    ``engine="c"`` streams ``chunk_size`` rows at a time through pandas.
+    ``engine="pyarrow"`` streams through ``pyarrow.csv`` instead; chunk
+    boundaries then follow ``block_size`` bytes rather than a row count.
+    ``bytes_read`` is measured from the file position, so it includes the
+    parser's read-ahead buffer.
+    """
+    if engine not in ("c", "pyarrow"):
+        raise ValueError(f"Unsupported engine: {engine}")
+
+    with open(path, "rb") as fh:
+        if engine == "pyarrow":
+            frames = _arrow_frames(fh, schema, block_size)
+        else:
+            frames = _pandas_frames(fh, schema, chunk_size, date_format)
+
+        position = 0
+        for index, frame in enumerate(frames):
+            frame = _apply_schema(frame, schema)
+            current = fh.tell()
+            stats = ChunkStats(
+                index=index,
+                rows=len(frame),
+                bytes_read=current - position,
+                total_bytes_read=current,
+                memory_bytes=int(frame.memory_usage(index=False).sum()),
+            )
+            position = current
+            yield frame, stats
+
+
+def concat_typed_chunks(chunks: Iterable[pd.DataFrame]) -> pd.DataFrame:
+    """Concatenate typed chunks without losing categorical dtypes.
+
+    Chunks read with a plain ``"category"`` dtype each carry their own
+    categories; a bare ``pd.concat`` would fall back to object columns.
+    """
+    chunks: List[pd.DataFrame] = list(chunks)
+    if not chunks:
+        return pd.DataFrame()
+
+    for col, dtype in chunks[0].dtypes.items():
+        if not isinstance(dtype, pd.CategoricalDtype):
+            continue
+        categories = dtype.categories
+        for chunk in chunks[1:]:
+            categories = categories.union(chunk[col].cat.categories)
+        unified = pd.CategoricalDtype(categories)
+        for chunk in chunks:
+            chunk[col] = chunk[col].astype(unified)
+
+    return pd.concat(chunks, ignore_index=True)
+
+
+def _pandas_frames(
+    fh: BinaryIO, schema: ColumnSchema, chunk_size: int, date_format: Optional[str]
+) -> Iterator[pd.DataFrame]:
+    date_cols = [col for col, spec in schema.items() if _is_datetime(spec)]
+    dtypes = {col: spec for col, spec in schema.items() if not _is_datetime(spec)}
+    reader = pd.read_csv(
+        fh,
+        usecols=list(schema),
+        dtype=dtypes,
+        parse_dates=date_cols,
+        date_format=date_format,
+        chunksize=chunk_size,
+    )
+    with reader:
+        yield from reader
+
+
+def _arrow_frames(fh: BinaryIO, schema: ColumnSchema, block_size: int) -> Iterator[pd.DataFrame]:
+    import pyarrow as pa
+    from pyarrow import csv as pa_csv
+
+    column_types = {}
+    for col, spec in schema.items():
+        if _is_datetime(spec):
+            column_types[col] = pa.timestamp("ns")
+        elif isinstance(spec, pd.CategoricalDtype) or _ARROW_TYPES.get(spec) == "dictionary":
+            column_types[col] = pa.dictionary(pa.int32(), pa.string())
+        elif spec in _ARROW_TYPES:
+            column_types[col] = getattr(pa, _ARROW_TYPES[spec])()
+
+    reader = pa_csv.open_csv(
+        fh,
+        read_options=pa_csv.ReadOptions(block_size=block_size),
+        convert_options=pa_csv.ConvertOptions(
+            column_types=column_types,
+            include_columns=list(schema),
+        ),
+    )
+    for batch in reader:
+        yield batch.to_pandas()
+
+
+def _apply_schema(frame: pd.DataFrame, schema: ColumnSchema) -> pd.DataFrame:
+    """Cast any column whose dtype drifted from the schema (cheap when it already matches)."""
+    for col, spec in schema.items():
+        if col not in frame.columns:
+            continue
+        if _is_datetime(spec):
+            if not pd.api.types.is_datetime64_any_dtype(frame[col]):
+                frame[col] = pd.to_datetime(frame[col], errors="coerce")
+        elif frame[col].dtype != spec:
+            frame[col] = frame[col].astype(spec)
+    return frame
+
+
+def _is_datetime(spec: DtypeSpec) -> bool:
+    return isinstance(spec, str) and spec == DATETIME
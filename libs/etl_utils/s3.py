@@ -1,12 +1,234 @@
+import hashlib
+import logging
 import os
-from typing import Optional
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
 
 import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
 
+logger = logging.getLogger(__name__)
 
-def upload_file_to_s3(local_path: str, bucket: str, key: str, region: Optional[str] = None):
-    """Upload a file to S3 using boto3. Expects credentials to be available via environment or IAM role."""
-    session = boto3.session.Session(region_name=region)
-    s3 = session.client("s3")
-    s3.upload_file(local_path, bucket, key)
+MB = 1024 * 1024
+
+# S3 rejects multipart parts smaller than 5 MB (except the last one).
+MIN_PART_SIZE = 5 * MB
+DEFAULT_PART_SIZE = 16 * MB
+DEFAULT_MAX_WORKERS = 8
+DEFAULT_PATTERNS = ("*.csv", "*.parquet")
+
+_clients: Dict[Tuple[int, Optional[str]], object] = {}
+_clients_lock = threading.Lock()
+
+
+def get_s3_client(region: Optional[str] = None, max_pool_connections: int = 32):
+    """Return the process-wide S3 client for ``region``, creating it once.
+
+    boto3 clients are thread-safe, so one client per process (keyed by pid so
+    forked workers never share a parent's connection pool) serves every upload.
+    """
+    key = (os.getpid(), region)
+    client = _clients.get(key)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(key)
+            if client is None:
+                session = boto3.session.Session(region_name=region)
+                client = session.client(
+                    "s3",
+                    config=Config(max_pool_connections=max_pool_connections, retries={"mode": "adaptive"}),
+                )
+                _clients[key] = client
+    return client
+
+
+def reset_s3_clients() -> None:
+    """Drop cached clients (e.g. after changing credentials or endpoints)."""
+    with _clients_lock:
+        _clients.clear()
+
+
+def transfer_config(
+    part_size: int = DEFAULT_PART_SIZE,
+    max_concurrency: int = DEFAULT_MAX_WORKERS,
+    multipart_threshold: Optional[int] = None,
+) -> TransferConfig:
+    """Build a ``TransferConfig`` for multipart transfers of ``part_size`` parts."""
+    part_size = max(part_size, MIN_PART_SIZE)
+    return TransferConfig(
+        multipart_threshold=multipart_threshold or part_size,
+        multipart_chunksize=part_size,
+        max_concurrency=max_concurrency,
+        use_threads=max_concurrency > 1,
+    )
+
+
+def upload_file_to_s3(
+    local_path: str,
+    bucket: str,
+    key: str,
+    region: Optional[str] = None,
+    config: Optional[TransferConfig] = None,
+):
+    """Upload a file to S3 using the pooled client. Expects credentials to be available via environment or IAM role."""
+    s3 = get_s3_client(region)
+    s3.upload_file(local_path, bucket, key, Config=config or transfer_config())
+    return f"s3://{bucket}/{key}"
+
+
+def local_etag(local_path: str, part_size: int = DEFAULT_PART_SIZE, multipart_threshold: Optional[int] = None) -> str:
+    """Compute the ETag S3 would report for ``local_path`` uploaded with ``part_size`` parts."""
+    part_size = max(part_size, MIN_PART_SIZE)
+    threshold = multipart_threshold or part_size
+    size = os.path.getsize(local_path)
+
+    whole = hashlib.md5()
+    digests: List[bytes] = []
+    with open(local_path, "rb") as fh:
+        for block in iter(lambda: fh.read(part_size), b""):
+            whole.update(block)
+            digests.append(hashlib.md5(block).digest())
+
+    if size < threshold:
+        return whole.hexdigest()
+    return f"{hashlib.md5(b''.join(digests)).hexdigest()}-{len(digests)}"
+
+
+def object_matches(
+    local_path: str,
+    bucket: str,
+    key: str,
+    region: Optional[str] = None,
+    part_size: int = DEFAULT_PART_SIZE,
+) -> bool:
+    """True if ``s3://bucket/key`` already holds the same bytes as ``local_path``.
+
+    Size is compared first so the local hash is only computed when it could match.
+    """
+    s3 = get_s3_client(region)
+    try:
+        head = s3.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+
+    if head["ContentLength"] != os.path.getsize(local_path):
+        return False
+    return head["ETag"].strip('"') == local_etag(local_path, part_size)
+
+
+def upload_directory_to_s3(
+    local_dir: str,
+    bucket: str,
+    prefix: str = "",
+    patterns: Iterable[str] = DEFAULT_PATTERNS,
+    region: Optional[str] = None,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+    part_size: int = DEFAULT_PART_SIZE,
+    skip_existing: bool = True,
+) -> Dict[str, str]:
+    """Upload every file in ``local_dir`` matching ``patterns`` through a thread pool.
+
+    Keys are ``prefix`` joined with the path relative to ``local_dir``. Returns
+    ``{key: "uploaded" | "skipped" | "failed"}``. Per-file concurrency is kept at
+    one thread because the pool already runs files in parallel.
+    """
+    root = Path(local_dir)
+    files = sorted({p for pattern in patterns for p in root.rglob(pattern) if p.is_file()})
+    config = transfer_config(part_size=part_size, max_concurrency=1)
+    prefix = prefix.strip("/")
+
+    def _upload(path: Path) -> Tuple[str, str]:
+        key = "/".join(filter(None, [prefix, path.relative_to(root).as_posix()]))
+        try:
+            if skip_existing and object_matches(str(path), bucket, key, region, part_size):
+                logger.info(f"Skipping unchanged s3://{bucket}/{key}")
+                return key, "skipped"
+            upload_file_to_s3(str(path), bucket, key, region=region, config=config)
+            logger.info(f"Uploaded {path} to s3://{bucket}/{key}")
+            return key, "uploaded"
+        except Exception as e:
+            logger.error(f"Upload of {path} failed: {e}")
+            return key, "failed"
+
+    results: Dict[str, str] = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        for future in as_completed([pool.submit(_upload, p) for p in files]):
+            key, status = future.result()
+            results[key] = status
+    return results
+
+
+def resumable_upload_to_s3(
+    local_path: str,
+    bucket: str,
+    key: str,
+    region: Optional[str] = None,
+    part_size: int = DEFAULT_PART_SIZE,
+    max_workers: int = DEFAULT_MAX_WORKERS,
+) -> str:
+    """Multipart upload that picks up an interrupted upload of ``key`` where it stopped.
+
+    If an in-progress multipart upload exists for ``key``, parts already stored
+    with a matching size and MD5 are kept and only the missing ones are sent.
+    Call again after a failure to resume. Files below ``part_size`` fall back
+    to a plain upload.
+    """
+    part_size = max(part_size, MIN_PART_SIZE)
+    size = os.path.getsize(local_path)
+    if size <= part_size:
+        return upload_file_to_s3(local_path, bucket, key, region=region)
+
+    s3 = get_s3_client(region)
+    upload_id, done = _find_multipart_upload(s3, bucket, key)
+    if upload_id is None:
+        upload_id = s3.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+        logger.info(f"Started multipart upload {upload_id} for s3://{bucket}/{key}")
+    else:
+        logger.info(f"Resuming multipart upload {upload_id} for s3://{bucket}/{key} ({len(done)} parts stored)")
+
+    part_count = (size + part_size - 1) // part_size
+
+    def _part(number: int) -> Tuple[int, str]:
+        with open(local_path, "rb") as fh:
+            fh.seek((number - 1) * part_size)
+            body = fh.read(part_size)
+        etag = hashlib.md5(body).hexdigest()
+        if done.get(number) == (len(body), etag):
+            return number, etag
+        resp = s3.upload_part(Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=number, Body=body)
+        return number, resp["ETag"].strip('"')
+
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        parts = sorted(pool.map(_part, range(1, part_count + 1)))
+
+    s3.complete_multipart_upload(
+        Bucket=bucket,
+        Key=key,
+        UploadId=upload_id,
+        MultipartUpload={"Parts": [{"PartNumber": n, "ETag": f'"{etag}"'} for n, etag in parts]},
+    )
     return f"s3://{bucket}/{key}"
+
+
+def _find_multipart_upload(s3, bucket: str, key: str) -> Tuple[Optional[str], Dict[int, Tuple[int, str]]]:
+    """Return the newest in-progress upload id for ``key`` and its stored parts."""
+    uploads = [
+        u for u in s3.list_multipart_uploads(Bucket=bucket, Prefix=key).get("Uploads", [])
+        if u["Key"] == key
+    ]
+    if not uploads:
+        return None, {}
+    upload_id = max(uploads, key=lambda u: u["Initiated"])["UploadId"]
+
+    done: Dict[int, Tuple[int, str]] = {}
+    paginator = s3.get_paginator("list_parts")
+    for page in paginator.paginate(Bucket=bucket, Key=key, UploadId=upload_id):
+        for part in page.get("Parts", []):
+            done[part["PartNumber"]] = (part["Size"], part["ETag"].strip('"'))
+    return upload_id, done
@@ -0,0 +1,7 @@
+"""Pytest configuration for the shared etl_utils tests"""
+
+import os
+import sys
+
+# Make `etl_utils` importable without installing the package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,93 @@
+"""Unit tests for the typed CSV chunk reader"""
+
+import os
+
+import pandas as pd
+import pytest
+
+from etl_utils.io import (
+    MARKET_DATA_SCHEMA,
+    concat_typed_chunks,
+    incremental_csv_chunks,
+    typed_csv_chunks,
+)
+
+
+@pytest.fixture
+def market_csv(tmp_path):
+    """Small market CSV with a missing quantity and an extra column"""
+    path = tmp_path / "market.csv"
+    pd.DataFrame({
+        'Market Name': ['Nairobi Market', 'Mombasa Market', 'Kisumu Market', 'Nairobi Market', 'Nakuru Market'],
+        'Product Name': ['Maize', 'Rice', 'Beans', 'Maize', 'Tea'],
+        'Price': [50.5, 120.0, 80.25, 55.0, 300.0],
+        'Quantity': pd.array([100, 200, None, 150, 40], dtype='Int64'),
+        'Date Recorded': ['2024-01-15', '2024-01-15', '2024-01-16', '2024-01-16', '2024-01-17'],
+        'Notes': ['a', 'b', 'c', 'd', 'e'],
+    }).to_csv(path, index=False)
+    return str(path)
+
+
+@pytest.mark.parametrize('engine', ['c', 'pyarrow'])
+def test_typed_chunks_pin_schema_dtypes(market_csv, engine):
+    if engine == 'pyarrow':
+        pytest.importorskip('pyarrow')
+
+    chunks = list(typed_csv_chunks(market_csv, MARKET_DATA_SCHEMA, chunk_size=2, engine=engine))
+    frames = [frame for frame, _ in chunks]
+
+    assert sum(len(f) for f in frames) == 5
+    for frame in frames:
+        assert list(frame.columns) == list(MARKET_DATA_SCHEMA)
+        assert isinstance(frame['Market Name'].dtype, pd.CategoricalDtype)
+        assert frame['Price'].dtype == 'float32'
+        assert frame['Quantity'].dtype == 'Int32'
+        assert pd.api.types.is_datetime64_any_dtype(frame['Date Recorded'])
+
+
+def test_typed_chunks_report_row_and_byte_counters(market_csv):
+    chunks = list(typed_csv_chunks(market_csv, MARKET_DATA_SCHEMA, chunk_size=2))
+    stats = [s for _, s in chunks]
+
+    assert [s.index for s in stats] == [0, 1, 2]
+    assert [s.rows for s in stats] == [2, 2, 1]
+    assert stats[-1].total_bytes_read == os.path.getsize(market_csv)
+    assert sum(s.bytes_read for s in stats) == stats[-1].total_bytes_read
+    assert all(s.memory_bytes > 0 for s in stats)
+
+
+def test_fixed_categories_are_respected(market_csv):
+    schema = dict(MARKET_DATA_SCHEMA)
+    schema['Product Name'] = pd.CategoricalDtype(['Maize', 'Rice', 'Beans', 'Tea'])
+
+    frames = [frame for frame, _ in typed_csv_chunks(market_csv, schema, chunk_size=2)]
+
+    for frame in frames:
+        assert list(frame['Product Name'].cat.categories) == ['Maize', 'Rice', 'Beans', 'Tea']
+
+
+def test_unknown_engine_rejected(market_csv):
+    with pytest.raises(ValueError):
+        next(typed_csv_chunks(market_csv, MARKET_DATA_SCHEMA, engine='python'))
+
+
+def test_concat_typed_chunks_keeps_categoricals(market_csv):
+    frames = [frame for frame, _ in typed_csv_chunks(market_csv, MARKET_DATA_SCHEMA, chunk_size=2)]
+
+    combined = concat_typed_chunks(frames)
+
+    assert len(combined) == 5
+    assert isinstance(combined['Market Name'].dtype, pd.CategoricalDtype)
+    assert set(combined['Market Name']) == {
+        'Nairobi Market', 'Mombasa Market', 'Kisumu Market', 'Nakuru Market'
+    }
+    assert combined['Quantity'].isna().sum() == 1
+
+
+def test_concat_typed_chunks_empty():
+    assert concat_typed_chunks([]).empty
+
+
+def test_incremental_csv_chunks_unchanged(market_csv):
+    chunks = list(incremental_csv_chunks(market_csv, chunk_size=3))
+    assert [len(c) for c in chunks] == [3, 2]
@@ -0,0 +1,103 @@
+"""Unit tests for the pooled S3 uploader (run against moto's in-process S3)"""
+
+import os
+
+import pytest
+
+moto = pytest.importorskip('moto')
+
+from etl_utils import s3 as s3_utils
+
+BUCKET = 'etl-test-bucket'
+MB = 1024 * 1024
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    """Mocked S3 with an empty bucket and a fresh client cache"""
+    monkeypatch.setenv('AWS_ACCESS_KEY_ID', 'testing')
+    monkeypatch.setenv('AWS_SECRET_ACCESS_KEY', 'testing')
+    monkeypatch.setenv('AWS_DEFAULT_REGION', 'us-east-1')
+    s3_utils.reset_s3_clients()
+    with moto.mock_aws():
+        client = s3_utils.get_s3_client('us-east-1')
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+    s3_utils.reset_s3_clients()
+
+
+@pytest.fixture
+def export_dir(tmp_path):
+    """Directory of processed exports plus a file that should not be uploaded"""
+    (tmp_path / 'daily').mkdir()
+    (tmp_path / 'taxpayers.csv').write_text('id,name\n1,a\n2,b\n')
+    (tmp_path / 'daily' / 'vat.parquet').write_bytes(os.urandom(2048))
+    (tmp_path / 'notes.txt').write_text('ignore me')
+    return tmp_path
+
+
+def test_client_is_reused(s3):
+    assert s3_utils.get_s3_client('us-east-1') is s3
+
+
+def test_upload_file_to_s3(s3, export_dir):
+    uri = s3_utils.upload_file_to_s3(str(export_dir / 'taxpayers.csv'), BUCKET, 'kra/taxpayers.csv', region='us-east-1')
+
+    assert uri == f's3://{BUCKET}/kra/taxpayers.csv'
+    body = s3.get_object(Bucket=BUCKET, Key='kra/taxpayers.csv')['Body'].read()
+    assert body == b'id,name\n1,a\n2,b\n'
+
+
+def test_upload_directory_uploads_then_skips_unchanged(s3, export_dir):
+    first = s3_utils.upload_directory_to_s3(str(export_dir), BUCKET, prefix='kra/processed', region='us-east-1')
+
+    assert first == {
+        'kra/processed/taxpayers.csv': 'uploaded',
+        'kra/processed/daily/vat.parquet': 'uploaded',
+    }
+
+    (export_dir / 'taxpayers.csv').write_text('id,name\n1,a\n2,b\n3,c\n')
+    second = s3_utils.upload_directory_to_s3(str(export_dir), BUCKET, prefix='kra/processed', region='us-east-1')
+
+    assert second == {
+        'kra/processed/taxpayers.csv': 'uploaded',
+        'kra/processed/daily/vat.parquet': 'skipped',
+    }
+
+
+def test_local_etag_matches_multipart_etag(s3, tmp_path):
+    path = tmp_path / 'big.csv'
+    path.write_bytes(os.urandom(11 * MB))
+    config = s3_utils.transfer_config(part_size=5 * MB)
+
+    s3_utils.upload_file_to_s3(str(path), BUCKET, 'big.csv', region='us-east-1', config=config)
+
+    assert s3_utils.object_matches(str(path), BUCKET, 'big.csv', 'us-east-1', part_size=5 * MB)
+    assert s3_utils.local_etag(str(path), part_size=5 * MB).endswith('-3')
+
+
+def test_resumable_upload_completes_interrupted_upload(s3, tmp_path):
+    path = tmp_path / 'big.parquet'
+    data = os.urandom(11 * MB)
+    path.write_bytes(data)
+
+    # Simulate a run that died after sending the first part
+    upload_id = s3.create_multipart_upload(Bucket=BUCKET, Key='big.parquet')['UploadId']
+    s3.upload_part(Bucket=BUCKET, Key='big.parquet', UploadId=upload_id, PartNumber=1, Body=data[:5 * MB])
+
+    sent = []
+    original = s3.upload_part
+
+    def tracking_upload_part(**kwargs):
+        sent.append(kwargs['PartNumber'])
+        return original(**kwargs)
+
+    s3.upload_part = tracking_upload_part
+    try:
+        s3_utils.resumable_upload_to_s3(str(path), BUCKET, 'big.parquet', region='us-east-1', part_size=5 * MB)
+    finally:
+        s3.upload_part = original
+
+    assert sorted(sent) == [2, 3]
+    assert s3.get_object(Bucket=BUCKET, Key='big.parquet')['Body'].read() == data
+    assert s3.list_multipart_uploads(Bucket=BUCKET).get('Uploads', []) == []